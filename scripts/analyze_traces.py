@@ -0,0 +1,302 @@
+"""
+Trace analyzer: per-topic / per-model tables from calls.trace.jsonl
+===================================================================
+The generators append one JSON line per backend call to a trace file
+(qgen/trace.py): calls.trace.jsonl in the bank folder for the Ollama
+generators, ossc_groq.trace.jsonl for the Groq one. This reads one or
+more of them in a single streaming pass and prints, per group:
+
+- calls, failed %, cached (answers reused from the response cache)
+- parse yield (questions parsed / asked for), duplicate % (of parsed),
+  accepted, accepted per call-minute
+- latency p50 / p95, mean queue wait (slot / rate limiter), tokens/s
+
+plus latency against output length (completion-token buckets, seconds
+per 100 tokens, correlation) and a count of failures by error class.
+
+Groups are any of run, backend, model, endpoint (the Ollama server that
+answered, with --hosts), subject, topic (subject + topic), subtopic,
+difficulty, finish_reason, error, stream; several --by make several
+tables, "a+b" groups by both.
+
+Usage:
+    python scripts/analyze_traces.py
+    python scripts/analyze_traces.py --by model topic difficulty --run last
+    python scripts/analyze_traces.py a.trace.jsonl b.trace.jsonl --by model+topic --sort parse_yield --top 20
+    python scripts/analyze_traces.py --filter subject=Odia* --by subtopic --json odia.json
+"""
+
+import argparse
+import json
+import math
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+
+from qgen.trace import iter_traces
+
+QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
+TRACE_FILE = "calls.trace.jsonl"
+KEYS = ("run", "backend", "model", "endpoint", "subject", "topic", "subtopic", "difficulty", "finish_reason", "error", "stream")
+COLUMNS = ("calls", "failed_pct", "cached", "parse_yield", "dup_pct", "accepted", "accepted_per_min",
+           "p50", "p95", "queue_wait", "tokens_per_s")
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096)
+
+
+class Group:
+    """Running totals for one table row; latencies are kept for the quantiles."""
+
+    __slots__ = ("calls", "failed", "cached", "requested", "parsed", "accepted", "duplicates",
+                 "tokens", "token_time", "call_time", "queue_wait", "latencies")
+
+    def __init__(self):
+        self.calls = self.failed = self.cached = 0
+        self.requested = self.parsed = self.accepted = self.duplicates = self.tokens = 0
+        self.token_time = self.call_time = self.queue_wait = 0.0
+        self.latencies = []
+
+    def add(self, t):
+        self.calls += 1
+        self.requested += t.get("requested") or 0
+        self.queue_wait += t.get("queue_wait") or 0.0
+        if t.get("error"):
+            self.failed += 1
+            return
+        self.parsed += t.get("parsed") or 0
+        self.accepted += t.get("accepted") or 0
+        self.duplicates += t.get("duplicates") or 0
+        if t.get("cached"):
+            self.cached += 1
+            return  # its latency and tokens belong to the run that cached it
+        latency = t.get("latency")
+        if latency is not None:
+            self.latencies.append(latency)
+            self.call_time += latency
+        tokens = t.get("completion_tokens")
+        if tokens:
+            self.tokens += tokens
+            self.token_time += t.get("eval_s") or latency or 0.0
+
+    def row(self):
+        self.latencies.sort()
+        return {
+            "calls": self.calls,
+            "failed_pct": round(100 * self.failed / self.calls, 1),
+            "cached": self.cached,
+            "parse_yield": round(self.parsed / self.requested, 3) if self.requested else None,
+            "dup_pct": round(100 * self.duplicates / self.parsed, 1) if self.parsed else None,
+            "accepted": self.accepted,
+            "accepted_per_min": round(self.accepted / self.call_time * 60, 1) if self.call_time else None,
+            "p50": _quantile(self.latencies, 0.5),
+            "p95": _quantile(self.latencies, 0.95),
+            "queue_wait": round(self.queue_wait / self.calls, 3),
+            "tokens_per_s": round(self.tokens / self.token_time, 1) if self.token_time else None,
+        }
+
+
+def _quantile(ordered, q):
+    if not ordered:
+        return None
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 3)
+
+
+def group_key(t, fields):
+    values = []
+    for field in fields:
+        if field == "topic":
+            values.append(f"{t.get('subject')} / {t.get('topic')}")
+        else:
+            values.append(str(t.get(field)))
+    return " | ".join(values)
+
+
+def token_bucket(tokens):
+    for bound in TOKEN_BUCKETS:
+        if tokens <= bound:
+            return bound
+    return math.inf
+
+
+class LengthTable:
+    """Latency against completion tokens: per-bucket latency and a Pearson correlation."""
+
+    def __init__(self):
+        self.buckets = {}
+        self.n = 0
+        self.sx = self.sy = self.sxx = self.syy = self.sxy = 0.0
+
+    def add(self, t):
+        tokens, latency = t.get("completion_tokens"), t.get("latency")
+        if t.get("error") or t.get("cached") or not tokens or latency is None:
+            return
+        self.buckets.setdefault(token_bucket(tokens), []).append((tokens, latency))
+        self.n += 1
+        self.sx += tokens
+        self.sy += latency
+        self.sxx += tokens * tokens
+        self.syy += latency * latency
+        self.sxy += tokens * latency
+
+    def correlation(self):
+        if self.n < 2:
+            return None
+        cov = self.sxy - self.sx * self.sy / self.n
+        var = (self.sxx - self.sx ** 2 / self.n) * (self.syy - self.sy ** 2 / self.n)
+        return round(cov / math.sqrt(var), 3) if var > 0 else None
+
+    def rows(self):
+        out = []
+        lower = 0
+        for bound in sorted(self.buckets):
+            calls = self.buckets[bound]
+            latencies = sorted(latency for _, latency in calls)
+            tokens = sum(n for n, _ in calls)
+            out.append({
+                "tokens": f"{lower + 1}-{bound}" if bound != math.inf else f">{lower}",
+                "calls": len(calls),
+                "mean_latency": round(sum(latencies) / len(calls), 3),
+                "p95": _quantile(latencies, 0.95),
+                "s_per_100_tokens": round(sum(latencies) / tokens * 100, 3),
+            })
+            lower = bound
+        return out
+
+
+def matches(t, filters):
+    return all(fnmatch(str(t.get(key)), pattern) for key, pattern in filters)
+
+
+def analyze(paths, tables, filters=(), run=None):
+    """One pass over the traces; returns ({table: {key: Group}}, LengthTable, {error: n}, total, runs)."""
+    groups = {table: {} for table in tables}
+    fields = {table: table.split("+") for table in tables}
+    lengths = LengthTable()
+    errors = {}
+    runs = {}
+    total = 0
+    if run == "last":
+        run = last_run(paths)
+    for path in paths:
+        for t in iter_traces(path):
+            if run and t.get("run") != run:
+                continue
+            if filters and not matches(t, filters):
+                continue
+            total += 1
+            runs[t.get("run")] = None
+            for table, by in groups.items():
+                key = group_key(t, fields[table])
+                group = by.get(key)
+                if group is None:
+                    group = by[key] = Group()
+                group.add(t)
+            lengths.add(t)
+            if t.get("error"):
+                errors[t["error"]] = errors.get(t["error"], 0) + 1
+    return groups, lengths, errors, total, list(runs)
+
+
+def last_run(paths):
+    """Id of the most recent run in the traces (the run of the last line of the last file)."""
+    for path in reversed(paths):
+        with open(path, "rb") as f:
+            f.seek(0, 2)
+            f.seek(max(0, f.tell() - 65536))
+            lines = f.read().splitlines()
+        for line in reversed(lines):
+            try:
+                return json.loads(line)["run"]
+            except (ValueError, KeyError):
+                continue
+    return None
+
+
+def fmt(value, width):
+    if value is None:
+        return f"{'-':>{width}}"
+    if isinstance(value, float):
+        return f"{value:>{width}.2f}" if value < 100 else f"{value:>{width}.0f}"
+    return f"{value:>{width}}"
+
+
+def print_table(title, rows, label_width=44):
+    print(f"\n📊 By {title}")
+    header = f"   {title[:label_width]:<{label_width}}" + "".join(f" {c:>9}" for c in
+                                                               ("calls", "fail%", "cached", "yield", "dup%",
+                                                                "accepted", "acc/min", "p50 s", "p95 s",
+                                                                "wait s", "tok/s"))
+    print(header)
+    print("   " + "-" * (len(header) - 3))
+    for key, row in rows:
+        print(f"   {key[:label_width]:<{label_width}}" + "".join(f" {fmt(row[c], 9)}" for c in COLUMNS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-topic / per-model throughput and yield from call traces")
+    parser.add_argument("traces", nargs="*", type=Path,
+                        help=f"trace files (default: {QUESTIONS_DIR / TRACE_FILE})")
+    parser.add_argument("--by", nargs="+", default=["model", "topic"],
+                        help=f"one table per grouping: {', '.join(KEYS)}, or several joined with +")
+    parser.add_argument("--run", default=None, help="only this run id, or 'last'")
+    parser.add_argument("--filter", action="append", default=[], metavar="KEY=GLOB",
+                        help="keep calls whose KEY matches GLOB, e.g. subject=Odia* (repeatable)")
+    parser.add_argument("--sort", default="calls", choices=COLUMNS, help="column to sort rows by (descending)")
+    parser.add_argument("--top", type=int, default=None, help="rows per table")
+    parser.add_argument("--json", type=Path, default=None, help="also write the tables to this JSON file")
+    args = parser.parse_args()
+
+    for table in args.by:
+        unknown = [k for k in table.split("+") if k not in KEYS]
+        if unknown:
+            parser.error(f"unknown grouping {'+'.join(unknown)} (use {', '.join(KEYS)})")
+    filters = []
+    for spec in args.filter:
+        key, sep, pattern = spec.partition("=")
+        if not sep or key not in KEYS:
+            parser.error(f"--filter takes KEY=GLOB with KEY one of {', '.join(KEYS)}")
+        filters.append((key, pattern))
+    paths = args.traces or [QUESTIONS_DIR / TRACE_FILE]
+    paths = [p for p in paths if p.exists() or print(f"⚠️  {p} not found, skipped")]
+    if not paths:
+        return
+
+    start = time.time()
+    groups, lengths, errors, total, runs = analyze(paths, args.by, filters, args.run)
+    elapsed = time.time() - start
+    print(f"🔍 {total} calls from {len(paths)} trace file(s), {len(runs)} run(s) "
+          f"({elapsed:.2f}s, {total / max(elapsed, 1e-9):,.0f} calls/s)")
+    if not total:
+        return
+
+    report = {"calls": total, "runs": runs, "tables": {}}
+    for table, by in groups.items():
+        rows = [(key, group.row()) for key, group in by.items()]
+        rows.sort(key=lambda kv: (kv[1][args.sort] is not None, kv[1][args.sort] or 0), reverse=True)
+        if args.top:
+            rows = rows[:args.top]
+        print_table(table, rows)
+        report["tables"][table] = [dict(row, key=key) for key, row in rows]
+
+    length_rows = lengths.rows()
+    if length_rows:
+        r = lengths.correlation()
+        print(f"\n⏱️  Latency vs. output length (r = {'-' if r is None else r})")
+        print(f"   {'tokens':<12} {'calls':>7} {'mean s':>8} {'p95 s':>8} {'s/100 tok':>10}")
+        for row in length_rows:
+            print(f"   {row['tokens']:<12} {row['calls']:>7} {row['mean_latency']:>8.2f} "
+                  f"{fmt(row['p95'], 8)} {row['s_per_100_tokens']:>10.3f}")
+        report["latency_by_tokens"] = {"correlation": r, "buckets": length_rows}
+
+    if errors:
+        print("\n❌ Failures by error")
+        for error, n in sorted(errors.items(), key=lambda kv: -kv[1]):
+            print(f"   {error:<44} {n:>7}")
+    report["errors"] = errors
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+bench - benchmarks for the question generator pipeline
+======================================================
+Every benchmark runs against a local stand-in LLM server (mock_server.py),
+so no Ollama install or API key is needed:
+
+    python scripts/bench/bench_engine.py
+
+bench_suite.py runs the end-to-end, parser, dedup and checkpoint
+benchmarks together and appends the numbers to results/suite.json
+(results.py), tagged with the git revision, so a regression shows up as
+a change against the previous run.
+"""
@@ -0,0 +1,70 @@
+"""
+Benchmark: per-request model alternation vs model-affinity runs
+===============================================================
+The stand-in holds one model at a time (like a box that can't fit both
+llama3 and mistral) and charges --load-latency on every swap. Runs
+generate_questions_fast.py's async engine with:
+
+- alternating: run_length=1, i.e. the old MODELS[i % len(MODELS)]
+- affinity:    run_length=MODEL_RUN_LENGTH, one swap per run
+
+and prints the scheduler's per-model resident/latency view for each.
+
+Usage: python scripts/bench/bench_affinity.py [--questions 300] [--load-latency 0.5]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.scheduler import ModelScheduler  # noqa: E402
+
+
+def run_one(label, server, run_length, target, out_dir):
+    reset(target, out_dir)
+    gqf.scheduler = ModelScheduler(gqf.MODELS, run_length, load_threshold=server.httpd.residency.load_latency / 2)
+    loads = server.loads
+    tasks = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(gqf.run_async(tasks, [server.url]))
+    elapsed = time.time() - start
+    server.wait_idle()
+    done = gqf.total_questions()
+    print(f"   {label:<12} {done:>5} q in {elapsed:6.2f}s | {done / elapsed * 60:7.0f} q/min | "
+          f"{server.loads - loads} model loads")
+    print(gqf.scheduler.view(server.url))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--load-latency", type=float, default=0.5)
+    parser.add_argument("--in-flight", type=int, default=8)
+    args = parser.parse_args()
+
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+    with MockLLMServer(latency=args.latency, load_latency=args.load_latency, max_loaded=1) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        print("=" * 60)
+        print(f"🧪 Model affinity benchmark: {args.questions} questions, 1 resident model, "
+              f"{args.load_latency}s per load")
+        print("=" * 60)
+        run_one("alternating", server, 1, args.questions, Path(tmp))
+        run_one("affinity", server, gqf.MODEL_RUN_LENGTH, args.questions, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark: the same batches through every generation backend
+=============================================================
+Runs generate_questions_fast.py's threaded engine once per backend, with
+the same target, batch size and parse -> validate -> dedup -> save steps
+(qgen.pipeline), and prints questions/min, tokens/question and parse
+yield per backend and model:
+
+- ollama:  /api/generate on the stand-in
+- openai:  /v1/chat/completions on the stand-in (the vLLM path)
+- groq:    GroqBackend pointed at the stand-in with GROQ_BASE_URL (and
+           its free-tier limiter, so it runs at 30 requests/min)
+- fake:    the in-process deterministic backend (no HTTP at all)
+
+Usage: python scripts/bench/bench_backends.py [--questions 300] [--malformed 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.scheduler import ModelScheduler  # noqa: E402
+
+
+def run_one(label, spec, target, out_dir):
+    gqf.BACKEND = spec
+    reset(target, out_dir)
+    gqf.scheduler = ModelScheduler(gqf.open_backend().models, gqf.MODEL_RUN_LENGTH)
+    planner = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.run_threaded(planner)
+        gqf.close_progress()
+    elapsed = time.time() - start
+    print(f"   {label:<7} {gqf.stats['generated']:>5} q added in {elapsed:6.2f}s")
+    print(gqf.run_stats.report(elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--malformed", type=float, default=0.2, help="share of free-text questions written wrongly")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.001)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    gqf.MAX_WORKERS = args.workers
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed worker counts; see bench_concurrency.py
+    gqf.CACHE_RESPONSES = False
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        print("=" * 96)
+        print(f"🧪 Backend benchmark: {args.questions} questions, latency {args.latency}s "
+              f"+ {args.token_latency}s/token, {args.malformed:.0%} malformed")
+        print("=" * 96)
+        with MockLLMServer(latency=args.latency, token_latency=args.token_latency, malformed=args.malformed,
+                           seed=1) as server:
+            os.environ["GROQ_BASE_URL"] = server.url
+            gqf.OLLAMA_HOST = server.url
+            gqf.OLLAMA_API = f"{server.url}/api/generate"
+            run_one("ollama", "ollama", args.questions, out_dir)
+            run_one("openai", f"openai={server.url}/v1", args.questions, out_dir)
+            run_one("groq", "groq", args.questions, out_dir)
+        run_one("fake", "fake=1", args.questions, out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: save / checkpoint cost vs. bank size
+===============================================
+Writes a bank of N question records as all_questions.json and times what
+generate_questions_fast.py pays to keep it on disk:
+
+- append:      journaling one accepted batch (append_many + fsync)
+- checkpoint:  save_progress() folding CHECKPOINT_INTERVAL journaled
+               questions into the JSON files (all, per subject, index)
+
+Both should stay flat as the bank grows: the checkpoint appends to the
+files in place (journal.fold) instead of rewriting them.
+
+Usage: python scripts/bench/bench_checkpoint.py [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_dedup import synthetic_question  # noqa: E402
+from qgen.fingerprints import DB_FILE, FingerprintStore  # noqa: E402
+from qgen.journal import atomic_write_json  # noqa: E402
+from qgen.pipeline import question_record  # noqa: E402
+
+
+def synthetic_bank(rng, size, start=0):
+    """Full bank records (cell fields, explanation, timestamps) over the fast generator's syllabus."""
+    bank = []
+    for n in range(start, start + size):
+        subject, topic, subtopics = rng.choice(gqf.SYLLABUS)
+        cell = (subject, topic, rng.choice(subtopics), rng.choice(["easy", "medium", "hard"]))
+        q = dict(synthetic_question(rng, n), explanation="Worked solution " * 8)
+        bank.append(question_record(q, cell, f"q_{n}", "llama3:latest"))
+    return bank
+
+
+def bench_size(size, batch, interval, tmp):
+    """(µs per journaled batch, checkpoint seconds, MB on disk) for a bank of `size`."""
+    rng = random.Random(size)
+    gqf.QUESTIONS_DIR = Path(tempfile.mkdtemp(dir=tmp))
+    bank_file = gqf.QUESTIONS_DIR / "all_questions.json"
+    atomic_write_json(bank_file, synthetic_bank(rng, size))
+    # Only the save path is timed here; startup indexing is bench_startup.py
+    store = FingerprintStore(gqf.QUESTIONS_DIR / DB_FILE)
+    store.mark_snapshot(bank_file, size)
+    store.close()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.recover_progress()
+
+    pending = synthetic_bank(rng, interval, start=size)
+    start = time.perf_counter()
+    for i in range(0, interval, batch):
+        questions = pending[i:i + batch]
+        gqf.journal.append_many(questions)
+        gqf.generated_questions.extend(questions)
+    append_us = (time.perf_counter() - start) / (interval / batch) * 1e6
+
+    start = time.perf_counter()
+    gqf.save_progress()
+    gqf.writer.flush()  # the files are written on the writer thread
+    checkpoint = time.perf_counter() - start
+    on_disk = sum(p.stat().st_size for p in gqf.QUESTIONS_DIR.glob("*.json"))
+    gqf.close_progress()
+    return append_us, checkpoint, on_disk / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--interval", type=int, default=gqf.CHECKPOINT_INTERVAL, help="questions per checkpoint")
+    args = parser.parse_args()
+
+    gqf.CACHE_RESPONSES = False
+    print("=" * 60)
+    print(f"🧪 Checkpoint benchmark ({gqf.QUESTIONS_PER_CALL} q/batch, checkpoint every {args.interval})")
+    print("=" * 60)
+    print(f"   {'size':>8} | {'append µs/batch':>15} | {'checkpoint s':>12} | {'MB on disk':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            append_us, checkpoint, mb = bench_size(size, gqf.QUESTIONS_PER_CALL, args.interval, Path(tmp))
+            print(f"   {size:>8} | {append_us:>15.0f} | {checkpoint:>12.2f} | {mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
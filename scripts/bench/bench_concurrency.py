@@ -0,0 +1,78 @@
+"""
+Benchmark: fixed concurrency vs the AIMD controller
+===================================================
+The stand-in decodes --parallel requests at once (OLLAMA_NUM_PARALLEL),
+queues the rest and answers 503 beyond --max-queue waiting requests.
+Runs generate_questions.py with a fixed low count (the old MAX_WORKERS),
+a fixed high count, and the adaptive controller on both engines; the
+controller should settle near --parallel without being told it.
+
+Usage: python scripts/bench/bench_concurrency.py [--questions 300] [--parallel 8]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions as gq  # noqa: E402
+from bench.bench_engine import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+
+
+def run_one(label, server, fn, target, out_dir, adaptive):
+    reset(target, out_dir)
+    gq.ADAPTIVE_CONCURRENCY = adaptive
+    before = dict(server.stats)
+    tasks = gq.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(tasks)
+    elapsed = time.time() - start
+    server.wait_idle()
+    done = gq.total_questions()
+    busy = server.stats["busy"] - before["busy"]
+    recent = gq.bank.recent_latencies()  # the last 50 questions
+    p50 = statistics.median(recent) if recent else 0.0
+    print(f"   {label:<22} {done:>4} q in {elapsed:6.2f}s | {done / elapsed * 60:6.0f} q/min | "
+          f"p50 (last 50) {p50:5.2f}s | {busy:>4} x 503")
+    if adaptive:
+        print(f"      🎚️  {gq.concurrency.summary()}")
+        print(f"      over time: {gq.concurrency.timeline(8)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--parallel", type=int, default=8)
+    parser.add_argument("--max-queue", type=int, default=16)
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency, parallel=args.parallel, max_queue=args.max_queue) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        gq.OLLAMA_HOST = server.url
+        gq.OLLAMA_API = f"{server.url}/api/generate"
+        out_dir = Path(tmp)
+        run_async = lambda tasks: asyncio.run(gq.run_async(tasks, [server.url]))  # noqa: E731
+
+        print("=" * 60)
+        print(f"🧪 Concurrency benchmark: {args.questions} questions, server parallel={args.parallel}, "
+              f"max queue={args.max_queue}")
+        print("=" * 60)
+        run_one(f"threads fixed ({gq.MAX_WORKERS})", server, gq.run_threaded, args.questions, out_dir, False)
+        gq.ASYNC_IN_FLIGHT = 64
+        run_one("async fixed (64)", server, run_async, args.questions, out_dir, False)
+        run_one("threads adaptive", server, gq.run_threaded, args.questions, out_dir, True)
+        run_one("async adaptive", server, run_async, args.questions, out_dir, True)
+
+
+if __name__ == "__main__":
+    main()
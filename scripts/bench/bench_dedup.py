@@ -0,0 +1,77 @@
+"""
+Benchmark: near-duplicate index insert/query cost vs. bank size
+===============================================================
+Fills a NearDuplicateIndex with synthetic questions and measures the
+cost of inserts and of queries (half reworded repeats, half new) at each
+size. With LSH the per-operation cost should stay flat as the bank grows.
+
+Usage: python scripts/bench/bench_dedup.py [--sizes 1000 10000 100000]
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qgen.dedup import NearDuplicateIndex  # noqa: E402
+
+SYLLABLES = "ka ra ta na ma pa la sa da ba ga ja ha va ya ri ni ti mi si ko ro to no mo pu lu su du bu".split()
+
+
+def make_vocab(rng, size=5000):
+    """Pseudo-words, so synthetic stems are as varied as a real bank."""
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(size)]
+
+
+WORDS = make_vocab(random.Random(42))
+
+
+def synthetic_question(rng, n):
+    stem = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 25)))
+    options = {k: f"{rng.choice(WORDS)} {rng.randint(1, 999)}" for k in "ABCD"}
+    return {"id": f"s{n}", "question": f"Q{n}: {stem}?", "options": options, "correctAnswer": "A"}
+
+
+def reword(q):
+    """A paraphrase-ish variant: same words, small edits at the ends."""
+    return dict(q, question="Which is correct: " + q["question"].split(": ", 1)[1].rstrip("?") + " ?")
+
+
+def bench_size(size, queries, seed=0):
+    rng = random.Random(seed)
+    bank = [synthetic_question(rng, i) for i in range(size)]
+    index = NearDuplicateIndex()
+
+    start = time.perf_counter()
+    for q in bank:
+        index.add(q["id"], q["question"], q["options"], q["options"]["A"])
+    insert_us = (time.perf_counter() - start) / size * 1e6
+
+    probes = [reword(rng.choice(bank)) for _ in range(queries // 2)]
+    probes += [synthetic_question(rng, size + i) for i in range(queries - len(probes))]
+    start = time.perf_counter()
+    hits = sum(index.query(q["question"], q["options"], q["options"]["A"]) is not None for q in probes)
+    query_us = (time.perf_counter() - start) / len(probes) * 1e6
+    return insert_us, query_us, hits / len(probes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧪 Near-duplicate index benchmark")
+    print("=" * 60)
+    print(f"   {'size':>8} | {'insert µs/q':>11} | {'query µs/q':>10} | hit rate (expect ~0.50)")
+    for size in args.sizes:
+        insert_us, query_us, hit_rate = bench_size(size, args.queries)
+        print(f"   {size:>8} | {insert_us:>11.1f} | {query_us:>10.1f} | {hit_rate:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: coordinator + N workers over the shared work queue
+=============================================================
+Runs generate_questions_fast.py's coordinator in this process and N
+--worker processes, each with its own stand-in Ollama process (--latency
+per batch, --parallel slots; one GPU box each), for every N in --workers:
+
+- scaling:  questions/min of the whole run against the first run's rate
+            per worker, and each worker's share of the batches
+- kill:     the largest N again, with one worker SIGKILLed --kill-after
+            seconds in; its leases run out after --lease-ttl and the
+            batches it held go to the others, so the target is still met
+
+--transport http has the workers go through the coordinator's
+QueueServer instead of opening the SQLite file.
+
+Usage: python scripts/bench/bench_distributed.py [--workers 1 2 4] [--questions 2000] [--transport file|http]
+"""
+
+import argparse
+import contextlib
+import io
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+
+SCRIPT = Path(gqf.__file__).resolve()
+MOCK = Path(__file__).resolve().parent / "mock_server.py"
+
+
+def start_server(latency, parallel):
+    """A stand-in Ollama in its own process (in this one it would compete with the coordinator for the GIL).
+
+    --varied: numbered mock stems all land in the same LSH buckets, which
+    would make the coordinator's dedup scan the whole bank per question.
+    """
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    proc = subprocess.Popen([sys.executable, str(MOCK), "--port", str(port), "--latency", str(latency),
+                             "--parallel", str(parallel), "--varied"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    while True:
+        try:
+            requests.get(f"{url}/api/tags", timeout=1)
+            return proc, url
+        except requests.RequestException:
+            time.sleep(0.1)
+
+
+def start_worker(target, url, out_dir, lease_ttl):
+    return subprocess.Popen([sys.executable, str(SCRIPT), "--worker", target, "--backend", f"ollama={url}",
+                             "--out", str(out_dir), "--no-cache", "--no-trace", "--fixed-concurrency",
+                             "--lease-ttl", str(lease_ttl)],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def run_one(n, servers, args, out_dir, kill_after=None):
+    reset(args.questions, out_dir)
+    gqf.COORDINATOR = str(Path(tempfile.mkdtemp(dir=out_dir)) / "queue.sqlite")
+    gqf.QUEUE_PORT = 0 if args.transport == "http" else None
+    with contextlib.redirect_stdout(io.StringIO()):
+        work = gqf.open_queue()
+    target = gqf.COORDINATOR if args.transport == "file" else f"http://127.0.0.1:{gqf.queue_server.port}"
+    workers = [start_worker(target, url, Path(tempfile.mkdtemp(dir=out_dir)), args.lease_ttl)
+               for _, url in servers[:n]]
+    while work.conn.execute("SELECT COUNT(*) FROM workers").fetchone()[0] < n:
+        time.sleep(0.05)  # don't time Python startup
+    timer = None
+    if kill_after is not None:
+        timer = threading.Timer(kill_after, lambda: workers[0].send_signal(signal.SIGKILL))
+        timer.start()
+
+    planner = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.run_coordinator(planner)
+    elapsed = time.time() - start
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.close_progress()
+    if gqf.queue_server is not None:
+        gqf.queue_server.close()
+        gqf.queue_server = None
+    if timer is not None:
+        timer.cancel()
+    for worker in workers:
+        worker.wait(timeout=60)
+    shares = " ".join(f"{batches / max(sum(b for _, b in work.by_worker()), 1):>4.0%}"
+                      for _, batches in work.by_worker())
+    reassigned = work.conn.execute("SELECT SUM(MAX(attempts - 1, 0)) FROM tasks").fetchone()[0] or 0
+    work.close()
+    return gqf.total_questions(), elapsed, shares, reassigned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per batch on each stand-in server")
+    parser.add_argument("--parallel", type=int, default=8, help="decode slots per server (= each worker's in-flight)")
+    parser.add_argument("--transport", choices=["file", "http"], default="file")
+    parser.add_argument("--lease-ttl", type=float, default=2.0)
+    parser.add_argument("--kill-after", type=float, default=2.0)
+    args = parser.parse_args()
+
+    gqf.TRACE_CALLS = False
+    servers = [start_server(args.latency, args.parallel) for _ in range(max(args.workers))]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp)
+            print("=" * 84)
+            print(f"🧪 Distributed benchmark: {args.questions} questions, {args.latency}s batches x "
+                  f"{args.parallel} slots per worker, queue over {args.transport}")
+            print("=" * 84)
+            print(f"   {'run':<16} {'questions':>9} {'seconds':>8} {'q/min':>8} {'speed-up':>8} {'re-leased':>9} "
+                  f"| share per worker")
+            base = None
+            for n in args.workers:
+                done, elapsed, shares, reassigned = run_one(n, servers, args, out_dir)
+                rate = done / elapsed * 60
+                base = base or rate / n
+                print(f"   {f'{n} workers':<16} {done:>9} {elapsed:>8.2f} {rate:>8.0f} {rate / base:>7.2f}x "
+                      f"{reassigned:>9} | {shares}")
+            n = max(args.workers)
+            done, elapsed, shares, reassigned = run_one(n, servers, args, out_dir, kill_after=args.kill_after)
+            print(f"   {f'{n}, 1 killed':<16} {done:>9} {elapsed:>8.2f} {done / elapsed * 60:>8.0f} "
+                  f"{done / elapsed * 60 / base:>7.2f}x {reassigned:>9} | {shares}")
+    finally:
+        for proc, _ in servers:
+            proc.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Benchmark: several Ollama servers, round-robin vs. the endpoint pool
+====================================================================
+Starts three stand-in servers of different speeds (--latencies, with the
+per-token time scaled the same way, and --parallel decode slots each, like
+OLLAMA_NUM_PARALLEL) and runs
+generate_questions_fast.py against all of them:
+
+- round-robin:  the async client's old next_host() rotation, one third of
+                the requests each whatever the server's speed
+- pool async:   qgen.endpoints.EndpointPool, least outstanding requests
+                weighted by observed latency
+- pool threads: the same pool behind the threaded engine's OllamaBackend
+- stall:        pool async again, with one server wedged (/api/tags 503,
+                generate requests hang) --stall-after seconds in; the
+                health check ejects it, its in-flight requests are
+                cancelled and re-sent to the other two
+
+Prints questions/min and each server's share of the requests.
+
+Usage: python scripts/bench/bench_endpoints.py [--questions 600] [--latencies 0.05 0.1 0.2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+
+
+def run_one(label, servers, target, out_dir, pool, engine="async", stall_after=None):
+    reset(target, out_dir)
+    urls = [s.url for s in servers]
+    gqf.OLLAMA_HOSTS = urls if pool else []
+    gqf.OLLAMA_HOST = urls[0]
+    gqf.OLLAMA_API = f"{urls[0]}/api/generate"
+    if gqf.open_endpoints() is not None:
+        gqf.endpoints.verbose = False
+        gqf.endpoints.start(0.5)
+    before = [s.stats["requests"] for s in servers]
+    timer = None
+    if stall_after is not None:
+        timer = threading.Timer(stall_after, lambda: setattr(servers[-1].httpd, "stalled", True))
+        timer.start()
+    planner = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if engine == "async":
+            asyncio.run(gqf.run_async(planner, None if pool else urls))
+        else:
+            gqf.run_threaded(planner)
+        gqf.close_progress()
+    elapsed = time.time() - start
+    if timer is not None:
+        timer.cancel()
+        servers[-1].httpd.stalled = False
+    sent = [s.stats["requests"] - b for s, b in zip(servers, before)]
+    shares = " ".join(f"{n / max(sum(sent), 1):>5.0%}" for n in sent)
+    print(f"   {label:<14} {gqf.stats['generated']:>9} {elapsed:>8.2f} {gqf.stats['generated'] / elapsed * 60:>8.0f} "
+          f"{gqf.stats['failed']:>7} | {shares}")
+    if gqf.endpoints is not None:
+        print(f"   {'':<14} {gqf.endpoints.summary()}")
+        gqf.endpoints.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=600)
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0.05, 0.1, 0.2],
+                        help="per-request latency of each stand-in server")
+    parser.add_argument("--token-latency", type=float, default=0.001,
+                        help="per-token time of the fastest server (the others scale with their latency)")
+    parser.add_argument("--parallel", type=int, default=4, help="decode slots per server")
+    parser.add_argument("--in-flight", type=int, default=24)
+    parser.add_argument("--stall-after", type=float, default=1.0, help="seconds before the last server wedges")
+    args = parser.parse_args()
+
+    gqf.ADAPTIVE_CONCURRENCY = False  # the same in-flight count for every run
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.MAX_WORKERS = args.in_flight // 2  # run_threaded keeps twice MAX_WORKERS submitted
+    gqf.CACHE_RESPONSES = False
+    gqf.TRACE_CALLS = False
+    fastest = min(args.latencies)
+    servers = [MockLLMServer(latency=latency, token_latency=args.token_latency * latency / fastest,
+                             parallel=args.parallel).start()
+               for latency in args.latencies]
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            out_dir = Path(tmp)
+            print("=" * 96)
+            print(f"🧪 Endpoint benchmark: {args.questions} questions, servers at "
+                  f"{', '.join(f'{latency}s' for latency in args.latencies)} x {args.parallel} slots, "
+                  f"{args.in_flight} in flight")
+            print("=" * 96)
+            print(f"   {'run':<14} {'questions':>9} {'seconds':>8} {'q/min':>8} {'failed':>7} | share per server")
+            run_one("round-robin", servers, args.questions, out_dir, pool=False)
+            run_one("pool async", servers, args.questions, out_dir, pool=True)
+            run_one("pool threads", servers, args.questions, out_dir, pool=True, engine="threads")
+            run_one("pool + stall", servers, args.questions, out_dir, pool=True, stall_after=args.stall_after)
+    finally:
+        for server in servers:
+            server.httpd.stalled = False
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
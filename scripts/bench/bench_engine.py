@@ -0,0 +1,90 @@
+"""
+Benchmark: ThreadPoolExecutor engine vs asyncio engine
+======================================================
+Runs generate_questions.py's two submit loops against the local stand-in
+server and reports questions/min for each.
+
+Usage: python scripts/bench/bench_engine.py [--questions 300] [--latency 0.25] [--in-flight 64]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions as gq  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+
+
+def reset(target, out_dir):
+    """Fresh global state in generate_questions for one run."""
+    gq.generated_questions.clear()
+    gq.stats.update({
+        "total_generated": 0,
+        "duplicates_skipped": 0,
+        "failures": 0,
+        "by_model": {m: 0 for m in gq.MODELS},
+        "by_subject": {},
+        "by_difficulty": {"easy": 0, "medium": 0, "hard": 0},
+        "start_time": time.time(),
+    })
+    gq.TARGET_QUESTIONS = target
+    gq.QUESTIONS_DIR = Path(tempfile.mkdtemp(dir=out_dir))
+    with contextlib.redirect_stdout(io.StringIO()):
+        gq.recover_progress()
+
+
+def run_one(label, fn, target, out_dir):
+    reset(target, out_dir)
+    tasks = gq.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(tasks)
+    elapsed = time.time() - start
+    done = gq.total_questions()
+    rate = done / elapsed * 60
+    print(f"   {label:<28} {done:>5} questions in {elapsed:6.2f}s  ->  {rate:8.0f} questions/min")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.25, help="stand-in server latency per request (s)")
+    parser.add_argument("--in-flight", type=int, default=64)
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=args.latency) as server, tempfile.TemporaryDirectory() as tmp:
+        gq.OLLAMA_HOST = server.url
+        gq.OLLAMA_API = f"{server.url}/api/generate"
+        gq.ASYNC_IN_FLIGHT = args.in_flight
+        gq.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+        out_dir = Path(tmp)
+
+        print("=" * 60)
+        print(f"🧪 Engine benchmark: {args.questions} questions, {args.latency}s/request")
+        print("=" * 60)
+
+        workers = gq.MAX_WORKERS
+        base = run_one(f"threads (MAX_WORKERS={workers})", gq.run_threaded, args.questions, out_dir)
+
+        gq.MAX_WORKERS = args.in_flight
+        run_one(f"threads (MAX_WORKERS={args.in_flight})", gq.run_threaded, args.questions, out_dir)
+        gq.MAX_WORKERS = workers
+
+        fast = run_one(f"async (in-flight={args.in_flight})",
+                       lambda tasks: asyncio.run(gq.run_async(tasks, [server.url])),
+                       args.questions, out_dir)
+
+        print("-" * 60)
+        print(f"⚡ async vs default threads: {fast / max(base, 1e-9):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: streaming merge time and memory vs. bank size
+========================================================
+Writes N synthetic questions split over three inputs in the shapes the
+merge sees (generator records, records without "model", Colab-style
+records with list options and the answer as text) and runs
+merge_questions.merge() over them:
+
+- cold:   fresh fingerprint index (every question signed and inserted)
+- warm:   the same inputs again, index already populated - the
+          after-every-session case
+- peak:   tracemalloc peak of the warm merge vs. json.load-ing the inputs
+
+Usage: python scripts/bench/bench_merge.py [--sizes 10000 100000]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import merge_questions  # noqa: E402
+from bench.bench_checkpoint import synthetic_bank  # noqa: E402
+from qgen.fingerprints import DB_FILE, FingerprintStore  # noqa: E402
+from qgen.journal import atomic_write_json  # noqa: E402
+
+
+def write_inputs(folder, size):
+    bank = [q.to_json() for q in synthetic_bank(random.Random(size), size)]
+    third = size // 3
+    no_model = [{k: v for k, v in q.items() if k != "model"} for q in bank[third:2 * third]]
+    colab = [dict(q, options=list(q["options"].values()), correctAnswer=q["options"][q["correctAnswer"]])
+             for q in bank[2 * third:]]
+    paths = []
+    for name, records in (("generator.json", bank[:third]), ("groq.json", no_model), ("colab.json", colab)):
+        atomic_write_json(folder / name, records)
+        paths.append(folder / name)
+    return paths
+
+
+def run_merge(inputs, out, index):
+    store = FingerprintStore(index)
+    start = time.perf_counter()
+    _, _, total = merge_questions.merge(inputs, out, store)
+    elapsed = time.perf_counter() - start
+    store.close()
+    return total, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print("=" * 78)
+    print("🧪 Merge benchmark (3 inputs, one pass, fingerprint dedup)")
+    print("=" * 78)
+    print(f"   {'size':>7} | {'merged':>7} | {'cold s':>7} | {'warm s':>7} | {'warm rec/s':>10} | "
+          f"{'peak MB':>7} | {'load-all MB':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            folder = Path(tempfile.mkdtemp(dir=tmp))
+            inputs = write_inputs(folder, size)
+            total, cold = run_merge(inputs, folder, folder / DB_FILE)
+            _, warm = run_merge(inputs, folder, folder / DB_FILE)
+
+            tracemalloc.start()
+            run_merge(inputs, folder, folder / DB_FILE)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            loaded = [json.loads(p.read_text(encoding="utf-8")) for p in inputs]
+            _, load_all = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            del loaded
+            print(f"   {size:>7} | {total:>7} | {cold:>7.2f} | {warm:>7.2f} | {size / warm:>10,.0f} | "
+                  f"{peak / 1e6:>7.1f} | {load_all / 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark: regex response parsers vs the brace-balanced extractor
+=================================================================
+Runs every parser over bench/corpus/raw_responses.jsonl (raw model
+outputs in the shapes llama3/mistral produce: fenced arrays, prose
+around the JSON, truncated batches, wrapper objects, brackets inside
+strings, ...; each line records how many complete questions it holds
+and whether it was cut off) and reports yield, how often the first
+question was found (all that generate_questions.py's one-question
+prompt needs) and time per response, plus how often scan_mcqs' cut-off
+flag (the truncation feedback's input) is wrong. A stress run then times one long batch cut off mid-question,
+which every regex parser returns nothing for.
+
+The regex parsers are the ones extract_mcqs() replaced:
+
+- greedy:  parse_questions / parse_qs (greedy array, then [^{}]* objects)
+- object:  parse_json_response in generate_questions.py (first { .. last })
+- lazy:    parse_response in colab_fast_generator.py (stops at the first ])
+- array:   groq_generator.py (greedy array only)
+
+Usage: python scripts/bench/bench_parsers.py [--repeat 200] [--stress 400]
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qgen.json_stream import extract_mcqs, is_valid_mcq, scan_mcqs  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent / "corpus" / "raw_responses.jsonl"
+
+
+# ============ LEGACY PARSERS ============
+
+def legacy_greedy(text):
+    cleaned = re.sub(r'```json\s*', '', text)
+    cleaned = re.sub(r'```\s*', '', cleaned)
+    try:
+        match = re.search(r'\[[\s\S]*\]', cleaned)
+        if match:
+            arr = json.loads(match.group(0))
+            if isinstance(arr, list):
+                return arr
+    except ValueError:
+        pass
+    questions = []
+    for m in re.finditer(r'\{[^{}]*"question"[^{}]*\}', cleaned, re.DOTALL):
+        try:
+            q = json.loads(m.group(0))
+            if "question" in q and "options" in q:
+                questions.append(q)
+        except ValueError:
+            pass
+    return questions
+
+
+def legacy_object(text):
+    cleaned = re.sub(r'```json\s*', '', text)
+    cleaned = re.sub(r'```\s*', '', cleaned)
+    try:
+        match = re.search(r'\{[\s\S]*\}', cleaned)
+        return [json.loads(match.group(0))] if match else []
+    except ValueError:
+        return []
+
+
+def legacy_lazy(text):
+    try:
+        match = re.search(r'\[[\s\S]*?\]', text)
+        return json.loads(match.group(0)) if match else []
+    except ValueError:
+        return []
+
+
+def legacy_array(text):
+    try:
+        match = re.search(r'\[[\s\S]*\]', text)
+        return json.loads(match.group(0)) if match else []
+    except ValueError:
+        return []
+
+
+PARSERS = [
+    ("greedy (fast/colab)", legacy_greedy),
+    ("object (generate_questions)", legacy_object),
+    ("lazy (colab_fast)", legacy_lazy),
+    ("array (groq)", legacy_array),
+    ("extract_mcqs", extract_mcqs),
+]
+
+
+def valid_count(result):
+    return sum(1 for q in result if is_valid_mcq(q)) if isinstance(result, list) else 0
+
+
+def timed(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def stress_text(n):
+    """One n-question batch cut off mid-question, with [..] inside the strings."""
+    q = {"question": "Which value completes [2, 6, 12, 20, ?] and why [explain]?",
+         "options": {"A": "[28]", "B": "[30]", "C": "[32]", "D": "[36]"},
+         "correctAnswer": "B", "explanation": "Differences [4, 6, 8, 10] grow by 2, so 20 + 10 = [30]."}
+    text = "```json\n[\n" + ",\n".join(json.dumps(q, indent=2) for _ in range(n)) + "\n]\n```"
+    return text[:int(len(text) * 0.97)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus for timing")
+    parser.add_argument("--stress", type=int, default=400, help="questions in the long truncated batch")
+    args = parser.parse_args()
+
+    rows = [json.loads(line) for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    texts = [r["text"] for r in rows]
+    expected = sum(r["expected"] for r in rows)
+    with_questions = sum(1 for r in rows if r["expected"])
+
+    print("=" * 72)
+    print(f"🧪 Parser benchmark: {len(rows)} captured responses, {expected} complete questions")
+    print("=" * 72)
+    print(f"   {'parser':<28} {'yield':>11} {'full':>6} {'first':>6} {'µs/response':>12}")
+    misses = {}
+    for label, fn in PARSERS:
+        got = [valid_count(fn(r["text"])) for r in rows]
+        full = sum(1 for g, r in zip(got, rows) if g == r["expected"])
+        first = sum(1 for g, r in zip(got, rows) if g and r["expected"])
+        per = timed(fn, texts, args.repeat)
+        print(f"   {label:<28} {sum(got):>4}/{expected:<4} {sum(got) / max(expected, 1):>4.0%} "
+              f"{full:>3}/{len(rows):<3} {first:>3}/{with_questions:<3} {per * 1e6:>9.1f}")
+        misses[label] = [r["shape"] for g, r in zip(got, rows) if g < r["expected"]]
+
+    print()
+    print("   shapes the greedy parser loses questions on:")
+    for shape in sorted(set(misses["greedy (fast/colab)"])):
+        print(f"     - {shape}")
+
+    flags = [(scan_mcqs(r["text"])[1], r["truncated"]) for r in rows]
+    print()
+    print(f"✂️  Cut-off flag: {sum(1 for got, cut in flags if got == cut)}/{len(rows)} right, "
+          f"{sum(1 for got, cut in flags if got and not cut)} false alarms, "
+          f"{sum(1 for got, cut in flags if cut and not got)} missed")
+
+    text = stress_text(args.stress)
+    print()
+    print(f"🏋️  Stress: {args.stress}-question batch, truncated ({len(text) // 1024} KB)")
+    for label, fn in PARSERS:
+        start = time.perf_counter()
+        got = valid_count(fn(text))
+        print(f"   {label:<28} {got:>5} questions in {(time.perf_counter() - start) * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Check: quota allocation vs. topic weights
+=========================================
+Splits a range of targets over the fast generator's syllabus (equal
+weights, batches of QUESTIONS_PER_CALL) and the Groq generator's
+(weighted, batches of QUESTIONS_PER_BATCH) with qgen.planner.allocate()
+and compares every topic's quota with its exact share:
+
+- spread:  largest minus smallest quota among topics of equal weight,
+           in batches (must be at most 1)
+- error:   largest |quota - share| of any topic, in batches (must be
+           below 1)
+- empty:   topics left with no quota at all
+
+Usage: python scripts/bench/bench_planner.py [--targets 100 300 1500 5000]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from qgen.planner import allocate  # noqa: E402
+
+with contextlib.redirect_stdout(io.StringIO()):  # prints its banner on import
+    import groq_generator  # noqa: E402
+
+
+def syllabi():
+    """(label, topics as allocate() takes them, batch size) per generator."""
+    return [
+        ("fast", [(subject, topic, subtopics, None, 1) for subject, topic, subtopics in gqf.SYLLABUS],
+         gqf.QUESTIONS_PER_CALL),
+        ("groq", [(t["subject"], t["topic"], t["subtopics"], None, t["weight"]) for t in groq_generator.SYLLABUS],
+         groq_generator.QUESTIONS_PER_BATCH),
+    ]
+
+
+def check(topics, target, unit):
+    """(quota total, spread in batches, error in batches, empty topics) for one allocation."""
+    quotas = allocate(topics, target, unit)
+    per_topic = Counter()
+    for cell, quota in quotas.items():
+        per_topic[cell[:2]] += quota
+    total_weight = sum(t[4] for t in topics)
+    units = -(-target // unit)
+    by_weight = defaultdict(list)
+    error = 0.0
+    for subject, topic, _, _, weight in topics:
+        got = per_topic[(subject, topic)] // unit
+        by_weight[weight].append(got)
+        error = max(error, abs(got - units * weight / total_weight))
+    spread = max(max(units) - min(units) for units in by_weight.values())
+    empty = sum(not per_topic[(t[0], t[1])] for t in topics)
+    return sum(quotas.values()), spread, error, empty
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", type=int, nargs="+", default=[100, 300, 1500, 5000])
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧪 Quota allocation check")
+    print("=" * 60)
+    print(f"   {'syllabus':<8} {'target':>7} {'planned':>8} {'spread':>7} {'error':>6} {'empty':>6}")
+    for label, topics, unit in syllabi():
+        for target in args.targets:
+            total, spread, error, empty = check(topics, target, unit)
+            print(f"   {label:<8} {target:>7} {total:>8} {spread:>7} {error:>6.2f} {empty:>6}")
+            assert spread <= 1, f"{label} @ {target}: equal-weight topics {spread} batches apart"
+            assert error < 1, f"{label} @ {target}: a topic is {error:.2f} batches off its share"
+            assert target <= total < target + unit, f"{label} @ {target}: planned {total}"
+    print("✅ Equal-weight topics within one batch, every topic within one batch of its share")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: cost of the stage profiler, off and on
+=================================================
+- per stage:  ns for one `with profiler.stage(...)` block while disabled
+              (the shared no-op context) and while timing
+- disabled:   stage() calls one run makes x the no-op cost, as a share
+              of the run (what an unprofiled run pays for the hooks)
+- end to end: generate_questions_fast.py's threaded engine on the fake
+              backend (no HTTP, so the pipeline's own CPU time is all there
+              is to slow down) without the profiler, with --profile, with
+              --profile-sample added; the modes are interleaved over
+              --repeat rounds and the median is reported, since run-to-run
+              noise on a ~2 s run is larger than the profiler's cost
+
+Usage: python scripts/bench/bench_profiling.py [--questions 1500] [--repeat 7]
+"""
+
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from qgen.profiling import StageProfiler  # noqa: E402
+from qgen.scheduler import ModelScheduler  # noqa: E402
+
+
+def per_stage(profiler, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        with profiler.stage("x"):
+            pass
+    return (time.perf_counter() - start) / n
+
+
+def run_one(target, out_dir, **profile):
+    reset(target, out_dir)
+    gqf.scheduler = ModelScheduler(gqf.open_backend().models, gqf.MODEL_RUN_LENGTH)
+    if profile:
+        gqf.profiler.start(**profile)
+    planner = gqf.create_planner()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.run_threaded(planner)
+        gqf.close_progress()
+    elapsed = time.perf_counter() - start
+    gqf.profiler.stop()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--calls", type=int, default=1_000_000, help="stage() calls for the per-stage timing")
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print("🧪 Profiler overhead")
+    print("=" * 64)
+    profiler = StageProfiler()
+    off = per_stage(profiler, args.calls)
+    profiler.enabled = True
+    on = per_stage(profiler, args.calls)
+    print(f"   stage() disabled: {off * 1e9:8.0f} ns | timing: {on * 1e9:8.0f} ns")
+
+    gqf.BACKEND = "fake=1"
+    gqf.ADAPTIVE_CONCURRENCY = False
+    gqf.CACHE_RESPONSES = False
+    gqf.TRACE_CALLS = False
+    modes = [("off", {}), ("--profile", {"sample": False}), ("+ --profile-sample", {"sample": True})]
+    times = {label: [] for label, _ in modes}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in range(args.repeat):
+            for label, profile in modes[n % len(modes):] + modes[:n % len(modes)]:
+                times[label].append(run_one(args.questions, Path(tmp), **profile))
+                if label == "--profile":
+                    calls = sum(row[0] for row in gqf.profiler.stages.values())
+    base = statistics.median(times["off"])
+    print(f"   disabled, per run: {calls} stage() calls x {off * 1e9:.0f} ns = {calls * off * 1e3:.2f} ms "
+          f"({calls * off / base * 100:.2f}% of the run)")
+    for label, _ in modes:
+        median = statistics.median(times[label])
+        print(f"   {label:<20} {args.questions} q in {median:6.2f}s median ({(median / base - 1) * 100:+5.1f}%)")
+
+
+if __name__ == "__main__":
+    main()
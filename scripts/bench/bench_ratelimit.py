@@ -0,0 +1,140 @@
+"""
+Benchmark: fixed delay vs RPM/TPM limiter against a rate-limited stand-in
+=========================================================================
+The stand-in enforces rpm/tpm over a sliding window and answers 429 +
+retry-after when a request would exceed them. Time is compressed: one
+"minute" of budget is --period seconds.
+
+- fixed delay:  the old groq_generator loop - one request, then sleep
+                period/10 (6s per minute), sleep a full period on a 429
+- burst:        MAX_CONCURRENT threads with no limiter (shows the 429s)
+- limiter:      MAX_CONCURRENT threads sharing one RateLimiter, which
+                reserves tokens, settles against usage and obeys headers
+
+The chat calls go through requests rather than the groq SDK, but feed the
+limiter exactly as groq_generator.generate_questions_batch() does.
+
+Usage: python scripts/bench/bench_ratelimit.py [--questions 90] [--period 2]
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.ratelimit import RateLimiter  # noqa: E402
+
+BATCH = 3
+# Roughly the size of groq_generator's prompt, so TPM (not just RPM) binds
+PROMPT = (f"Generate exactly {BATCH} unique multiple-choice questions (MCQs) for the OSSC exam. "
+          + "Each question must be unique, exam-worthy and have four options A-D. " * 20)
+
+
+class RateLimited(Exception):
+    def __init__(self, headers):
+        super().__init__("429")
+        self.headers = headers
+
+
+def chat(session, url):
+    """One chat completion; returns (question count, total tokens, headers)."""
+    r = session.post(f"{url}/openai/v1/chat/completions", timeout=30, json={
+        "model": "llama-3.1-8b-instant",
+        "messages": [{"role": "user", "content": PROMPT}],
+        "max_tokens": 2000,
+    })
+    if r.status_code == 429:
+        raise RateLimited(r.headers)
+    body = r.json()
+    questions = json.loads(body["choices"][0]["message"]["content"])
+    return len(questions), body["usage"]["total_tokens"], r.headers
+
+
+def run_fixed(url, target, period):
+    session = requests.Session()
+    done = 0
+    while done < target:
+        try:
+            count, _, _ = chat(session, url)
+            done += count
+        except RateLimited:
+            time.sleep(period)
+        time.sleep(period / 10)
+    return done
+
+
+def run_concurrent(url, target, workers, limiter=None):
+    done = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def worker():
+        nonlocal done
+        local.session = getattr(local, "session", None) or requests.Session()
+        while True:
+            with lock:
+                if done >= target:
+                    return
+            reserved = limiter.acquire() if limiter else 0
+            try:
+                count, used, headers = chat(local.session, url)
+            except RateLimited as e:
+                if limiter:
+                    limiter.rate_limited(reserved, e.headers)
+                continue
+            if limiter:
+                limiter.settle(reserved, used, headers)
+            with lock:
+                done += count
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for _ in range(workers):
+            executor.submit(worker)
+    return done
+
+
+def run_one(label, server, fn, period):
+    before = dict(server.stats)
+    start = time.time()
+    done = fn()
+    elapsed = time.time() - start
+    server.wait_idle()
+    limited = server.stats["rate_limited"] - before["rate_limited"]
+    requests_made = server.stats["requests"] - before["requests"]
+    print(f"   {label:<14} {done:>4} q in {elapsed:6.2f}s | {done / elapsed * period:6.1f} q/'min' | "
+          f"{requests_made:>4} requests | {limited:>4} x 429")
+    time.sleep(period)  # let the server's window drain before the next run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=90)
+    parser.add_argument("--period", type=float, default=2.0, help="seconds standing in for one minute")
+    parser.add_argument("--rpm", type=int, default=30)
+    parser.add_argument("--tpm", type=int, default=6000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    with MockLLMServer(latency=0.05, rpm=args.rpm, tpm=args.tpm, period=args.period) as server:
+        print("=" * 60)
+        print(f"🧪 Rate limit benchmark: {args.questions} questions, "
+              f"{args.rpm} rpm / {args.tpm} tpm per {args.period}s")
+        print("=" * 60)
+        run_one("fixed delay", server, lambda: run_fixed(server.url, args.questions, args.period), args.period)
+        run_one("burst", server, lambda: run_concurrent(server.url, args.questions, args.workers), args.period)
+        limiter = RateLimiter(args.rpm, args.tpm, period=args.period, initial_estimate=1200)
+        run_one("limiter", server,
+                lambda: run_concurrent(server.url, args.questions, args.workers, limiter), args.period)
+        print(f"   🚦 {limiter.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: memory of the bank in memory, dict records vs. compact records
+=========================================================================
+Builds a bank of N full question records over the fast generator's
+syllabus, serializes it once, then loads it back both ways and measures
+what stays allocated (tracemalloc) and what loading / dumping costs:
+
+- dict:     json.loads(text) - the records the generators used to hold
+- compact:  json.loads(text, object_hook=compact) - qgen.records.Question
+
+Both dumps must be byte-identical to the original text.
+
+Usage: python scripts/bench/bench_records.py [--sizes 10000 100000]
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.bench_checkpoint import synthetic_bank  # noqa: E402
+from qgen.records import as_json, compact  # noqa: E402
+
+
+def measure(text, hook):
+    """(bytes held by the loaded bank, load seconds, dump seconds, dump text)."""
+    start = time.perf_counter()
+    bank = json.loads(text, object_hook=hook)
+    load = time.perf_counter() - start
+    del bank
+    gc.collect()
+    tracemalloc.start()  # slows allocation down, so the load above is timed untraced
+    bank = json.loads(text, object_hook=hook)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    dumped = json.dumps(bank, indent=2, ensure_ascii=False, default=as_json)
+    dump = time.perf_counter() - start
+    return held, load, dump, dumped
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("🧪 Record memory benchmark")
+    print("=" * 72)
+    print(f"   {'size':>7} | {'records':<8} | {'MB held':>8} | {'B/question':>10} | {'load s':>7} | {'dump s':>7}")
+    for size in args.sizes:
+        text = json.dumps(synthetic_bank(random.Random(size), size), indent=2, ensure_ascii=False, default=as_json)
+        rows = {}
+        for label, hook in (("dict", None), ("compact", compact)):
+            held, load, dump, dumped = measure(text, hook)
+            assert dumped == text, f"{label} records don't round-trip"
+            rows[label] = held
+            print(f"   {size:>7} | {label:<8} | {held / 1e6:>8.1f} | {held / size:>10.0f} | {load:>7.2f} | {dump:>7.2f}")
+        print(f"   {'':>7}   compact holds {rows['compact'] / rows['dict']:.0%} of the dict bank")
+
+
+if __name__ == "__main__":
+    main()
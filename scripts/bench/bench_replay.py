@@ -0,0 +1,87 @@
+"""
+Benchmark: live generation vs replay from the raw-response cache
+================================================================
+Runs generate_questions_fast.py's async engine against the stand-in
+while every raw answer goes into one responses.sqlite, then:
+
+- replay:   the same target into an empty bank with the server shut
+            down (--replay: parse -> validate -> dedup -> save only)
+- regex:    the replay again with the old greedy regex parser swapped
+            in, i.e. a pipeline change measured on the same answers
+- rerun:    the bank lost, the cache kept: the same target again with
+            the server up, counting the requests it still has to send
+
+Usage: python scripts/bench/bench_replay.py [--questions 600] [--malformed 0.2]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_parsers import legacy_greedy  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+
+
+def run_one(label, url, target, out_dir, server=None):
+    reset(target, out_dir)
+    before = server.stats["requests"] if server else 0
+    planner = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(gqf.run_async(planner, [url]))
+        gqf.close_progress()
+    elapsed = time.time() - start
+    requests = server.stats["requests"] - before if server else 0
+    added = gqf.stats["generated"]
+    print(f"   {label:<8} {added:>5} q added in {elapsed:6.2f}s | {added / elapsed * 60:8.0f} q/min | "
+          f"{requests:>4} requests | cache: {gqf.response_cache.summary()}")
+    gqf.response_cache.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=600)
+    parser.add_argument("--malformed", type=float, default=0.2, help="share of free-text questions written wrongly")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.001)
+    parser.add_argument("--in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        gqf.CACHE_PATH = out_dir / "responses.sqlite"
+        print("=" * 96)
+        print(f"🧪 Replay benchmark: {args.questions} questions, latency {args.latency}s "
+              f"+ {args.token_latency}s/token, {args.malformed:.0%} malformed")
+        print("=" * 96)
+        with MockLLMServer(latency=args.latency, token_latency=args.token_latency, malformed=args.malformed,
+                           seed=1) as server:
+            url = server.url
+            run_one("live", url, args.questions, out_dir, server)
+
+        gqf.REPLAY = True
+        run_one("replay", url, args.questions, out_dir)
+        scan_mcqs = gqf.scan_mcqs
+        gqf.scan_mcqs = lambda text: (legacy_greedy(text), False)
+        run_one("regex", url, args.questions, out_dir)
+        gqf.scan_mcqs = scan_mcqs
+        gqf.REPLAY = False
+
+        with MockLLMServer(latency=args.latency, token_latency=args.token_latency, malformed=args.malformed,
+                           seed=2) as server:
+            run_one("rerun", server.url, args.questions, out_dir, server)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: generator startup with and without the fingerprint store
+===================================================================
+Writes a synthetic bank of N questions and times what a run pays before
+its first request:
+
+- rebuild:  json.load the bank + sign every question into a NearDuplicateIndex
+- cold:     first FingerprintStore.sync_snapshot (same work, plus SQLite writes)
+- warm:     later runs - the snapshot is already indexed, one stat() + SELECT
+
+Usage: python scripts/bench/bench_startup.py [--sizes 1000 10000]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.bench_dedup import synthetic_question  # noqa: E402
+from qgen.dedup import NearDuplicateIndex  # noqa: E402
+from qgen.fingerprints import FingerprintStore  # noqa: E402
+
+
+def bench_size(size, tmp):
+    rng = random.Random(size)
+    bank_file = tmp / f"bank_{size}.json"
+    with open(bank_file, "w", encoding="utf-8") as f:
+        json.dump([synthetic_question(rng, i) for i in range(size)], f, ensure_ascii=False)
+
+    start = time.perf_counter()
+    with open(bank_file, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    index = NearDuplicateIndex()
+    for q in questions:
+        index.add_question(q)
+    rebuild = time.perf_counter() - start
+    del questions, index
+
+    db = tmp / f"fingerprints_{size}.sqlite"
+    start = time.perf_counter()
+    store = FingerprintStore(db)
+    store.sync_snapshot(bank_file)
+    store.close()
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    store = FingerprintStore(db)
+    store.sync_snapshot(bank_file)
+    store.close()
+    warm = time.perf_counter() - start
+    return rebuild, cold, warm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("🧪 Startup benchmark (time before the first request)")
+    print("=" * 60)
+    print(f"   {'size':>8} | {'rebuild s':>9} | {'cold s':>8} | {'warm ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            rebuild, cold, warm = bench_size(size, Path(tmp))
+            print(f"   {size:>8} | {rebuild:>9.2f} | {cold:>8.2f} | {warm * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark: buffered vs streaming batch generation
+=================================================
+Runs generate_questions_fast.py's async engine against the stand-in
+server with and without --stream. The stand-in over-generates (like a
+model running on to num_predict), so streaming's early cancel shows up
+as fewer decoded tokens per accepted question.
+
+Usage: python scripts/bench/bench_streaming.py [--questions 200] [--token-latency 0.002]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+
+
+def reset(target, out_dir):
+    gqf.generated_questions.clear()
+    gqf.stats.update({"generated": 0, "failed": 0, "duplicates": 0, "start": time.time()})
+    gqf.TARGET_QUESTIONS = target
+    gqf.QUESTIONS_DIR = Path(tempfile.mkdtemp(dir=out_dir))
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.recover_progress()
+
+
+def run_one(label, server, stream, target, out_dir):
+    reset(target, out_dir)
+    gqf.STREAM = stream
+    before = dict(server.stats)
+    tasks = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(gqf.run_async(tasks, [server.url]))
+    elapsed = time.time() - start
+    server.wait_idle()
+    done = gqf.total_questions()
+    tokens = server.stats["tokens"] - before["tokens"]
+    cancelled = server.stats["cancelled"] - before["cancelled"]
+    print(f"   {label:<10} {done:>5} q in {elapsed:6.2f}s | {done / elapsed * 60:7.0f} q/min | "
+          f"{tokens / max(done, 1):6.1f} tokens/q | {cancelled} streams cancelled")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--extra", type=int, default=5, help="extra questions the stand-in over-generates")
+    parser.add_argument("--in-flight", type=int, default=32)
+    args = parser.parse_args()
+
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+    with MockLLMServer(latency=args.latency, token_latency=args.token_latency,
+                       extra_questions=args.extra) as server, tempfile.TemporaryDirectory() as tmp:
+        print("=" * 60)
+        print(f"🧪 Streaming benchmark: {args.questions} questions, "
+              f"{gqf.QUESTIONS_PER_CALL}/call (+{args.extra} over-generated)")
+        print("=" * 60)
+        run_one("buffered", server, False, args.questions, Path(tmp))
+        run_one("streaming", server, True, args.questions, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
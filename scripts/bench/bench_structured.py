@@ -0,0 +1,118 @@
+"""
+Benchmark: free-text JSON prompts vs schema-constrained output
+==============================================================
+The stand-in writes --malformed of the questions in free-text answers
+the way real models slip (trailing comma, single quotes, options as a
+list, "Option B" as the answer); with Ollama's "format" or Groq's JSON
+mode it answers like constrained decoding, always well-formed.
+
+- Ollama: generate_questions_fast.py's async engine, with and without
+  --structured (batch_schema() as "format", parse_structured())
+- Groq:   chat completions sent as groq_generator.py sends them, with and
+  without response_format json_object
+
+Reports calls, failed calls (nothing accepted), accepted questions per
+call and accepted questions per minute.
+
+Usage: python scripts/bench/bench_structured.py [--questions 600] [--malformed 0.25]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.json_stream import scan_mcqs  # noqa: E402
+from qgen.schema import conforms, parse_structured  # noqa: E402
+
+BATCH = 3  # groq_generator.QUESTIONS_PER_BATCH
+
+
+def report(label, calls, failed, accepted, elapsed):
+    print(f"   {label:<20} {calls:>5} calls | {failed:>4} failed | {accepted / max(calls, 1):4.2f} q/call | "
+          f"{accepted:>5} q | {accepted / elapsed * 60:7.0f} q/min")
+
+
+def run_ollama(label, server, structured, target, out_dir):
+    reset(target, out_dir)
+    gqf.STRUCTURED_OUTPUT = structured
+    before = dict(server.stats)
+    planner = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(gqf.run_async(planner, [server.url]))
+    elapsed = time.time() - start
+    server.wait_idle()
+    calls = server.stats["requests"] - before["requests"]
+    report(label, calls, gqf.stats["failed"], gqf.stats["generated"], elapsed)
+
+
+def groq_call(session, url, structured):
+    """One batch the way groq_generator.generate_questions_batch() asks and parses it."""
+    shape = f"a JSON object with {BATCH} questions" if structured else f"a valid JSON array with {BATCH} questions"
+    payload = {
+        "model": "llama-3.1-8b-instant",
+        "messages": [{"role": "user", "content": f"Generate exactly {BATCH} unique MCQs. Return ONLY {shape}."}],
+        "max_tokens": 2000,
+    }
+    if structured:
+        payload["response_format"] = {"type": "json_object"}
+    r = session.post(f"{url}/openai/v1/chat/completions", json=payload, timeout=30)
+    if r.status_code == 400:
+        parsed, _ = scan_mcqs(r.json()["error"].get("failed_generation") or "")
+    else:
+        text = r.json()["choices"][0]["message"]["content"]
+        parsed, _ = (parse_structured if structured else scan_mcqs)(text)
+    return sum(1 for q in parsed if conforms(q))
+
+
+def run_groq(label, server, structured, calls, workers):
+    sessions = [requests.Session() for _ in range(workers)]
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(lambda i: groq_call(sessions[i % workers], server.url, structured),
+                                    range(calls)))
+    elapsed = time.time() - start
+    report(label, calls, sum(1 for n in results if not n), sum(results), elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=600)
+    parser.add_argument("--malformed", type=float, default=0.25, help="share of free-text questions written wrongly")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0005)
+    parser.add_argument("--in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+    with MockLLMServer(latency=args.latency, token_latency=args.token_latency, malformed=args.malformed,
+                       seed=1) as server, tempfile.TemporaryDirectory() as tmp:
+        print("=" * 88)
+        print(f"🧪 Structured output benchmark: {args.questions} questions, "
+              f"{args.malformed:.0%} of free-text questions malformed")
+        print("=" * 88)
+        print(f"   Ollama /api/generate, {gqf.QUESTIONS_PER_CALL}/call:")
+        run_ollama("free-text", server, False, args.questions, Path(tmp))
+        run_ollama("format (schema)", server, True, args.questions, Path(tmp))
+        print(f"   Groq chat completions, {BATCH}/call:")
+        calls = args.questions // BATCH
+        run_groq("free-text", server, False, calls, 4)
+        run_groq("json_object", server, True, calls, 4)
+
+
+if __name__ == "__main__":
+    main()
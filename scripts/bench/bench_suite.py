@@ -0,0 +1,118 @@
+"""
+Benchmark suite: one run, every number, stored as JSON
+======================================================
+Runs the pipeline's benchmarks in one go and appends the results to
+bench/results/suite.json (see results.py), then prints the change
+against the previous run with the same parameters:
+
+- e2e:         generate_questions_fast.py's async engine against the
+               stand-in with latency, per-token decode time, a model
+               load delay, malformed and duplicate questions, 500s and
+               429s -> questions/min, tokens/question, parse yield
+- parse:       extract_mcqs over the captured response corpus
+- dedup:       NearDuplicateIndex insert/query cost at each bank size
+- checkpoint:  journal append and save_progress() cost at each bank size
+
+Usage: python scripts/bench/bench_suite.py [--sizes 1000 10000 100000] [--questions 500]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench import bench_checkpoint, bench_dedup, results  # noqa: E402
+from bench.bench_parsers import CORPUS, timed  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.json_stream import extract_mcqs  # noqa: E402
+
+
+def bench_e2e(args, out_dir):
+    server = MockLLMServer(latency=args.latency, token_latency=args.token_latency, load_latency=args.load_latency,
+                           max_loaded=1, malformed=args.malformed, duplicates=args.duplicates,
+                           failures=args.failures, throttled=args.throttled, seed=1)
+    with server:
+        gqf.OLLAMA_HOST = server.url
+        gqf.OLLAMA_API = f"{server.url}/api/generate"
+        reset(args.questions, out_dir)
+        planner = gqf.create_planner()
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            asyncio.run(gqf.run_async(planner, [server.url]))
+            gqf.close_progress()
+        elapsed = time.time() - start
+        server.wait_idle()
+        rows = gqf.run_stats.to_json(elapsed)
+        accepted = sum(r["accepted"] for r in rows)
+        return {
+            "e2e.questions_per_min": accepted / elapsed * 60,
+            "e2e.tokens_per_question": server.stats["tokens"] / max(accepted, 1),
+            "e2e.parse_yield": sum(r["parsed"] for r in rows) / max(sum(r["requested"] for r in rows), 1),
+            "e2e.requests": server.stats["requests"],
+            "e2e.model_loads": server.loads,
+        }
+
+
+def bench_parse(repeat):
+    texts = [json.loads(line)["text"] for line in CORPUS.read_text(encoding="utf-8").splitlines() if line.strip()]
+    return {"parse.us_per_response": timed(extract_mcqs, texts, repeat) * 1e6}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--questions", type=int, default=500, help="end-to-end target")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.001)
+    parser.add_argument("--load-latency", type=float, default=0.5)
+    parser.add_argument("--malformed", type=float, default=0.1)
+    parser.add_argument("--duplicates", type=float, default=0.05)
+    parser.add_argument("--failures", type=float, default=0.02)
+    parser.add_argument("--throttled", type=float, default=0.02)
+    parser.add_argument("--queries", type=int, default=2000, help="dedup probes per size")
+    parser.add_argument("--repeat", type=int, default=50, help="passes over the parser corpus")
+    parser.add_argument("--no-record", action="store_true", help="print only, don't append to results/suite.json")
+    args = parser.parse_args()
+
+    gqf.ADAPTIVE_CONCURRENCY = True
+    gqf.CACHE_RESPONSES = False
+    print("=" * 72)
+    print(f"🧪 Benchmark suite @ {results.git_revision()}")
+    print("=" * 72)
+    metrics = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        metrics.update(bench_e2e(args, out_dir))
+        metrics.update(bench_parse(args.repeat))
+        for size in args.sizes:
+            insert_us, query_us, _ = bench_dedup.bench_size(size, args.queries)
+            metrics[f"dedup.{size}.insert_us"] = insert_us
+            metrics[f"dedup.{size}.query_us"] = query_us
+        for size in args.sizes:
+            append_us, checkpoint, _ = bench_checkpoint.bench_size(size, gqf.QUESTIONS_PER_CALL,
+                                                                   gqf.CHECKPOINT_INTERVAL, out_dir)
+            metrics[f"checkpoint.{size}.append_us"] = append_us
+            metrics[f"checkpoint.{size}.save_s"] = checkpoint
+
+    for key, value in metrics.items():
+        print(f"   {key:<36} {value:>12,.2f}")
+    if args.no_record:
+        return
+    params = {k: v for k, v in vars(args).items() if k != "no_record"}
+    run = results.record("suite", params, metrics)
+    print()
+    print(results.compare(run, results.previous("suite", run)))
+    print(f"\n📁 {results.RESULTS_DIR / 'suite.json'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: trace logging overhead and analyzer time vs. log size
+================================================================
+Writes N synthetic call traces over the fast generator's syllabus through
+qgen.trace.CallTracer (8 threads, as the worker pool would) and runs
+analyze_traces.analyze() over the file with the default tables:
+
+- record:   µs per traced call on the worker threads
+- analyze:  seconds for one pass (model and topic tables, latency vs.
+            length) and calls/s
+
+Usage: python scripts/bench/bench_traces.py [--sizes 10000 100000]
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import analyze_traces  # noqa: E402
+import generate_questions_fast as gqf  # noqa: E402
+from qgen.trace import CallTracer, prompt_hash, trace_record  # noqa: E402
+
+THREADS = 8
+
+
+def synthetic_calls(rng, size):
+    cells = [(subject, topic, subtopic, difficulty) for subject, topic, subtopics in gqf.SYLLABUS
+             for subtopic in subtopics for difficulty in ("easy", "medium", "hard")]
+    calls = []
+    for n in range(size):
+        model = rng.choice(gqf.MODELS)
+        tokens = rng.randint(150, 2048)
+        failed = rng.random() < 0.03
+        parsed = 0 if failed else rng.randint(3, 5)
+        completion = None if failed else {"completion_tokens": tokens, "prompt_tokens": 210,
+                                          "elapsed": 0.3 + tokens * 0.012, "eval_duration": tokens * 11_000_000,
+                                          "load_duration": 0, "finish_reason": "stop"}
+        info = {"prompt_hash": prompt_hash(str(n)), "queue_wait": rng.random()}
+        if failed:
+            info["error"] = rng.choice(["ReadTimeout", "HTTP 500"])
+        dups = rng.randint(0, parsed)
+        calls.append((info, completion, model, rng.choice(cells), parsed, parsed - dups, dups))
+    return calls
+
+
+def write_traces(path, calls):
+    tracer = CallTracer(path)
+
+    def record(chunk):
+        for info, completion, model, cell, parsed, accepted, dups in chunk:
+            tracer.record(trace_record(info, completion, "ollama", model, cell, 5, parsed, accepted, dups))
+
+    chunks = [calls[i::THREADS] for i in range(THREADS)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(record, chunks))
+    tracer.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("🧪 Trace benchmark (write from 8 threads, analyze model + topic tables)")
+    print("=" * 72)
+    print(f"   {'calls':>7} | {'MB':>6} | {'record µs':>9} | {'analyze s':>9} | {'calls/s':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            path = Path(tmp) / f"{size}.trace.jsonl"
+            calls = synthetic_calls(random.Random(size), size)
+            written = write_traces(path, calls)
+            start = time.perf_counter()
+            _, _, _, total, _ = analyze_traces.analyze([path], ["model", "topic"])
+            elapsed = time.perf_counter() - start
+            assert total == size
+            print(f"   {size:>7} | {path.stat().st_size / 1e6:>6.1f} | {written / size * 1e6:>9.1f} | "
+                  f"{elapsed:>9.2f} | {size / elapsed:>9,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: truncated batches - regex parse vs salvage vs salvage + feedback
+===========================================================================
+The stand-in answers the LONG_TOPICS topics with long worked
+explanations, so their 5-question batches run past num_predict and stop
+mid-array (done_reason "length"). Runs generate_questions_fast.py's async
+engine with:
+
+- regex:     the old greedy [..] parser (a cut-off batch yields nothing)
+- salvage:   scan_mcqs keeps every question that closed before the cutoff
+- feedback:  salvage + per-topic num_predict raised up to MAX_NUM_PREDICT
+- capped:    feedback with a low MAX_NUM_PREDICT, so batches shrink instead
+
+and reports calls, truncated calls, calls salvaged, tokens per question
+and throughput.
+
+Usage: python scripts/bench/bench_truncation.py [--questions 1500] [--num-predict 400]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_parsers import legacy_greedy  # noqa: E402
+from bench.bench_streaming import reset  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.json_stream import scan_mcqs  # noqa: E402
+
+LONG_TOPICS = ["Time & Work", "Time Speed Distance", "Mensuration", "Profit & Loss", "Compound Interest"]
+
+
+def run_one(label, server, target, out_dir, feedback, max_num_predict, parser=scan_mcqs):
+    reset(target, out_dir)
+    gqf.TRUNCATION_FEEDBACK = feedback
+    gqf.MAX_NUM_PREDICT = max_num_predict
+    gqf.scan_mcqs = parser
+    before = dict(server.stats)
+    tasks = gqf.create_planner()
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(gqf.run_async(tasks, [server.url]))
+    elapsed = time.time() - start
+    server.wait_idle()
+    done = gqf.total_questions()
+    calls = server.stats["requests"] - before["requests"]
+    cut = server.stats["truncated"] - before["truncated"]
+    tokens = server.stats["tokens"] - before["tokens"]
+    t = gqf.truncation.totals
+    print(f"   {label:<9} {done:>4} q | {calls:>4} calls | {cut:>4} truncated | {t['salvagedCalls']:>4} salvaged | "
+          f"{gqf.stats['failed']:>4} empty | {tokens / max(done, 1):5.1f} tok/q | {done / elapsed * 60:6.0f} q/min")
+    return gqf.truncation
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1500)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--token-latency", type=float, default=0.0005)
+    parser.add_argument("--num-predict", type=int, default=400)
+    parser.add_argument("--in-flight", type=int, default=16)
+    args = parser.parse_args()
+
+    gqf.ASYNC_IN_FLIGHT = args.in_flight
+    gqf.ADAPTIVE_CONCURRENCY = False  # fixed in-flight counts; see bench_concurrency.py
+    gqf.OLLAMA_OPTIONS = dict(gqf.OLLAMA_OPTIONS, num_predict=args.num_predict)
+    regex = lambda text: (legacy_greedy(text), False)  # noqa: E731
+    with MockLLMServer(latency=args.latency, token_latency=args.token_latency, long_topics=LONG_TOPICS) as server, \
+            tempfile.TemporaryDirectory() as tmp:
+        out_dir = Path(tmp)
+        print("=" * 96)
+        print(f"🧪 Truncation benchmark: {args.questions} questions, num_predict={args.num_predict}, "
+              f"{len(LONG_TOPICS)} verbose topics")
+        print("=" * 96)
+        run_one("regex", server, args.questions, out_dir, False, args.num_predict, regex)
+        run_one("salvage", server, args.questions, out_dir, False, args.num_predict)
+        tracker = run_one("feedback", server, args.questions, out_dir, True, 4096)
+        capped = run_one("capped", server, args.questions, out_dir, True, int(args.num_predict * 1.5))
+        print()
+        print(f"   feedback: {tracker.summary()}")
+        print(tracker.report(5))
+        print(f"   capped:   {capped.summary()}")
+        print(capped.report(5))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark: worker stall time, inline checkpoints vs. the writer thread
+======================================================================
+Runs generate_questions_fast.py's threaded engine against the stand-in
+server on top of a large existing bank with a short checkpoint interval,
+so every checkpoint rewrites a big all_questions.json, once with
+--inline-writes (journal + checkpoint on the submit loop) and once with
+the background writer (qgen/writer.py):
+
+- pickup wait:  time a finished batch sits until the submit loop takes it
+                (the loop is busy writing -> workers idle, nothing new
+                is submitted)
+- dedup wait:   time per accept_question() call (fingerprint check)
+- loop writes:  time the submit loop itself spent in journal/checkpoint
+
+Usage: python scripts/bench/bench_writer.py [--bank 50000] [--questions 1000] [--interval 100]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import generate_questions_fast as gqf  # noqa: E402
+from bench.bench_checkpoint import synthetic_bank  # noqa: E402
+from bench.mock_server import MockLLMServer  # noqa: E402
+from qgen.fingerprints import DB_FILE, FingerprintStore  # noqa: E402
+from qgen.journal import atomic_write_json  # noqa: E402
+
+
+def seed_bank(folder, size):
+    """all_questions.json with `size` questions, already marked as indexed."""
+    bank_file = folder / "all_questions.json"
+    atomic_write_json(bank_file, synthetic_bank(random.Random(size), size), indent=None)
+    store = FingerprintStore(folder / DB_FILE)
+    store.mark_snapshot(bank_file, size)
+    store.close()
+
+
+def run_one(label, background, bank, target, out_dir):
+    gqf.BACKGROUND_WRITES = background
+    gqf.QUESTIONS_DIR = Path(tempfile.mkdtemp(dir=out_dir))
+    seed_bank(gqf.QUESTIONS_DIR, bank)
+    gqf.generated_questions.clear()
+    gqf.stats.update({"generated": 0, "failed": 0, "duplicates": 0, "start": time.time()})
+    gqf.TARGET_QUESTIONS = bank + target
+    with contextlib.redirect_stdout(io.StringIO()):
+        gqf.recover_progress()
+
+    finished, pickup, dedup = {}, [], []
+    generate_batch, accept_results, accept_question = gqf.generate_batch, gqf.accept_results, gqf.accept_question
+
+    def timed_batch(task, *args):
+        questions, elapsed = generate_batch(task, *args)
+        finished[id(questions)] = time.perf_counter()
+        return questions, elapsed
+
+    def timed_results(task, questions, elapsed):
+        done = finished.pop(id(questions), None)
+        if done is not None:
+            pickup.append(time.perf_counter() - done)
+        return accept_results(task, questions, elapsed)
+
+    def timed_question(task, q):
+        start = time.perf_counter()
+        try:
+            return accept_question(task, q)
+        finally:
+            dedup.append(time.perf_counter() - start)
+
+    gqf.generate_batch, gqf.accept_results, gqf.accept_question = timed_batch, timed_results, timed_question
+    try:
+        planner = gqf.create_planner()
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            gqf.run_threaded(planner)
+        elapsed = time.time() - start
+        loop_writes = gqf.writer.waited
+        gqf.close_progress()
+    finally:
+        gqf.generate_batch, gqf.accept_results, gqf.accept_question = generate_batch, accept_results, accept_question
+
+    pickup.sort()
+    p99 = pickup[int(len(pickup) * 0.99) - 1] if pickup else 0.0
+    print(f"   {label:<10} {gqf.stats['generated']:>5} q in {elapsed:6.2f}s | "
+          f"{gqf.stats['generated'] / elapsed * 60:7.0f} q/min | "
+          f"pickup wait {sum(pickup):6.2f}s total, p99 {p99 * 1000:6.1f} ms, max {max(pickup, default=0) * 1000:6.1f} ms | "
+          f"dedup {statistics.mean(dedup or [0]) * 1000:5.2f} ms/q | loop writes {loop_writes:5.2f}s")
+    print(f"              {gqf.writer.summary()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bank", type=int, default=50000, help="questions already in all_questions.json")
+    parser.add_argument("--questions", type=int, default=1000)
+    parser.add_argument("--interval", type=int, default=100, help="questions per checkpoint")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    gqf.CHECKPOINT_INTERVAL = args.interval
+    gqf.MAX_WORKERS = args.workers
+    gqf.ADAPTIVE_CONCURRENCY = False
+    gqf.CACHE_RESPONSES = False
+    print("=" * 60)
+    print(f"🧪 Writer benchmark ({args.bank} existing, +{args.questions}, checkpoint every {args.interval})")
+    print("=" * 60)
+    with MockLLMServer(latency=args.latency, seed=1) as server, tempfile.TemporaryDirectory() as tmp:
+        gqf.OLLAMA_HOST = server.url
+        gqf.OLLAMA_API = f"{server.url}/api/generate"
+        run_one("inline", False, args.bank, args.questions, Path(tmp))
+        run_one("background", True, args.bank, args.questions, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,579 @@
+"""
+Local stand-in for the Ollama HTTP API
+======================================
+Speaks just enough of /api/generate and /api/tags for the generator
+scripts, with a configurable per-request latency and per-token decode
+time. "stream": true is answered with Ollama-style NDJSON, one line per
+token, and a client disconnect stops decoding just like the real server.
+Every question it returns is unique, so dedup never hides throughput
+differences - unless duplicates is set: that share of the questions
+repeats an earlier one word for word, like a model that keeps coming
+back to the same facts. The stems are all "Mock question number N..."
+and so share most of their LSH bands; with varied set each stem is
+random words instead (salted per process, so several server processes
+don't repeat each other), which keeps the dedup index's candidate sets
+as small as a real bank's.
+
+With max_loaded set it simulates model residency: a request for a model
+that isn't loaded waits for the other model's in-flight requests to
+finish, evicts it and pays load_latency, like Ollama with
+OLLAMA_MAX_LOADED_MODELS=1. /api/ps lists resident models, and responses
+carry load_duration.
+
+With parallel set, only that many requests decode at once (like
+OLLAMA_NUM_PARALLEL); the rest queue, and beyond max_queue waiting
+requests the server answers 503 like OLLAMA_MAX_QUEUE.
+
+It also answers Groq's OpenAI-style /openai/v1/chat/completions with
+usage fields and x-ratelimit-* headers, and enforces rpm/tpm over a
+sliding window (429 + retry-after when a request would exceed them).
+
+Output stops at options.num_predict / max_tokens with done_reason /
+finish_reason "length", mid-array like a real model. Prompts that
+mention one of long_topics get long worked explanations (~verbosity x
+the tokens per question), so those topics hit the limit first.
+
+With malformed set, that share of the questions in free-text answers
+come back the way real models slip (trailing comma, single quotes,
+options as a list, "Option B" as the answer). A request with Ollama's
+"format" or a chat response_format is answered like constrained
+decoding: always well-formed, {"questions": [...]} for batches, exactly
+the count asked for. Chat JSON mode cut off at max_tokens is a 400
+json_validate_failed carrying the partial text, as Groq does.
+
+failures and throttled are shares of requests (on either API) answered
+500 (a crashed model runner) or 429 with retry-after, before any work.
+stalled (settable while it runs: server.httpd.stalled = True) plays a
+wedged box: /api/tags answers 503 and generate requests hang until it is
+cleared.
+
+    with MockLLMServer(latency=0.25) as server:
+        requests.post(f"{server.url}/api/generate", json={...})
+"""
+
+import collections
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MODELS = ["llama3:latest", "mistral:latest"]
+
+_counter = itertools.count(1)
+_SALT = random.getrandbits(32)  # varied stems differ between server processes
+_SYLLABLES = "ka ra ta na ma pa la sa da ba ga ja ha va ya ri ni ti mi si ko ro to no mo pu lu su du bu".split()
+_rng = random.Random(7)
+WORDS = ["".join(_rng.choice(_SYLLABLES) for _ in range(_rng.randint(2, 4))) for _ in range(5000)]
+
+
+def fake_question(n, varied=False):
+    """One well-formed MCQ object with a unique stem (varied: random words, like a real bank)."""
+    if varied:
+        rng = random.Random(_SALT << 32 | n)
+        stem = " ".join(rng.choice(WORDS) for _ in range(rng.randint(10, 25)))
+        return {
+            "question": f"{stem} ({n})?",
+            "options": {k: f"{rng.choice(WORDS)} {rng.randint(1, 999)}" for k in "ABCD"},
+            "correctAnswer": "A",
+            "explanation": f"{stem.split()[0]} comes first",
+        }
+    return {
+        "question": f"Mock question number {n}: what is {n} + {n}?",
+        "options": {"A": str(2 * n), "B": str(2 * n + 1), "C": str(n), "D": str(n * n + 3)},
+        "correctAnswer": "A",
+        "explanation": f"{n} + {n} = {2 * n}",
+    }
+
+
+def malform(q, rng=random):
+    """One question as a free-text model sometimes writes it: invalid JSON or the wrong shape."""
+    kind = rng.randrange(4)
+    if kind == 0:
+        return json.dumps(q, indent=2)[:-2] + ",\n}"  # trailing comma
+    if kind == 1:
+        return json.dumps(q, indent=2).replace('"', "'")  # Python-style quotes
+    q = dict(q)
+    if kind == 2:
+        q["options"] = [f"{k}) {v}" for k, v in q["options"].items()]
+    else:
+        q["correctAnswer"] = f"Option {q['correctAnswer']}"
+    return json.dumps(q, indent=2)
+
+
+def fake_response(prompt, extra_questions=0, verbosity=1, malformed=0.0, structured=False, rng=random,
+                  duplicates=0.0, varied=False):
+    """Model text for a prompt: one object, or an array for batch prompts.
+
+    extra_questions makes the "model" over-generate, like a real model that
+    keeps going until num_predict; verbosity > 1 pads each explanation.
+    malformed is the share of free-text questions written wrongly;
+    structured output is always valid and wrapped in {"questions": [...]}.
+    duplicates is the share of questions that repeat an earlier one;
+    varied stems are random words instead of "Mock question number N".
+    """
+    def question():
+        n = next(_counter)
+        if n > 1 and rng.random() < duplicates:
+            n = rng.randrange(max(1, n - 1000), n)
+        q = fake_question(n, varied)
+        if verbosity > 1:
+            q["explanation"] += " Step: check the working again." * (verbosity * 4)
+        return q
+
+    m = re.search(r"exactly (\d+)", prompt)
+    if not m:
+        if not structured and rng.random() < malformed:
+            return malform(question(), rng)
+        return json.dumps(question(), indent=2)
+    if structured:
+        # maxItems: the grammar ends the array at the requested count
+        return json.dumps({"questions": [question() for _ in range(int(m.group(1)))]}, indent=2)
+    count = int(m.group(1)) + extra_questions
+    if not malformed:
+        return json.dumps([question() for _ in range(count)], indent=2)
+    parts = [malform(q, rng) if rng.random() < malformed else json.dumps(q, indent=2)
+             for q in (question() for _ in range(count))]
+    return "[\n" + ",\n".join(parts) + "\n]"
+
+
+def tokenize(text, size=4):
+    """Split text into ~4-char pieces standing in for model tokens."""
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.server.stalled:
+            self._send_json(503, {"error": "stalled"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": m} for m in self.server.models]})
+        elif self.path == "/api/ps":
+            self._send_json(200, {"models": [{"name": m, "model": m} for m in self.server.residency.resident]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if self.path == "/api/generate":
+            handler = self._generate
+        elif self.path.endswith("/v1/chat/completions"):
+            handler = self._chat
+        else:
+            self._send_json(404, {"error": "not found"})
+            return
+        server = self.server
+        server.count("requests")
+        while server.stalled:
+            time.sleep(0.05)
+        roll = server.rng.random()
+        if roll < server.failures:
+            server.count("failed")
+            self._send_json(500, {"error": "llama runner process has terminated: exit status 2"})
+            return
+        if roll < server.failures + server.throttled:
+            server.count("rate_limited")
+            self._send_json(429, {"error": {"message": "Rate limit reached. Please try again later.",
+                                            "type": "requests", "code": "rate_limit_exceeded"}},
+                            {"retry-after": "1"})
+            return
+        server.count("active")
+        try:
+            handler(payload)
+        finally:
+            server.count("active", -1)
+
+    def _generate(self, payload):
+        server = self.server
+        if server.slots is None:
+            self._generate_in_slot(payload)
+            return
+        with server._lock:
+            busy = server.queued >= server.max_queue
+            if not busy:
+                server.queued += 1
+        if busy:
+            server.count("busy")
+            self._send_json(503, {"error": "server busy, please try again.  maximum pending requests exceeded"})
+            return
+        server.slots.acquire()
+        with server._lock:
+            server.queued -= 1
+        try:
+            self._generate_in_slot(payload)
+        finally:
+            server.slots.release()
+
+    def _generate_in_slot(self, payload):
+        server = self.server
+        model = payload.get("model")
+        load = server.residency.acquire(model)
+        try:
+            if not payload.get("prompt"):
+                # Ollama: an empty prompt just loads the model (keep_alive warm-up)
+                self._send_json(200, {"model": model, "response": "", "done": True,
+                                      "done_reason": "load", "load_duration": int(load * 1e9)})
+                return
+
+            time.sleep(server.latency)
+            tokens, reason = server.complete(payload["prompt"], (payload.get("options") or {}).get("num_predict"),
+                                             structured=bool(payload.get("format")))
+            text = "".join(tokens)
+
+            if payload.get("stream", True):
+                self._stream(payload, tokens, load, reason)
+                return
+
+            time.sleep(len(tokens) * server.token_latency)
+            server.count("tokens", len(tokens))
+            self._send_json(200, {
+                "model": model,
+                "response": text,
+                "done": True,
+                "done_reason": reason,
+                "load_duration": int(load * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int(len(tokens) * server.token_latency * 1e9),
+            })
+        finally:
+            server.residency.release(model)
+
+    def _chat(self, payload):
+        """OpenAI/Groq chat completion, rate limited like the hosted API."""
+        server = self.server
+        prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+        prompt_tokens = len(tokenize(prompt))
+        admitted, headers = server.limits.admit(prompt_tokens)
+        if not admitted:
+            server.count("rate_limited")
+            self._send_json(429, {"error": {
+                "message": "Rate limit reached. Please try again later.",
+                "type": "tokens",
+                "code": "rate_limit_exceeded",
+            }}, headers)
+            return
+
+        time.sleep(server.latency)
+        json_mode = (payload.get("response_format") or {}).get("type") in ("json_object", "json_schema")
+        tokens, reason = server.complete(prompt, payload.get("max_tokens"), structured=json_mode)
+        text = "".join(tokens)
+        completion_tokens = len(tokens)
+        time.sleep(completion_tokens * server.token_latency)
+        server.count("tokens", completion_tokens)
+        headers = server.limits.charge(completion_tokens)
+        if json_mode and reason == "length":
+            self._send_json(400, {"error": {
+                "message": "Failed to generate JSON. Please adjust your prompt. See 'failed_generation' for more details.",
+                "type": "invalid_request_error",
+                "code": "json_validate_failed",
+                "failed_generation": text,
+            }}, headers)
+            return
+        self._send_json(200, {
+            "id": f"chatcmpl-{next(_counter)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": reason,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }, headers)
+
+    def _stream(self, payload, tokens, load=0.0, reason="stop"):
+        server = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        sent = 0
+        try:
+            for tok in tokens:
+                time.sleep(server.token_latency)
+                self._chunk({"model": payload.get("model"), "response": tok, "done": False})
+                sent += 1
+            self._chunk({
+                "model": payload.get("model"),
+                "response": "",
+                "done": True,
+                "done_reason": reason,
+                "load_duration": int(load * 1e9),
+                "eval_count": sent,
+                "eval_duration": int(sent * server.token_latency * 1e9),
+            })
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            server.count("cancelled")
+            self.close_connection = True
+        finally:
+            server.count("tokens", sent)
+
+    def _chunk(self, obj):
+        line = json.dumps(obj).encode() + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+
+class _Residency:
+    """Which models are loaded; at most max_loaded at once (None = unlimited)."""
+
+    def __init__(self, load_latency=0.0, max_loaded=None):
+        self.load_latency = load_latency
+        self.max_loaded = max_loaded
+        self.resident = collections.OrderedDict()  # LRU order
+        self.loading = set()
+        self.active = collections.Counter()
+        self.loads = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, model):
+        """Wait until `model` is resident and count a request on it; returns seconds spent loading."""
+        if self.max_loaded is None:
+            return 0.0
+        with self._cond:
+            while True:
+                if model in self.resident:
+                    self.resident.move_to_end(model)
+                    self.active[model] += 1
+                    return 0.0
+                if model not in self.loading:
+                    if len(self.resident) + len(self.loading) < self.max_loaded:
+                        break
+                    idle = next((m for m in self.resident if not self.active[m]), None)
+                    if idle is not None:
+                        del self.resident[idle]  # evict
+                        break
+                self._cond.wait()
+            self.loading.add(model)
+            self.loads += 1
+        time.sleep(self.load_latency)
+        with self._cond:
+            self.loading.discard(model)
+            self.resident[model] = None
+            self.active[model] += 1
+            self._cond.notify_all()
+        return self.load_latency
+
+    def release(self, model):
+        if self.max_loaded is None:
+            return
+        with self._cond:
+            self.active[model] -= 1
+            self._cond.notify_all()
+
+
+class _Limits:
+    """Sliding-window requests/tokens budget with Groq-style headers."""
+
+    def __init__(self, rpm=None, tpm=None, period=60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.period = period
+        self._requests = collections.deque()  # timestamps
+        self._tokens = collections.deque()  # (timestamp, tokens)
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        cutoff = now - self.period
+        while self._requests and self._requests[0] <= cutoff:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= cutoff:
+            self._tokens.popleft()
+
+    def _headers(self, now):
+        headers = {}
+        if self.rpm:
+            headers["x-ratelimit-limit-requests"] = str(self.rpm)
+            headers["x-ratelimit-remaining-requests"] = str(max(0, self.rpm - len(self._requests)))
+            reset = self._requests[0] + self.period - now if self._requests else 0.0
+            headers["x-ratelimit-reset-requests"] = f"{max(reset, 0.0):.2f}s"
+        if self.tpm:
+            used = sum(t for _, t in self._tokens)
+            headers["x-ratelimit-limit-tokens"] = str(self.tpm)
+            headers["x-ratelimit-remaining-tokens"] = str(max(0, self.tpm - used))
+            reset = self._tokens[0][0] + self.period - now if self._tokens else 0.0
+            headers["x-ratelimit-reset-tokens"] = f"{max(reset, 0.0):.2f}s"
+        return headers
+
+    def admit(self, prompt_tokens):
+        """Count a request if it fits; returns (admitted, headers)."""
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            used = sum(t for _, t in self._tokens)
+            over = []
+            if self.rpm and len(self._requests) >= self.rpm:
+                over.append(self._requests[0] + self.period - now)
+            if self.tpm and used + prompt_tokens > self.tpm:
+                # Oldest usage that has to expire before this prompt fits
+                need, freed = used + prompt_tokens - self.tpm, 0
+                for ts, t in self._tokens:
+                    freed += t
+                    if freed >= need:
+                        over.append(ts + self.period - now)
+                        break
+                else:
+                    over.append(self.period)
+            headers = self._headers(now)
+            if over:
+                headers["retry-after"] = f"{max(max(over), 0.0):.2f}"
+                return False, headers
+            self._requests.append(now)
+            self._tokens.append((now, prompt_tokens))
+            return True, headers
+
+    def charge(self, completion_tokens):
+        """Add completion tokens to the window; returns the response headers."""
+        with self._lock:
+            now = time.time()
+            self._tokens.append((now, completion_tokens))
+            self._expire(now)
+            return self._headers(now)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    _lock = threading.Lock()
+
+    def count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    def complete(self, prompt, limit=None, structured=False):
+        """Tokens of the model's answer and why it stopped ("stop" or "length")."""
+        verbosity = self.verbosity if any(t in prompt for t in self.long_topics) else 1
+        if structured:
+            self.count("structured")
+        tokens = tokenize(fake_response(prompt, self.extra_questions, verbosity, self.malformed, structured, self.rng,
+                                        self.duplicates, self.varied))
+        if limit and len(tokens) > limit:
+            self.count("truncated")
+            return tokens[:limit], "length"
+        return tokens, "stop"
+
+    def handle_error(self, request, client_address):
+        # Clients cancelling requests (early stop, timeouts) are expected.
+        pass
+
+
+class MockLLMServer:
+    """Threaded stand-in server on 127.0.0.1; use as a context manager."""
+
+    def __init__(self, latency=0.25, token_latency=0.0, extra_questions=0, port=0, models=None,
+                 rpm=None, tpm=None, period=60.0, load_latency=0.0, max_loaded=None,
+                 parallel=None, max_queue=512, long_topics=(), verbosity=4, malformed=0.0, seed=None,
+                 duplicates=0.0, failures=0.0, throttled=0.0, stalled=False, varied=False):
+        self.httpd = _Server(("127.0.0.1", port), _Handler)
+        self.httpd.latency = latency
+        self.httpd.token_latency = token_latency
+        self.httpd.extra_questions = extra_questions
+        self.httpd.long_topics = tuple(long_topics)
+        self.httpd.verbosity = verbosity
+        self.httpd.malformed = malformed
+        self.httpd.duplicates = duplicates
+        self.httpd.varied = varied
+        self.httpd.failures = failures
+        self.httpd.throttled = throttled
+        self.httpd.stalled = stalled
+        self.httpd.rng = random.Random(seed)
+        self.httpd.models = models or MODELS
+        self.httpd.limits = _Limits(rpm, tpm, period)
+        self.httpd.residency = _Residency(load_latency, max_loaded)
+        self.httpd.slots = threading.Semaphore(parallel) if parallel else None
+        self.httpd.max_queue = max_queue
+        self.httpd.queued = 0
+        self.httpd.stats = {"requests": 0, "tokens": 0, "cancelled": 0, "active": 0, "rate_limited": 0,
+                            "busy": 0, "truncated": 0, "structured": 0, "failed": 0}
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    @property
+    def loads(self):
+        """Model loads so far (only counted when max_loaded is set)."""
+        return self.httpd.residency.loads
+
+    def wait_idle(self, timeout=30):
+        """Block until no request is being served (so stats are final)."""
+        deadline = time.time() + timeout
+        while self.stats["active"] > 0 and time.time() < deadline:
+            time.sleep(0.01)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stand-in Ollama server")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=None, help="chat completions: requests per minute")
+    parser.add_argument("--tpm", type=int, default=None, help="chat completions: tokens per minute")
+    parser.add_argument("--max-loaded", type=int, default=None, help="models that fit in memory at once")
+    parser.add_argument("--load-latency", type=float, default=0.0, help="seconds to load a model")
+    parser.add_argument("--parallel", type=int, default=None, help="requests decoded at once (OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--max-queue", type=int, default=512, help="queued requests before 503 (OLLAMA_MAX_QUEUE)")
+    parser.add_argument("--long-topic", action="append", default=[], help="topic answered verbosely (repeatable)")
+    parser.add_argument("--malformed", type=float, default=0.0, help="share of free-text questions written wrongly")
+    parser.add_argument("--duplicates", type=float, default=0.0, help="share of questions repeating an earlier one")
+    parser.add_argument("--varied", action="store_true", help="random-word stems instead of numbered ones")
+    parser.add_argument("--failures", type=float, default=0.0, help="share of requests answered 500")
+    parser.add_argument("--throttled", type=float, default=0.0, help="share of requests answered 429")
+    args = parser.parse_args()
+
+    server = MockLLMServer(latency=args.latency, token_latency=args.token_latency, port=args.port,
+                           rpm=args.rpm, tpm=args.tpm, max_loaded=args.max_loaded, load_latency=args.load_latency,
+                           parallel=args.parallel, max_queue=args.max_queue, long_topics=args.long_topic,
+                           malformed=args.malformed, duplicates=args.duplicates, failures=args.failures,
+                           throttled=args.throttled, varied=args.varied)
+    print(f"🧪 Mock Ollama on {server.url} (latency {args.latency}s) - Ctrl+C to stop")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
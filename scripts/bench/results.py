@@ -0,0 +1,84 @@
+"""
+Benchmark results on disk
+=========================
+Each run of a benchmark is appended to results/<name>.json, tagged with
+the git revision it ran on, so a regression shows up as a worse number
+next to the previous run instead of scrolling by:
+
+    run = record("suite", params, {"e2e.questions_per_min": 4200.0, ...})
+    print(compare(run, previous("suite", run)))
+
+Metrics are one flat dict of numbers. Names ending in _per_min or _yield
+are better when higher; everything else (times, sizes) when lower.
+"""
+
+import json
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qgen.journal import atomic_write_json  # noqa: E402
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+HIGHER_IS_BETTER = ("_per_min", "_yield")
+
+
+def git_revision():
+    """Short HEAD hash, "-dirty" if the tree has changes ("unknown" outside git)."""
+    here = Path(__file__).resolve().parent
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=here, capture_output=True,
+                             text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def load(name, results_dir=RESULTS_DIR):
+    """Every stored run of a benchmark, oldest first."""
+    path = Path(results_dir) / f"{name}.json"
+    if not path.exists():
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def record(name, params, metrics, results_dir=RESULTS_DIR):
+    """Append one run and return it."""
+    run = {
+        "revision": git_revision(),
+        "recordedAt": datetime.now().isoformat(timespec="seconds"),
+        "params": params,
+        "metrics": {k: round(v, 3) if isinstance(v, float) else v for k, v in metrics.items()},
+    }
+    atomic_write_json(Path(results_dir) / f"{name}.json", load(name, results_dir) + [run])
+    return run
+
+
+def previous(name, run, results_dir=RESULTS_DIR):
+    """The stored run before `run` with the same params (None if there is none)."""
+    runs = [r for r in load(name, results_dir) if r["params"] == run["params"]]
+    if runs and runs[-1] == run:
+        runs.pop()
+    return runs[-1] if runs else None
+
+
+def compare(run, base, threshold=0.10):
+    """One line per metric: base -> run, % change, ⚠️ where it got worse by more than threshold."""
+    if base is None:
+        return "   (no earlier run with the same parameters to compare against)"
+    lines = [f"   vs {base['revision']} ({base['recordedAt']}):"]
+    for key, value in run["metrics"].items():
+        old = base["metrics"].get(key)
+        if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+            continue
+        change = (value - old) / old if old else 0.0
+        worse = -change if key.endswith(HIGHER_IS_BETTER) else change
+        flag = " ⚠️" if worse > threshold else ""
+        lines.append(f"   {key:<36} {old:>12,.2f} -> {value:>12,.2f}  {change:+7.1%}{flag}")
+    return "\n".join(lines)
@@ -10,7 +10,7 @@
 print("✅ Dependencies installed!")
 
 #@title **CELL 2: Import Libraries & Setup** { display-mode: "form" }
-import json, time, random, re, hashlib, torch
+import json, time, random, re, hashlib, itertools, torch
 from datetime import datetime
 from pathlib import Path
 from transformers import AutoModelForCausalLM, AutoTokenizer, BitsAndBytesConfig
@@ -151,8 +151,11 @@ model = AutoModelForCausalLM.from_pretrained(
 print("✅ Model loaded!")
 
 #@title **CELL 5: Helper Functions** { display-mode: "form" }
+_ID_SEQ = itertools.count()  # per-run sequence: IDs from the same millisecond can't collide
+_ID_WORKER = random.randrange(80, 100)  # qgen.ids.NOTEBOOK_SLOTS: a random slot per session, clear of local runs
+
 def gen_id():
-    return f"q_{int(time.time()*1000)}_{random.randint(1000,9999)}"
+    return f"q_{int(time.time()*1000)}_{_ID_WORKER:02d}{next(_ID_SEQ) % 10000:04d}"
 
 def get_hash(t):
     return hashlib.md5(t.lower().strip()[:100].encode()).hexdigest()
@@ -162,21 +165,60 @@ def fmt_time(s):
     if s < 3600: return f"{int(s//60)}m {int(s%60)}s"
     return f"{int(s//3600)}h {int((s%3600)//60)}m"
 
+_OBJECT_SCAN = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_KEY_AHEAD = re.compile(r'\s*"')
+_decoder = json.JSONDecoder()
+
+def _collect(value, found):
+    if isinstance(value, dict):
+        if "question" in value:
+            found.append(value)
+            return
+        value = value.values()
+    elif not isinstance(value, list):
+        return
+    for item in value:
+        _collect(item, found)
+
+def extract_mcqs(text):
+    """Every complete {"question": ...} object in text, in order.
+
+    Same extractor as scripts/qgen/json_stream.py, inlined so the notebook
+    runs standalone: each "{" goes to the C decoder first; a broken or
+    cut-off object is scanned brace by brace (string-aware) for the
+    complete objects inside it. A failed "{" with no key after it is prose,
+    and a question found inside a failed one closes it. Prose, fences and
+    wrapper objects are skipped.
+    """
+    found, depth, pos = [], 0, 0
+    while True:
+        m = _OBJECT_SCAN.search(text, pos)
+        if not m:
+            return found
+        pos = m.end()
+        ch = m.group()
+        if ch == "{":
+            try:
+                value, pos = _decoder.raw_decode(text, m.start())
+            except ValueError:
+                if _KEY_AHEAD.match(text, pos):
+                    depth += 1
+                continue
+            before = len(found)
+            _collect(value, found)
+            if len(found) > before:
+                depth = 0
+        elif ch == "}":
+            depth = max(depth - 1, 0)
+        elif depth:
+            end = _STRING_TAIL.match(text, pos)
+            if not end:
+                return found  # cut off inside a string
+            pos = end.end()
+
 def parse_qs(text):
-    qs = []
-    try:
-        m = re.search(r'\[[\s\S]*\]', text)
-        if m:
-            arr = json.loads(m.group(0))
-            if isinstance(arr, list): return arr
-    except: pass
-    
-    for m in re.finditer(r'\{[^{}]*"question"[^{}]*\}', text, re.DOTALL):
-        try:
-            o = json.loads(m.group(0))
-            if "question" in o and "options" in o: qs.append(o)
-        except: pass
-    return qs
+    return extract_mcqs(text)
 
 def gen_batch(topic, n=5):
     subj, top, subs, _ = topic
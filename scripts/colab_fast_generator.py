@@ -18,6 +18,7 @@ import time
 import random
 import re
 import hashlib
+import itertools
 from datetime import datetime
 from pathlib import Path
 from google.colab import files
@@ -117,8 +118,11 @@ print("✅ vLLM model loaded! Ready for fast generation.")
 
 # ==================== CELL 6: Fast Generation Functions ====================
 
+_ID_SEQ = itertools.count()  # per-run sequence: IDs from the same millisecond can't collide
+_ID_WORKER = random.randrange(80, 100)  # qgen.ids.NOTEBOOK_SLOTS: a random slot per session, clear of local runs
+
 def generate_id():
-    return f"q_{int(time.time()*1000)}_{random.randint(1000,9999)}"
+    return f"q_{int(time.time()*1000)}_{_ID_WORKER:02d}{next(_ID_SEQ) % 10000:04d}"
 
 def get_hash(text):
     return hashlib.md5(text.lower().strip()[:80].encode()).hexdigest()
@@ -141,33 +145,79 @@ Return JSON array ONLY:
 
 {count} questions: [/INST]"""
 
+_OBJECT_SCAN = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_KEY_AHEAD = re.compile(r'\s*"')
+_decoder = json.JSONDecoder()
+
+def _collect(value, found):
+    if isinstance(value, dict):
+        if "question" in value:
+            found.append(value)
+            return
+        value = value.values()
+    elif not isinstance(value, list):
+        return
+    for item in value:
+        _collect(item, found)
+
+def extract_mcqs(text):
+    """Every complete {"question": ...} object in text, in order.
+
+    Same extractor as scripts/qgen/json_stream.py, inlined so the notebook
+    runs standalone: each "{" goes to the C decoder first; a broken or
+    cut-off object is scanned brace by brace (string-aware) for the
+    complete objects inside it. A failed "{" with no key after it is prose,
+    and a question found inside a failed one closes it. Prose, fences and
+    wrapper objects are skipped.
+    """
+    found, depth, pos = [], 0, 0
+    while True:
+        m = _OBJECT_SCAN.search(text, pos)
+        if not m:
+            return found
+        pos = m.end()
+        ch = m.group()
+        if ch == "{":
+            try:
+                value, pos = _decoder.raw_decode(text, m.start())
+            except ValueError:
+                if _KEY_AHEAD.match(text, pos):
+                    depth += 1
+                continue
+            before = len(found)
+            _collect(value, found)
+            if len(found) > before:
+                depth = 0
+        elif ch == "}":
+            depth = max(depth - 1, 0)
+        elif depth:
+            end = _STRING_TAIL.match(text, pos)
+            if not end:
+                return found  # cut off inside a string
+            pos = end.end()
+
 def parse_response(text, topic_data):
     """Parse model output to questions"""
     questions = []
     
-    # Extract JSON array
-    try:
-        match = re.search(r'\[[\s\S]*?\]', text)
-        if match:
-            arr = json.loads(match.group(0))
-            for q in arr:
-                if all(k in q for k in ["question", "options", "correctAnswer"]):
-                    if isinstance(q["options"], dict) and len(q["options"]) == 4:
-                        if q["correctAnswer"] in ["A", "B", "C", "D"]:
-                            questions.append({
-                                "id": generate_id(),
-                                "subject": topic_data["subject"],
-                                "topic": topic_data["topic"],
-                                "subtopic": random.choice(topic_data["subtopics"]),
-                                "difficulty": random.choice(["easy", "medium", "hard"]),
-                                "question": q["question"],
-                                "options": q["options"],
-                                "correctAnswer": q["correctAnswer"],
-                                "explanation": q.get("explanation", ""),
-                                "generatedAt": datetime.now().isoformat()
-                            })
-    except:
-        pass
+    # Every complete question object (a lazy [...] match stopped at the first "]")
+    for q in extract_mcqs(text):
+        if all(k in q for k in ["question", "options", "correctAnswer"]):
+            if isinstance(q["options"], dict) and len(q["options"]) == 4:
+                if q["correctAnswer"] in ["A", "B", "C", "D"]:
+                    questions.append({
+                        "id": generate_id(),
+                        "subject": topic_data["subject"],
+                        "topic": topic_data["topic"],
+                        "subtopic": random.choice(topic_data["subtopics"]),
+                        "difficulty": random.choice(["easy", "medium", "hard"]),
+                        "question": q["question"],
+                        "options": q["options"],
+                        "correctAnswer": q["correctAnswer"],
+                        "explanation": q.get("explanation", ""),
+                        "generatedAt": datetime.now().isoformat()
+                    })
     
     return questions
 
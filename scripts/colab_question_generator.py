@@ -19,6 +19,7 @@ import time
 import random
 import re
 import hashlib
+import itertools
 from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor
@@ -189,9 +190,12 @@ print(f"📦 Model: {MODEL_NAME}")
 
 # ==================== CELL 6: Utility Functions ====================
 
+_ID_SEQ = itertools.count()  # per-run sequence: IDs from the same millisecond can't collide
+_ID_WORKER = random.randrange(80, 100)  # qgen.ids.NOTEBOOK_SLOTS: a random slot per session, clear of local runs
+
 def generate_id():
     """Generate unique question ID"""
-    return f"q_{int(time.time()*1000)}_{random.randint(1000,9999)}"
+    return f"q_{int(time.time()*1000)}_{_ID_WORKER:02d}{next(_ID_SEQ) % 10000:04d}"
 
 def get_hash(text):
     """Generate hash for duplicate detection"""
@@ -206,31 +210,64 @@ def format_time(seconds):
     else:
         return f"{int(seconds//3600)}h {int((seconds%3600)//60)}m"
 
+_OBJECT_SCAN = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_KEY_AHEAD = re.compile(r'\s*"')
+_decoder = json.JSONDecoder()
+
+def _collect(value, found):
+    if isinstance(value, dict):
+        if "question" in value:
+            found.append(value)
+            return
+        value = value.values()
+    elif not isinstance(value, list):
+        return
+    for item in value:
+        _collect(item, found)
+
+def extract_mcqs(text):
+    """Every complete {"question": ...} object in text, in order.
+
+    Same extractor as scripts/qgen/json_stream.py, inlined so the notebook
+    runs standalone: each "{" goes to the C decoder first; a broken or
+    cut-off object is scanned brace by brace (string-aware) for the
+    complete objects inside it. A failed "{" with no key after it is prose,
+    and a question found inside a failed one closes it. Prose, fences and
+    wrapper objects are skipped.
+    """
+    found, depth, pos = [], 0, 0
+    while True:
+        m = _OBJECT_SCAN.search(text, pos)
+        if not m:
+            return found
+        pos = m.end()
+        ch = m.group()
+        if ch == "{":
+            try:
+                value, pos = _decoder.raw_decode(text, m.start())
+            except ValueError:
+                if _KEY_AHEAD.match(text, pos):
+                    depth += 1
+                continue
+            before = len(found)
+            _collect(value, found)
+            if len(found) > before:
+                depth = 0
+        elif ch == "}":
+            depth = max(depth - 1, 0)
+        elif depth:
+            end = _STRING_TAIL.match(text, pos)
+            if not end:
+                return found  # cut off inside a string
+            pos = end.end()
+
 def parse_questions(text):
     """Parse questions from model output"""
-    questions = []
-    
-    # Try JSON array
-    try:
-        match = re.search(r'\[[\s\S]*\]', text)
-        if match:
-            arr = json.loads(match.group(0))
-            if isinstance(arr, list):
-                return arr
-    except:
-        pass
-    
-    # Try individual JSON objects
-    pattern = r'\{[^{}]*"question"[^{}]*"options"[^{}]*\}'
-    for match in re.finditer(pattern, text, re.DOTALL):
-        try:
-            obj = json.loads(match.group(0))
-            if "question" in obj and "options" in obj:
-                questions.append(obj)
-        except:
-            continue
+    # Every complete question object, wherever it sits in the output
+    questions = [q for q in extract_mcqs(text) if "options" in q]
     
-    # Try line-by-line parsing
+    # Try line-by-line parsing (output that isn't valid JSON at all)
     if not questions:
         lines = text.split('\n')
         current_q = {}
@@ -0,0 +1,69 @@
+"""
+Near-duplicate pass over a question bank
+========================================
+Runs the MinHash/LSH index from qgen/dedup.py over a JSON question list
+(default: src/data/questions/merged_questions.json), reports every
+near-duplicate with the question it repeats, and optionally writes the
+deduplicated list.
+
+Usage:
+    python scripts/dedup_questions.py
+    python scripts/dedup_questions.py --threshold 0.6 --show 50
+    python scripts/dedup_questions.py --output src/data/questions/merged_questions.json
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from qgen.dedup import NearDuplicateIndex
+from qgen.journal import atomic_write_json
+
+QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate questions in a question bank")
+    parser.add_argument("--input", type=Path, default=QUESTIONS_DIR / "merged_questions.json")
+    parser.add_argument("--output", type=Path, help="write the deduplicated list here")
+    parser.add_argument("--threshold", type=float, default=0.7, help="stem similarity (0-1)")
+    parser.add_argument("--option-threshold", type=float, default=0.75, help="option-set similarity (0-1)")
+    parser.add_argument("--show", type=int, default=20, help="duplicate pairs to print")
+    args = parser.parse_args()
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        questions = json.load(f)
+
+    print(f"📂 {args.input.name}: {len(questions)} questions")
+    start = time.time()
+
+    index = NearDuplicateIndex(threshold=args.threshold, option_threshold=args.option_threshold)
+    by_key = {}
+    kept = []
+    duplicates = []
+    for i, q in enumerate(questions):
+        by_key[i] = q
+        match = index.check_question(q, key=i)
+        if match is None:
+            kept.append(q)
+        else:
+            duplicates.append((match, i))
+
+    elapsed = time.time() - start
+    print(f"🔍 {len(duplicates)} near-duplicates in {elapsed:.2f}s "
+          f"({elapsed / max(len(questions), 1) * 1e6:.0f}µs/question)")
+
+    for original, dup in duplicates[:args.show]:
+        print(f"\n   = {by_key[original]['question'][:100]}")
+        print(f"   ≈ {by_key[dup]['question'][:100]}")
+    if len(duplicates) > args.show:
+        print(f"\n   ... {len(duplicates) - args.show} more")
+
+    if args.output:
+        atomic_write_json(args.output, kept)
+        print(f"\n💾 Wrote {len(kept)} questions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,35 +3,77 @@ OSSC RI/AI Exam Question Generator
 ===================================
 Generates 1000-2000 unique questions using Ollama (Llama3 & Mistral) in parallel.
 
-Usage: python scripts/generate_questions.py
+Usage: python scripts/generate_questions.py [--engine async] [--stream] [--structured] [--metrics-port 9464]
+       python scripts/generate_questions.py --profile [--profile-sample] [--profile-memory]
+       python scripts/generate_questions.py --hosts http://gpu1:11434 http://gpu2:11434 [--engine async]
 
 Features:
 - Parallel generation using both models simultaneously
 - Real-time progress bar with ETA
-- Duplicate detection
-- Auto-save progress every 50 questions
+- Near-duplicate detection
+- Crash-safe progress: journaled questions, periodic checkpoints
 - Generates questions based on OSSC RI/AI syllabus
 """
 
-import json
+import argparse
+import asyncio
+import itertools
 import os
 import time
-import hashlib
-import random
-import re
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 import requests
 from threading import Lock
 
+from qgen.backends import OllamaBackend, ollama_completion
+from qgen.bankstats import BankStats, subject_file
+from qgen.concurrency import AIMDController
+from qgen.endpoints import EndpointPool
+from qgen.fingerprints import DB_FILE, SHARED_BANK, FingerprintStore
+from qgen.ids import claim_worker, new_id
+from qgen.journal import QuestionJournal, atomic_write_json
+from qgen.json_stream import extract_mcqs
+from qgen.metrics import RunMetrics
+from qgen.pipeline import BackendStats, question_record
+from qgen.planner import QuotaPlanner, allocate, load_cell_counts
+from qgen.profiling import StageProfiler
+from qgen.scheduler import ModelScheduler
+from qgen.schema import MCQ_SCHEMA, conforms, parse_structured
+from qgen.trace import CallTracer, call_info, trace_record
+from qgen.writer import BackgroundWriter
+
 # ============ CONFIGURATION ============
-OLLAMA_API = "http://localhost:11434/api/generate"
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_API = f"{OLLAMA_HOST}/api/generate"
+OLLAMA_HOSTS = []  # --hosts: several Ollama servers behind an EndpointPool (empty = OLLAMA_HOST only)
+HEALTH_INTERVAL = 5  # Seconds between health checks of OLLAMA_HOSTS
 MODELS = ["llama3:latest", "mistral:latest"]
 TARGET_QUESTIONS = 1500  # Target number of questions (1000-2000)
-MAX_WORKERS = 4  # Parallel threads
+MAX_WORKERS = 4  # Parallel threads (starting point when ADAPTIVE_CONCURRENCY is on)
+ADAPTIVE_CONCURRENCY = True  # AIMD controller picks the in-flight count (both engines)
+MAX_CONCURRENCY = 64  # Ceiling for the adaptive controller
 QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
-SAVE_INTERVAL = 50  # Save progress every N questions
+CHECKPOINT_INTERVAL = 500  # Compact the journal into the JSON files every N questions
+JOURNAL_FILE = "all_questions.journal.jsonl"  # Every accepted question is fsync'd here
+BACKGROUND_WRITES = True  # Journal + checkpoints on a persistence thread (--inline-writes: on the submit loop)
+ASYNC_IN_FLIGHT = 64  # Concurrent requests for --engine async
+OLLAMA_OPTIONS = {"temperature": 0.8, "top_p": 0.9, "num_predict": 1024}
+STREAM = False  # --stream: consume tokens as they arrive, cancel once the question closes
+STRUCTURED_OUTPUT = False  # --structured: send the MCQ JSON schema as Ollama's "format" (Ollama 0.5+)
+MODEL_RUN_LENGTH = 200  # Requests sent to one model before switching to the next
+KEEP_ALIVE = "30m"  # Ollama keep_alive: keep the current model resident between requests
+PLAN_REPORT = "plan_report.json"  # Planned vs. delivered per cell, written at exit
+METRICS_PORT = None  # --metrics-port: serve Prometheus metrics on 127.0.0.1:<port>/metrics
+METRICS_FILE = "metrics.json"  # Metrics snapshot in QUESTIONS_DIR, rewritten every METRICS_INTERVAL seconds
+METRICS_INTERVAL = 30
+TRACE_CALLS = True  # One JSONL line per call in TRACE_FILE (--no-trace to skip)
+TRACE_FILE = "calls.trace.jsonl"  # In QUESTIONS_DIR; appended to, each run tagged with its start time
+PROFILE = False  # --profile: per-stage timers, breakdown printed at exit and written to PROFILE_FILE
+PROFILE_SAMPLE = False  # --profile-sample: also sample stacks into PROFILE_STACKS (collapsed, for flame graphs)
+PROFILE_MEMORY = False  # --profile-memory: also tracemalloc the run (peak, top allocation growth)
+PROFILE_FILE = "profile.json"
+PROFILE_STACKS = "profile.folded"
 
 # ============ SYLLABUS DATA ============
 SYLLABUS = [
@@ -94,8 +136,20 @@ SYLLABUS = [
 ]
 
 # ============ GLOBAL STATE ============
-generated_questions = []
-question_hashes = set()
+generated_questions = []  # Accepted since the last checkpoint (journal contents)
+existing_count = 0  # Questions already in all_questions.json
+journal = None  # QuestionJournal, opened by recover_progress()
+writer = None  # BackgroundWriter (journal appends + checkpoints), started by recover_progress()
+question_index = None  # FingerprintStore (on-disk MinHash/LSH index), opened by recover_progress()
+scheduler = ModelScheduler(MODELS, MODEL_RUN_LENGTH)  # Assigns models to tasks in long runs
+concurrency = None  # AIMDController for the current run (None = fixed concurrency)
+backend = None  # OllamaBackend for buffered calls, built by ollama_backend()
+endpoints = None  # EndpointPool over OLLAMA_HOSTS, built by open_endpoints() (None = OLLAMA_HOST only)
+planner = None  # QuotaPlanner for the current run, built by create_planner()
+metrics = RunMetrics()  # Live latency / tokens/sec / yield / dedup metrics (Prometheus + metrics.json)
+run_stats = BackendStats(metrics)  # Per-model calls and parse yield; feeds `metrics`
+tracer = None  # CallTracer for the current run, opened by main() (None = no trace)
+profiler = StageProfiler()  # Per-stage timers; a no-op unless --profile started it
 stats = {
     "total_generated": 0,
     "duplicates_skipped": 0,
@@ -103,37 +157,31 @@ stats = {
     "by_model": {"llama3:latest": 0, "mistral:latest": 0},
     "by_subject": {},
     "by_difficulty": {"easy": 0, "medium": 0, "hard": 0},
-    "start_time": None,
-    "times": []
+    "start_time": None
 }
-lock = Lock()
+bank = BankStats()  # Per-cell counts, pending subjects and time-per-question window, built by recover_progress()
+lock = Lock()  # In-memory run state only; never held across disk I/O
 
 # ============ UTILITY FUNCTIONS ============
 
 def generate_id():
     """Generate unique question ID."""
-    return f"q_{int(time.time() * 1000)}_{random.randint(1000, 9999)}"
+    return new_id()  # q_{ms}_{worker}{seq}: sortable, no same-millisecond collisions
 
-def get_question_hash(question_text):
-    """Generate hash for duplicate detection."""
-    normalized = question_text.lower().strip()
-    normalized = re.sub(r'\s+', ' ', normalized)
-    return hashlib.md5(normalized.encode()).hexdigest()
+def total_questions():
+    """Questions in the bank, including those not yet checkpointed."""
+    return existing_count + len(generated_questions)
 
 def parse_json_response(response_text):
-    """Parse JSON from model response."""
-    try:
-        # Remove markdown code blocks
-        cleaned = re.sub(r'```json\s*', '', response_text)
-        cleaned = re.sub(r'```\s*', '', cleaned)
-        
-        # Find JSON object
-        match = re.search(r'\{[\s\S]*\}', cleaned)
-        if match:
-            return json.loads(match.group(0))
-        return None
-    except json.JSONDecodeError:
-        return None
+    """First question object in a model response (fences, prose and trailing text skipped)."""
+    found = parse_structured(response_text)[0] if STRUCTURED_OUTPUT else extract_mcqs(response_text, limit=1)
+    return found[0] if found else None
+
+def request_fields():
+    """Payload fields besides model/prompt/options: keep_alive, plus the schema when structured."""
+    if STRUCTURED_OUTPUT:
+        return {"keep_alive": KEEP_ALIVE, "format": MCQ_SCHEMA}
+    return {"keep_alive": KEEP_ALIVE}
 
 def format_time(seconds):
     """Format seconds to human-readable time."""
@@ -148,7 +196,7 @@ def format_time(seconds):
         mins = int((seconds % 3600) // 60)
         return f"{hours}h {mins}m"
 
-def print_progress(current, total, start_time, last_times):
+def print_progress(current, total, start_time, avg_time):
     """Print progress bar with ETA."""
     percent = (current / total) * 100
     bar_length = 40
@@ -157,8 +205,7 @@ def print_progress(current, total, start_time, last_times):
     
     # Calculate ETA
     elapsed = time.time() - start_time
-    if current > 0 and len(last_times) > 0:
-        avg_time = sum(last_times[-50:]) / len(last_times[-50:])  # Last 50 questions avg
+    if current > 0 and avg_time is not None:  # avg over the last 50 questions
         remaining = (total - current) * avg_time
         eta = format_time(remaining)
     else:
@@ -169,76 +216,114 @@ def print_progress(current, total, start_time, last_times):
     print(f"\r⏳ Progress: |{bar}| {current}/{total} ({percent:.1f}%) | Elapsed: {elapsed_str} | ETA: {eta}   ", end='', flush=True)
 
 def save_progress():
-    """Save current progress to file."""
-    global generated_questions
+    """Checkpoint: hand the journal compaction to the writer thread.
+    
+    What the checkpoint needs from the running BankStats (subjects with new
+    questions, their counts, index.json) is taken under the lock; the files
+    are written by write_checkpoint() on the writer thread, after every
+    question journaled before it, so no worker waits for the dump.
+    """
+    global existing_count
     
     with lock:
-        if not generated_questions:
-            return
-            
-        # Ensure directory exists
-        QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
-        
-        # Save all questions
-        output_file = QUESTIONS_DIR / "all_questions.json"
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(generated_questions, f, indent=2, ensure_ascii=False)
-        
-        # Save by subject
-        questions_by_subject = {}
-        for q in generated_questions:
-            subject = q["subject"]
-            if subject not in questions_by_subject:
-                questions_by_subject[subject] = []
-            questions_by_subject[subject].append(q)
-        
-        for subject, questions in questions_by_subject.items():
-            filename = re.sub(r'[^a-z0-9]', '_', subject.lower()) + '.json'
-            with open(QUESTIONS_DIR / filename, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, indent=2, ensure_ascii=False)
-        
-        # Save index
-        index = {
-            "totalQuestions": len(generated_questions),
-            "generatedAt": datetime.now().isoformat(),
-            "subjects": [
-                {
-                    "name": subject,
-                    "count": len(questions),
-                    "file": re.sub(r'[^a-z0-9]', '_', subject.lower()) + '.json'
-                }
-                for subject, questions in questions_by_subject.items()
-            ],
-            "difficultyBreakdown": stats["by_difficulty"].copy()
-        }
-        with open(QUESTIONS_DIR / "index.json", 'w', encoding='utf-8') as f:
-            json.dump(index, f, indent=2, ensure_ascii=False)
+        if not generated_questions or writer.busy():
+            return  # nothing new, or the previous checkpoint is still being written
+        new = list(generated_questions)
+        pending = bank.take_pending()
+        counts = bank.by_subject()
+        index = bank.index()
+        existing_count += len(generated_questions)
+        generated_questions.clear()
+    writer.checkpoint(new, pending, counts, index)
+
+def write_checkpoint(new, pending, counts, index):
+    """Fold the journal into the pretty JSON files; runs on the writer thread.
+    
+    The new questions are appended in place to all_questions.json and to
+    the files of the subjects that got some (journal.fold), so a checkpoint
+    doesn't grow with the bank; a file changed by someone else is rebuilt
+    instead. The snapshot is then marked as indexed in the fingerprint store.
+    """
+    # Save all questions, and by subject (only subjects that got questions since the last checkpoint)
+    all_file = QUESTIONS_DIR / "all_questions.json"
+    with profiler.stage("checkpoint.files"):
+        total = journal.fold(all_file, new, pending, counts, lambda subject: QUESTIONS_DIR / subject_file(subject))
+    question_index.mark_snapshot(all_file, total)
+    
+    # Save index
+    with profiler.stage("checkpoint.index"):
+        atomic_write_json(QUESTIONS_DIR / "index.json", index)
+    
+    # Everything journaled is now in all_questions.json
+    journal.checkpoint()
+
+def close_progress():
+    """Final checkpoint, wait for the writer to finish, close the journal and fingerprint store."""
+    writer.flush()
+    save_progress()
+    writer.close()
+    journal.close()
+    question_index.close()
+
+def recover_progress():
+    """Open the fingerprint store and replay questions journaled since the last checkpoint.
+    
+    all_questions.json (and the shared merged bank) are only parsed when they
+    changed since they were last indexed; otherwise startup is one stat() each.
+    """
+    global generated_questions, existing_count, journal, question_index, bank, writer
+    
+    if writer is not None:
+        writer.close()  # a previous run in this process (benchmarks)
+    journal = QuestionJournal(QUESTIONS_DIR / JOURNAL_FILE)
+    question_index = FingerprintStore(QUESTIONS_DIR / DB_FILE)
+    claim_worker(QUESTIONS_DIR)  # an ID slot no other generator writing here holds
+    existing_file = QUESTIONS_DIR / "all_questions.json"
+    
+    generated_questions = list(journal.replay())  # first: undoes an interrupted checkpoint
+    existing_count = question_index.sync_snapshot(existing_file)
+    if existing_count:
+        journal.note(existing_file, existing_count)
+    question_index.sync_snapshot(QUESTIONS_DIR / SHARED_BANK)
+    question_index.add_missing(generated_questions)
+    bank = BankStats(load_cell_counts(QUESTIONS_DIR / "index.json", existing_file, total=existing_count))
+    bank.add_many(generated_questions)
+    if existing_count:
+        print(f"\n✅ {existing_count} existing questions in {existing_file.name} "
+              f"({len(question_index)} fingerprints indexed)")
+    if generated_questions:
+        print(f"♻️  Recovered {len(generated_questions)} questions from the journal")
+    
+    journal.open()
+    writer = BackgroundWriter(journal, write_checkpoint, background=BACKGROUND_WRITES, profiler=profiler)
 
 # ============ QUESTION GENERATION ============
 
-def call_ollama(model, prompt, timeout=120):
-    """Call Ollama API to generate question."""
-    try:
-        response = requests.post(
-            OLLAMA_API,
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.8,
-                    "top_p": 0.9,
-                    "num_predict": 1024
-                }
-            },
-            timeout=timeout
-        )
-        
-        if response.status_code == 200:
-            return response.json().get("response", "")
-        return None
-    except Exception as e:
-        return None
+def ollama_backend():
+    """OllamaBackend for OLLAMA_HOST (one keep-alive session per worker), fed to this run's controller."""
+    global backend
+    if backend is None:
+        backend = OllamaBackend(OLLAMA_HOST, MODELS, keep_alive=KEEP_ALIVE, timeout=120)
+    backend.controller = concurrency
+    backend.pool = endpoints
+    return backend
+
+def open_endpoints():
+    """EndpointPool over OLLAMA_HOSTS for this run (None when only OLLAMA_HOST is used)."""
+    global endpoints
+    if endpoints is not None:
+        endpoints.close()  # a previous run in this process (benchmarks)
+    endpoints = EndpointPool(OLLAMA_HOSTS) if OLLAMA_HOSTS else None
+    return endpoints
+
+def call_ollama(model, prompt, info=None):
+    """Call Ollama API to generate question; returns the completion (None if the call failed)."""
+    start = time.time()
+    with metrics.in_flight.track(), profiler.stage("request"):
+        completion = ollama_backend().complete(model, prompt, OLLAMA_OPTIONS,
+                                               MCQ_SCHEMA if STRUCTURED_OUTPUT else None, info)
+    scheduler.observe(model, time.time() - start, completion)
+    return completion
 
 def generate_prompt(topic_data, subtopic, difficulty):
     """Generate prompt for question generation."""
@@ -272,77 +357,303 @@ Return ONLY a valid JSON object in this exact format (no other text):
   "explanation": "Detailed explanation with solution steps if applicable"
 }}"""
 
-def generate_single_question(task):
-    """Generate a single question using specified model."""
+def make_question(task, parsed):
+    """Validate and dedup one parsed object into a question dict (or None)."""
     model, topic_data, subtopic, difficulty, task_id = task
     
-    start = time.time()
-    
-    prompt = generate_prompt(topic_data, subtopic, difficulty)
-    response = call_ollama(model, prompt)
+    # Validate structure (4 options A-D, answer one of them)
+    with profiler.stage("validate"):
+        if not conforms(parsed) or "explanation" not in parsed:
+            return None
+    
+    # Check for (near-)duplicate
+    question_id = generate_id()
+    # The store locks its own query + insert; the checkpoint lock isn't needed here
+    with profiler.stage("dedup"):
+        duplicate = question_index.check_question(parsed, key=question_id) is not None
+    if duplicate:
+        with lock:
+            stats["duplicates_skipped"] += 1
+        metrics.duplicates.inc(model=model)
+        return None
     
-    if not response:
-        return None, model, time.time() - start
+    # Create question object
+    return question_record(parsed, task_cell(task), question_id, model)
+
+def build_question(task, completion, start, info=None):
+    """Parse, validate and dedup one completion into a question dict."""
+    model = task[0]
+    
+    response = completion["text"] if completion else None
+    with profiler.stage("parse"):
+        parsed = parse_json_response(response) if response else None
+    question = make_question(task, parsed) if parsed else None
+    
+    valid = bool(parsed) and conforms(parsed)
+    run_stats.record(completion, "ollama", model, 1, int(valid), int(question is not None))
+    trace_call(task, info, completion, int(valid), int(question is not None),
+               int(valid and question is None and "explanation" in parsed))
+    return question, model, time.time() - start
+
+def record_stream(task, collector, last, found, elapsed, info=None):
+    """Backend stats and trace for a streamed call (last = the stream's final line, None if it failed)."""
+    completion = None if last is None else ollama_completion(last, task[0], elapsed)
+    run_stats.record(completion, "ollama", task[0], 1, collector.scanner.found, len(found))
+    duplicates = info.pop("duplicates", 0) if info else 0
+    trace_call(task, info, completion, collector.scanner.found, len(found), duplicates, stream=True)
+
+def trace_call(task, info, completion, parsed=0, accepted=0, duplicates=0, stream=False):
+    """Append one call to the trace log (no-op without a tracer)."""
+    if tracer is not None:
+        tracer.record(trace_record(info or {}, completion, "ollama", task[0], task_cell(task), 1,
+                                   parsed, accepted, duplicates, stream=stream))
+
+def stream_collector(task, found, info=None):
+    """StreamCollector that stops the stream as soon as one question is accepted (duplicates counted in info)."""
+    from qgen.json_stream import StreamCollector
+    
+    def on_question(parsed):
+        question = make_question(task, parsed)
+        if question:
+            found.append(question)
+        elif info is not None and conforms(parsed) and "explanation" in parsed:
+            info["duplicates"] = info.get("duplicates", 0) + 1
+        return question is not None
+    
+    return StreamCollector(1, on_question)
+
+def generate_single_question(task, queued=None):
+    """Generate a single question using specified model (queued: when the task was submitted)."""
+    model, topic_data, subtopic, difficulty, task_id = task
     
-    parsed = parse_json_response(response)
-    if not parsed:
-        return None, model, time.time() - start
+    start = time.time()
     
-    # Validate structure
-    required_fields = ["question", "options", "correctAnswer", "explanation"]
-    if not all(field in parsed for field in required_fields):
-        return None, model, time.time() - start
+    with profiler.stage("prompt"):
+        prompt = generate_prompt(topic_data, subtopic, difficulty)
+    info = call_info(prompt, queued)
     
-    # Check for duplicate
-    q_hash = get_question_hash(parsed["question"])
-    with lock:
-        if q_hash in question_hashes:
-            stats["duplicates_skipped"] += 1
-            return None, model, time.time() - start
-        question_hashes.add(q_hash)
+    if STREAM:
+        from qgen.ollama_stream import pooled_stream_generate, stream_generate
+        
+        found = []
+        collector = stream_collector(task, found, info)
+        payload = {"model": model, "prompt": prompt, "options": OLLAMA_OPTIONS, **request_fields()}
+        with metrics.in_flight.track(), profiler.stage("request"):
+            if endpoints is not None:
+                last = pooled_stream_generate(endpoints, payload, collector, controller=concurrency, info=info)
+            else:
+                last = stream_generate(OLLAMA_API, payload, collector, controller=concurrency, info=info)
+        scheduler.observe(model, time.time() - start, last)
+        record_stream(task, collector, last, found, time.time() - start, info)
+        return (found[0] if found else None), model, time.time() - start
+    
+    completion = call_ollama(model, prompt, info)
+    
+    return build_question(task, completion, start, info)
+
+async def generate_single_question_async(client, task):
+    """Async twin of generate_single_question() using the pooled client."""
+    model, topic_data, subtopic, difficulty, task_id = task
     
-    # Create question object
-    question = {
-        "id": generate_id(),
-        "subject": topic_data["subject"],
-        "topic": topic_data["topic"],
-        "subtopic": subtopic,
-        "difficulty": difficulty,
-        "question": parsed["question"],
-        "options": parsed["options"],
-        "correctAnswer": parsed["correctAnswer"],
-        "explanation": parsed["explanation"],
-        "model": model,
-        "generatedAt": datetime.now().isoformat()
-    }
+    start = time.time()
     
-    return question, model, time.time() - start
+    with profiler.stage("prompt"):
+        prompt = generate_prompt(topic_data, subtopic, difficulty)
+    info = call_info(prompt)  # the wait for an in-flight slot is added by the client
+    
+    if STREAM:
+        found = []
+        collector = stream_collector(task, found, info)
+        with metrics.in_flight.track(), profiler.stage("request"):
+            last = await client.generate_stream(model, prompt, collector, options=OLLAMA_OPTIONS, info=info,
+                                                **request_fields())
+        scheduler.observe(model, time.time() - start, last)
+        record_stream(task, collector, last, found, time.time() - start, info)
+        return (found[0] if found else None), model, time.time() - start
+    
+    with metrics.in_flight.track(), profiler.stage("request"):
+        body = await client.generate_raw(model, prompt, options=OLLAMA_OPTIONS, info=info, **request_fields())
+    scheduler.observe(model, time.time() - start, body)
+    completion = None if body is None else ollama_completion(body, model, time.time() - start)
+    
+    return build_question(task, completion, start, info)
 
-def create_task_queue(target_count):
-    """Create balanced task queue based on syllabus weights."""
-    tasks = []
-    
-    # Calculate total weight
-    total_weight = sum(t["weight"] for t in SYLLABUS)
+def accept_question(question, model, elapsed):
+    """Record an accepted question in the global list and stats."""
+    with profiler.stage("accept"), lock:
+        generated_questions.append(question)
+        stats["total_generated"] += 1
+        stats["by_model"][model] += 1
+        stats["by_difficulty"][question["difficulty"]] += 1
+        if question["subject"] not in stats["by_subject"]:
+            stats["by_subject"][question["subject"]] = 0
+        stats["by_subject"][question["subject"]] += 1
+        bank.observe(elapsed)
+        bank.add(question)
+    writer.append([question])  # journaled on the writer thread
+
+def within_quota(task, question):
+    """(question, 0), or (None, 1) if its cell filled up while the call was out; the extra leaves the index."""
+    if question is None or planner.deficit(task_cell(task)):
+        return question, 0
+    question_index.discard([question["id"]])  # make_question() indexed it
+    return None, 1
+
+def task_cell(task):
+    """(subject, topic, subtopic, difficulty) a task was planned for."""
+    model, topic_data, subtopic, difficulty, task_id = task
+    return (topic_data["subject"], topic_data["topic"], subtopic, difficulty)
+
+def create_planner():
+    """Quota planner over the syllabus cells, minus what the bank already holds."""
+    global planner
+    
+    topics = {(t["subject"], t["topic"]): t for t in SYLLABUS}
+    quotas = allocate(
+        [(t["subject"], t["topic"], t["subtopics"], t["difficulties"], t["weight"]) for t in SYLLABUS],
+        TARGET_QUESTIONS
+    )
+    task_ids = itertools.count()
+    
+    def make_task(cell, count):
+        subject, topic, subtopic, difficulty = cell
+        # Model is filled in by the scheduler at submit time
+        return (None, topics[(subject, topic)], subtopic, difficulty, next(task_ids))
+    
+    planner = QuotaPlanner(quotas, make_task)
+    planner.add_existing(bank.cells)
+    return planner
+
+def save_plan_report():
+    """Write planned vs. delivered per cell next to the bank."""
+    atomic_write_json(QUESTIONS_DIR / PLAN_REPORT, {
+        "target": TARGET_QUESTIONS,
+        "generatedAt": datetime.now().isoformat(),
+        "remaining": planner.remaining(),
+        "cells": planner.to_json()
+    })
+
+def print_plan_progress():
+    print_progress(total_questions(), total_questions() + planner.remaining(),
+                   stats["start_time"], bank.mean_latency())
+
+def start_metrics(engine):
+    """Point the callback gauges at this run and start the endpoint / periodic dump."""
+    metrics.queue_depth.set_function(lambda: planner.remaining(), queue="plan")
+    metrics.queue_depth.set_function(lambda: writer.queue.qsize(), queue="writer")
+    metrics.concurrency.set_function(
+        lambda: concurrency.current if concurrency is not None
+        else ASYNC_IN_FLIGHT if engine == "async" else MAX_WORKERS)
+    metrics.start(METRICS_PORT, QUESTIONS_DIR / METRICS_FILE, METRICS_INTERVAL)
+    if metrics.port is not None:
+        print(f"📊 Metrics: http://127.0.0.1:{metrics.port}/metrics")
+
+def open_trace():
+    """Per-call trace log for this run (None when TRACE_CALLS is off)."""
+    global tracer
+    tracer = CallTracer(QUESTIONS_DIR / TRACE_FILE) if TRACE_CALLS else None
+    return tracer
+
+def new_controller(initial, maximum):
+    """Fresh AIMD controller for one run (None when ADAPTIVE_CONCURRENCY is off)."""
+    global concurrency
+    concurrency = AIMDController(initial=initial, maximum=maximum) if ADAPTIVE_CONCURRENCY else None
+    return concurrency
+
+def run_threaded(planner):
+    """ThreadPoolExecutor submit loop (one blocking backend call per worker thread)."""
+    completed = 0
+    controller = new_controller(MAX_WORKERS, MAX_CONCURRENCY)
     
-    for topic_data in SYLLABUS:
-        # Questions for this topic based on weight
-        topic_count = int((topic_data["weight"] / total_weight) * target_count)
-        topic_count = max(topic_count, 5)  # Minimum 5 questions per topic
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY if controller else MAX_WORKERS) as executor:
+        futures = {}
+        
+        def submit_more():
+            """Top up to the current in-flight limit (the planner stops once deficits are covered)."""
+            limit = controller.current if controller else MAX_WORKERS * 2
+            while len(futures) < limit and not planner.done():
+                try:
+                    with profiler.stage("plan"):
+                        task = next(planner)
+                except StopIteration:
+                    return
+                future = executor.submit(generate_single_question, scheduler.assign(task), time.time())
+                futures[future] = task
         
-        for _ in range(topic_count):
-            subtopic = random.choice(topic_data["subtopics"])
-            difficulty = random.choice(topic_data["difficulties"])
-            model = random.choice(MODELS)
+        # Submit initial batch
+        submit_more()
+        
+        while futures and not planner.done():
+            # Wait for next completed future
+            done = next(as_completed(futures))
+            task = futures.pop(done)
+            
+            try:
+                question, model, elapsed = done.result()
+                question, dropped = within_quota(task, question)
+                with profiler.stage("plan"):
+                    planner.record(task_cell(task), 1 if question else 0, dropped=dropped)
+                
+                if question:
+                    accept_question(question, model, elapsed)
+                    completed += 1
+                    
+                    # Save progress periodically
+                    if completed % CHECKPOINT_INTERVAL == 0:
+                        save_progress()
+                        print(f"\n💾 Checkpoint: {total_questions()} questions")
+                elif not dropped:
+                    stats["failures"] += 1
+                
+            except Exception as e:
+                planner.record(task_cell(task), 0)
+                stats["failures"] += 1
+            
+            # Print progress
+            print_plan_progress()
             
-            tasks.append((model, topic_data, subtopic, difficulty, len(tasks)))
+            # Submit new tasks: re-planned from the deficits (the limit may have moved)
+            submit_more()
+    
+    return completed
+
+async def run_async(planner, hosts=None):
+    """Asyncio submit loop: one pooled session, ASYNC_IN_FLIGHT requests in flight."""
+    from qgen.ollama_async import AsyncOllamaClient, run_tasks
     
-    # Shuffle tasks for variety
-    random.shuffle(tasks)
+    completed = 0
+    controller = new_controller(MAX_WORKERS, MAX_CONCURRENCY)
+    
+    def on_result(task, result, _):
+        nonlocal completed
+        question, model, elapsed = result or (None, task[0], 0.0)
+        question, dropped = within_quota(task, question)
+        with profiler.stage("plan"):
+            planner.record(task_cell(task), 1 if question else 0, dropped=dropped)
+        if question:
+            accept_question(question, model, elapsed)
+            completed += 1
+            if completed % CHECKPOINT_INTERVAL == 0:
+                save_progress()
+                print(f"\n💾 Checkpoint: {total_questions()} questions")
+        elif not dropped:
+            stats["failures"] += 1
+        print_plan_progress()
+    
+    ceiling = MAX_CONCURRENCY if controller else ASYNC_IN_FLIGHT
+    async with AsyncOllamaClient(hosts or [OLLAMA_HOST], max_in_flight=ceiling, controller=controller,
+                                 pool=endpoints) as client:
+        await run_tasks(
+            profiler.iterate("plan", planner),
+            lambda task: generate_single_question_async(client, scheduler.assign(task)),
+            on_result,
+            planner.done,
+            (lambda: controller.current) if controller else ASYNC_IN_FLIGHT,
+        )
     
-    return tasks[:target_count + 200]  # Add buffer for failures
+    return completed
 
-def main():
+def main(engine="threads"):
     """Main generation loop."""
     global generated_questions, stats
     
@@ -351,112 +662,86 @@ def main():
     print("=" * 60)
     print(f"📊 Target: {TARGET_QUESTIONS} questions")
     print(f"🤖 Models: {', '.join(MODELS)}")
-    print(f"⚡ Parallel workers: {MAX_WORKERS}")
+    if OLLAMA_HOSTS:
+        print(f"🔌 Servers: {len(OLLAMA_HOSTS)} (least-loaded routing, health checks every {HEALTH_INTERVAL}s)")
+    if ADAPTIVE_CONCURRENCY:
+        print(f"⚡ Adaptive concurrency: starts at {MAX_WORKERS}, up to {MAX_CONCURRENCY} in flight")
+    elif engine == "async":
+        print(f"⚡ Async in-flight requests: {ASYNC_IN_FLIGHT}")
+    else:
+        print(f"⚡ Parallel workers: {MAX_WORKERS}")
+    if STRUCTURED_OUTPUT:
+        print("🧩 Structured output: on (MCQ JSON schema)")
     print(f"📁 Output: {QUESTIONS_DIR}")
     print("=" * 60)
     
     # Check Ollama is running
     print("\n🔍 Checking Ollama connection...")
-    try:
-        response = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if response.status_code == 200:
-            models = [m["name"] for m in response.json().get("models", [])]
-            print(f"✅ Ollama running. Available models: {', '.join(models)}")
-        else:
-            print("❌ Ollama not responding properly. Please start Ollama first.")
+    if open_endpoints() is not None:
+        healthy = endpoints.check()
+        if not healthy:
+            print("❌ None of the Ollama servers answer. Please start Ollama first.")
             return
-    except:
-        print("❌ Cannot connect to Ollama. Please start Ollama first.")
-        print("   Run: ollama serve")
-        return
-    
-    # Load existing questions to avoid duplicates
-    existing_file = QUESTIONS_DIR / "all_questions.json"
-    if existing_file.exists():
-        print(f"\n📂 Loading existing questions from {existing_file}...")
+        print(f"✅ {healthy}/{len(OLLAMA_HOSTS)} Ollama servers answering")
+    else:
         try:
-            with open(existing_file, 'r', encoding='utf-8') as f:
-                existing = json.load(f)
-                generated_questions = existing
-                for q in existing:
-                    question_hashes.add(get_question_hash(q["question"]))
-                print(f"✅ Loaded {len(existing)} existing questions")
+            response = requests.get(f"{OLLAMA_HOST}/api/tags", timeout=5)
+            if response.status_code == 200:
+                models = [m["name"] for m in response.json().get("models", [])]
+                print(f"✅ Ollama running. Available models: {', '.join(models)}")
+            else:
+                print("❌ Ollama not responding properly. Please start Ollama first.")
+                return
         except:
-            print("⚠️ Could not load existing questions, starting fresh")
+            print("❌ Cannot connect to Ollama. Please start Ollama first.")
+            print("   Run: ollama serve")
+            return
+    
+    if PROFILE or PROFILE_SAMPLE or PROFILE_MEMORY:
+        profiler.start(sample=PROFILE_SAMPLE, memory=PROFILE_MEMORY)
     
-    remaining = TARGET_QUESTIONS - len(generated_questions)
+    # Load existing questions (snapshot + journal) to avoid duplicates
+    with profiler.stage("recover"):
+        recover_progress()
+    
+    # Plan per-cell quotas against what the bank already holds
+    with profiler.stage("plan"):
+        create_planner()
+    remaining = planner.remaining()
     if remaining <= 0:
-        print(f"\n✅ Already have {len(generated_questions)} questions. Target reached!")
+        print(f"\n✅ Already have {total_questions()} questions. Every cell is at quota!")
+        profiler.stop()
         return
     
-    print(f"\n📝 Need to generate: {remaining} more questions")
+    short = sum(1 for cell in planner.quotas if planner.deficit(cell))
+    print(f"\n📝 Need to generate: {remaining} more questions across {short} short cells")
     
-    # Create task queue
-    tasks = create_task_queue(remaining + 100)
+    # Load the first model's weights before any work is queued on it
+    for host in (endpoints.up if endpoints is not None else [OLLAMA_HOST]):
+        scheduler.warm_up(host, KEEP_ALIVE)
+    if endpoints is not None:
+        endpoints.start(HEALTH_INTERVAL)
     
     stats["start_time"] = time.time()
-    completed = 0
+    start_metrics(engine)
+    open_trace()
     
     print("\n🏁 Starting generation...\n")
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {}
-        task_iter = iter(tasks)
-        
-        # Submit initial batch
-        for _ in range(min(MAX_WORKERS * 2, len(tasks))):
-            try:
-                task = next(task_iter)
-                future = executor.submit(generate_single_question, task)
-                futures[future] = task
-            except StopIteration:
-                break
-        
-        while futures and len(generated_questions) < TARGET_QUESTIONS:
-            # Wait for next completed future
-            done = next(as_completed(futures))
-            task = futures.pop(done)
-            
-            try:
-                question, model, elapsed = done.result()
-                
-                if question:
-                    with lock:
-                        generated_questions.append(question)
-                        stats["total_generated"] += 1
-                        stats["by_model"][model] += 1
-                        stats["by_difficulty"][question["difficulty"]] += 1
-                        if question["subject"] not in stats["by_subject"]:
-                            stats["by_subject"][question["subject"]] = 0
-                        stats["by_subject"][question["subject"]] += 1
-                        stats["times"].append(elapsed)
-                    
-                    completed += 1
-                    
-                    # Save progress periodically
-                    if completed % SAVE_INTERVAL == 0:
-                        save_progress()
-                        print(f"\n💾 Progress saved: {len(generated_questions)} questions")
-                else:
-                    stats["failures"] += 1
-                
-            except Exception as e:
-                stats["failures"] += 1
-            
-            # Print progress
-            print_progress(len(generated_questions), TARGET_QUESTIONS, stats["start_time"], stats["times"])
-            
-            # Submit new task if available
-            if len(generated_questions) < TARGET_QUESTIONS:
-                try:
-                    task = next(task_iter)
-                    future = executor.submit(generate_single_question, task)
-                    futures[future] = task
-                except StopIteration:
-                    pass
+    if engine == "async":
+        completed = asyncio.run(run_async(planner))
+    else:
+        completed = run_threaded(planner)
     
     # Final save
-    save_progress()
+    close_progress()
+    profiler.stop()
+    metrics.stop()
+    if endpoints is not None:
+        endpoints.close()
+    if tracer is not None:
+        tracer.close()
+    save_plan_report()
     
     # Print summary
     elapsed = time.time() - stats["start_time"]
@@ -464,15 +749,27 @@ def main():
     print("\n\n" + "=" * 60)
     print("📊 GENERATION COMPLETE!")
     print("=" * 60)
-    print(f"✅ Total Questions: {len(generated_questions)}")
+    print(f"✅ Total Questions: {total_questions()}")
     print(f"⏱️  Total Time: {format_time(elapsed)}")
     print(f"⚡ Avg Time/Question: {elapsed/max(completed,1):.1f}s")
     print(f"❌ Failures: {stats['failures']}")
     print(f"🔄 Duplicates Skipped: {stats['duplicates_skipped']}")
+    print(f"💾 Writes: {writer.summary()}")
+    if tracer is not None:
+        print(f"🔍 Trace: {tracer.count} calls -> {tracer.path} (python scripts/analyze_traces.py)")
     print()
     print("📈 By Model:")
     for model, count in stats["by_model"].items():
         print(f"   {model}: {count}")
+    print(scheduler.view(OLLAMA_HOST))
+    if endpoints is not None:
+        print("🔌 Servers (share of calls, failures, re-sent calls, ejections):")
+        print(endpoints.report())
+    print(f"⏲️  Latency / tokens/sec / dedup (metrics: {QUESTIONS_DIR / METRICS_FILE}):")
+    print(metrics.report())
+    if concurrency is not None:
+        print(f"🎚️  {concurrency.summary()}")
+        print(f"   over time: {concurrency.timeline()}")
     print()
     print("📊 By Difficulty:")
     for diff, count in stats["by_difficulty"].items():
@@ -482,8 +779,52 @@ def main():
     for subject, count in sorted(stats["by_subject"].items(), key=lambda x: -x[1]):
         print(f"   {subject}: {count}")
     print()
+    print("🗺️  Plan (planned vs. delivered):")
+    print(planner.report())
+    if profiler.stages:
+        profiler.save(QUESTIONS_DIR / PROFILE_FILE, QUESTIONS_DIR / PROFILE_STACKS)
+        print(f"🔬 Stages (profile: {QUESTIONS_DIR / PROFILE_FILE}):")
+        print(profiler.report())
+    print()
     print(f"📁 Output saved to: {QUESTIONS_DIR}")
     print("=" * 60)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="OSSC RI/AI question generator (Ollama)")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="threads = ThreadPoolExecutor + requests, async = pooled aiohttp session")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream tokens and cancel as soon as the question object closes")
+    parser.add_argument("--fixed-concurrency", action="store_true",
+                        help="keep MAX_WORKERS / ASYNC_IN_FLIGHT instead of the adaptive controller")
+    parser.add_argument("--hosts", nargs="+", default=[], metavar="URL",
+                        help="spread requests over several Ollama servers (least-loaded, failing ones ejected)")
+    parser.add_argument("--structured", action="store_true",
+                        help="constrain output to the MCQ JSON schema (Ollama format) and parse with json.loads")
+    parser.add_argument("--inline-writes", action="store_true",
+                        help="journal and checkpoint on the submit loop instead of the writer thread")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on 127.0.0.1:<port>/metrics (0 = any free port)")
+    parser.add_argument("--no-trace", action="store_true",
+                        help=f"don't append every call to {TRACE_FILE}")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"time every pipeline stage and print a breakdown at the end ({PROFILE_FILE})")
+    parser.add_argument("--profile-sample", action="store_true",
+                        help=f"with --profile: sample stacks into {PROFILE_STACKS} for a flame graph")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile: tracemalloc the run (peak, top allocation growth; much slower)")
+    args = parser.parse_args()
+    BACKGROUND_WRITES = not args.inline_writes
+    METRICS_PORT = args.metrics_port
+    TRACE_CALLS = not args.no_trace
+    PROFILE = args.profile
+    PROFILE_SAMPLE = args.profile_sample
+    PROFILE_MEMORY = args.profile_memory
+    if args.hosts:
+        OLLAMA_HOSTS = [h.rstrip("/") for h in args.hosts]
+        OLLAMA_HOST = OLLAMA_HOSTS[0]
+        OLLAMA_API = f"{OLLAMA_HOST}/api/generate"
+    STREAM = args.stream
+    STRUCTURED_OUTPUT = args.structured
+    ADAPTIVE_CONCURRENCY = not args.fixed_concurrency
+    main(engine=args.engine)
@@ -3,30 +3,96 @@ OSSC RI/AI Question Generator - FAST VERSION
 =============================================
 Generates 1000-2000 unique questions using Ollama in parallel.
 OPTIMIZED: Generates 5 questions per API call for 5x speed!
+--coordinator / --worker spread one run over several machines (qgen.workqueue).
 
-Usage: python scripts/generate_questions_fast.py
+Usage: python scripts/generate_questions_fast.py [--engine async] [--stream] [--fixed-concurrency] [--structured]
+       python scripts/generate_questions_fast.py --backend openai=http://localhost:8000/v1 [--engine async]
+       python scripts/generate_questions_fast.py --replay --out /tmp/replay [--structured]
+       python scripts/generate_questions_fast.py --metrics-port 9464
+       python scripts/generate_questions_fast.py --profile [--profile-sample] [--profile-memory]
+       python scripts/generate_questions_fast.py --hosts http://gpu1:11434 http://gpu2:11434 [--engine async]
+       python scripts/generate_questions_fast.py --coordinator queue.sqlite --queue-port 8765
+       python scripts/generate_questions_fast.py --worker http://<coordinator>:8765 [--lease-ttl 60]   (each GPU box)
 """
 
-import json
+import argparse
+import asyncio
 import os
+import socket
 import time
-import hashlib
-import random
-import re
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 from pathlib import Path
-import requests
 from threading import Lock
 
+import requests
+
+from qgen.backends import as_completion, make_backend, ollama_completion
+from qgen.bankstats import BankStats, subject_file
+from qgen.concurrency import AIMDController
+from qgen.endpoints import EndpointPool
+from qgen.fingerprints import DB_FILE, SHARED_BANK, FingerprintStore
+from qgen.ids import claim_worker, new_id, set_worker
+from qgen.journal import QuestionJournal, atomic_write_json
+from qgen.json_stream import scan_mcqs
+from qgen.metrics import RunMetrics
+from qgen.ollama_stream import pooled_stream_generate, stream_generate
+from qgen.pipeline import BackendStats, batch_prompt, parse_completion, question_record
+from qgen.planner import QuotaPlanner, allocate, load_cell_counts
+from qgen.profiling import StageProfiler
+from qgen.response_cache import CACHE_FILE, ResponseCache
+from qgen.scheduler import ModelScheduler
+from qgen.schema import batch_schema, conforms, parse_structured
+from qgen.trace import CallTracer, call_info, trace_record
+from qgen.truncation import TruncationTracker
+from qgen.workqueue import EVICTED, FINISHED, GIVE_UP, QueueServer, WorkQueue, connect
+from qgen.writer import BackgroundWriter
+
 # ============ CONFIGURATION ============
-OLLAMA_API = "http://localhost:11434/api/generate"
+OLLAMA_HOST = "http://localhost:11434"
+OLLAMA_API = f"{OLLAMA_HOST}/api/generate"
+OLLAMA_HOSTS = []  # --hosts: several Ollama servers behind an EndpointPool (empty = OLLAMA_HOST only)
+HEALTH_INTERVAL = 5  # Seconds between health checks of OLLAMA_HOSTS
+BACKEND = "ollama"  # --backend: ollama, groq, openai=<base url> or fake (see qgen.backends)
 MODELS = ["llama3:latest", "mistral:latest"]
 TARGET_QUESTIONS = 1500
-MAX_WORKERS = 8  # Increased workers
+MAX_WORKERS = 8  # Increased workers (starting point when ADAPTIVE_CONCURRENCY is on)
+ADAPTIVE_CONCURRENCY = True  # AIMD controller picks the in-flight count (both engines)
+MAX_CONCURRENCY = 64  # Ceiling for the adaptive controller
 QUESTIONS_PER_CALL = 5  # Generate 5 questions per API call!
 QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
-SAVE_INTERVAL = 25
+CHECKPOINT_INTERVAL = 500  # Compact the journal into the JSON files every N questions
+JOURNAL_FILE = "all_questions.journal.jsonl"  # Every accepted batch is fsync'd here
+BACKGROUND_WRITES = True  # Journal + checkpoints on a persistence thread (--inline-writes: on the submit loop)
+ASYNC_IN_FLIGHT = 64  # Concurrent requests for --engine async
+OLLAMA_OPTIONS = {"temperature": 0.9, "num_predict": 2048}
+MAX_NUM_PREDICT = 4096  # Ceiling when a topic's batches keep hitting num_predict
+TRUNCATION_FEEDBACK = True  # Raise num_predict / shrink batches for topics that get cut off
+STREAM = False  # --stream: consume tokens as they arrive, cancel once QUESTIONS_PER_CALL are in
+STRUCTURED_OUTPUT = False  # --structured: send the MCQ JSON schema as Ollama's "format" (Ollama 0.5+)
+MODEL_RUN_LENGTH = 40  # Batches sent to one model before switching to the next
+KEEP_ALIVE = "30m"  # Ollama keep_alive: keep the current model resident between requests
+PLAN_REPORT = "plan_report.json"  # Planned vs. delivered per cell, written at exit
+CACHE_RESPONSES = True  # Keep every raw answer in CACHE_FILE and reuse it (--no-cache to skip)
+REPLAY = False  # --replay: answer every batch from the cache, never call Ollama
+CACHE_PATH = None  # Cache file to use (default: QUESTIONS_DIR / CACHE_FILE)
+METRICS_PORT = None  # --metrics-port: serve Prometheus metrics on 127.0.0.1:<port>/metrics
+METRICS_FILE = "metrics.json"  # Metrics snapshot in QUESTIONS_DIR, rewritten every METRICS_INTERVAL seconds
+METRICS_INTERVAL = 30
+TRACE_CALLS = True  # One JSONL line per call in TRACE_FILE (--no-trace to skip)
+TRACE_FILE = "calls.trace.jsonl"  # In QUESTIONS_DIR; appended to, each run tagged with its start time
+PROFILE = False  # --profile: per-stage timers, breakdown printed at exit and written to PROFILE_FILE
+PROFILE_SAMPLE = False  # --profile-sample: also sample stacks into PROFILE_STACKS (collapsed, for flame graphs)
+PROFILE_MEMORY = False  # --profile-memory: also tracemalloc the run (peak, top allocation growth)
+PROFILE_FILE = "profile.json"
+PROFILE_STACKS = "profile.folded"
+COORDINATOR = None  # --coordinator QUEUE: plan, dedup and save here; batches are generated by --worker processes
+WORKER = None  # --worker QUEUE: lease batches from a coordinator's queue, generate them, send the questions back
+WORKER_NAME = f"{socket.gethostname()}-{os.getpid()}"
+LEASE_TTL = 60  # Seconds a worker's lease lasts without renewal (a dead worker's batches go to others after this)
+QUEUE_AHEAD = 16  # Batches the coordinator keeps queued beyond the ones leased
+QUEUE_POLL = 0.05  # Seconds between queue polls when there is nothing to do
+QUEUE_PORT = None  # --queue-port: serve the queue over HTTP for workers on other machines
 
 # ============ SYLLABUS DATA (Compact) ============
 SYLLABUS = [
@@ -66,44 +132,33 @@ SYLLABUS = [
 ]
 
 # ============ GLOBAL STATE ============
-generated_questions = []
-question_hashes = set()
-stats = {"generated": 0, "failed": 0, "duplicates": 0, "start": None, "times": []}
-lock = Lock()
+generated_questions = []  # Accepted since the last checkpoint (journal contents)
+existing_count = 0  # Questions already in all_questions.json
+question_index = None  # FingerprintStore (on-disk MinHash/LSH index), opened by recover_progress()
+stats = {"generated": 0, "failed": 0, "duplicates": 0, "start": None}
+bank = BankStats(window=20)  # Per-cell counts, pending subjects and batch-time window, built by recover_progress()
+journal = None  # QuestionJournal, opened by recover_progress()
+writer = None  # BackgroundWriter (journal appends + checkpoints), started by recover_progress()
+scheduler = ModelScheduler(MODELS, MODEL_RUN_LENGTH)  # Assigns models to batches in long runs
+concurrency = None  # AIMDController for the current run (None = fixed concurrency)
+planner = None  # QuotaPlanner for the current run, built by create_planner()
+truncation = None  # TruncationTracker for the current run, built by create_planner()
+response_cache = None  # ResponseCache, opened by recover_progress() (None = off)
+backend = None  # Backend for the current run, built by open_backend()
+endpoints = None  # EndpointPool over OLLAMA_HOSTS, built by open_endpoints() (None = OLLAMA_HOST only)
+metrics = RunMetrics()  # Live latency / tokens/sec / yield / dedup metrics (Prometheus + metrics.json)
+run_stats = BackendStats(metrics)  # questions/min, tokens/question, parse yield per backend/model (per run)
+tracer = None  # CallTracer for the current run, opened by main() (None = no trace)
+profiler = StageProfiler()  # Per-stage timers; a no-op unless --profile started it
+work_queue = None  # WorkQueue of a --coordinator run, opened by open_queue()
+queue_server = None  # QueueServer for remote workers (--queue-port), started by open_queue()
+lock = Lock()  # In-memory run state only; never held across disk I/O
 
 def generate_id():
-    return f"q_{int(time.time()*1000)}_{random.randint(1000,9999)}"
-
-def get_hash(text):
-    return hashlib.md5(text.lower().strip()[:100].encode()).hexdigest()
+    return new_id()  # q_{ms}_{worker}{seq}: sortable, no same-millisecond collisions
 
-def parse_questions(response_text):
-    """Parse multiple questions from response."""
-    questions = []
-    try:
-        # Try to find JSON array first
-        cleaned = re.sub(r'```json\s*', '', response_text)
-        cleaned = re.sub(r'```\s*', '', cleaned)
-        
-        # Try array
-        match = re.search(r'\[[\s\S]*\]', cleaned)
-        if match:
-            arr = json.loads(match.group(0))
-            if isinstance(arr, list):
-                return arr
-        
-        # Try individual objects
-        for m in re.finditer(r'\{[^{}]*"question"[^{}]*\}', cleaned, re.DOTALL):
-            try:
-                q = json.loads(m.group(0))
-                if "question" in q and "options" in q:
-                    questions.append(q)
-            except:
-                pass
-        
-        return questions
-    except:
-        return questions
+def total_questions():
+    return existing_count + len(generated_questions)
 
 def format_time(s):
     if s < 60: return f"{int(s)}s"
@@ -112,14 +167,14 @@ def format_time(s):
 
 def print_progress():
     global stats
-    current = len(generated_questions)
-    total = TARGET_QUESTIONS
+    current = total_questions()
+    total = current + planner.remaining()
     percent = (current / total) * 100
     bar = '█' * int(40 * current // total) + '░' * (40 - int(40 * current // total))
     
     elapsed = time.time() - stats["start"]
-    if current > 0 and stats["times"]:
-        avg = sum(stats["times"][-20:]) / len(stats["times"][-20:])
+    avg = bank.mean_latency()
+    if current > 0 and avg is not None:
         remaining = ((total - current) / QUESTIONS_PER_CALL) * avg
         eta = format_time(remaining)
     else:
@@ -128,226 +183,858 @@ def print_progress():
     print(f"\r⏳ |{bar}| {current}/{total} ({percent:.1f}%) | {format_time(elapsed)} | ETA: {eta} | ❌{stats['failed']}   ", end='', flush=True)
 
 def save_progress():
+    """Checkpoint: hand the journal compaction to the writer thread.
+
+    Takes what the checkpoint needs from the running BankStats (subjects
+    with new questions, their counts, index.json) under the lock, then
+    queues write_checkpoint() behind the appends already queued, so the
+    submit loop and the workers never wait for the files to be written.
+    """
+    global existing_count
     with lock:
-        if not generated_questions:
-            return
-        QUESTIONS_DIR.mkdir(parents=True, exist_ok=True)
-        
-        with open(QUESTIONS_DIR / "all_questions.json", 'w', encoding='utf-8') as f:
-            json.dump(generated_questions, f, indent=2, ensure_ascii=False)
-        
-        # Group by subject
-        by_subject = {}
-        for q in generated_questions:
-            s = q["subject"]
-            by_subject.setdefault(s, []).append(q)
-        
-        for subject, qs in by_subject.items():
-            fname = re.sub(r'[^a-z0-9]', '_', subject.lower()) + '.json'
-            with open(QUESTIONS_DIR / fname, 'w', encoding='utf-8') as f:
-                json.dump(qs, f, indent=2, ensure_ascii=False)
-        
-        # Index
-        index = {
-            "totalQuestions": len(generated_questions),
-            "generatedAt": datetime.now().isoformat(),
-            "subjects": [{"name": s, "count": len(qs)} for s, qs in by_subject.items()]
-        }
-        with open(QUESTIONS_DIR / "index.json", 'w', encoding='utf-8') as f:
-            json.dump(index, f, indent=2)
-
-def generate_batch(task):
-    """Generate 5 questions in one API call."""
-    model, subject, topic, subtopics = task
-    difficulty = random.choice(["easy", "medium", "hard"])
+        if not generated_questions or writer.busy():
+            return  # nothing new, or the previous checkpoint is still being written
+        new = list(generated_questions)
+        pending = bank.take_pending()
+        counts = bank.by_subject()
+        index = bank.index()
+        existing_count += len(generated_questions)
+        generated_questions.clear()
+    writer.checkpoint(new, pending, counts, index)
+
+def write_checkpoint(new, pending, counts, index):
+    """Fold the journal into the JSON files; runs on the writer thread.
+
+    The new questions are appended in place to all_questions.json and the
+    files of the subjects that got some (journal.fold), so a checkpoint
+    costs O(questions since the last one); a file changed by someone else
+    is rebuilt instead. The fingerprint store marks the snapshot as indexed
+    so the next run skips it.
+    """
+    all_file = QUESTIONS_DIR / "all_questions.json"
+    with profiler.stage("checkpoint.files"):
+        total = journal.fold(all_file, new, pending, counts, lambda subject: QUESTIONS_DIR / subject_file(subject))
+    question_index.mark_snapshot(all_file, total)
     
-    prompt = f"""Generate exactly {QUESTIONS_PER_CALL} unique MCQ questions for OSSC RI/AI exam.
-
-Subject: {subject}
-Topic: {topic}
-Subtopics: {', '.join(subtopics)}
-Difficulty: {difficulty}
-
-Return a JSON array with {QUESTIONS_PER_CALL} questions in this format:
-[
-  {{"question": "Q1 text", "options": {{"A": "opt1", "B": "opt2", "C": "opt3", "D": "opt4"}}, "correctAnswer": "A", "explanation": "Why A is correct"}},
-  {{"question": "Q2 text", "options": {{"A": "opt1", "B": "opt2", "C": "opt3", "D": "opt4"}}, "correctAnswer": "B", "explanation": "Why B is correct"}},
-  ...
-]
+    with profiler.stage("checkpoint.index"):
+        atomic_write_json(QUESTIONS_DIR / "index.json", index)
+    journal.checkpoint()
 
-Requirements:
-- Each question must be unique
-- Suitable for Indian govt competitive exam
-- Include solution steps for math questions
-- Return ONLY the JSON array, no other text"""
+def close_progress():
+    """Final checkpoint, wait for the writer to finish, close the journal and fingerprint store."""
+    writer.flush()
+    save_progress()
+    writer.close()
+    journal.close()
+    question_index.close()
 
-    start = time.time()
+def recover_progress():
+    """Open the fingerprint store and replay questions journaled since the last checkpoint.
+
+    all_questions.json is only re-read if it changed since it was last indexed.
+    """
+    global generated_questions, existing_count, journal, question_index, response_cache, bank, writer
     
-    try:
-        response = requests.post(
-            OLLAMA_API,
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {"temperature": 0.9, "num_predict": 2048}
-            },
-            timeout=90
+    if writer is not None:
+        writer.close()  # a previous run in this process (benchmarks)
+    journal = QuestionJournal(QUESTIONS_DIR / JOURNAL_FILE)
+    response_cache = ResponseCache(CACHE_PATH or QUESTIONS_DIR / CACHE_FILE) if CACHE_RESPONSES or REPLAY else None
+    question_index = FingerprintStore(QUESTIONS_DIR / DB_FILE)
+    claim_worker(QUESTIONS_DIR)  # an ID slot no other generator writing here holds
+    generated_questions = list(journal.replay())  # first: undoes an interrupted checkpoint
+    existing_count = question_index.sync_snapshot(QUESTIONS_DIR / "all_questions.json")
+    if existing_count:
+        journal.note(QUESTIONS_DIR / "all_questions.json", existing_count)
+    question_index.sync_snapshot(QUESTIONS_DIR / SHARED_BANK)
+    question_index.add_missing(generated_questions)
+    bank = BankStats(load_cell_counts(QUESTIONS_DIR / "index.json", QUESTIONS_DIR / "all_questions.json",
+                                      total=existing_count), window=20)
+    bank.add_many(generated_questions)
+    if existing_count:
+        print(f"📂 {existing_count} existing questions ({len(question_index)} fingerprints indexed)")
+    if generated_questions:
+        print(f"♻️  Recovered {len(generated_questions)} questions from the journal")
+    journal.open()
+    writer = BackgroundWriter(journal, write_checkpoint, background=BACKGROUND_WRITES, profiler=profiler)
+
+def build_batch_prompt(subject, topic, subtopic, difficulty, count=QUESTIONS_PER_CALL):
+    with profiler.stage("prompt"):
+        return batch_prompt(subject, topic, subtopic, difficulty, count, STRUCTURED_OUTPUT)
+
+def accept_question(task, q):
+    """Validate and dedup one parsed object; returns the question dict or None."""
+    model, subject, topic, subtopic, difficulty, count = task
+    with profiler.stage("validate"):
+        if not conforms(q):
+            return None
+
+    question_id = generate_id()
+    # A --worker has no index: the coordinator dedups what it sends back
+    if question_index is not None and is_duplicate(q, question_id, model):
+        return None
+
+    return question_record(q, task_cell(task), question_id, model)
+
+def is_duplicate(q, key, model):
+    """Check q against the fingerprint index (adding it if new); duplicates are counted."""
+    # The store locks its own query + insert; the checkpoint lock isn't needed here
+    with profiler.stage("dedup"):
+        duplicate = question_index.check_question(q, key=key) is not None
+    if duplicate:
+        with lock:
+            stats["duplicates"] += 1
+        metrics.duplicates.inc(model=model)
+    return duplicate
+
+def call_schema(task):
+    """JSON schema the batch is constrained to (None unless structured)."""
+    return batch_schema(task[-1]) if STRUCTURED_OUTPUT else None
+
+def request_fields(task):
+    """Streaming payload fields besides model/prompt/options: keep_alive, plus the schema when structured."""
+    if STRUCTURED_OUTPUT:
+        return {"keep_alive": KEEP_ALIVE, "format": call_schema(task)}
+    return {"keep_alive": KEEP_ALIVE}
+
+def call_options(task):
+    """Ollama options for one batch: num_predict as the truncation feedback sets it for the topic."""
+    if not TRUNCATION_FEEDBACK:
+        return OLLAMA_OPTIONS
+    return dict(OLLAMA_OPTIONS, num_predict=truncation.limit(task[1:3]))
+
+def accept_batch(task, completion, options, cached=False, info=None):
+    """Parse (salvaging a cut-off batch) and dedup one completion into question dicts.
+
+    Returns at most the count asked for; the topic's truncation stats,
+    the backend stats and the trace are updated (cached: the completion
+    came from the response cache).
+    """
+    parse = parse_structured if STRUCTURED_OUTPUT else scan_mcqs
+    with profiler.stage("parse"):
+        parsed, truncated = parse_completion(completion, parse)
+    truncation.record(task[1:3], truncated, len(parsed), options["num_predict"], completion.get("completion_tokens"))
+    valid = []
+    duplicates = 0
+    for q in parsed:
+        question = accept_question(task, q)
+        if question:
+            valid.append(question)
+            if len(valid) == task[-1]:
+                break
+        elif conforms(q):
+            duplicates += 1
+    name = completion.get("backend") or backend.name
+    conforming = sum(1 for q in parsed if conforms(q))
+    run_stats.record(completion, name, task[0], task[-1], conforming, len(valid), cached)
+    trace_call(task, info, completion, conforming, len(valid), duplicates, cached, backend_name=name)
+    return valid
+
+def trace_call(task, info, completion, parsed=0, accepted=0, duplicates=0, cached=False, stream=False,
+               backend_name=None):
+    """Append one call to the trace log (no-op without a tracer)."""
+    if tracer is not None:
+        tracer.record(trace_record(info or {}, completion, backend_name or backend.name, task[0], task_cell(task),
+                                   task[-1], parsed, accepted, duplicates, cached, stream))
+
+def stream_collector(task, valid, info=None):
+    """StreamCollector that accepts questions into `valid` as each object closes (duplicates counted in info)."""
+    from qgen.json_stream import StreamCollector
+
+    def on_question(q):
+        question = accept_question(task, q)
+        if question:
+            valid.append(question)
+        elif info is not None and conforms(q):
+            info["duplicates"] = info.get("duplicates", 0) + 1
+        return question is not None
+
+    return StreamCollector(task[-1], on_question)
+
+def record_stream(task, collector, last, options, completion, accepted, info=None):
+    """Truncation, backend stats and trace for a streamed batch (a stream we cancelled was not truncated)."""
+    run_stats.record(completion, "ollama", task[0], task[-1], collector.scanner.found, accepted)
+    duplicates = info.pop("duplicates", 0) if info else 0
+    trace_call(task, info, completion, collector.scanner.found, accepted, duplicates, stream=True,
+               backend_name="ollama")
+    if last is not None:
+        truncation.record(task[1:3], last.get("done_reason") == "length", collector.scanner.found,
+                          options["num_predict"], last.get("eval_count"))
+
+def from_cache(task, prompt, options, info=None):
+    """Answer a batch from the response cache, skipping cached answers that add nothing.
+
+    Returns (questions, None) for a useful hit. Otherwise ([], request),
+    request being (key, options with the seed to send) for the backend call
+    whose answer is stored under that key - or None in replay mode.
+    Answers recorded for another model are used too, since the scheduler
+    may hand the cell to a different one this time.
+    """
+    models = [task[0]] + [m for m in backend.models if m != task[0]]
+    while True:
+        for model in models:
+            key, seed, body = response_cache.next(backend.name, model, prompt, options)
+            if body is not None:
+                break
+            if model == task[0]:
+                request = (key, dict(options, seed=seed))
+        else:
+            return [], (None if REPLAY else request)
+        # Already-accepted answers (a rerun after a crash) come back as duplicates
+        valid = accept_batch((model, *task[1:]), as_completion(body), options, cached=True,
+                             info=None if info is None else dict(info))
+        if valid:
+            return valid, None
+
+def remember(request, task, prompt, options, completion):
+    """Store a fresh completion under the key from_cache() handed out."""
+    if request is not None and completion is not None:
+        key, sent = request
+        response_cache.put(key, sent["seed"], backend.name, task[0], prompt, options, completion,
+                           completion["elapsed"])
+
+def capture(collector, parts):
+    """on_chunk wrapper that also keeps the streamed text for the cache."""
+    def on_chunk(text):
+        parts.append(text)
+        return collector(text)
+    return on_chunk
+
+def streamed_completion(model, last, parts, elapsed):
+    """A finished stream as a completion; a stream we cancelled counts as stopped."""
+    return ollama_completion(dict(last, response="".join(parts), done_reason=last.get("done_reason") or "cancel"),
+                             model, elapsed)
+
+def generate_batch(task, queued=None):
+    """Generate up to QUESTIONS_PER_CALL questions for one cell in one API call (queued: when it was submitted)."""
+    model, subject, topic, subtopic, difficulty, count = task
+    prompt = build_batch_prompt(subject, topic, subtopic, difficulty, count)
+    options = call_options(task)
+
+    start = time.time()
+    info = call_info(prompt, queued)
+
+    request = None
+    sent = options
+    if response_cache is not None:
+        with profiler.stage("cache"):
+            valid, request = from_cache(task, prompt, options, info)
+        if valid or request is None:
+            return valid, time.time() - start
+        sent = request[1]
+
+    if STREAM:
+        valid, parts = [], []
+        collector = stream_collector(task, valid, info)
+        payload = {"model": model, "prompt": prompt, "options": sent, **request_fields(task)}
+        with metrics.in_flight.track(), profiler.stage("request"):
+            if endpoints is not None:
+                last = pooled_stream_generate(endpoints, payload, capture(collector, parts), timeout=90,
+                                              controller=concurrency, info=info)
+            else:
+                last = stream_generate(OLLAMA_API, payload, capture(collector, parts), timeout=90,
+                                       controller=concurrency, info=info)
+        scheduler.observe(model, time.time() - start, last)
+        completion = None if last is None else streamed_completion(model, last, parts, time.time() - start)
+        record_stream(task, collector, last, options, completion, len(valid), info)
+        remember(request, task, prompt, options, completion)
+        return valid, time.time() - start
+
+    with metrics.in_flight.track(), profiler.stage("request"):
+        completion = backend.complete(model, prompt, sent, call_schema(task), info)
+    return finish_batch(task, prompt, options, request, completion, time.time() - start, info)
+
+def finish_batch(task, prompt, options, request, completion, elapsed, info=None):
+    """Scheduler/cache/stats/trace bookkeeping for one backend call, then accept its questions."""
+    scheduler.observe(task[0], elapsed, completion)
+    if completion is None:
+        run_stats.record(None, backend.name, task[0], task[-1])
+        trace_call(task, info, None)
+        return [], elapsed
+    remember(request, task, prompt, options, completion)
+    return accept_batch(task, completion, options, info=info), elapsed
+
+async def generate_batch_async(client, task):
+    """Async twin of generate_batch() using the pooled client."""
+    model, subject, topic, subtopic, difficulty, count = task
+    prompt = build_batch_prompt(subject, topic, subtopic, difficulty, count)
+    options = call_options(task)
+
+    start = time.time()
+    info = call_info(prompt)  # the wait for an in-flight slot is added by the client
+
+    request = None
+    sent = options
+    if response_cache is not None:
+        with profiler.stage("cache"):
+            valid, request = from_cache(task, prompt, options, info)
+        if valid or request is None:
+            return valid, time.time() - start
+        sent = request[1]
+
+    if STREAM:
+        valid, parts = [], []
+        collector = stream_collector(task, valid, info)
+        with metrics.in_flight.track(), profiler.stage("request"):
+            last = await client.generate_stream(model, prompt, capture(collector, parts), options=sent,
+                                                info=info, **request_fields(task))
+        scheduler.observe(model, time.time() - start, last)
+        completion = None if last is None else streamed_completion(model, last, parts, time.time() - start)
+        record_stream(task, collector, last, options, completion, len(valid), info)
+        remember(request, task, prompt, options, completion)
+        return valid, time.time() - start
+
+    with metrics.in_flight.track(), profiler.stage("request"):
+        if backend.name == "ollama":
+            body = await client.generate_raw(model, prompt, options=sent, info=info, **request_fields(task))
+            completion = None if body is None else ollama_completion(body, model, time.time() - start)
+        else:
+            completion = await backend.complete_async(model, prompt, sent, call_schema(task), info)
+    return finish_batch(task, prompt, options, request, completion, time.time() - start, info)
+
+def accept_results(task, questions, elapsed):
+    """Record one finished batch, up to what its cell still needs; returns (added, dropped over quota)."""
+    bank.observe(elapsed)
+    room = planner.deficit(task_cell(task))
+    extra = questions[room:]
+    if extra:
+        questions = questions[:room]
+        question_index.discard([q["id"] for q in extra])  # accept_question() indexed them
+    if questions:
+        with profiler.stage("accept"), lock:
+            generated_questions.extend(questions)
+            bank.add_many(questions)
+            stats["generated"] += len(questions)
+        writer.append(questions)  # journaled on the writer thread
+    elif not extra:
+        stats["failed"] += 1
+    return len(questions), len(extra)
+
+def task_cell(task):
+    """(subject, topic, subtopic, difficulty) a batch was planned for."""
+    return tuple(task[1:5])
+
+def batch_size(cell):
+    """Questions per call for a cell: fewer for topics whose batches don't fit MAX_NUM_PREDICT."""
+    return truncation.batch_size(cell[:2]) if TRUNCATION_FEEDBACK else QUESTIONS_PER_CALL
+
+def create_planner():
+    """Quota planner over the syllabus cells (topics weighted equally), minus the bank."""
+    global planner, truncation
+    truncation = TruncationTracker(QUESTIONS_PER_CALL, OLLAMA_OPTIONS["num_predict"], MAX_NUM_PREDICT)
+    quotas = allocate([(subject, topic, subtopics, None, 1) for subject, topic, subtopics in SYLLABUS],
+                      TARGET_QUESTIONS, unit=QUESTIONS_PER_CALL)
+    # model: assigned by the scheduler at submit time
+    planner = QuotaPlanner(quotas, lambda cell, count: (None, *cell, count), per_call=batch_size)
+    planner.add_existing(bank.cells)
+    return planner
+
+def new_controller(initial, maximum):
+    """Fresh AIMD controller for one run (None when ADAPTIVE_CONCURRENCY is off)."""
+    global concurrency
+    concurrency = AIMDController(initial=initial, maximum=maximum) if ADAPTIVE_CONCURRENCY else None
+    return concurrency
+
+def open_backend():
+    """Backend (and fresh backend stats) for the current run from BACKEND; Ollama is OLLAMA_HOST with MODELS."""
+    global backend, run_stats
+    if BACKEND == "ollama":
+        backend = make_backend(f"ollama={OLLAMA_HOST}", MODELS, keep_alive=KEEP_ALIVE, timeout=90, pool=endpoints)
+    else:
+        backend = make_backend(BACKEND)
+    backend.controller = concurrency
+    run_stats = BackendStats(metrics)
+    return backend
+
+def open_endpoints():
+    """EndpointPool over OLLAMA_HOSTS for this run (None when only OLLAMA_HOST is used)."""
+    global endpoints
+    if endpoints is not None:
+        endpoints.close()  # a previous run in this process (benchmarks)
+    endpoints = EndpointPool(OLLAMA_HOSTS) if OLLAMA_HOSTS and BACKEND == "ollama" else None
+    return endpoints
+
+def start_metrics(engine):
+    """Point the callback gauges at this run and start the endpoint / periodic dump."""
+    metrics.queue_depth.set_function(lambda: planner.remaining(), queue="plan")
+    metrics.queue_depth.set_function(lambda: writer.queue.qsize(), queue="writer")
+    metrics.concurrency.set_function(
+        lambda: concurrency.current if concurrency is not None
+        else ASYNC_IN_FLIGHT if engine == "async" else MAX_WORKERS)
+    metrics.start(METRICS_PORT, QUESTIONS_DIR / METRICS_FILE, METRICS_INTERVAL)
+    if metrics.port is not None:
+        print(f"📊 Metrics: http://127.0.0.1:{metrics.port}/metrics")
+
+def open_trace():
+    """Per-call trace log for this run (None when TRACE_CALLS is off, or on a coordinator: workers trace)."""
+    global tracer
+    tracer = CallTracer(QUESTIONS_DIR / TRACE_FILE) if TRACE_CALLS and not COORDINATOR else None
+    return tracer
+
+def run_threaded(planner):
+    """ThreadPoolExecutor submit loop (one blocking backend call per worker thread)."""
+    controller = new_controller(MAX_WORKERS, MAX_CONCURRENCY)
+    open_backend()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY if controller else MAX_WORKERS) as executor:
+        futures = {}
+
+        def submit_more():
+            """Top up to the current in-flight limit (the planner stops once deficits are covered)."""
+            limit = controller.current if controller else MAX_WORKERS * 2
+            while len(futures) < limit and not planner.done():
+                try:
+                    with profiler.stage("plan"):
+                        task = next(planner)
+                except StopIteration:
+                    return
+                futures[executor.submit(generate_batch, scheduler.assign(task), time.time())] = task
+
+        # Submit initial batch
+        submit_more()
+
+        save_counter = 0
+
+        while futures and not planner.done():
+            done = next(as_completed(futures))
+            task = futures.pop(done)
+
+            try:
+                questions, elapsed = done.result()
+                added, dropped = accept_results(task, questions, elapsed)
+                save_counter += added
+            except:
+                added = dropped = 0
+                stats["failed"] += 1
+            with profiler.stage("plan"):
+                planner.record(task_cell(task), added, task[-1], dropped)
+
+            print_progress()
+
+            # Save periodically
+            if save_counter >= CHECKPOINT_INTERVAL:
+                save_progress()
+                save_counter = 0
+
+            # Submit new tasks: re-planned from the deficits (the limit may have moved)
+            submit_more()
+
+async def run_async(planner, hosts=None):
+    """Asyncio submit loop: one pooled session, ASYNC_IN_FLIGHT requests in flight."""
+    from qgen.ollama_async import AsyncOllamaClient, run_tasks
+
+    save_counter = 0
+    controller = new_controller(MAX_WORKERS, MAX_CONCURRENCY)
+    if open_backend().name != "ollama":
+        # complete_async() runs on the default executor; let it hold every request in flight
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(MAX_CONCURRENCY if controller
+                                                                           else ASYNC_IN_FLIGHT))
+
+    def on_result(task, result, _):
+        nonlocal save_counter
+        added = dropped = 0
+        if result is None:
+            stats["failed"] += 1
+        else:
+            added, dropped = accept_results(task, *result)
+            save_counter += added
+        with profiler.stage("plan"):
+            planner.record(task_cell(task), added, task[-1], dropped)
+        print_progress()
+        if save_counter >= CHECKPOINT_INTERVAL:
+            save_progress()
+            save_counter = 0
+
+    ceiling = MAX_CONCURRENCY if controller else ASYNC_IN_FLIGHT
+    async with AsyncOllamaClient(hosts or [OLLAMA_HOST], max_in_flight=ceiling, timeout=90,
+                                 controller=controller, pool=endpoints) as client:
+        await run_tasks(
+            profiler.iterate("plan", planner),
+            lambda task: generate_batch_async(client, scheduler.assign(task)),
+            on_result,
+            planner.done,
+            (lambda: controller.current) if controller else ASYNC_IN_FLIGHT,
         )
-        
-        elapsed = time.time() - start
-        
-        if response.status_code != 200:
-            return [], elapsed
-        
-        text = response.json().get("response", "")
-        questions = parse_questions(text)
-        
-        valid = []
-        for q in questions:
-            if not all(k in q for k in ["question", "options", "correctAnswer"]):
+
+def open_queue():
+    """--coordinator: open the work queue and keep what workers sent back after the last coordinator stopped."""
+    global work_queue, queue_server
+    work_queue = WorkQueue(COORDINATOR)
+    work_queue.start()
+    if QUEUE_PORT is not None:
+        queue_server = QueueServer(work_queue, QUEUE_PORT)
+        print(f"📬 Remote workers: --worker http://{socket.gethostname()}:{queue_server.port}")
+    leftover = [q for _, _, questions, _ in work_queue.take() for q in questions]
+    kept = [q for q in leftover if not is_duplicate(q, q["id"], q.get("model"))]
+    if kept:
+        with lock:
+            generated_questions.extend(kept)
+            bank.add_many(kept)
+        writer.append(kept)
+        print(f"♻️  Kept {len(kept)} questions workers sent after the last coordinator stopped")
+    return work_queue
+
+def run_coordinator(planner):
+    """--coordinator submit loop: keep QUEUE_AHEAD batches queued, dedup and accept what the workers send back."""
+    outstanding = {}  # task id -> task
+    save_counter = 0
+    while not planner.done():
+        tasks = []
+        ahead = work_queue.queued()
+        while ahead + len(tasks) < QUEUE_AHEAD:
+            try:
+                with profiler.stage("plan"):
+                    tasks.append(scheduler.assign(next(planner)))
+            except StopIteration:
+                break
+        if tasks:
+            outstanding.update(zip(work_queue.put(tasks), tasks))
+        if not outstanding:
+            break  # every cell given up, nothing left to wait for
+
+        results = work_queue.take()
+        for task_id, _, questions, elapsed in results:
+            task = outstanding.pop(task_id, None)
+            if task is None:
+                continue
+            added, dropped = accept_results(task, [q for q in questions if not is_duplicate(q, q["id"], task[0])],
+                                            elapsed)
+            save_counter += added
+            with profiler.stage("plan"):
+                planner.record(task_cell(task), added, task[-1], dropped)
+        if results:
+            print_progress()
+            if save_counter >= CHECKPOINT_INTERVAL:
+                save_progress()
+                save_counter = 0
+        else:
+            time.sleep(QUEUE_POLL)
+    work_queue.finish()
+
+def run_worker(work):
+    """--worker loop: lease batches up to the in-flight limit, renew the leases while they run, send back results.
+
+    Returns why it stopped: qgen.workqueue.FINISHED, EVICTED or UNREACHABLE.
+    """
+    controller = new_controller(MAX_WORKERS, MAX_CONCURRENCY)
+    renewed = time.time()
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY if controller else MAX_WORKERS) as executor:
+        futures = {}
+        while True:
+            limit = controller.current if controller else MAX_WORKERS
+            leased = work.lease(WORKER_NAME, limit - len(futures), LEASE_TTL) if len(futures) < limit else []
+            if isinstance(leased, str):
+                break  # told to stop; whatever is still running would be dropped
+            for task_id, task in leased:
+                futures[executor.submit(generate_batch, task, time.time())] = task_id
+            if not futures:
+                time.sleep(QUEUE_POLL)
                 continue
-            
-            h = get_hash(q["question"])
-            with lock:
-                if h in question_hashes:
-                    stats["duplicates"] += 1
-                    continue
-                question_hashes.add(h)
-            
-            valid.append({
-                "id": generate_id(),
-                "subject": subject,
-                "topic": topic,
-                "subtopic": random.choice(subtopics),
-                "difficulty": difficulty,
-                "question": q["question"],
-                "options": q["options"],
-                "correctAnswer": q["correctAnswer"],
-                "explanation": q.get("explanation", ""),
-                "model": model,
-                "generatedAt": datetime.now().isoformat()
-            })
-        
-        return valid, elapsed
-        
-    except Exception as e:
-        return [], time.time() - start
-
-def main():
-    global generated_questions, stats
+
+            done, _ = wait(futures, timeout=QUEUE_POLL, return_when=FIRST_COMPLETED)
+            for future in done:
+                task_id = futures.pop(future)
+                try:
+                    questions, elapsed = future.result()
+                except Exception:
+                    questions, elapsed = [], 0.0
+                work.complete(task_id, WORKER_NAME, questions, elapsed)
+                stats["generated"] += len(questions)
+                stats["failed"] += not questions
+            if futures and time.time() - renewed > LEASE_TTL / 4:
+                work.renew(WORKER_NAME, list(futures.values()), LEASE_TTL)
+                renewed = time.time()
+            if done:
+                print(f"\r📤 {WORKER_NAME}: {stats['generated']} questions sent | "
+                      f"{format_time(time.time() - stats['start'])} | ❌{stats['failed']}   ", end='', flush=True)
+        for future in futures:
+            future.cancel()
+    return leased
+
+def worker_main():
+    """--worker: generate the coordinator's batches here; it dedups, journals and writes the bank.
+
+    A worker keeps only its own response cache, call trace and backend
+    stats (in QUESTIONS_DIR, or --out).
+    """
+    global truncation, response_cache, STREAM
+
+    work = connect(WORKER)
+    open_endpoints()
+    open_backend()
+    ollama = backend.name == "ollama"
+    if not ollama and STREAM:
+        print("⚠️  --stream is Ollama-only; sending buffered requests")
+        STREAM = False
+
+    print("=" * 60)
+    print("🛠️  OSSC Question Generator - WORKER")
+    print("=" * 60)
+    print(f"📬 Queue: {WORKER} (as {WORKER_NAME}, leases {LEASE_TTL}s)")
+    print(f"🔌 Backend: {BACKEND}")
+    if endpoints is not None:
+        print(f"🔌 Servers: {len(endpoints.endpoints)} (least-loaded routing, health checks every {HEALTH_INTERVAL}s)")
+    print("=" * 60)
+    if not REPLAY and not backend.ping():
+        print("❌ Cannot connect to Ollama. Run: ollama serve" if ollama else f"❌ {backend.name} backend not answering")
+        return
+
+    try:
+        set_worker(work.register(WORKER_NAME))
+    except requests.RequestException as e:
+        print(f"❌ Cannot reach the coordinator at {WORKER}: {e}")
+        return
+    except RuntimeError as e:
+        print(f"❌ Coordinator refused {WORKER_NAME}: {e}")
+        return
+    truncation = TruncationTracker(QUESTIONS_PER_CALL, OLLAMA_OPTIONS["num_predict"], MAX_NUM_PREDICT)
+    response_cache = ResponseCache(CACHE_PATH or QUESTIONS_DIR / CACHE_FILE) if CACHE_RESPONSES or REPLAY else None
+    if ollama and not REPLAY:
+        for host in (endpoints.up if endpoints is not None else [OLLAMA_HOST]):
+            scheduler.warm_up(host, KEEP_ALIVE)
+    if endpoints is not None:
+        endpoints.start(HEALTH_INTERVAL)
+    stats["start"] = time.time()
+    open_trace()
+
+    stopped = run_worker(work)
+
+    if endpoints is not None:
+        endpoints.close()
+    if tracer is not None:
+        tracer.close()
+    if response_cache is not None:
+        response_cache.close()
+    work.close()
+    elapsed = time.time() - stats["start"]
+    print("\n\n" + "=" * 60)
+    if stopped == FINISHED:
+        print(f"✅ Worker {WORKER_NAME} done: the coordinator finished the run")
+    elif stopped == EVICTED:
+        print(f"⚠️  Worker {WORKER_NAME} stopped: it went quiet and its ID slot was given to another worker")
+    else:
+        print(f"⚠️  Worker {WORKER_NAME} stopped: no answer from the coordinator for {GIVE_UP:.0f}s "
+              f"(it exited or died; its leases go to other workers if it comes back)")
+    print(f"📤 This worker: {stats['generated']} questions sent in {format_time(elapsed)} "
+          f"({stats['generated'] / elapsed * 60:.0f}/min), {stats['failed']} failed batches")
+    print("📈 Backend (questions/min, tokens/question, parse yield):")
+    print(run_stats.report(elapsed))
+    print("=" * 60)
+
+def main(engine="threads"):
+    global generated_questions, stats, scheduler, STREAM
+    
+    if WORKER:
+        return worker_main()
+    
+    open_endpoints()
+    open_backend()
+    ollama = backend.name == "ollama"
+    if not ollama:
+        scheduler = ModelScheduler(backend.models, MODEL_RUN_LENGTH)
+        if STREAM:
+            print("⚠️  --stream is Ollama-only; sending buffered requests")
+            STREAM = False
     
     print("=" * 60)
     print("🚀 OSSC Question Generator - FAST MODE")
     print("=" * 60)
     print(f"📊 Target: {TARGET_QUESTIONS} questions")
-    print(f"🤖 Models: {', '.join(MODELS)}")
-    print(f"⚡ Workers: {MAX_WORKERS} | Batch size: {QUESTIONS_PER_CALL}")
+    print(f"🔌 Backend: {BACKEND}")
+    print(f"🤖 Models: {', '.join(backend.models)}")
+    if endpoints is not None:
+        print(f"🔌 Servers: {len(endpoints.endpoints)} (least-loaded routing, health checks every {HEALTH_INTERVAL}s)")
+    if COORDINATOR:
+        print(f"📬 Coordinator: queue {COORDINATOR} (batches are generated by --worker processes)")
+    elif ADAPTIVE_CONCURRENCY:
+        print(f"⚡ Adaptive in-flight: {MAX_WORKERS}..{MAX_CONCURRENCY} | Batch size: {QUESTIONS_PER_CALL}")
+    elif engine == "async":
+        print(f"⚡ Async in-flight: {ASYNC_IN_FLIGHT} | Batch size: {QUESTIONS_PER_CALL}")
+    else:
+        print(f"⚡ Workers: {MAX_WORKERS} | Batch size: {QUESTIONS_PER_CALL}")
+    if STREAM:
+        print("📡 Streaming: on (early cancel per batch)")
+    if STRUCTURED_OUTPUT:
+        print("🧩 Structured output: on (MCQ JSON schema)")
+    if REPLAY:
+        print(f"⏪ Replay: answers from {CACHE_PATH or QUESTIONS_DIR / CACHE_FILE}, no backend calls")
     print("=" * 60)
     
-    # Check Ollama
-    try:
-        r = requests.get("http://localhost:11434/api/tags", timeout=5)
-        if r.status_code == 200:
-            print("✅ Ollama connected")
+    # Check the backend (replay never calls it; a coordinator's workers do)
+    if not REPLAY and not COORDINATOR:
+        if backend.ping():
+            print(f"✅ {backend.name} connected")
+        elif ollama:
+            print("❌ Cannot connect to Ollama. Run: ollama serve"); return
         else:
-            print("❌ Ollama error"); return
-    except:
-        print("❌ Cannot connect to Ollama. Run: ollama serve"); return
+            print(f"❌ {backend.name} backend not answering"); return
+    
+    if PROFILE or PROFILE_SAMPLE or PROFILE_MEMORY:
+        profiler.start(sample=PROFILE_SAMPLE, memory=PROFILE_MEMORY)
     
-    # Load existing
-    existing_file = QUESTIONS_DIR / "all_questions.json"
-    if existing_file.exists():
-        try:
-            with open(existing_file, 'r', encoding='utf-8') as f:
-                generated_questions = json.load(f)
-                for q in generated_questions:
-                    question_hashes.add(get_hash(q["question"]))
-            print(f"📂 Loaded {len(generated_questions)} existing questions")
-        except:
-            pass
+    # Load existing (snapshot + journal)
+    with profiler.stage("recover"):
+        recover_progress()
+    if COORDINATOR:
+        open_queue()
     
-    remaining = TARGET_QUESTIONS - len(generated_questions)
+    # Plan per-cell quotas; each batch asks for up to QUESTIONS_PER_CALL of one cell's deficit
+    with profiler.stage("plan"):
+        create_planner()
+    remaining = planner.remaining()
     if remaining <= 0:
-        print(f"✅ Already have {len(generated_questions)} questions!")
+        print(f"✅ Already have {total_questions()} questions, every cell at quota!")
+        profiler.stop()
         return
     
     print(f"📝 Generating: {remaining} questions")
     print()
     
-    # Create tasks - each task generates QUESTIONS_PER_CALL questions
-    tasks = []
-    batches_needed = (remaining // QUESTIONS_PER_CALL) + 10  # buffer
-    
-    for i in range(batches_needed):
-        subject, topic, subtopics = random.choice(SYLLABUS)
-        model = MODELS[i % len(MODELS)]
-        tasks.append((model, subject, topic, subtopics))
+    # Load the first model's weights before any work is queued on it
+    if ollama and not REPLAY and not COORDINATOR:
+        for host in (endpoints.up if endpoints is not None else [OLLAMA_HOST]):
+            scheduler.warm_up(host, KEEP_ALIVE)
+    if endpoints is not None:
+        endpoints.start(HEALTH_INTERVAL)
     
     stats["start"] = time.time()
+    start_metrics(engine)
+    open_trace()
     
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {}
-        task_iter = iter(tasks)
-        
-        # Submit initial batch
-        for _ in range(min(MAX_WORKERS * 2, len(tasks))):
-            try:
-                task = next(task_iter)
-                futures[executor.submit(generate_batch, task)] = task
-            except StopIteration:
-                break
-        
-        save_counter = 0
-        
-        while futures and len(generated_questions) < TARGET_QUESTIONS:
-            done = next(as_completed(futures))
-            futures.pop(done)
-            
-            try:
-                questions, elapsed = done.result()
-                stats["times"].append(elapsed)
-                
-                if questions:
-                    with lock:
-                        generated_questions.extend(questions)
-                        stats["generated"] += len(questions)
-                    save_counter += len(questions)
-                else:
-                    stats["failed"] += 1
-                
-            except:
-                stats["failed"] += 1
-            
-            print_progress()
-            
-            # Save periodically
-            if save_counter >= SAVE_INTERVAL:
-                save_progress()
-                save_counter = 0
-            
-            # Submit new task
-            if len(generated_questions) < TARGET_QUESTIONS:
-                try:
-                    task = next(task_iter)
-                    futures[executor.submit(generate_batch, task)] = task
-                except StopIteration:
-                    pass
+    if COORDINATOR:
+        run_coordinator(planner)
+    elif engine == "async":
+        asyncio.run(run_async(planner))
+    else:
+        run_threaded(planner)
     
-    save_progress()
+    close_progress()
+    if queue_server is not None:
+        queue_server.close()  # once the remote workers have heard the run is finished
+    profiler.stop()
+    metrics.stop()
+    if endpoints is not None:
+        endpoints.close()
+    if tracer is not None:
+        tracer.close()
+    atomic_write_json(QUESTIONS_DIR / PLAN_REPORT, {
+        "target": TARGET_QUESTIONS,
+        "generatedAt": datetime.now().isoformat(),
+        "remaining": planner.remaining(),
+        "cells": planner.to_json()
+    })
+    if response_cache is not None:
+        response_cache.close()
     
     elapsed = time.time() - stats["start"]
     
     print("\n\n" + "=" * 60)
     print("✅ GENERATION COMPLETE!")
     print("=" * 60)
-    print(f"📊 Total Questions: {len(generated_questions)}")
+    print(f"📊 Total Questions: {total_questions()}")
     print(f"⏱️  Time: {format_time(elapsed)}")
-    print(f"⚡ Speed: {len(generated_questions)/elapsed*60:.0f} questions/min")
+    print(f"⚡ Speed: {stats['generated']/elapsed*60:.0f} questions/min")
     print(f"❌ Failed batches: {stats['failed']}")
     print(f"🔄 Duplicates: {stats['duplicates']}")
+    if work_queue is not None:
+        print("📬 Workers (share of the batches):")
+        print(work_queue.report())
+        work_queue.close()
+    else:
+        print(scheduler.view(OLLAMA_HOST if ollama else None))
+    if endpoints is not None:
+        print("🔌 Servers (share of calls, failures, re-sent calls, ejections):")
+        print(endpoints.report())
+    if work_queue is None:  # a coordinator's calls ran on the workers, which report them
+        print("📈 Backend (questions/min, tokens/question, parse yield):")
+        print(run_stats.report(elapsed))
+        print(f"⏲️  Latency / tokens/sec / dedup (metrics: {QUESTIONS_DIR / METRICS_FILE}):")
+        print(metrics.report())
+        if concurrency is not None:
+            print(f"🎚️  {concurrency.summary()}")
+            print(f"   over time: {concurrency.timeline()}")
+        print(f"✂️  Truncation: {truncation.summary()}")
+        if truncation.report():
+            print(truncation.report())
+    print(f"💾 Writes: {writer.summary()}")
+    if tracer is not None:
+        print(f"🔍 Trace: {tracer.count} calls -> {tracer.path} (python scripts/analyze_traces.py)")
+    if response_cache is not None:
+        print(f"🗄️  Response cache: {response_cache.summary()}")
+    print("🗺️  Plan (planned vs. delivered):")
+    print(planner.report())
+    if profiler.stages:
+        profiler.save(QUESTIONS_DIR / PROFILE_FILE, QUESTIONS_DIR / PROFILE_STACKS)
+        print(f"🔬 Stages (profile: {QUESTIONS_DIR / PROFILE_FILE}):")
+        print(profiler.report())
     print(f"📁 Saved to: {QUESTIONS_DIR}")
     print("=" * 60)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="OSSC question generator - fast batch mode (Ollama)")
+    parser.add_argument("--backend", default="ollama",
+                        help="ollama[=host], groq, openai=<base url> (vLLM etc.) or fake[=seed]")
+    parser.add_argument("--engine", choices=["threads", "async"], default="threads",
+                        help="threads = ThreadPoolExecutor + requests, async = pooled aiohttp session")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream tokens, emit each question as it closes and cancel early")
+    parser.add_argument("--fixed-concurrency", action="store_true",
+                        help="keep MAX_WORKERS / ASYNC_IN_FLIGHT instead of the adaptive controller")
+    parser.add_argument("--hosts", nargs="+", default=[], metavar="URL",
+                        help="spread requests over several Ollama servers (least-loaded, failing ones ejected)")
+    parser.add_argument("--structured", action="store_true",
+                        help="constrain output to the MCQ JSON schema (Ollama format) and parse with json.loads")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="don't keep raw answers in responses.sqlite (and don't reuse them)")
+    parser.add_argument("--replay", action="store_true",
+                        help="run parse/validate/dedup/save from the cached answers only, no Ollama")
+    parser.add_argument("--inline-writes", action="store_true",
+                        help="journal and checkpoint on the submit loop instead of the writer thread")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve Prometheus metrics on 127.0.0.1:<port>/metrics (0 = any free port)")
+    parser.add_argument("--no-trace", action="store_true",
+                        help=f"don't append every call to {TRACE_FILE}")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"time every pipeline stage and print a breakdown at the end ({PROFILE_FILE})")
+    parser.add_argument("--profile-sample", action="store_true",
+                        help=f"with --profile: sample stacks into {PROFILE_STACKS} for a flame graph")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="with --profile: tracemalloc the run (peak, top allocation growth; much slower)")
+    parser.add_argument("--coordinator", default=None, metavar="QUEUE",
+                        help="plan, dedup and save here; --worker processes sharing QUEUE generate the batches")
+    parser.add_argument("--queue-port", type=int, default=None,
+                        help="with --coordinator: serve the queue on this port for workers on other machines")
+    parser.add_argument("--worker", default=None, metavar="QUEUE",
+                        help="lease batches from the coordinator's QUEUE (file, or http://host:port) "
+                             "and send the questions back")
+    parser.add_argument("--lease-ttl", type=float, default=LEASE_TTL,
+                        help="with --worker: seconds before a batch this worker stops renewing goes to another")
+    parser.add_argument("--out", type=Path, default=None,
+                        help="write the bank here instead (the cache is still read from the default folder)")
+    args = parser.parse_args()
+    BACKEND = args.backend
+    if BACKEND.startswith("ollama="):
+        OLLAMA_HOST = BACKEND.partition("=")[2].rstrip("/")
+        OLLAMA_API = f"{OLLAMA_HOST}/api/generate"
+        BACKEND = "ollama"
+    if args.hosts:
+        OLLAMA_HOSTS = [h.rstrip("/") for h in args.hosts]
+        OLLAMA_HOST = OLLAMA_HOSTS[0]
+        OLLAMA_API = f"{OLLAMA_HOST}/api/generate"
+    STREAM = args.stream
+    STRUCTURED_OUTPUT = args.structured
+    CACHE_RESPONSES = not args.no_cache
+    REPLAY = args.replay
+    BACKGROUND_WRITES = not args.inline_writes
+    METRICS_PORT = args.metrics_port
+    TRACE_CALLS = not args.no_trace
+    PROFILE = args.profile
+    PROFILE_SAMPLE = args.profile_sample
+    PROFILE_MEMORY = args.profile_memory
+    COORDINATOR = args.coordinator
+    QUEUE_PORT = args.queue_port
+    WORKER = args.worker
+    LEASE_TTL = args.lease_ttl
+    if args.out:
+        CACHE_PATH = QUESTIONS_DIR / CACHE_FILE
+        QUESTIONS_DIR = args.out
+    ADAPTIVE_CONCURRENCY = not args.fixed_concurrency
+    main(engine=args.engine)
@@ -1,8 +1,19 @@
 # ============================================================
 # ⚡ GROQ ULTRA-FAST Question Generator
 # ============================================================
-# Groq Free Tier: ~14,400 requests/day, 6000 tokens/min
+# Groq Free Tier: ~14,400 requests/day, 30 requests/min, 6000 tokens/min
 # Speed: 500+ tokens/second (FASTEST inference available)
+# Requests run MAX_CONCURRENT at a time inside an RPM + TPM token bucket
+# Batches are planned per subject/topic/subtopic/difficulty cell from the deficits
+# Batches cut off at max_tokens keep every complete question; topics that keep
+# getting cut off get a higher max_tokens, then smaller batches
+# STRUCTURED_OUTPUT uses Groq's JSON mode: one {"questions": [...]} object, parsed with json.loads
+# Calls go through qgen.backends.GroqBackend and the records through qgen.pipeline,
+# so questions/min, tokens/question and parse yield compare with the other backends
+# Live metrics (latency, tokens/sec, yield, duplicates) go to METRICS_FILE every
+# METRICS_INTERVAL seconds, and to 127.0.0.1:METRICS_PORT/metrics (Prometheus) if set
+# Every call is traced to TRACE_FILE (one JSON line: cell, limiter wait, latency,
+# usage tokens, parsed/accepted/duplicates, error) for scripts/analyze_traces.py
 # Target: 5000+ questions in ~2-3 hours
 # ============================================================
 
@@ -10,22 +21,23 @@ import json
 import time
 import random
 import re
-import hashlib
 import os
-from datetime import datetime
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
 
-# ==================== INSTALL GROQ ====================
-# Run: pip install groq
-
-try:
-    from groq import Groq
-except ImportError:
-    print("Installing groq...")
-    os.system("pip install groq -q")
-    from groq import Groq
+from qgen.backends import GroqBackend
+from qgen.fingerprints import DB_FILE, SHARED_BANK, FingerprintStore
+from qgen.ids import claim_worker, new_id
+from qgen.json_stream import scan_mcqs
+from qgen.metrics import RunMetrics
+from qgen.pipeline import BackendStats, parse_completion, question_record
+from qgen.planner import QuotaPlanner, allocate, count_cells
+from qgen.ratelimit import RateLimiter
+from qgen.records import as_json, compact
+from qgen.schema import batch_schema, conforms, parse_structured
+from qgen.trace import CallTracer, call_info, trace_record
+from qgen.truncation import TruncationTracker
 
 # ==================== CONFIGURATION ====================
 
@@ -37,13 +49,24 @@ TARGET_QUESTIONS = 5000
 QUESTIONS_PER_BATCH = 3  # Fewer questions = less tokens = less rate limiting
 SAVE_INTERVAL = 50
 OUTPUT_FILE = "ossc_groq_5k.json"
-
-# Groq rate limits (free tier) - VERY CONSERVATIVE settings
-# llama-3.1-8b-instant has MUCH higher limits than 70b model!
-# - 30 requests per minute (but we'll do 10 to be safe)
-# - 20,000 tokens per minute (8b model has higher limit)
-REQUESTS_PER_MINUTE = 10  # Very conservative
-DELAY_BETWEEN_REQUESTS = 6.0  # 6 seconds between requests (safe)
+QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
+FINGERPRINT_DB = QUESTIONS_DIR / DB_FILE  # Dedup index shared with the Ollama generators; files are only re-signed when they change
+PLAN_REPORT = "ossc_groq_plan.json"  # Planned vs. delivered per cell, written at the end
+METRICS_FILE = "ossc_groq_metrics.json"  # Live metrics snapshot, rewritten every METRICS_INTERVAL seconds
+METRICS_INTERVAL = 30
+METRICS_PORT = None  # e.g. 9464 to serve Prometheus metrics on 127.0.0.1:9464/metrics
+TRACE_FILE = "ossc_groq.trace.jsonl"  # Per-call trace, appended to (None to skip)
+
+# Groq rate limits (free tier, llama-3.1-8b-instant)
+# The limiter starts from these and follows the x-ratelimit-* headers and
+# retry-after on 429s, so a paid tier only needs bigger numbers here.
+REQUESTS_PER_MINUTE = 30
+TOKENS_PER_MINUTE = 6000
+MAX_CONCURRENT = 4  # Requests in flight (each still waits for RPM/TPM budget)
+TOKENS_PER_REQUEST = 1200  # Initial estimate; replaced by a running average of usage.total_tokens
+MAX_TOKENS = 2000  # Completion limit per batch
+MAX_TOKENS_CEILING = 4096  # Raised up to this for topics whose batches keep hitting MAX_TOKENS
+STRUCTURED_OUTPUT = False  # JSON mode: response_format json_object, parsed with json.loads
 
 # Model - USE 8B MODEL (has HIGHER rate limits on free tier!)
 # MODEL = "llama-3.3-70b-versatile"  # Low limits - causes rate errors
@@ -56,7 +79,8 @@ print("=" * 60)
 print(f"🎯 Target: {TARGET_QUESTIONS} questions")
 print(f"📦 Batch size: {QUESTIONS_PER_BATCH}")
 print(f"🤖 Model: {MODEL}")
-print(f"⏱️  Rate: {REQUESTS_PER_MINUTE} requests/min")
+print(f"⏱️  Rate: {REQUESTS_PER_MINUTE} requests/min, {TOKENS_PER_MINUTE} tokens/min, {MAX_CONCURRENT} in flight")
+print(f"🧩 Output: {'JSON mode (json_object)' if STRUCTURED_OUTPUT else 'free-text JSON'}")
 print("=" * 60)
 
 # ==================== COMPLETE OSSC SYLLABUS ====================
@@ -153,19 +177,26 @@ SYLLABUS = [
 
 print(f"📚 Total topics: {len(SYLLABUS)}")
 
-# ==================== INITIALIZE GROQ CLIENT ====================
-
-client = Groq(api_key=GROQ_API_KEY)
+# ==================== INITIALIZE GROQ BACKEND ====================
+
+# No retries: 429s go to the shared limiter instead of per-thread retries
+# (GROQ_BASE_URL in the environment points the backend at a stand-in server)
+if STRUCTURED_OUTPUT:
+    # JSON mode needs one object at the top level (and "JSON" in the messages)
+    SYSTEM_PROMPT = "You are an expert competitive exam question setter. Always return one JSON object."
+else:
+    SYSTEM_PROMPT = "You are an expert competitive exam question setter. Always return valid JSON arrays only."
+limiter = RateLimiter(REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, initial_estimate=TOKENS_PER_REQUEST)
+backend = GroqBackend(models=(MODEL,), api_key=GROQ_API_KEY, system=SYSTEM_PROMPT, limiter=limiter)
+metrics = RunMetrics()  # Latency / tokens/sec / yield / dedup, live (Prometheus + METRICS_FILE)
+run_stats = BackendStats(metrics)  # questions/min, tokens/question, parse yield
+truncation = TruncationTracker(QUESTIONS_PER_BATCH, MAX_TOKENS, MAX_TOKENS_CEILING)
 
 # ==================== UTILITY FUNCTIONS ====================
 
 def generate_id():
     """Generate unique question ID"""
-    return f"q_{int(time.time()*1000)}_{random.randint(1000,9999)}"
-
-def get_hash(text):
-    """Generate hash for duplicate detection"""
-    return hashlib.md5(text.lower().strip()[:100].encode()).hexdigest()
+    return new_id()  # q_{ms}_{worker}{seq}: sortable, no same-millisecond collisions
 
 def format_time(seconds):
     """Format seconds to readable string"""
@@ -179,17 +210,32 @@ def format_time(seconds):
 def save_questions(questions, filename):
     """Save questions to JSON file"""
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, indent=2, ensure_ascii=False)
+        json.dump(questions, f, indent=2, ensure_ascii=False, default=as_json)
 
 # ==================== QUESTION GENERATION ====================
 
-def generate_questions_batch(topic_data, batch_size=5):
-    """Generate a batch of questions using Groq API"""
+def build_questions(parsed, subject, topic, subtopic, difficulty):
+    """Question records for the parsed objects that match the MCQ schema"""
+    cell = (subject, topic, subtopic, difficulty)
+    return [question_record(q, cell, generate_id()) for q in parsed if conforms(q)]
+
+def generate_questions_batch(topic_data, batch_size=5, subtopic=None, difficulty=None, queued=None):
+    """Generate a batch of questions using Groq API (random subtopic/difficulty unless given)
+
+    Returns (questions, completion, info); completion is None if the call
+    failed, info is the call's trace info (queue wait, error class).
+    """
     
     subject = topic_data["subject"]
     topic = topic_data["topic"]
-    subtopic = random.choice(topic_data["subtopics"])
-    difficulty = random.choice(["easy", "medium", "hard"])
+    subtopic = subtopic or random.choice(topic_data["subtopics"])
+    difficulty = difficulty or random.choice(["easy", "medium", "hard"])
+    
+    max_tokens = truncation.limit((subject, topic))
+    
+    shape, opening, closing = f"a valid JSON array with {batch_size} questions", "[", "]"
+    if STRUCTURED_OUTPUT:
+        shape, opening, closing = f"a JSON object with {batch_size} questions", '{"questions": [', "]}"
     
     prompt = f"""You are an expert question setter for OSSC (Odisha Staff Selection Commission) RI & AI competitive exams in India.
 
@@ -206,73 +252,33 @@ REQUIREMENTS:
 4. Include clear explanation for each answer
 5. For math questions, show step-by-step solution in explanation
 
-Return ONLY a valid JSON array with {batch_size} questions in this EXACT format:
-[
+Return ONLY {shape} in this EXACT format:
+{opening}
   {{
     "question": "Complete question text here?",
     "options": {{"A": "Option 1", "B": "Option 2", "C": "Option 3", "D": "Option 4"}},
     "correctAnswer": "A",
     "explanation": "Detailed explanation"
   }}
-]
+{closing}
 
 Generate {batch_size} questions now:"""
 
-    try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are an expert competitive exam question setter. Always return valid JSON arrays only."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            temperature=0.8,
-            max_tokens=2000,
-        )
-        
-        text = response.choices[0].message.content
-        
-        # Parse JSON
-        questions = []
-        try:
-            # Find JSON array
-            match = re.search(r'\[[\s\S]*\]', text)
-            if match:
-                arr = json.loads(match.group(0))
-                for q in arr:
-                    if all(k in q for k in ["question", "options", "correctAnswer"]):
-                        if isinstance(q["options"], dict) and len(q["options"]) == 4:
-                            if q["correctAnswer"] in ["A", "B", "C", "D"]:
-                                questions.append({
-                                    "id": generate_id(),
-                                    "subject": subject,
-                                    "topic": topic,
-                                    "subtopic": subtopic,
-                                    "difficulty": difficulty,
-                                    "question": q["question"],
-                                    "options": q["options"],
-                                    "correctAnswer": q["correctAnswer"],
-                                    "explanation": q.get("explanation", ""),
-                                    "generatedAt": datetime.now().isoformat()
-                                })
-        except json.JSONDecodeError:
-            pass
-        
-        return questions
-        
-    except Exception as e:
-        error_msg = str(e)
-        if "rate_limit" in error_msg.lower():
-            print(f"\n⚠️ Rate limit hit, waiting 60s...")
-            time.sleep(60)
-        else:
-            print(f"\n❌ Error: {error_msg[:50]}")
-        return []
+    info = call_info(prompt, queued)  # the limiter wait is added by the backend
+    # JSON mode: the backend sends response_format json_object (and keeps the
+    # partial text of a batch that JSON mode rejected for being cut off)
+    with metrics.in_flight.track():
+        completion = backend.complete(MODEL, prompt, {"temperature": 0.8, "num_predict": max_tokens},
+                                      batch_schema(batch_size) if STRUCTURED_OUTPUT else None, info)
+    if completion is None:
+        return [], None, info
+    
+    # Parse JSON (JSON mode: one json.loads; otherwise every complete question
+    # object, wherever the model put it; a batch cut off at max_tokens keeps
+    # the ones that closed)
+    parsed, truncated = parse_completion(completion, parse_structured if STRUCTURED_OUTPUT else scan_mcqs)
+    truncation.record((subject, topic), truncated, len(parsed), max_tokens, completion["completion_tokens"])
+    return build_questions(parsed, subject, topic, subtopic, difficulty), completion, info
 
 # ==================== MAIN GENERATION LOOP ====================
 
@@ -284,7 +290,7 @@ def run_generation():
     print("=" * 60)
     
     all_questions = []
-    question_hashes = set()
+    question_index = FingerprintStore(FINGERPRINT_DB)  # On-disk MinHash/LSH near-duplicate index
     stats = {
         "generated": 0,
         "duplicates": 0,
@@ -292,92 +298,137 @@ def run_generation():
         "by_subject": {}
     }
     
-    # Load existing questions
+    claim_worker(Path(OUTPUT_FILE).resolve().parent)  # an ID slot no other generator writing here holds
+    
+    # Load existing questions (fingerprints are only rebuilt if the file changed)
     if Path(OUTPUT_FILE).exists():
         try:
+            question_index.sync_snapshot(OUTPUT_FILE)
             with open(OUTPUT_FILE, 'r', encoding='utf-8') as f:
-                all_questions = json.load(f)
-                for q in all_questions:
-                    question_hashes.add(get_hash(q["question"]))
-            print(f"📂 Loaded {len(all_questions)} existing questions")
+                all_questions = json.load(f, object_hook=compact)  # compact records for the whole run
+            print(f"📂 Loaded {len(all_questions)} existing questions ({len(question_index)} fingerprints)")
         except:
             pass
+    question_index.sync_snapshot(QUESTIONS_DIR / SHARED_BANK)  # so repeats of other generators' questions are caught
     
-    remaining = TARGET_QUESTIONS - len(all_questions)
+    # Per-cell quotas by topic weight, minus what the file already holds
+    topics = {(t["subject"], t["topic"]): t for t in SYLLABUS}
+    quotas = allocate([(t["subject"], t["topic"], t["subtopics"], None, t["weight"]) for t in SYLLABUS],
+                      TARGET_QUESTIONS, unit=QUESTIONS_PER_BATCH)
+    planner = QuotaPlanner(
+        quotas,
+        lambda cell, count: (topics[cell[:2]], count, cell[2], cell[3]),
+        per_call=lambda cell: truncation.batch_size(cell[:2])
+    )
+    planner.add_existing(count_cells(all_questions))
+    
+    remaining = planner.remaining()
     if remaining <= 0:
-        print(f"✅ Already have {len(all_questions)} questions!")
+        print(f"✅ Already have {len(all_questions)} questions, every cell at quota!")
         return all_questions
     
     print(f"📝 Generating {remaining} more questions...")
-    print(f"⏱️  Estimated time: {format_time(remaining / QUESTIONS_PER_BATCH * DELAY_BETWEEN_REQUESTS)}")
+    print(f"⏱️  Estimated time: {format_time(remaining / QUESTIONS_PER_BATCH / REQUESTS_PER_MINUTE * 60)}")
     print()
     
     start_time = time.time()
     last_save = len(all_questions)
-    request_times = []
+    metrics.queue_depth.set_function(planner.remaining, queue="plan")
+    metrics.concurrency.set(MAX_CONCURRENT)
+    metrics.start(METRICS_PORT, Path(METRICS_FILE), METRICS_INTERVAL)
+    tracer = CallTracer(TRACE_FILE) if TRACE_FILE else None
+    if metrics.port is not None:
+        print(f"📊 Metrics: http://127.0.0.1:{metrics.port}/metrics")
     
-    while len(all_questions) < TARGET_QUESTIONS:
-        batch_start = time.time()
-        
-        # Select topic based on weight
-        topic = random.choices(SYLLABUS, weights=[t["weight"] for t in SYLLABUS])[0]
-        
-        # Generate questions
-        new_questions = generate_questions_batch(topic, QUESTIONS_PER_BATCH)
+    def submit_more(executor):
+        # Next cells furthest below quota (none while in-flight batches cover every deficit)
+        while len(futures) < MAX_CONCURRENT and not planner.done():
+            task = next(planner, None)
+            if task is None:
+                return
+            futures[executor.submit(generate_questions_batch, *task, time.time())] = task
+    
+    # MAX_CONCURRENT requests in flight; the limiter decides when each may start
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT) as executor:
+        futures = {}
+        submit_more(executor)
         
-        # Add unique questions
-        added = 0
-        for q in new_questions:
-            h = get_hash(q["question"])
-            if h in question_hashes:
-                stats["duplicates"] += 1
-                continue
+        while futures and not planner.done():
+            done = next(as_completed(futures))
+            topic_data, batch_size, subtopic, difficulty = futures.pop(done)
+            new_questions, completion, info = done.result()
+            cell = (topic_data["subject"], topic_data["topic"], subtopic, difficulty)
             
-            question_hashes.add(h)
-            all_questions.append(q)
-            added += 1
+            # Add unique questions, up to what the cell still needs
+            added = 0
+            duplicates = 0
+            room = planner.deficit(cell)
+            dropped = 0
+            for q in new_questions:
+                if added == room:
+                    dropped += 1  # the cell filled up while this call was out
+                    continue
+                if question_index.check_question(q) is not None:
+                    stats["duplicates"] += 1
+                    metrics.duplicates.inc(model=MODEL)
+                    duplicates += 1
+                    continue
+                
+                all_questions.append(q)
+                added += 1
+                
+                # Track by subject
+                subj = q["subject"]
+                stats["by_subject"][subj] = stats["by_subject"].get(subj, 0) + 1
             
-            # Track by subject
-            subj = q["subject"]
-            stats["by_subject"][subj] = stats["by_subject"].get(subj, 0) + 1
-        
-        stats["generated"] += added
-        if not new_questions:
-            stats["failed"] += 1
-        
-        # Calculate progress
-        current = len(all_questions)
-        percent = (current / TARGET_QUESTIONS) * 100
-        bar = '█' * int(30 * current // TARGET_QUESTIONS) + '░' * (30 - int(30 * current // TARGET_QUESTIONS))
-        
-        # Calculate ETA
-        elapsed = time.time() - start_time
-        if stats["generated"] > 0:
-            time_per_q = elapsed / stats["generated"]
-            remaining_qs = TARGET_QUESTIONS - current
-            eta = remaining_qs * time_per_q
-            speed = stats["generated"] / max(elapsed, 1) * 3600
-            eta_str = format_time(eta)
-        else:
-            eta_str = "calculating..."
-            speed = 0
-        
-        print(f"\r⚡ |{bar}| {current}/{TARGET_QUESTIONS} ({percent:.1f}%) | +{added} | {speed:.0f}/hr | ETA: {eta_str}   ", end='', flush=True)
-        
-        # Auto-save
-        if current - last_save >= SAVE_INTERVAL:
-            save_questions(all_questions, OUTPUT_FILE)
-            print(f"\n💾 Saved {current} questions")
-            last_save = current
-        
-        # Rate limiting - wait before next request
-        batch_time = time.time() - batch_start
-        wait_time = max(0, DELAY_BETWEEN_REQUESTS - batch_time)
-        if wait_time > 0:
-            time.sleep(wait_time)
+            stats["generated"] += added
+            run_stats.record(completion, backend.name, MODEL, batch_size, len(new_questions), added)
+            if tracer is not None:
+                tracer.record(trace_record(info, completion, backend.name, MODEL, cell, batch_size,
+                                           len(new_questions), added, duplicates))
+            if not new_questions:
+                stats["failed"] += 1
+            planner.record(cell, added, batch_size, dropped)
+            
+            # Calculate progress
+            current = len(all_questions)
+            goal = current + planner.remaining()
+            percent = (current / goal) * 100
+            bar = '█' * int(30 * current // goal) + '░' * (30 - int(30 * current // goal))
+            
+            # Calculate ETA
+            elapsed = time.time() - start_time
+            if stats["generated"] > 0:
+                time_per_q = elapsed / stats["generated"]
+                remaining_qs = goal - current
+                eta = remaining_qs * time_per_q
+                speed = stats["generated"] / max(elapsed, 1) * 3600
+                eta_str = format_time(eta)
+            else:
+                eta_str = "calculating..."
+                speed = 0
+            
+            print(f"\r⚡ |{bar}| {current}/{goal} ({percent:.1f}%) | +{added} | {speed:.0f}/hr | ETA: {eta_str}   ", end='', flush=True)
+            
+            # Auto-save
+            if current - last_save >= SAVE_INTERVAL:
+                save_questions(all_questions, OUTPUT_FILE)
+                question_index.mark_snapshot(OUTPUT_FILE, current)
+                print(f"\n💾 Saved {current} questions")
+                last_save = current
+            
+            # Re-plan from the deficits this result left
+            submit_more(executor)
     
     # Final save
     save_questions(all_questions, OUTPUT_FILE)
+    question_index.mark_snapshot(OUTPUT_FILE, len(all_questions))
+    question_index.close()
+    metrics.stop()
+    if tracer is not None:
+        tracer.close()
+    save_questions({"target": TARGET_QUESTIONS, "remaining": planner.remaining(), "cells": planner.to_json()},
+                   PLAN_REPORT)
     
     # Summary
     elapsed = time.time() - start_time
@@ -389,12 +440,21 @@ def run_generation():
     print(f"⚡ Speed: {len(all_questions)/max(elapsed,1)*3600:.0f} questions/hour")
     print(f"🔄 Duplicates skipped: {stats['duplicates']}")
     print(f"❌ Failed requests: {stats['failed']}")
+    print(f"🚦 Limiter: {limiter.summary()}")
+    print(f"📈 Backend: {run_stats.report(elapsed).strip()}")
+    print(f"⏲️  Latency: {metrics.report().strip()}")
+    print(f"✂️  Truncation: {truncation.summary()}")
+    if truncation.report():
+        print(truncation.report())
     print()
     print("📚 Questions by Subject:")
     for subj, count in sorted(stats["by_subject"].items(), key=lambda x: -x[1]):
         print(f"   {subj}: {count}")
     print()
-    print(f"📁 Output file: {OUTPUT_FILE}")
+    print("🗺️  Plan (planned vs. delivered):")
+    print(planner.report())
+    print()
+    print(f"📁 Output file: {OUTPUT_FILE} (plan: {PLAN_REPORT})")
     print("=" * 60)
     
     return all_questions
@@ -416,7 +476,7 @@ def create_subject_files(questions):
         filename = re.sub(r'[^a-z0-9]', '_', subj.lower()) + '.json'
         filepath = Path(OUTPUT_FILE).parent / filename
         with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(qs, f, indent=2, ensure_ascii=False)
+            json.dump(qs, f, indent=2, ensure_ascii=False, default=as_json)
         print(f"   ✅ {filename}: {len(qs)} questions")
 
 # ==================== RUN ====================
@@ -427,15 +487,10 @@ if __name__ == "__main__":
     
     # Test API connection
     print("🔄 Testing Groq API connection...")
-    try:
-        test = client.chat.completions.create(
-            model=MODEL,
-            messages=[{"role": "user", "content": "Say 'API working'"}],
-            max_tokens=10
-        )
+    if backend.ping():
         print(f"✅ API connected! Model: {MODEL}")
-    except Exception as e:
-        print(f"❌ API Error: {e}")
+    else:
+        print("❌ API Error: no answer from Groq (check GROQ_API_KEY)")
         exit(1)
     
     # Run generation
@@ -0,0 +1,213 @@
+"""
+Streaming merge of generator outputs into merged_questions.json
+===============================================================
+merged_questions.json (what the app loads) and the per-subject
+*_merged.json shards are the union of every generator's output:
+ossc_groq_5k.json, all_questions.json, Colab downloads, journals.
+
+This merges them in one pass without loading any of them whole:
+
+- read:       each input is streamed record by record (qgen/bankfiles.py);
+              JSON lists, the firestore {"questions": [...]} wrapper and
+              JSONL journals are accepted
+- normalize:  every record is put in the bank's shape - keys in order,
+              options as an A-D dict (a 4-item list is accepted), the
+              answer as a letter (an option's text is accepted), model /
+              generatedAt kept when present, other keys dropped; records
+              that can't be repaired are skipped
+- order:      inputs one after another (--order input, the app's current
+              layout), or a k-way merge by creation time (--order time;
+              each input is already in generation order, so heapq.merge
+              needs one record per input)
+- dedup:      the same ID twice is one question (a different question
+              reusing an ID gets a new one); near-duplicates go through
+              the shared fingerprint index (fingerprints.sqlite), so a
+              question is dropped when it repeats one merged before it
+- write:      merged_questions.json and every subject's shard at once,
+              each through a temp file renamed into place at the end
+
+Memory is one record per input plus an ID -> content hash map, whatever
+the size of the inputs.
+
+Usage:
+    python scripts/merge_questions.py
+    python scripts/merge_questions.py colab_output.json --order time
+    python scripts/merge_questions.py a.json b.json --out /tmp/merged
+"""
+
+import argparse
+import heapq
+import json
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from qgen.bankfiles import JsonListWriter, iter_questions
+from qgen.dedup import answer_text
+from qgen.fingerprints import DB_FILE, SHARED_BANK, FingerprintStore
+from qgen.ids import claim_worker, new_id
+from qgen.records import pack_time
+from qgen.schema import OPTION_KEYS
+
+QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
+DEFAULT_INPUTS = ["ossc_groq_5k.json", "all_questions.json"]
+LEGACY_ID = re.compile(r"^q_(\d{13})_\d+$")
+
+
+def shard_file(subject):
+    """Per-subject merged file, e.g. "Reasoning & Mental Ability" -> reasoning_and_mental_ability_merged.json."""
+    return re.sub(r'[^a-z0-9]+', '_', subject.lower().replace('&', 'and')).strip('_') + '_merged.json'
+
+
+def normalize(q):
+    """The record in the bank's shape, or None if it isn't a usable question."""
+    if not isinstance(q, dict):
+        return None
+    text, subject = q.get("question"), q.get("subject")
+    if not isinstance(text, str) or not text.strip() or not isinstance(subject, str) or not subject:
+        return None
+
+    options = q.get("options")
+    if isinstance(options, list) and len(options) == len(OPTION_KEYS):
+        options = dict(zip(OPTION_KEYS, options))
+    if not isinstance(options, dict):
+        return None
+    options = {str(k).strip().upper(): v for k, v in options.items()}
+    if set(options) != set(OPTION_KEYS):
+        return None
+    options = {k: options[k] for k in OPTION_KEYS}
+
+    answer = q.get("correctAnswer", q.get("answer"))
+    letter = str(answer).strip().upper()
+    if letter not in options:
+        answer = str(answer).strip().casefold()
+        letter = next((k for k, v in options.items() if str(v).strip().casefold() == answer), None)
+        if letter is None:
+            return None
+
+    record = {
+        "id": q.get("id") or new_id(),
+        "subject": subject,
+        "topic": q.get("topic", ""),
+        "subtopic": q.get("subtopic", ""),
+        "difficulty": str(q.get("difficulty", "medium")).lower(),
+        "question": text,
+        "options": options,
+        "correctAnswer": letter,
+        "explanation": q.get("explanation", ""),
+    }
+    if "model" in q:
+        record["model"] = q["model"]
+    if "generatedAt" in q:
+        record["generatedAt"] = q["generatedAt"]
+    return record
+
+
+def created_at(q):
+    """Sort key for --order time: the ID's millisecond, else generatedAt (µs), else 0."""
+    match = LEGACY_ID.match(q["id"])
+    if match:
+        return int(match.group(1)) * 1000
+    stamp, _ = pack_time(q.get("generatedAt"))
+    return stamp if isinstance(stamp, int) else 0
+
+
+def content_hash(q):
+    return hash((q["question"].strip(), json.dumps(q["options"], sort_keys=True, ensure_ascii=False)))
+
+
+def read_input(path, stats):
+    """Normalized records of one input, counting what was read / repaired / skipped."""
+    for raw in iter_questions(path):
+        stats["read"] += 1
+        q = normalize(raw)
+        if q is None:
+            stats["invalid"] += 1
+            continue
+        if not isinstance(raw, dict) or list(q.items()) != list(raw.items()):
+            stats["normalized"] += 1
+        yield q
+
+
+def _keyed(stream, path):
+    for q in stream:
+        yield created_at(q), path, q
+
+
+def merge(inputs, out_dir, store, order="input"):
+    """Merge `inputs` into out_dir; returns ({input: Counter}, {shard file: count}, merged count)."""
+    stats = {path: Counter() for path in inputs}
+    streams = [read_input(path, stats[path]) for path in inputs]
+    if order == "time":
+        keyed = [_keyed(stream, path) for path, stream in zip(inputs, streams)]
+        records = ((path, q) for _, path, q in heapq.merge(*keyed, key=lambda t: t[0]))
+    else:
+        records = ((path, q) for path, stream in zip(inputs, streams) for q in stream)
+
+    emitted = {}  # id -> content hash of the question merged under it
+    with ExitStack() as stack:
+        merged = stack.enter_context(JsonListWriter(out_dir / SHARED_BANK))
+        shards = {}
+        for path, q in records:
+            seen = emitted.get(q["id"])
+            h = content_hash(q)
+            if seen is not None:
+                if seen == h:
+                    stats[path]["repeated"] += 1
+                    continue
+                q["id"] = new_id()  # a different question reusing the ID
+                stats[path]["re-IDed"] += 1
+            matches = store.matches(q["question"], q["options"], answer_text(q))
+            if any(key != q["id"] and key in emitted for key in matches):
+                stats[path]["near-duplicates"] += 1
+                continue
+            if q["id"] not in store:
+                store.add_question(q)
+            emitted[q["id"]] = h
+            text = merged.write(q)
+            shard = shards.get(q["subject"])
+            if shard is None:
+                shard = shards[q["subject"]] = stack.enter_context(JsonListWriter(out_dir / shard_file(q["subject"])))
+            shard.write_encoded(text)
+            stats[path]["merged"] += 1
+    store.commit()
+    return stats, {w.path.name: w.count for w in shards.values()}, merged.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge generator outputs into merged_questions.json and subject shards")
+    parser.add_argument("inputs", nargs="*", type=Path,
+                        help=f"question files, merged in this order (default: {' '.join(DEFAULT_INPUTS)})")
+    parser.add_argument("--out", type=Path, default=QUESTIONS_DIR, help="folder for merged_questions.json and shards")
+    parser.add_argument("--index", type=Path, default=QUESTIONS_DIR / DB_FILE, help="shared fingerprint index")
+    parser.add_argument("--order", choices=["input", "time"], default="input",
+                        help="input = files one after another, time = k-way merge by creation time")
+    args = parser.parse_args()
+    inputs = args.inputs or [QUESTIONS_DIR / name for name in DEFAULT_INPUTS]
+    inputs = [p for p in inputs if p.exists() or print(f"⚠️  {p} not found, skipped")]
+
+    store = FingerprintStore(args.index)
+    claim_worker(args.out)  # IDs it gives out can't clash with a generator writing there
+    print(f"🔀 Merging {len(inputs)} inputs ({args.order} order, {len(store)} fingerprints indexed)")
+    start = time.time()
+    stats, shards, total = merge(inputs, args.out, store, args.order)
+    elapsed = time.time() - start
+    if args.out.resolve() == args.index.parent.resolve():
+        store.mark_snapshot(args.out / SHARED_BANK, total)  # generators won't re-import it
+    store.close()
+
+    for path, counts in stats.items():
+        detail = ", ".join(f"{n} {what}" for what, n in counts.items() if what not in ("read", "merged") and n)
+        print(f"   {path.name:<40} {counts['read']:>6} read -> {counts['merged']:>6} merged" +
+              (f" ({detail})" if detail else ""))
+    print(f"\n💾 {args.out / SHARED_BANK}: {total} questions")
+    for name, count in sorted(shards.items()):
+        print(f"   {name:<45} {count:>6}")
+    read = sum(c["read"] for c in stats.values())
+    print(f"\n⏱️  {elapsed:.2f}s ({read / max(elapsed, 1e-9):,.0f} records/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+"""
+qgen - shared building blocks for the question generator scripts
+================================================================
+The generator scripts in this folder import from here, e.g.
+
+    from qgen.ollama_async import AsyncOllamaClient
+
+Run the scripts from the repo root (python scripts/<name>.py) so that
+the scripts/ folder is on sys.path.
+"""
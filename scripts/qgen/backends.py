@@ -0,0 +1,425 @@
+"""
+Generation backends
+===================
+One interface for every place a batch prompt is sent, so the generator
+scripts share parse -> validate -> dedup -> save (qgen.pipeline) and a
+throughput change is made once instead of per script:
+
+    backend = make_backend("groq")
+    completion = backend.complete(model, prompt, {"temperature": 0.8, "num_predict": 2000})
+
+complete() takes Ollama-style options (temperature, top_p, num_predict,
+seed; chat backends send num_predict as max_tokens) and an optional JSON
+schema for constrained output, and returns a completion dict, or None if
+the call failed:
+
+- text:              raw model output
+- finish_reason:     "stop", "length" (cut off at the token limit),
+                     "cancel" (a stream we stopped) or None if unknown
+- prompt_tokens, completion_tokens: as the backend counted them (or None)
+- elapsed:           seconds for the call
+- load_duration:     ns spent loading weights (Ollama; 0 elsewhere), so
+                     ModelScheduler.observe() takes a completion as-is
+- eval_duration:     ns spent generating (Ollama eval_duration, Groq
+                     usage.completion_time; None if not reported)
+- backend, model
+
+complete(..., info=dict) also fills in that dict (qgen.trace): the time the
+call waited for the rate limiter ("queue_wait") and, when it failed, why
+("error": an exception class, "HTTP 503", "rate_limited", ...).
+
+Adapters:
+
+- OllamaBackend:     /api/generate ("format" = schema); with an EndpointPool
+                     (qgen.endpoints) each call goes to the least-loaded
+                     server and is re-sent to another one if it fails
+- OpenAIChatBackend: /v1/chat/completions (vLLM's OpenAI server,
+                     llama.cpp, ...; response_format json_schema)
+- GroqBackend:       Groq's OpenAI-compatible endpoint with the shared
+                     RPM/TPM RateLimiter, JSON mode, and the partial text
+                     of a json_validate_failed 400 kept as a cut-off answer
+- FakeBackend:       deterministic, in-process; the same seed, model,
+                     prompt and options always give the same answer
+
+complete_async() runs complete() on a worker thread, so the asyncio
+engine can drive any backend; generate_questions_fast.py keeps its pooled
+aiohttp client (and streaming) for Ollama.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+import requests
+
+from qgen.ratelimit import RateLimiter
+from qgen.schema import OPTION_KEYS
+from qgen.trace import add_wait, set_error
+
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+GROQ_HOST = "https://api.groq.com"
+
+
+def ollama_completion(body, model=None, elapsed=None):
+    """Completion dict for an /api/generate body (buffered, or the final line of a stream)."""
+    return {
+        "backend": "ollama",
+        "model": body.get("model", model),
+        "text": body.get("response", ""),
+        "finish_reason": body.get("done_reason"),
+        "prompt_tokens": body.get("prompt_eval_count"),
+        "completion_tokens": body.get("eval_count"),
+        "elapsed": elapsed,
+        "load_duration": body.get("load_duration") or 0,
+        "eval_duration": body.get("eval_duration"),
+    }
+
+
+def as_completion(body):
+    """A stored answer as a completion dict (response caches written before the
+    backend interface hold raw Ollama bodies)."""
+    if "text" in body:
+        return body
+    return ollama_completion(body)
+
+
+class Backend:
+    """Sends one prompt, returns a completion dict (None on failure)."""
+
+    name = "backend"
+
+    def __init__(self, models, controller=None):
+        self.models = list(models)
+        self.controller = controller  # AIMDController fed with each call's latency / failure
+        self.stats = Counter()  # requests, failures
+
+    def complete(self, model, prompt, options=None, schema=None, info=None):
+        raise NotImplementedError
+
+    async def complete_async(self, model, prompt, options=None, schema=None, info=None):
+        """complete() on a worker thread, for the asyncio engine."""
+        return await asyncio.to_thread(self.complete, model, prompt, options, schema, info)
+
+    def ping(self):
+        """True if the backend answers at all (a ten-token completion)."""
+        return self.complete(self.models[0], "Say 'API working'", {"num_predict": 10}) is not None
+
+    def _observe(self, start, error):
+        self.stats["requests"] += 1
+        if error:
+            self.stats["failures"] += 1
+        if self.controller is not None:
+            self.controller.observe(time.time() - start, error)
+
+
+class _HTTPBackend(Backend):
+    """requests-based backend with one keep-alive session per worker thread."""
+
+    def __init__(self, models, timeout=90, controller=None):
+        super().__init__(models, controller)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    @property
+    def session(self):
+        if getattr(self._local, "session", None) is None:
+            self._local.session = requests.Session()
+        return self._local.session
+
+
+class OllamaBackend(_HTTPBackend):
+    """Ollama /api/generate, stream off."""
+
+    name = "ollama"
+
+    def __init__(self, host=DEFAULT_OLLAMA_HOST, models=(), keep_alive=None, timeout=90, controller=None,
+                 pool=None):
+        super().__init__(models, timeout, controller)
+        self.host = host.rstrip("/")
+        self.keep_alive = keep_alive
+        self.pool = pool  # EndpointPool routing every call (None = always self.host)
+
+    def complete(self, model, prompt, options=None, schema=None, info=None):
+        if self.pool is None:
+            return self.complete_at(self.host, model, prompt, options, schema, info)
+        return self.pool.call(lambda host: self.complete_at(host, model, prompt, options, schema, info), info)
+
+    def complete_at(self, host, model, prompt, options=None, schema=None, info=None):
+        """complete() against one server."""
+        payload = {"model": model, "prompt": prompt, "stream": False, "options": options or {}}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        if schema is not None:
+            payload["format"] = schema
+        start = time.time()
+        body = None
+        error = False
+        try:
+            response = self.session.post(f"{host}/api/generate", json=payload, timeout=self.timeout)
+            error = response.status_code >= 500
+            if response.status_code == 200:
+                body = response.json()
+            else:
+                set_error(info, f"HTTP {response.status_code}")
+        except requests.RequestException as e:
+            error = True
+            set_error(info, e)
+        except ValueError:
+            set_error(info, "bad_json")
+        finally:
+            self._observe(start, error or body is None)
+        if body is None:
+            return None
+        return ollama_completion(body, model, time.time() - start)
+
+    def ping(self):
+        if self.pool is not None:
+            return self.pool.check() > 0
+        try:
+            return self.session.get(f"{self.host}/api/tags", timeout=5).status_code == 200
+        except requests.RequestException:
+            return False
+
+
+class OpenAIChatBackend(_HTTPBackend):
+    """OpenAI-compatible /chat/completions under base_url (e.g. http://localhost:8000/v1 for vLLM)."""
+
+    name = "openai"
+    schema_format = "json_schema"  # response_format type sent with a schema
+
+    def __init__(self, base_url, models=(), api_key=None, system=None, limiter=None, timeout=60,
+                 controller=None):
+        super().__init__(models, timeout, controller)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.system = system  # system message sent before each prompt
+        self.limiter = limiter  # RateLimiter shared by every caller, or None
+
+    def payload(self, model, prompt, options, schema):
+        options = options or {}
+        messages = [{"role": "user", "content": prompt}]
+        if self.system:
+            messages.insert(0, {"role": "system", "content": self.system})
+        payload = {"model": model, "messages": messages}
+        for key in ("temperature", "top_p", "seed"):
+            if options.get(key) is not None:
+                payload[key] = options[key]
+        if options.get("num_predict"):
+            payload["max_tokens"] = options["num_predict"]
+        if schema is not None:
+            if self.schema_format == "json_schema":
+                payload["response_format"] = {"type": "json_schema",
+                                              "json_schema": {"name": "mcq_batch", "schema": schema}}
+            else:
+                payload["response_format"] = {"type": self.schema_format}
+        return payload
+
+    def complete(self, model, prompt, options=None, schema=None, info=None):
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        start = time.time()
+        reserved = self.limiter.acquire() if self.limiter else 0
+        add_wait(info, time.time() - start)
+        start = time.time()
+        response = None
+        used = None
+        error = False
+        try:
+            response = self.session.post(f"{self.base_url}/chat/completions",
+                                         json=self.payload(model, prompt, options, schema),
+                                         headers=headers, timeout=self.timeout)
+            error = response.status_code >= 500
+            if response.status_code == 429:
+                set_error(info, "rate_limited")
+                self.stats["rate_limited"] += 1
+                if self.limiter:
+                    delay = self.limiter.rate_limited(reserved, response.headers)
+                    reserved = None
+                    print(f"\n⚠️ Rate limit hit, all requests paused {delay:.1f}s")
+                return None
+            body = response.json()
+            if response.status_code == 400:
+                return self._failed_generation(model, body, start, info)
+            if response.status_code != 200:
+                set_error(info, f"HTTP {response.status_code}")
+                return None
+            usage = body.get("usage") or {}
+            used = usage.get("total_tokens")
+            choice = body["choices"][0]
+            return {
+                "backend": self.name,
+                "model": model,
+                "text": choice["message"].get("content") or "",
+                "finish_reason": choice.get("finish_reason"),
+                "prompt_tokens": usage.get("prompt_tokens"),
+                "completion_tokens": usage.get("completion_tokens"),
+                "elapsed": time.time() - start,
+                "load_duration": 0,
+                "eval_duration": usage["completion_time"] * 1e9 if usage.get("completion_time") else None,
+            }
+        except requests.RequestException as e:
+            error = True
+            set_error(info, e)
+            return None
+        except (ValueError, KeyError, IndexError):
+            set_error(info, "bad_response")
+            return None
+        finally:
+            if self.limiter and reserved is not None:
+                self.limiter.settle(reserved, used, response.headers if response is not None else None)
+            self._observe(start, error)
+
+    def _failed_generation(self, model, body, start, info=None):
+        """JSON mode rejects output that isn't one complete object (a batch cut off
+        at max_tokens); the partial text comes back as failed_generation."""
+        error = body.get("error", body) if isinstance(body, dict) else {}
+        if error.get("code") != "json_validate_failed":
+            print(f"\n❌ Error: {str(error.get('message', error))[:50]}")
+            set_error(info, "HTTP 400")
+            return None
+        self.stats["json_failed"] += 1
+        return {
+            "backend": self.name,
+            "model": model,
+            "text": error.get("failed_generation") or "",
+            "finish_reason": "length",
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "elapsed": time.time() - start,
+            "load_duration": 0,
+            "eval_duration": None,
+        }
+
+
+class GroqBackend(OpenAIChatBackend):
+    """Groq's OpenAI-compatible API (GROQ_BASE_URL in the environment points it at a stand-in)."""
+
+    name = "groq"
+    schema_format = "json_object"  # JSON mode; the schema itself goes in the prompt
+
+    def __init__(self, models=("llama-3.1-8b-instant",), api_key=None, system=None, limiter=None, timeout=60,
+                 controller=None):
+        base = os.environ.get("GROQ_BASE_URL") or GROQ_HOST
+        super().__init__(f"{base.rstrip('/')}/openai/v1", models, api_key or os.environ.get("GROQ_API_KEY"),
+                         system, limiter, timeout, controller)
+
+
+_COUNT = re.compile(r"exactly (\d+)")
+_SYLLABLES = ["ka", "ri", "to", "ne", "sa", "mu", "lo", "pe", "di", "va", "go", "hi", "ra", "no", "tu", "be",
+              "ch", "ma", "si", "ko", "la", "de", "pu", "ta", "mi", "jo", "re", "su", "ba", "ni", "te", "ga"]
+
+
+class FakeBackend(Backend):
+    """Deterministic in-process backend for harness runs and tests.
+
+    Answers a prompt asking for "exactly N" questions with N distinct MCQs
+    whose words are drawn from a RNG seeded by (seed, model, prompt,
+    options), so the same request always gets the same answer. Without a
+    seed in the options, repeats of a request get the next answer in line.
+    `malformed` of the free-text questions have options as a list; output
+    longer than num_predict (4 characters per token) is cut off.
+    """
+
+    name = "fake"
+
+    def __init__(self, models=("fake-small", "fake-large"), seed=0, malformed=0.0, latency=0.0, token_latency=0.0,
+                 controller=None):
+        super().__init__(models, controller)
+        self.seed = seed
+        self.malformed = malformed
+        self.latency = latency
+        self.token_latency = token_latency
+        self._repeats = Counter()
+        self._lock = threading.Lock()
+
+    def _rng(self, model, prompt, options):
+        options = dict(options or {})
+        if options.get("seed") is None:
+            key = (model, prompt, json.dumps(options, sort_keys=True))
+            with self._lock:
+                options["seed"] = f"repeat-{self._repeats[key]}"
+                self._repeats[key] += 1
+        raw = json.dumps([self.seed, model, prompt, options], sort_keys=True)
+        return random.Random(hashlib.sha256(raw.encode("utf-8")).digest())
+
+    @staticmethod
+    def _words(rng, n):
+        return " ".join("".join(rng.choice(_SYLLABLES) for _ in range(rng.randint(2, 3))) for _ in range(n))
+
+    def _question(self, rng, n):
+        options = {k: self._words(rng, 2) for k in OPTION_KEYS}
+        q = {
+            "question": f"Q{n}: which {self._words(rng, 6)}?",
+            "options": options,
+            "correctAnswer": rng.choice(OPTION_KEYS),
+            "explanation": self._words(rng, 8),
+        }
+        if rng.random() < self.malformed:
+            q["options"] = list(options.values())
+        return q
+
+    def complete(self, model, prompt, options=None, schema=None, info=None):
+        start = time.time()
+        rng = self._rng(model, prompt, options)
+        match = _COUNT.search(prompt)
+        count = int(match.group(1)) if match else 1
+        questions = [self._question(rng, n + 1) for n in range(count)]
+        if schema is not None:
+            # Constrained decoding never writes a malformed question
+            for q in questions:
+                if isinstance(q["options"], list):
+                    q["options"] = dict(zip(OPTION_KEYS, q["options"]))
+            text = json.dumps({"questions": questions}, ensure_ascii=False)
+        else:
+            text = json.dumps(questions, ensure_ascii=False, indent=1)
+        tokens = (len(text) + 3) // 4
+        limit = (options or {}).get("num_predict")
+        reason = "stop"
+        if limit and tokens > limit:
+            text, tokens, reason = text[:limit * 4], limit, "length"
+        delay = self.latency + tokens * self.token_latency
+        if delay:
+            time.sleep(delay)
+        self._observe(start, False)
+        return {
+            "backend": self.name,
+            "model": model,
+            "text": text,
+            "finish_reason": reason,
+            "prompt_tokens": (len(prompt) + 3) // 4,
+            "completion_tokens": tokens,
+            "elapsed": time.time() - start,
+            "load_duration": 0,
+            "eval_duration": delay * 1e9 if delay else None,
+        }
+
+    def ping(self):
+        return True
+
+
+def make_backend(spec, models=None, **kwargs):
+    """Backend from a --backend value: "ollama[=host]", "groq", "openai=<base url>" or "fake[=seed]".
+
+    `models` overrides the backend's default model list; other keyword
+    arguments go to the adapter (keep_alive, limiter, system, ...).
+    """
+    kind, _, arg = spec.partition("=")
+    if kind == "ollama":
+        return OllamaBackend(arg or DEFAULT_OLLAMA_HOST, models or (), **kwargs)
+    if kind == "groq":
+        # Free-tier llama-3.1-8b-instant limits unless the caller brings its own limiter
+        kwargs.setdefault("limiter", RateLimiter(30, 6000))
+        return GroqBackend(models or ("llama-3.1-8b-instant",), **kwargs)
+    if kind == "openai":
+        if not arg:
+            raise ValueError("openai backend needs a base URL: openai=http://host:8000/v1")
+        return OpenAIChatBackend(arg, models or (os.environ.get("OPENAI_MODEL", "default"),),
+                                 api_key=os.environ.get("OPENAI_API_KEY"), **kwargs)
+    if kind == "fake":
+        return FakeBackend(models or ("fake-small", "fake-large"), seed=int(arg or 0), **kwargs)
+    raise ValueError(f"unknown backend: {spec!r} (ollama, groq, openai=<url>, fake)")
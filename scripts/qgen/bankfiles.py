@@ -0,0 +1,142 @@
+"""
+Streaming bank file I/O
+=======================
+Read and write question lists one record at a time, so a tool that walks
+the whole bank (merge, export) holds one question, not the file:
+
+- iter_questions(path):  records of a JSON list, a {"questions": [...]}
+                         wrapper (firestore_data.json) or a JSONL journal;
+                         a JSON list is decoded element by element from
+                         CHUNK-sized reads (json.JSONDecoder.raw_decode)
+- JsonListWriter(path):  writes records as they come, byte-identical to
+                         atomic_write_json(path, records) (indent=2), via
+                         a temp file renamed into place on close
+
+    with JsonListWriter(out) as w:
+        for q in iter_questions(a):
+            w.write(q)
+"""
+
+import json
+import os
+import stat
+import tempfile
+from pathlib import Path
+
+from qgen.records import as_json
+
+CHUNK = 1 << 16
+_WHITESPACE = " \t\r\n"
+_UMASK = os.umask(0)  # read once: os.umask can only be read by setting it
+os.umask(_UMASK)
+
+
+def iter_questions(path, object_hook=None, chunk=CHUNK):
+    """Yield the records of a question file without loading it whole."""
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line, object_hook=object_hook)
+        return
+
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    with open(path, "r", encoding="utf-8") as f:
+        buf = f.read(chunk)
+        pos = _skip(buf, 0)
+        if buf[pos:pos + 1] != "[":
+            # Not a bare list (e.g. the firestore wrapper): small, load it whole
+            f.seek(0)
+            data = json.load(f, object_hook=object_hook)
+            yield from data.get("questions", []) if isinstance(data, dict) else []
+            return
+        pos += 1
+        eof = False
+        while True:
+            pos = _skip(buf, pos)
+            if buf[pos:pos + 1] == "]":
+                return
+            if buf[pos:pos + 1] == ",":
+                pos = _skip(buf, pos + 1)
+            try:
+                if pos >= len(buf):
+                    raise ValueError("need more input")
+                obj, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise ValueError(f"{path.name}: truncated or malformed JSON list near offset {pos}")
+                more = f.read(chunk)
+                eof = not more
+                buf, pos = buf[pos:] + more, 0
+                continue
+            yield obj
+            pos = end
+
+
+def file_mode(path):
+    """Permissions for a file about to replace `path`: the existing file's, else
+    what open(path, "w") would create. mkstemp files are 0600, and os.replace keeps that."""
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def set_mode(fd, path):
+    if hasattr(os, "fchmod"):  # not on Windows
+        os.fchmod(fd, file_mode(path))
+
+
+def list_item(record):
+    """One record as json.dump(records, indent=2) lays it out inside the list."""
+    return "  " + json.dumps(record, indent=2, ensure_ascii=False, default=as_json).replace("\n", "\n  ")
+
+
+def _skip(buf, pos):
+    while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+class JsonListWriter:
+    """Incremental json.dump(records, indent=2) into a temp file, renamed over `path` on close."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.count = 0
+        self._file = None
+        self._tmp = None
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(prefix=f".{self.path.name}.", suffix=".tmp", dir=self.path.parent)
+        set_mode(fd, self.path)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._file.write("[")
+        return self
+
+    def write(self, record):
+        """Append one record; returns its encoded text (reusable with write_encoded)."""
+        text = list_item(record)
+        self.write_encoded(text)
+        return text
+
+    def write_encoded(self, text):
+        """Append a record already encoded by write() (e.g. the same record going to two files)."""
+        self._file.write(("\n" if self.count == 0 else ",\n") + text)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self._file.write("\n]" if self.count else "]")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            self._file.close()
+            if exc_type is None:
+                os.replace(self._tmp, self.path)
+        finally:
+            if os.path.exists(self._tmp):
+                os.unlink(self._tmp)
+        return False
@@ -0,0 +1,95 @@
+"""
+Incremental bank statistics
+===========================
+What a checkpoint writes into index.json, and what the progress line
+needs for its ETA, kept up to date one question / one call at a time, so
+neither has to walk the bank:
+
+- cells:    questions per (subject, topic, subtopic, difficulty) for the
+            whole bank - seeded from index.json (or one pass over the
+            snapshot) at startup; subject and difficulty totals are
+            summed from these (a few hundred cells, not N questions)
+- pending:  questions per subject since the last checkpoint, so only
+            those subjects' files are rewritten
+- latency:  the last `window` call times with a running sum (O(1) mean)
+
+    bank = BankStats(load_cell_counts(index_path, bank_path, existing_count))
+    bank.add(question)            # accepted
+    bank.observe(elapsed)         # one call finished
+    eta = bank.mean_latency() * calls_left
+    for subject, added in bank.take_pending().items(): ...
+    atomic_write_json(index_path, bank.index())
+"""
+
+import re
+from collections import Counter, defaultdict, deque
+from datetime import datetime
+
+from qgen.planner import cell_of_question, cells_to_json
+
+
+def subject_file(subject):
+    """Per-subject JSON file name, e.g. "Odisha GK" -> odisha_gk.json."""
+    return re.sub(r'[^a-z0-9]', '_', subject.lower()) + '.json'
+
+
+class BankStats:
+    """Bank composition and call-latency window, O(1) per accepted question or call."""
+
+    def __init__(self, cells=None, window=50):
+        self.cells = Counter(cells or {})
+        self.pending = defaultdict(list)
+        self._times = deque(maxlen=window)
+        self._time_sum = 0.0
+
+    def __len__(self):
+        return sum(self.cells.values())
+
+    def add(self, question):
+        self.cells[cell_of_question(question)] += 1
+        self.pending[question["subject"]].append(question)
+
+    def add_many(self, questions):
+        for q in questions:
+            self.add(q)
+
+    def observe(self, elapsed):
+        if len(self._times) == self._times.maxlen:
+            self._time_sum -= self._times[0]
+        self._times.append(elapsed)
+        self._time_sum += elapsed
+
+    def mean_latency(self):
+        """Mean of the last `window` call times (None before the first call)."""
+        return self._time_sum / len(self._times) if self._times else None
+
+    def recent_latencies(self):
+        return list(self._times)
+
+    def take_pending(self):
+        """{subject: questions added since the last call}, and start a new checkpoint."""
+        pending, self.pending = self.pending, defaultdict(list)
+        return pending
+
+    def by_subject(self):
+        counts = Counter()
+        for cell, n in self.cells.items():
+            counts[cell[0]] += n
+        return counts
+
+    def by_difficulty(self):
+        counts = Counter()
+        for cell, n in self.cells.items():
+            counts[cell[3]] += n
+        return counts
+
+    def index(self):
+        """index.json contents for the bank as it stands."""
+        return {
+            "totalQuestions": len(self),
+            "generatedAt": datetime.now().isoformat(),
+            "subjects": [{"name": s, "count": n, "file": subject_file(s)} for s, n in self.by_subject().items()],
+            "difficultyBreakdown": dict(self.by_difficulty()),
+            # Per-cell counts, so the next run can plan without parsing the bank
+            "cells": cells_to_json(self.cells),
+        }
@@ -0,0 +1,109 @@
+"""
+Adaptive concurrency (AIMD)
+===========================
+A fixed MAX_WORKERS is either too low (the GPU idles between requests)
+or too high (requests queue inside Ollama, latency balloons and the queue
+limit answers 503). The controller finds the server's parallel capacity
+(OLLAMA_NUM_PARALLEL x servers) at runtime, the same way TCP finds a
+link's bandwidth:
+
+- slow start: +1 per completion (doubling per window) until the first
+  sign of trouble, so a 64-slot server is found in a few windows
+- additive increase: +1 in-flight request per window of completions
+  while latency holds near the best seen so far
+- multiplicative decrease: x0.5 on a timeout / 5xx / connection error;
+  a gentler x0.8 when smoothed latency climbs past `tolerance` x baseline
+  (requests are queueing, i.e. we are past the server's parallel slots)
+- at most one decrease per window, so one burst of failures from the
+  same cohort of requests only counts once
+
+The submit loops keep `controller.current` requests in flight, and the
+HTTP layer calls controller.observe(latency, error) per response.
+
+    controller = AIMDController(initial=4, maximum=64)
+    ...
+    controller.observe(time.time() - start, error=status >= 500)
+    print(controller.summary())
+"""
+
+import threading
+import time
+
+
+class AIMDController:
+    """Additive-increase / multiplicative-decrease limit on requests in flight."""
+
+    def __init__(self, initial=4, minimum=1, maximum=64, backoff=0.5, latency_backoff=0.8,
+                 tolerance=1.5, alpha=0.2):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.tolerance = tolerance
+        self.alpha = alpha
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.latency = None  # smoothed (EWMA) latency
+        self.baseline = None  # best smoothed latency seen: what an unqueued request costs
+        self.knee = None  # in-flight count at which latency last started climbing
+        self.stats = {"ok": 0, "errors": 0, "backoffs": 0, "peak": int(self.limit)}
+        self._since_cut = 0
+        self._slow_start = True
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.history = [(0.0, int(self.limit))]  # (seconds since start, limit) on every change
+
+    @property
+    def current(self):
+        """How many requests the submit loop may have in flight right now."""
+        return int(self.limit)
+
+    def observe(self, latency, error=False):
+        """Feed one finished request: its latency (s) and whether it failed for capacity reasons."""
+        with self._lock:
+            before = int(self.limit)
+            self._since_cut += 1
+            if error:
+                self.stats["errors"] += 1
+                self._decrease(self.backoff)
+            else:
+                self.stats["ok"] += 1
+                self.latency = latency if self.latency is None else \
+                    self.latency + (latency - self.latency) * self.alpha
+                if self.baseline is None or self.latency < self.baseline:
+                    self.baseline = self.latency
+                else:
+                    # Let the baseline follow slow drift (longer prompts, other load)
+                    self.baseline += (self.latency - self.baseline) * 0.01
+                if self.latency > self.baseline * self.tolerance:
+                    if self._decrease(self.latency_backoff):
+                        self.knee = before
+                else:
+                    step = 1.0 if self._slow_start else 1.0 / self.limit
+                    self.limit = min(self.maximum, self.limit + step)
+            after = int(self.limit)
+            if after != before:
+                self.history.append((time.monotonic() - self._start, after))
+                self.stats["peak"] = max(self.stats["peak"], after)
+
+    def _decrease(self, factor):
+        if self._since_cut < self.current:
+            return False  # same window as the last cut
+        self.limit = max(float(self.minimum), self.limit * factor)
+        self._since_cut = 0
+        self._slow_start = False
+        self.stats["backoffs"] += 1
+        return True
+
+    def timeline(self, points=12):
+        """Compact "t=..s:N" view of how the limit moved."""
+        hist = self.history
+        if len(hist) > points:
+            step = len(hist) / points
+            hist = [hist[int(i * step)] for i in range(points)] + [hist[-1]]
+        return " ".join(f"{t:.1f}s:{n}" for t, n in hist)
+
+    def summary(self):
+        s = self.stats
+        knee = f", latency knee at ~{self.knee}" if self.knee else ""
+        return (f"concurrency {self.history[0][1]} -> {self.current} (peak {s['peak']}{knee}), "
+                f"{s['backoffs']} backoffs, {s['errors']} errors")
@@ -0,0 +1,214 @@
+"""
+Near-duplicate detection (MinHash + LSH)
+========================================
+Replaces md5(first 80-100 chars) dedup, which misses reworded stems and
+wrongly merges long questions that share a preamble.
+
+- Text is NFC-normalized (Odia vowel signs and conjuncts compare equal
+  however the model encoded them), case-folded, stripped of punctuation
+  (symbols like △ or © are kept - they are the question in figure items).
+- The whole stem is shingled into character 5-grams, so paraphrases share
+  most shingles and Odia needs no word segmentation.
+- Signatures use one-permutation MinHash (one hash per shingle, binned,
+  empty bins densified), so signing costs O(len(text)) in pure Python.
+- LSH banding (16 bands x 4 rows) gives candidate lookups that do not grow
+  with the bank; only candidates are verified.
+- Option-aware: two stems that look alike are only duplicates if their
+  option sets mostly match and the correct option's text is the same
+  ("antonym of 'Hot'" vs "antonym of 'Clean'" share a stem pattern and
+  half the options, but not the answer).
+
+    index = NearDuplicateIndex()
+    if index.check_question(q) is None:
+        ...  # new question
+"""
+
+import re
+import unicodedata
+from array import array
+from zlib import crc32
+
+_MASK64 = (1 << 64) - 1
+_GOLDEN = 0x9E3779B97F4A7C15
+_SPACES = re.compile(r"\s+")
+
+
+class _PunctuationTable(dict):
+    """str.translate table blanking punctuation; categories cached per char."""
+
+    def __missing__(self, code):
+        cat = unicodedata.category(chr(code))
+        value = " " if cat[0] == "P" else code
+        self[code] = value
+        return value
+
+
+_PUNCT = _PunctuationTable()
+
+
+def normalize_text(text):
+    """NFC + casefold + punctuation removal + collapsed whitespace."""
+    text = unicodedata.normalize("NFC", str(text)).casefold()
+    text = text.translate(_PUNCT)
+    return _SPACES.sub(" ", text).strip()
+
+
+def shingles(text, k=5):
+    """Character k-grams of already normalized text."""
+    if len(text) <= k:
+        return {text}
+    return {text[i:i + k] for i in range(len(text) - k + 1)}
+
+
+def minhash(text, num_perm=64, k=5):
+    """One-permutation MinHash signature (array of num_perm uint32)."""
+    empty = 1 << 32
+    sig = [empty] * num_perm
+    for sh in shingles(text, k):
+        h = (crc32(sh.encode("utf-8")) * _GOLDEN) & _MASK64
+        h ^= h >> 31
+        b = h % num_perm
+        v = (h >> 32) & 0xFFFFFFFF
+        if v < sig[b]:
+            sig[b] = v
+    # Densify: empty bins borrow from the next filled bin (rotation)
+    if empty in sig and any(v != empty for v in sig):
+        for j in range(num_perm):
+            if sig[j] == empty:
+                t = 1
+                while sig[(j + t) % num_perm] == empty:
+                    t += 1
+                sig[j] = (sig[(j + t) % num_perm] + t * 0x9E3779B1) & 0xFFFFFFFF
+    elif empty in sig:
+        sig = [0] * num_perm
+    return array("I", sig)
+
+
+def signature_similarity(a, b):
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def option_set(options):
+    """Normalized option texts, ignoring the A-D labels and their order."""
+    if isinstance(options, dict):
+        options = options.values()
+    return frozenset(normalize_text(o) for o in (options or ()) if str(o).strip())
+
+
+def option_similarity(a, b):
+    if not a or not b:
+        return 1.0  # nothing to tell them apart by
+    return len(a & b) / len(a | b)
+
+
+class LSHIndexBase:
+    """Signing, banding and verification shared by the in-memory index and
+    the persistent FingerprintStore (qgen/fingerprints.py). Subclasses only
+    provide storage: _candidates(band_keys) and _insert(...)."""
+
+    def __init__(self, threshold=0.7, option_threshold=0.75, num_perm=64, bands=16, k=5):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.option_threshold = option_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.k = k
+
+    def band_keys(self, sig):
+        """One stable 64-bit bucket id per band (same in every process)."""
+        r = self.rows
+        return [(i << 32) | crc32(sig[i * r:(i + 1) * r].tobytes()) for i in range(self.bands)]
+
+    def signature(self, question):
+        return minhash(normalize_text(question), self.num_perm, self.k)
+
+    def _candidates(self, band_keys):
+        """Yield (key, sig, option_set, answer) for stored docs sharing a bucket."""
+        raise NotImplementedError
+
+    def _insert(self, key, sig, options, answer, band_keys):
+        raise NotImplementedError
+
+    def matches(self, question, options=None, answer=None, sig=None):
+        """Yield the key of every stored near-duplicate."""
+        sig = sig if sig is not None else self.signature(question)
+        opts = option_set(options)
+        answer = normalize_text(answer) if answer else None
+        for key, other_sig, other_opts, other_answer in self._candidates(self.band_keys(sig)):
+            if signature_similarity(sig, other_sig) < self.threshold:
+                continue
+            if option_similarity(opts, other_opts) < self.option_threshold:
+                continue
+            if answer and other_answer and answer != other_answer:
+                continue
+            yield key
+
+    def query(self, question, options=None, answer=None, sig=None):
+        """Return the key of a stored near-duplicate, or None."""
+        return next(self.matches(question, options, answer, sig), None)
+
+    def add(self, key, question, options=None, answer=None, sig=None):
+        sig = sig if sig is not None else self.signature(question)
+        self._insert(key, sig, option_set(options), normalize_text(answer) if answer else None,
+                     self.band_keys(sig))
+
+    def add_question(self, q, key=None):
+        """add() for a question dict in the bank's JSON shape (no dedup check)."""
+        self.add(key if key is not None else q.get("id"), q["question"], q.get("options"), answer_text(q))
+
+    def check_and_add(self, key, question, options=None, answer=None):
+        """Add unless a near-duplicate exists; returns the existing key or None."""
+        sig = self.signature(question)
+        match = self.query(question, options, answer, sig=sig)
+        if match is None:
+            self.add(key, question, options, answer, sig=sig)
+        return match
+
+    def check_question(self, q, key=None):
+        """check_and_add() for a question dict in the bank's JSON shape."""
+        return self.check_and_add(key if key is not None else q.get("id"),
+                                  q["question"], q.get("options"), answer_text(q))
+
+
+class NearDuplicateIndex(LSHIndexBase):
+    """In-memory LSH index of question stems (+ option sets)."""
+
+    def __init__(self, **params):
+        super().__init__(**params)
+        self.keys = []
+        self._sigs = []
+        self._options = []
+        self._answers = []
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _candidates(self, band_keys):
+        seen = set()
+        for bkey in band_keys:
+            for doc in self._buckets.get(bkey, ()):
+                if doc not in seen:
+                    seen.add(doc)
+                    yield self.keys[doc], self._sigs[doc], self._options[doc], self._answers[doc]
+
+    def _insert(self, key, sig, options, answer, band_keys):
+        doc = len(self.keys)
+        self.keys.append(key)
+        self._sigs.append(sig)
+        self._options.append(options)
+        self._answers.append(answer)
+        for bkey in band_keys:
+            self._buckets.setdefault(bkey, []).append(doc)
+
+
+def answer_text(q):
+    """Text of the correct option (falls back to the letter)."""
+    options = q.get("options")
+    letter = q.get("correctAnswer")
+    if isinstance(options, dict) and letter in options:
+        return str(options[letter])
+    return letter
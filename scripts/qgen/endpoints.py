@@ -0,0 +1,347 @@
+"""
+Ollama endpoint pool
+====================
+Spreads one run over several Ollama servers. Every request goes to the
+server expected to answer it first, servers that stop answering are
+taken out of rotation, and calls that failed on one server are re-sent
+to another:
+
+- routing:    least outstanding requests, weighted by observed speed.
+              A server's cost is (outstanding + 1) x its latency EWMA
+              ("peak EWMA"), so one answering twice as fast carries twice
+              the in-flight load. Servers with no answer yet count at the
+              pool's mean latency.
+- breaker:    failure_threshold failures in a row (connection error,
+              timeout, 5xx, bad body) eject a server for `cooldown`
+              seconds, doubled on every ejection in a row up to
+              max_cooldown. After that one live request (half-open) or a
+              passing health check brings it back.
+- health:     start(interval) runs a thread that GETs /api/tags on every
+              server, ejecting the ones that fail (cancelling an async
+              half-open trial stuck on a wedged server) and restoring
+              ejected ones once their cooldown is over.
+- re-queue:   call() / call_async() re-send a failed request to another
+              server (up to `retries` times). Async requests still in
+              flight on a server when it is ejected are cancelled and
+              re-sent at once; blocking ones fail over when their own
+              timeout or connection error comes back.
+
+    pool = EndpointPool(["http://gpu1:11434", "http://gpu2:11434"])
+    pool.start(interval=5)
+    body = pool.call(lambda host: post(f"{host}/api/generate", ...), info)
+    body = await pool.call_async(lambda host: client.generate_raw(..., host=host), info)
+    print(pool.report())
+    pool.close()
+
+A request function gets the server's base URL and returns its result, or
+None if the call failed. info (qgen.trace.call_info) gets the server that
+answered ("endpoint").
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+
+import requests
+
+from qgen.trace import set_error
+
+FAILURE_THRESHOLD = 3  # failures in a row that eject a server
+COOLDOWN = 5.0  # seconds out of rotation after the first ejection
+MAX_COOLDOWN = 60.0
+RETRIES = 2  # extra attempts on other servers per call
+MAX_WAIT = 120.0  # seconds a call waits for any server to come back before giving up
+HEALTH_PATH = "/api/tags"
+HEALTH_TIMEOUT = 2.0
+
+
+class Endpoint:
+    """One server: routing state, breaker state and counters."""
+
+    def __init__(self, url, cooldown=COOLDOWN):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.latency = None  # EWMA of successful call latency
+        self.requests = 0
+        self.failures = 0
+        self.consecutive = 0  # failures in a row
+        self.requeued = 0  # failed calls re-sent to another server
+        self.ejections = 0
+        self.tokens = 0
+        self.token_time = 0.0
+        self.down_until = 0.0  # monotonic time the breaker lets a trial through (0 = in rotation)
+        self.cooldown = cooldown
+        self.probing = False  # a half-open trial request is in flight
+        self.tasks = set()  # (loop, asyncio task) of async calls in flight here
+
+    @property
+    def state(self):
+        if not self.down_until:
+            return "up"
+        return "probing" if self.probing else "down"
+
+
+def _tokens(result):
+    if isinstance(result, dict):
+        return result.get("completion_tokens") or result.get("eval_count")
+    return None
+
+
+class EndpointPool:
+    """Least-outstanding, latency-weighted routing over several servers, with a circuit breaker each."""
+
+    def __init__(self, urls, failure_threshold=FAILURE_THRESHOLD, cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN,
+                 retries=RETRIES, max_wait=MAX_WAIT, alpha=0.2, health_path=HEALTH_PATH,
+                 health_timeout=HEALTH_TIMEOUT, verbose=True):
+        if isinstance(urls, str):
+            urls = [urls]
+        self.endpoints = [Endpoint(url, cooldown) for url in urls]
+        if not self.endpoints:
+            raise ValueError("EndpointPool needs at least one server URL")
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.retries = retries
+        self.max_wait = max_wait
+        self.alpha = alpha
+        self.health_path = health_path
+        self.health_timeout = health_timeout
+        self.verbose = verbose
+        self.gave_up = 0  # calls that found no server within max_wait
+        self._lock = threading.Lock()
+        self._rotation = itertools.count()  # tie-break start for equal costs
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def urls(self):
+        return [e.url for e in self.endpoints]
+
+    @property
+    def up(self):
+        """URLs of the servers currently in rotation."""
+        return [e.url for e in self.endpoints if not e.down_until]
+
+    # ---------- routing ----------
+
+    def acquire(self, exclude=()):
+        """Cheapest server in rotation (or one due for a half-open trial), or None if there is none."""
+        now = time.monotonic()
+        with self._lock:
+            known = [e.latency for e in self.endpoints if e.latency is not None]
+            default = sum(known) / len(known) if known else 1.0
+            first = next(self._rotation)
+            best, best_cost = None, None
+            for i in range(len(self.endpoints)):
+                e = self.endpoints[(first + i) % len(self.endpoints)]
+                if e in exclude or (e.down_until and (now < e.down_until or e.probing)):
+                    continue
+                cost = (e.outstanding + 1) * (e.latency or default)
+                if best is None or cost < best_cost:
+                    best, best_cost = e, cost
+            if best is not None:
+                if best.down_until:
+                    best.probing = True  # this request decides whether it comes back
+                best.outstanding += 1
+            return best
+
+    def release(self, e, elapsed, error, tokens=None, trial=False):
+        """Record how a call routed to `e` went (trial: it was the half-open one); trips or resets its breaker."""
+        with self._lock:
+            e.outstanding -= 1
+            e.requests += 1
+            if trial:
+                e.probing = False
+            if error:
+                e.failures += 1
+                e.consecutive += 1
+                # a failed trial ejects again, unless a health check already did (and cancelled it)
+                if (trial and time.monotonic() >= e.down_until) or \
+                        (not e.down_until and e.consecutive >= self.failure_threshold):
+                    self._eject(e, f"{e.consecutive} failures in a row")
+                return
+            e.consecutive = 0
+            e.latency = elapsed if e.latency is None else e.latency * (1 - self.alpha) + elapsed * self.alpha
+            if tokens:
+                e.tokens += tokens
+                e.token_time += elapsed
+            if e.down_until:
+                self._restore(e)
+
+    def wait_time(self):
+        """Seconds until the first ejected server is due for a trial."""
+        now = time.monotonic()
+        with self._lock:
+            due = [e.down_until - now for e in self.endpoints if e.down_until and not e.probing]
+        return min(max(min(due), 0.05), 1.0) if due else 0.25
+
+    def _eject(self, e, reason):
+        """Take `e` out of rotation (lock held) and cancel its async calls so they re-route."""
+        e.down_until = time.monotonic() + e.cooldown
+        if self.verbose:
+            print(f"\n🔌 {e.url} ejected ({reason}), retrying it in {e.cooldown:.0f}s")
+        e.cooldown = min(e.cooldown * 2, self.max_cooldown)
+        e.ejections += 1
+        for loop, task in list(e.tasks):
+            loop.call_soon_threadsafe(task.cancel)
+
+    def _restore(self, e):
+        e.down_until = 0.0
+        e.cooldown = self.base_cooldown
+        e.consecutive = 0
+        if self.verbose:
+            print(f"\n🔌 {e.url} back in rotation")
+
+    def _next(self, tried):
+        """A server not tried yet for this call, else any server in rotation."""
+        return self.acquire(tried) or self.acquire()
+
+    def _give_up(self, info):
+        with self._lock:
+            self.gave_up += 1
+        set_error(info, "no_endpoint")
+
+    def _resend(self, e, info, attempt, retry):
+        """After a failed attempt on `e`: True if the call goes to another server."""
+        if attempt == self.retries or (retry is not None and not retry()):
+            return False
+        with self._lock:
+            e.requeued += 1
+        if info is not None:
+            info.pop("error", None)
+        return True
+
+    # ---------- calls ----------
+
+    def call(self, request, info=None, retry=None):
+        """request(url) on the best server, re-sent elsewhere on failure; returns its result or None.
+
+        retry() (optional) is asked before each re-send, e.g. a stream may
+        only be re-sent if nothing of it has arrived yet.
+        """
+        tried = []
+        for attempt in range(self.retries + 1):
+            e = self._next(tried)
+            deadline = time.monotonic() + self.max_wait
+            while e is None:  # every server is out: wait for the first one due back
+                if time.monotonic() >= deadline:
+                    self._give_up(info)
+                    return None
+                time.sleep(self.wait_time())
+                e = self.acquire()
+            trial = e.probing  # set by acquire() for this call only
+            if info is not None:
+                info["endpoint"] = e.url
+            start = time.time()
+            result = None
+            try:
+                result = request(e.url)
+            finally:
+                self.release(e, time.time() - start, result is None, _tokens(result), trial)
+            if result is not None or not self._resend(e, info, attempt, retry):
+                return result
+            tried.append(e)
+        return None
+
+    async def call_async(self, request, info=None, retry=None):
+        """Async call(): request(url) returns a coroutine; it is cancelled and re-sent if its server is ejected."""
+        loop = asyncio.get_running_loop()
+        tried = []
+        for attempt in range(self.retries + 1):
+            e = self._next(tried)
+            deadline = time.monotonic() + self.max_wait
+            while e is None:
+                if time.monotonic() >= deadline:
+                    self._give_up(info)
+                    return None
+                await asyncio.sleep(self.wait_time())
+                e = self.acquire()
+            trial = e.probing
+            if info is not None:
+                info["endpoint"] = e.url
+            start = time.time()
+            inner = asyncio.ensure_future(request(e.url))
+            entry = (loop, inner)
+            with self._lock:
+                e.tasks.add(entry)
+            result = None
+            try:
+                await asyncio.wait({inner})
+                if inner.cancelled():
+                    set_error(info, "ejected")
+                else:
+                    result = inner.result()
+            finally:
+                if not inner.done():
+                    inner.cancel()  # we were cancelled ourselves
+                with self._lock:
+                    e.tasks.discard(entry)
+                self.release(e, time.time() - start, result is None, _tokens(result), trial)
+            if result is not None or not self._resend(e, info, attempt, retry):
+                return result
+            tried.append(e)
+        return None
+
+    # ---------- health checks ----------
+
+    def probe(self, url):
+        try:
+            return requests.get(f"{url}{self.health_path}", timeout=self.health_timeout).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def check(self):
+        """One health-check round over every server; returns how many answered."""
+        healthy = 0
+        for e in self.endpoints:
+            ok = self.probe(e.url)
+            healthy += ok
+            with self._lock:
+                due = e.down_until and time.monotonic() >= e.down_until and not e.probing
+                if ok and due:
+                    self._restore(e)
+                elif not ok and (not e.down_until or due or e.probing):
+                    self._eject(e, "health check failed")
+        return healthy
+
+    def start(self, interval=5.0):
+        """Health-check every server each `interval` seconds on a daemon thread (None = no checks)."""
+        if interval and self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._health_loop, args=(interval,), name="qgen-health",
+                                            daemon=True)
+            self._thread.start()
+        return self
+
+    def _health_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.check()
+
+    def close(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    # ---------- reporting ----------
+
+    def summary(self):
+        up = sum(1 for e in self.endpoints if not e.down_until)
+        requeued = sum(e.requeued for e in self.endpoints)
+        ejections = sum(e.ejections for e in self.endpoints)
+        return (f"{len(self.endpoints)} servers, {up} in rotation, {requeued} calls re-sent, "
+                f"{ejections} ejections, {self.gave_up} calls found no server")
+
+    def report(self):
+        """Per-server table: state, share of calls, failures, re-sends, ejections, latency, tokens/s."""
+        total = sum(e.requests for e in self.endpoints) or 1
+        lines = [f"   {'server':<28} {'state':>7} {'calls':>6} {'share':>6} {'failed':>6} {'re-sent':>7} "
+                 f"{'ejected':>7} {'latency':>8} {'tok/s':>7}"]
+        for e in self.endpoints:
+            latency = f"{e.latency:.2f}s" if e.latency is not None else "-"
+            rate = f"{e.tokens / e.token_time:.0f}" if e.token_time else "-"
+            lines.append(f"   {e.url:<28} {e.state:>7} {e.requests:>6} {e.requests / total:>6.0%} "
+                         f"{e.failures:>6} {e.requeued:>7} {e.ejections:>7} {latency:>8} {rate:>7}")
+        lines.append(f"   {self.summary()}")
+        return "\n".join(lines)
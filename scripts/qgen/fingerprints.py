@@ -0,0 +1,210 @@
+"""
+Persistent fingerprint index (SQLite)
+=====================================
+On-disk version of NearDuplicateIndex shared by every generator script,
+so a run starts without json.load-ing the whole bank just to rebuild the
+dedup set, and a question generated by one script is caught as a repeat
+by the others.
+
+- fingerprints: one row per question (signature blob, option set, answer)
+- buckets:      one row per (LSH band bucket, question), indexed
+- sources:      which bank files have been imported, with the size/mtime
+                they had, so a file is only re-read when it changed
+
+The journal is the durable record; this index is rebuilt from it on
+startup (INSERT OR IGNORE) and committed in batches. WAL mode lets
+several generator processes share one file.
+
+    store = FingerprintStore(QUESTIONS_DIR / "fingerprints.sqlite")
+    existing = store.sync_snapshot(QUESTIONS_DIR / "all_questions.json")
+    if store.check_question(q) is None:
+        ...  # new question
+"""
+
+import json
+import sqlite3
+import threading
+from array import array
+from pathlib import Path
+
+from qgen.dedup import LSHIndexBase
+
+DB_FILE = "fingerprints.sqlite"
+SHARED_BANK = "merged_questions.json"  # imported by every generator for cross-script dedup
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fingerprints (
+    doc INTEGER PRIMARY KEY,
+    key TEXT UNIQUE,
+    source TEXT,
+    sig BLOB,
+    options TEXT,
+    answer TEXT
+);
+CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, doc INTEGER);
+CREATE INDEX IF NOT EXISTS buckets_bucket ON buckets(bucket);
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    size INTEGER,
+    mtime_ns INTEGER,
+    count INTEGER
+);
+"""
+
+_OPTION_SEP = "\x1f"
+
+
+class FingerprintStore(LSHIndexBase):
+    """SQLite-backed LSH index; same query/add API as NearDuplicateIndex."""
+
+    def __init__(self, path, source=None, commit_every=200, **params):
+        super().__init__(**params)
+        self.path = Path(path)
+        self.source = source
+        self.commit_every = commit_every
+        self._conn = None
+        self._uncommitted = 0
+        self._lock = threading.RLock()
+
+    # ---------- connection ----------
+
+    @property
+    def conn(self):
+        """Opened on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def commit(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self.conn.execute("SELECT 1 FROM fingerprints WHERE key = ?", (key,)).fetchone() is not None
+
+    # ---------- LSHIndexBase storage ----------
+
+    def _candidates(self, band_keys):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT DISTINCT f.key, f.sig, f.options, f.answer FROM buckets b "
+                "JOIN fingerprints f ON f.doc = b.doc "
+                f"WHERE b.bucket IN ({','.join('?' * len(band_keys))})",
+                band_keys,
+            ).fetchall()
+        for key, sig, options, answer in rows:
+            opts = frozenset(options.split(_OPTION_SEP)) if options else frozenset()
+            yield key, array("I", sig), opts, answer
+
+    def _insert(self, key, sig, options, answer, band_keys):
+        with self._lock:
+            cur = self.conn.execute(
+                "INSERT OR IGNORE INTO fingerprints (key, source, sig, options, answer) VALUES (?, ?, ?, ?, ?)",
+                (key, self.source, sig.tobytes(), _OPTION_SEP.join(sorted(options)), answer),
+            )
+            if cur.rowcount:
+                self.conn.executemany("INSERT INTO buckets (bucket, doc) VALUES (?, ?)",
+                                      [(b, cur.lastrowid) for b in band_keys])
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+
+    def check_and_add(self, key, question, options=None, answer=None):
+        # MinHash outside the lock (pure CPU); query + insert under it so two
+        # threads can't both accept a pair. Callers need no lock of their own.
+        sig = self.signature(question)
+        with self._lock:
+            match = self.query(question, options, answer, sig=sig)
+            if match is None:
+                self.add(key, question, options, answer, sig=sig)
+        return match
+
+    # ---------- syncing with bank files and the journal ----------
+
+    def discard(self, keys):
+        """Forget questions that were indexed but not kept (over a cell's quota)."""
+        with self._lock:
+            for key in keys:
+                row = self.conn.execute("SELECT doc, sig FROM fingerprints WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                doc, sig = row
+                self.conn.executemany("DELETE FROM buckets WHERE bucket = ? AND doc = ?",
+                                      [(b, doc) for b in self.band_keys(array("I", sig))])
+                self.conn.execute("DELETE FROM fingerprints WHERE doc = ?", (doc,))
+                self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+
+    def add_missing(self, questions):
+        """Index questions not present yet (journal replay). Returns how many were new."""
+        added = 0
+        with self._lock:
+            for q in questions:
+                if q.get("id") not in self:
+                    self.add_question(q)
+                    added += 1
+            self.commit()
+        return added
+
+    def sync_snapshot(self, path, source=None):
+        """Make sure a bank file is indexed; returns its question count.
+
+        Only reads the file if its size/mtime differ from the last import,
+        so normally this costs one stat() and one SELECT.
+        """
+        path = Path(path)
+        source = source or path.name
+        if not path.exists():
+            return 0
+        st = path.stat()
+        with self._lock:
+            row = self.conn.execute("SELECT size, mtime_ns, count FROM sources WHERE source = ?",
+                                    (source,)).fetchone()
+            if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+                return row[2]
+
+            with open(path, 'r', encoding='utf-8') as f:
+                questions = json.load(f)
+            previous, self.source = self.source, source
+            try:
+                for q in questions:
+                    if q.get("id") not in self:
+                        self.add_question(q)
+            finally:
+                self.source = previous
+            self.mark_snapshot(path, len(questions), source)
+            return len(questions)
+
+    def mark_snapshot(self, path, count, source=None):
+        """Record that `path` (just written by us) is fully indexed."""
+        path = Path(path)
+        st = path.stat()
+        with self._lock:
+            self.conn.execute("INSERT OR REPLACE INTO sources (source, size, mtime_ns, count) VALUES (?, ?, ?, ?)",
+                              (source or path.name, st.st_size, st.st_mtime_ns, count))
+            self.commit()
+
+    def snapshot_count(self, source):
+        with self._lock:
+            row = self.conn.execute("SELECT count FROM sources WHERE source = ?", (source,)).fetchone()
+        return row[0] if row else 0
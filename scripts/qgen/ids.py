@@ -0,0 +1,116 @@
+"""
+Question IDs
+============
+q_{ms timestamp}_{random 4 digits} collides whenever one batch yields
+several questions in the same millisecond, and the frontend keys its
+question Map by id, so a collision silently drops a question.
+
+IdGenerator hands out q_{ms}_{worker:02d}{seq:04d} instead:
+
+- ms:      wall-clock milliseconds, never going backwards; when the 10000
+           sequence numbers of one millisecond run out it borrows the next
+- worker:  00-99, unique among the processes writing into one bank, from
+           one of three ranges so their allocators can't clash:
+           LOCAL_SLOTS    claim_worker(bank dir): a lock on a slot file in
+                          bank/.id_slots, held until the process exits
+           QUEUE_SLOTS    --worker processes, handed out by the
+                          coordinator's work queue (qgen.workqueue)
+           NOTEBOOK_SLOTS standalone Colab notebooks, which share no
+                          directory to lock in: a random slot per session
+- seq:     per-millisecond counter
+
+IDs keep the old q_<13-digit ms>_<digits> shape, sort by creation time
+as strings, and cost a lock and a few integer ops each.
+
+    claim_worker(QUESTIONS_DIR)
+    new_id()  ->  "q_1769844616088_070000"
+"""
+
+import os
+import socket
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SEQ_LIMIT = 10000  # sequence numbers per worker and millisecond
+LOCAL_SLOTS = range(0, 40)
+QUEUE_SLOTS = range(40, 80)
+NOTEBOOK_SLOTS = range(80, 100)
+SLOT_DIR = ".id_slots"
+
+
+class IdGenerator:
+    """Monotonic, collision-free question IDs for one worker."""
+
+    def __init__(self, worker=None, clock=time.time):
+        self.worker = (LOCAL_SLOTS[os.getpid() % len(LOCAL_SLOTS)] if worker is None else worker) % 100
+        self.clock = clock
+        self._ms = 0
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = int(self.clock() * 1000)
+            if now > self._ms:
+                self._ms, self._seq = now, 0
+            elif self._seq + 1 < SEQ_LIMIT:
+                self._seq += 1
+            else:
+                self._ms, self._seq = self._ms + 1, 0  # borrow the next millisecond
+            return f"q_{self._ms}_{self.worker:02d}{self._seq:04d}"
+
+
+new_id = IdGenerator()
+
+
+_claims = {}  # slot directory -> (slot, open locked file)
+
+
+def set_worker(worker):
+    """Worker number (0-99) for new_id(), e.g. a machine's slot in a distributed run."""
+    new_id.worker = worker % 100
+
+
+def _lock(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def claim_worker(directory, slots=LOCAL_SLOTS):
+    """Take a slot no other live process writing into `directory` holds, and use it for new_id().
+
+    The claim is an OS lock on directory/.id_slots/NN, so it goes away with
+    the process however it ends. Returns the slot; raises RuntimeError if
+    every slot in `slots` is held.
+    """
+    folder = Path(directory) / SLOT_DIR
+    key = str(folder.resolve())
+    if key in _claims:
+        slot = _claims[key][0]
+    else:
+        folder.mkdir(parents=True, exist_ok=True)
+        for slot in slots:
+            fd = os.open(folder / f"{slot:02d}", os.O_RDWR | os.O_CREAT, 0o644)
+            if _lock(fd):
+                os.ftruncate(fd, 0)
+                os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode())
+                _claims[key] = (slot, fd)
+                break
+            os.close(fd)
+        else:
+            raise RuntimeError(f"all {len(slots)} question ID slots in {folder} are held by running generators")
+    set_worker(slot)
+    return slot
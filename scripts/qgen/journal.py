@@ -0,0 +1,324 @@
+"""
+Write-ahead journal for accepted questions
+==========================================
+Every accepted question is appended to a JSONL journal and fsync'd, so a
+crash loses nothing and a save costs O(1) instead of rewriting the whole
+bank. The pretty JSON artifacts (all_questions.json, per-subject files)
+are only written at checkpoints and at exit, after which the journal is
+truncated: fold() appends the new records in place, before each file's
+closing "]", so a checkpoint costs O(questions since the last one).
+Files it can't vouch for are rebuilt atomically (temp file + rename)
+from snapshot + journal instead.
+
+An in-place append is undoable until the journal is truncated: the
+files' old ends are journaled first, and replay() after a crash cuts
+each file back to its end (the questions are still in the journal).
+
+Records are read back as compact qgen.records.Question objects and
+written in the bank's JSON shape (as_json), whichever kind a list holds.
+
+Startup recovery = last compacted snapshot + journal replay. A torn last
+journal line (crash mid-write) is cut off; a corrupt snapshot is moved
+aside instead of being silently replaced by an empty bank.
+"""
+
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from qgen.bankfiles import iter_questions, list_item, set_mode
+from qgen.records import as_json, compact
+
+_APPEND = "__append__"  # journal line: {path: [offset, closing bracket]} before in-place appends
+
+
+def atomic_write_json(path, data, indent=2):
+    """Write JSON via temp file + fsync + rename; readers never see a partial file.
+
+    The file keeps the mode of the one it replaces (a new one gets the umask's).
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        set_mode(fd, path)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False, default=as_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def extend_json_list(path, items):
+    """Append items to a JSON list file (atomic rewrite), skipping ids already there.
+
+    Returns the list's new length. A missing or corrupt file starts empty.
+    """
+    path = Path(path)
+    existing = []
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                existing = json.load(f)
+        except ValueError:
+            existing = []
+    ids = {q.get("id") for q in existing}
+    existing.extend(q for q in items if q.get("id") not in ids)
+    atomic_write_json(path, existing)
+    return len(existing)
+
+
+def list_end(path):
+    """(offset, closing text) of the "]" ending a list as atomic_write_json writes it, else None."""
+    try:
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            f.seek(max(size - 2, 0))
+            end = f.read()
+    except FileNotFoundError:
+        return None
+    if end == b"[]" and size == 2:
+        return 1, "]"
+    if end == b"\n]" and size > 3:
+        return size - 2, "\n]"
+    return None
+
+
+class QuestionJournal:
+    """Append-only JSONL log of questions accepted since the last checkpoint."""
+
+    def __init__(self, path, fsync=True):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._file = None
+        self.appended = 0
+        self.interrupted = False  # replay() found a checkpoint that didn't finish
+        self._lists = {}  # path -> (size, mtime_ns, records) of list files as last written or counted
+
+    def open(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return self
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- writing ----------
+
+    def append(self, question):
+        """Durably record one accepted question."""
+        self.append_many([question])
+
+    def append_many(self, questions):
+        """Durably record several questions with a single fsync."""
+        if not questions:
+            return
+        if self._file is None:
+            self.open()
+        self._file.write("".join(json.dumps(q, ensure_ascii=False, default=as_json) + "\n" for q in questions))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.appended += len(questions)
+
+    def checkpoint(self):
+        """Forget journaled entries once a snapshot containing them is on disk."""
+        if self._file is None:
+            self.open()
+        self._file.truncate(0)
+        self._file.seek(0)
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.interrupted = False
+
+    # ---------- bank files ----------
+
+    def note(self, path, length):
+        """Record that the JSON list at `path` holds `length` records as it is now."""
+        st = os.stat(path)
+        self._lists[str(path)] = (st.st_size, st.st_mtime_ns, length)
+
+    def length(self, path):
+        """Records in the JSON list at `path`: remembered if it hasn't changed, else counted
+        (streamed, once). None if the file is missing or not a list."""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        known = self._lists.get(str(path))
+        if known and known[:2] == (st.st_size, st.st_mtime_ns):
+            return known[2]
+        try:
+            length = sum(1 for _ in iter_questions(path))
+        except ValueError:
+            return None
+        self.note(path, length)
+        return length
+
+    def in_step(self, path, length):
+        """True if records can be appended to `path` in place: it ends the way
+        atomic_write_json writes it and holds `length` records."""
+        return (not self.interrupted and length is not None and list_end(path) is not None
+                and self.length(path) == length)
+
+    def append_lists(self, appends):
+        """Append [(path, records)] to JSON list files in place, byte-identical to rewriting them.
+
+        The files' current ends are journaled (and fsync'd) first, so a crash
+        part-way is undone by replay(); checkpoint() makes the appends final.
+        """
+        appends = [(Path(path), records) for path, records in appends if records]
+        ends = {str(path): list_end(path) for path, _ in appends}
+        if self._file is None:
+            self.open()
+        self._file.write(json.dumps({_APPEND: ends}) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        for path, records in appends:
+            offset, closing = ends[str(path)]
+            length = self.length(path)
+            text = ("\n" if closing == "]" else ",\n") + ",\n".join(list_item(q) for q in records) + "\n]"
+            with open(path, "r+b") as f:
+                f.seek(offset)
+                f.write(text.encode("utf-8"))
+                f.truncate()
+                f.flush()
+                os.fsync(f.fileno())
+            self.note(path, length + len(records))
+
+    def rewrite_list(self, path, records):
+        atomic_write_json(path, records)
+        self.note(path, len(records))
+
+    def fold(self, snapshot_path, new, pending, counts, file_of):
+        """Write the questions journaled since the last checkpoint into the bank files.
+
+        snapshot_path (all_questions.json) gets `new`; pending maps each
+        subject to its share of them and counts to the subject's total, and
+        file_of(subject) names its file. Files in step are appended to in
+        place; a snapshot that isn't (changed by another tool, written
+        compact, or after an interrupted checkpoint) is loaded, merged by id
+        and rewritten as before, and a subject file that isn't is rebuilt
+        from the snapshot. Returns the snapshot's length; checkpoint() still
+        has to follow.
+        """
+        snapshot_path = Path(snapshot_path)
+        if not snapshot_path.exists():
+            self.rewrite_list(snapshot_path, [])
+        before = self.length(snapshot_path)
+        if not self.in_step(snapshot_path, before):
+            questions, _ = self.recover(snapshot_path)
+            self.rewrite_list(snapshot_path, questions)
+            for subject, added in pending.items():
+                path = file_of(subject)
+                if extend_json_list(path, added) != counts[subject]:
+                    self.rewrite_list(path, [q for q in questions if q["subject"] == subject])
+            return len(questions)
+
+        appends, stale = [(snapshot_path, new)], []
+        for subject, added in pending.items():
+            path = file_of(subject)
+            if not path.exists() and counts[subject] == len(added):
+                self.rewrite_list(path, [])
+            if self.in_step(path, counts[subject] - len(added)):
+                appends.append((path, added))
+            else:
+                stale.append(subject)
+        self.append_lists(appends)
+        if stale:
+            # Out of step (missing, edited, ...): rebuild from the snapshot, streamed
+            rebuilt = {subject: [] for subject in stale}
+            for q in iter_questions(snapshot_path, object_hook=compact):
+                if q["subject"] in rebuilt:
+                    rebuilt[q["subject"]].append(q)
+            for subject, questions in rebuilt.items():
+                self.rewrite_list(file_of(subject), questions)
+        return before + len(new)
+
+    # ---------- recovery ----------
+
+    def replay(self):
+        """Return the journaled questions, cutting off a torn trailing line.
+
+        A checkpoint that didn't finish is undone: the files it was
+        appending to are cut back to where they ended, and the next fold()
+        rebuilds them by id, since some may have been rewritten whole.
+        """
+        if not self.path.exists():
+            return []
+        questions = []
+        good_bytes = 0
+        with open(self.path, "rb") as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    break  # torn write at crash time
+                try:
+                    entry = json.loads(raw, object_hook=compact)
+                except ValueError:
+                    break
+                if isinstance(entry, dict) and _APPEND in entry:
+                    self._undo(entry[_APPEND])
+                    break
+                questions.append(entry)
+                good_bytes += len(raw)
+        if good_bytes != self.path.stat().st_size:
+            with open(self.path, "r+b") as f:
+                f.truncate(good_bytes)
+        return questions
+
+    def _undo(self, ends):
+        for path, (offset, closing) in ends.items():
+            if os.path.exists(path):
+                with open(path, "r+b") as f:
+                    f.seek(offset)
+                    f.write(closing.encode("utf-8"))
+                    f.truncate()
+                    f.flush()
+                    os.fsync(f.fileno())
+        self.interrupted = True
+        print(f"♻️  Undid an interrupted checkpoint ({len(ends)} files cut back)")
+
+    def recover(self, snapshot_path):
+        """Load snapshot + journal. Returns (questions, replayed_count).
+
+        Journal entries already present in the snapshot (crash between the
+        compaction rename and the journal truncate) are skipped by id.
+        """
+        snapshot_path = Path(snapshot_path)
+        questions = []
+        if snapshot_path.exists():
+            try:
+                with open(snapshot_path, "r", encoding="utf-8") as f:
+                    questions = json.load(f, object_hook=compact)
+            except ValueError:
+                aside = snapshot_path.with_name(f"{snapshot_path.name}.corrupt-{int(time.time())}")
+                os.replace(snapshot_path, aside)
+                print(f"⚠️ {snapshot_path.name} is corrupt - moved to {aside.name}, recovering from journal")
+                questions = []
+
+        seen = {q.get("id") for q in questions}
+        replayed = 0
+        for q in self.replay():
+            if q.get("id") in seen:
+                continue
+            seen.add(q.get("id"))
+            questions.append(q)
+            replayed += 1
+        return questions, replayed
@@ -0,0 +1,268 @@
+"""
+Incremental MCQ scanner
+=======================
+Feeds on model output as it arrives (token by token or all at once) and
+emits every {"question": ...} object the moment its closing brace is
+seen. The scanner is string-aware (braces inside "..." don't count) and
+only calls json.loads once per complete question object, so a whole
+response is processed in a single linear pass. Quotes in prose outside
+any object are ignored, so an unbalanced " in a preamble can't swallow
+the JSON after it; so are "{" in prose that aren't followed by a key.
+
+    scanner = MCQStreamScanner()
+    for chunk in tokens:
+        for q in scanner.feed(chunk):
+            ...
+        if scanner.garbage:
+            break
+
+extract_mcqs(text) does the same job for a finished response and replaces
+the generators' regex parsers (greedy [\s\S]* matches that break on prose
+after the array, and [^{}]* fallbacks that can't see nested "options").
+A batch cut off by num_predict still yields every question that closed;
+scan_mcqs() also says whether the text was cut off.
+"""
+
+import json
+import re
+
+# Characters that matter outside / inside a JSON string
+_OUTSIDE = re.compile(r'[{}":]')
+_INSIDE = re.compile(r'["\\]')
+_SPACE = re.compile(r'\s*')
+
+# extract_mcqs(): object boundaries, and the rest of a string after its opening quote
+_OBJECT_SCAN = re.compile(r'[{}"]')
+_STRING_TAIL = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_KEY_AHEAD = re.compile(r'\s*"')  # what follows the "{" of an object with keys
+_decoder = json.JSONDecoder()
+
+REQUIRED_FIELDS = ("question", "options", "correctAnswer")
+
+
+def is_valid_mcq(obj):
+    """Minimal shape check shared by the generators."""
+    return isinstance(obj, dict) and all(k in obj for k in REQUIRED_FIELDS)
+
+
+class MCQStreamScanner:
+    """Single-pass, brace-balanced scanner for question objects.
+
+    max_gap: prose characters allowed between objects before the output
+             is declared garbage.
+    max_object: size of one object before it is declared runaway garbage.
+    max_failures: objects that look like questions but fail json.loads.
+    """
+
+    def __init__(self, max_gap=2000, max_object=8000, max_failures=2):
+        self.max_gap = max_gap
+        self.max_object = max_object
+        self.max_failures = max_failures
+        self.text = ""
+        self.consumed = 0  # chars of the full output dropped from self.text
+        self._pos = 0
+        self._stack = []  # [start index, has "question" key]
+        self._in_str = False
+        self._str_start = 0
+        self._key = None  # last closed string, if it may be a key
+        self._gap_start = 0  # absolute offset where the current prose gap began
+        self._last_found = 0
+        self.found = 0
+        self.failures = 0
+
+    @property
+    def garbage(self):
+        if self.failures >= self.max_failures:
+            return True
+        if self._stack:
+            since = max(self.consumed + self._stack[0][0], self._last_found)
+            return self.consumed + self._pos - since > self.max_object
+        return self.consumed + self._pos - self._gap_start > self.max_gap
+
+    @property
+    def open_objects(self):
+        """Nesting depth at the current position (>0 means mid-object)."""
+        return len(self._stack)
+
+    def feed(self, chunk):
+        """Add text and return the question dicts completed by it."""
+        self.text += chunk
+        found = list(self._scan())
+        if not self._stack:
+            # Nothing open: drop the scanned prefix so memory stays bounded
+            drop = self._str_start - 1 if self._in_str else self._pos
+            if drop > 0:
+                self.text = self.text[drop:]
+                self.consumed += drop
+                self._pos -= drop
+                self._str_start -= drop
+        return found
+
+    def _scan(self):
+        text = self.text
+        pos = self._pos
+        end = len(text)
+        while pos < end:
+            if self._in_str:
+                m = _INSIDE.search(text, pos)
+                if not m:
+                    pos = end
+                    break
+                pos = m.start()
+                if text[pos] == "\\":
+                    if pos + 1 >= end:
+                        break  # escape split across chunks; wait for more
+                    pos += 2
+                    continue
+                self._in_str = False
+                self._key = text[self._str_start:pos]
+                pos += 1
+                continue
+
+            m = _OUTSIDE.search(text, pos)
+            if not m:
+                pos = end
+                break
+            pos = m.start()
+            ch = text[pos]
+            if ch == '"':
+                if not self._stack:
+                    pos += 1
+                    continue  # prose between objects, not a JSON string
+                self._in_str = True
+                self._str_start = pos + 1
+                self._key = None
+            elif ch == ":":
+                if self._key == "question" and self._stack:
+                    self._stack[-1][1] = True
+                self._key = None
+            elif ch == "{":
+                if not self._stack:
+                    ahead = _SPACE.match(text, pos + 1).end()
+                    if ahead == end:
+                        break  # can't tell an object from prose yet; wait for more
+                    if text[ahead] != '"':
+                        pos += 1
+                        continue  # a "{" in prose, not an object with keys
+                self._stack.append([pos, False])
+                self._key = None
+            else:  # "}"
+                self._key = None
+                if self._stack:
+                    start, has_question = self._stack.pop()
+                    if has_question:
+                        obj = self._load(text[start:pos + 1])
+                        if obj is not None:
+                            self.found += 1
+                            self._last_found = self.consumed + pos + 1
+                            yield obj
+                    if not self._stack:
+                        self._gap_start = self.consumed + pos + 1
+            pos += 1
+        self._pos = pos
+
+    def _load(self, raw):
+        try:
+            obj = json.loads(raw)
+        except ValueError:
+            self.failures += 1
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def _collect(value, found):
+    """Question dicts in a decoded value (the value itself, or nested in wrappers/lists)."""
+    if isinstance(value, dict):
+        if "question" in value:
+            found.append(value)
+            return
+        value = value.values()
+    elif not isinstance(value, list):
+        return
+    for item in value:
+        _collect(item, found)
+
+
+def scan_mcqs(text, limit=None):
+    """Every complete {"question": ...} object in a model response, plus
+    whether it was cut off mid-batch: an object left open after the last
+    question decoded, with the text ending inside it. Prose braces and
+    broken objects that close don't count; where the backend reports a
+    finish_reason, that is the better signal (see pipeline.parse_completion).
+
+    Each "{" is handed to the C decoder first, so well-formed objects cost
+    one raw_decode. Only when that fails (an object cut off or broken) is
+    its inside scanned brace by brace, string-aware, for the complete
+    objects it still holds. A failed "{" not followed by a key's opening
+    quote is prose ("a set {1, 2}") and is passed over, and a question
+    that decodes inside a failed one means that one was prose or a broken
+    wrapper, so it stops counting as open. Markdown fences, wrapper
+    objects ({"questions": [...]}) and a truncated tail are skipped.
+    Stops after `limit` objects if given.
+    """
+    found, depth, pos = [], 0, 0
+    while limit is None or len(found) < limit:
+        m = _OBJECT_SCAN.search(text, pos)
+        if not m:
+            break
+        pos = m.end()
+        ch = m.group()
+        if ch == "{":
+            try:
+                value, pos = _decoder.raw_decode(text, m.start())
+            except ValueError:
+                if _KEY_AHEAD.match(text, pos):
+                    depth += 1  # broken or cut off: keep scanning inside it
+                continue
+            before = len(found)
+            _collect(value, found)
+            if len(found) > before:
+                depth = 0  # so only an object opened after it can be reported as cut off
+        elif ch == "}":
+            depth = max(depth - 1, 0)
+        elif depth:
+            end = _STRING_TAIL.match(text, pos)
+            if not end:
+                return found, True  # cut off inside a string
+            pos = end.end()
+    if limit is not None:
+        return found[:limit], False
+    return found, depth > 0
+
+
+def extract_mcqs(text, limit=None):
+    """Every complete {"question": ...} object in a model response, in order (see scan_mcqs)."""
+    return scan_mcqs(text, limit)[0]
+
+
+class StreamCollector:
+    """Glue between a token stream and the generators' accept step.
+
+    Call it with each text chunk; it returns True once the stream should
+    be cancelled - either `want` objects were accepted by on_question(obj)
+    or the output has turned into garbage.
+    """
+
+    def __init__(self, want, on_question, scanner=None):
+        self.want = want
+        self.on_question = on_question
+        self.scanner = scanner or MCQStreamScanner()
+        self.accepted = 0
+        self.chunks = 0
+        self.first_question_at = None
+        self.cancel_reason = None
+
+    def __call__(self, chunk):
+        self.chunks += 1
+        for obj in self.scanner.feed(chunk):
+            if self.first_question_at is None:
+                self.first_question_at = self.chunks
+            if is_valid_mcq(obj) and self.on_question(obj):
+                self.accepted += 1
+                if self.accepted >= self.want:
+                    self.cancel_reason = "enough"
+                    return True
+        if self.scanner.garbage:
+            self.cancel_reason = "garbage"
+            return True
+        return False
@@ -0,0 +1,427 @@
+"""
+Run metrics: Prometheus endpoint + JSON dump
+============================================
+BackendStats answers "how did the run go" once it is over; this answers it
+while the run is going, per backend and model:
+
+- Counter / Gauge / Histogram:  labelled metrics, thread-safe (worker
+                                threads and the event loop both record);
+                                a gauge can also be read from a callback
+                                (writer queue depth, concurrency limit)
+- MetricsRegistry:              renders them as Prometheus text on
+                                http://127.0.0.1:<port>/metrics (and JSON on
+                                /metrics.json), and dumps the JSON to a file
+                                every `interval` seconds and once on stop()
+- RunMetrics:                   the generators' metrics - request latency and
+                                tokens/sec histograms, questions asked for /
+                                parsed / accepted, duplicates, in-flight
+                                requests, queue depth, concurrency limit - and
+                                a p50/p95/p99 report per backend/model
+
+No prometheus_client needed: the text format is a few lines per sample.
+
+    metrics = RunMetrics()
+    run_stats = BackendStats(metrics)            # every call recorded once
+    metrics.start(port=9464, path=QUESTIONS_DIR / "metrics.json")
+    with metrics.in_flight.track():
+        completion = backend.complete(...)
+    metrics.stop()
+    print(metrics.report())
+
+    curl -s localhost:9464/metrics | grep qgen_request_seconds
+"""
+
+import json
+import math
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from qgen.journal import atomic_write_json
+
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 90, 120)
+TOKENS_PER_SECOND_BUCKETS = (5, 10, 20, 40, 80, 160, 320, 640, 1280)
+DUMP_INTERVAL = 30  # seconds between JSON dumps
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """[(label values, value)] sorted by labels."""
+        with self._lock:
+            return sorted(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, value in self.samples():
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return lines
+
+    def to_json(self):
+        return {"type": self.kind, "help": self.help,
+                "samples": [{"labels": dict(zip(self.labelnames, key)), "value": value}
+                            for key, value in self.samples()]}
+
+
+class Counter(_Metric):
+    """Monotonic count per label set."""
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Current value per label set: set / inc / dec, track() around work, or read from a callback."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self._functions = {}
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn, **labels):
+        """Read the value from fn() whenever the gauge is rendered (fn returning None = no sample)."""
+        key = self._key(labels)
+        with self._lock:
+            self._functions[key] = fn
+
+    def track(self, **labels):
+        """Context manager: +1 while the block runs."""
+        gauge = self
+
+        class _Track:
+            def __enter__(self):
+                gauge.inc(**labels)
+
+            def __exit__(self, *exc):
+                gauge.dec(**labels)
+                return False
+
+        return _Track()
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = list(self._functions.items())
+        for key, fn in functions:
+            try:
+                value = fn()
+            except Exception:
+                value = None
+            if value is not None:
+                values[key] = value
+        return sorted(values.items())
+
+
+class Histogram(_Metric):
+    """Bucketed observations per label set (cumulative buckets, sum, count) and quantile estimates."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.bounds = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = {"buckets": [0] * len(self.bounds), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.bounds):
+                if value <= bound:
+                    row["buckets"][i] += 1
+                    break
+            row["sum"] += value
+            row["count"] += 1
+
+    def samples(self):
+        with self._lock:
+            return sorted((key, dict(row, buckets=list(row["buckets"]))) for key, row in self._values.items())
+
+    def quantile(self, q, **labels):
+        """Estimate of the q-quantile (linear within its bucket, like histogram_quantile); None if empty."""
+        with self._lock:
+            row = self._values.get(self._key(labels))
+            if not row or not row["count"]:
+                return None
+            return self._quantile(q, row)
+
+    def _quantile(self, q, row):
+        rank = q * row["count"]
+        seen = 0
+        for i, n in enumerate(row["buckets"]):
+            if n and seen + n >= rank:
+                lower = self.bounds[i - 1] if i else 0.0
+                upper = self.bounds[i]
+                if upper == math.inf:
+                    return lower  # above the last bound: the best we can say
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.bounds[-2]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in self.samples():
+            cumulative = 0
+            for bound, n in zip(self.bounds, row["buckets"]):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [('le', _number(float(bound)))])} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(round(row['sum'], 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {row['count']}")
+        return lines
+
+    def to_json(self):
+        samples = []
+        for key, row in self.samples():
+            sample = {"labels": dict(zip(self.labelnames, key)), "count": row["count"],
+                      "sum": round(row["sum"], 6),
+                      "buckets": {_number(float(b)): n for b, n in zip(self.bounds, row["buckets"])}}
+            for q in (0.5, 0.95, 0.99):
+                value = self._quantile(q, row) if row["count"] else None
+                sample[f"p{round(q * 100)}"] = None if value is None else round(value, 3)
+            samples.append(sample)
+        return {"type": "histogram", "help": self.help, "samples": samples}
+
+
+class MetricsRegistry:
+    """Named metrics, served as Prometheus text over HTTP and dumped to a JSON file."""
+
+    def __init__(self):
+        self.metrics = {}
+        self.port = None
+        self.path = None
+        self.dumps = 0
+        self._server = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def to_json(self):
+        return {"generatedAt": datetime.now().isoformat(),
+                "metrics": {name: metric.to_json() for name, metric in self.metrics.items()}}
+
+    def dump(self):
+        if self.path is not None:
+            atomic_write_json(self.path, self.to_json())
+            self.dumps += 1
+
+    def start(self, port=None, path=None, interval=DUMP_INTERVAL):
+        """Serve /metrics on 127.0.0.1:port (0 = any free port, None = no server) and dump to path."""
+        self.stop()
+        self._stop = threading.Event()
+        self.path = path
+        if port is not None:
+            self._server = ThreadingHTTPServer(("127.0.0.1", port), _handler(self))
+            self._server.daemon_threads = True
+            self.port = self._server.server_address[1]
+            self._spawn(self._server.serve_forever, "qgen-metrics-http")
+        if path is not None and interval:
+            self._spawn(lambda: self._dump_loop(interval), "qgen-metrics-dump")
+        return self
+
+    def stop(self):
+        """Shut the server down, stop dumping and write the final dump."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+        if self._threads or self.path is not None:
+            self.dump()
+        self._threads = []
+        self.path = None
+
+    def _spawn(self, target, name):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _dump_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"⚠️  Metrics dump failed: {e}")
+
+
+def _handler(registry):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            route = self.path.split("?", 1)[0]
+            if route in ("/", "/metrics"):
+                body, kind = registry.render(), "text/plain; version=0.0.4; charset=utf-8"
+            elif route == "/metrics.json":
+                body, kind = json.dumps(registry.to_json(), indent=2), "application/json"
+            else:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # scrapes would drown the progress line
+
+    return Handler
+
+
+class RunMetrics(MetricsRegistry):
+    """The generators' metrics; BackendStats(metrics) feeds observe_call() once per call."""
+
+    def __init__(self):
+        super().__init__()
+        call = ("backend", "model")
+        self.requests = self.counter("qgen_requests_total", "Backend calls by outcome (ok, failed, cached)",
+                                     call + ("outcome",))
+        self.latency = self.histogram("qgen_request_seconds", "Backend call latency (fresh calls)", call)
+        self.tokens = self.counter("qgen_completion_tokens_total", "Completion tokens generated (fresh calls)", call)
+        self.tokens_per_second = self.histogram("qgen_tokens_per_second", "Completion tokens/sec per call", call,
+                                                TOKENS_PER_SECOND_BUCKETS)
+        self.requested = self.counter("qgen_questions_requested_total", "Questions asked for", call)
+        self.parsed = self.counter("qgen_questions_parsed_total", "Schema-valid questions parsed", call)
+        self.accepted = self.counter("qgen_questions_accepted_total", "Questions kept after dedup", call)
+        self.duplicates = self.counter("qgen_duplicates_total", "Parsed questions dropped as near-duplicates",
+                                       ("model",))
+        self.in_flight = self.gauge("qgen_in_flight_requests", "Backend calls in flight")
+        self.queue_depth = self.gauge("qgen_queue_depth", "Work waiting: planned questions not yet asked for "
+                                      "(plan) and jobs queued for the writer thread (writer)", ("queue",))
+        self.concurrency = self.gauge("qgen_concurrency_limit", "In-flight limit (AIMD controller or fixed)")
+
+    def observe_call(self, completion, backend, model, requested, parsed=0, accepted=0, cached=False):
+        """One call as BackendStats.record() sees it; completion None if it failed."""
+        outcome = "failed" if completion is None else "cached" if cached else "ok"
+        self.requests.inc(backend=backend, model=model, outcome=outcome)
+        self.requested.inc(requested, backend=backend, model=model)
+        if completion is None:
+            return
+        self.parsed.inc(parsed, backend=backend, model=model)
+        self.accepted.inc(accepted, backend=backend, model=model)
+        if cached:
+            return  # the latency and tokens were paid by the run that cached it
+        elapsed = completion.get("elapsed")
+        tokens = completion.get("completion_tokens") or 0
+        if elapsed:
+            self.latency.observe(elapsed, backend=backend, model=model)
+            if tokens:
+                self.tokens_per_second.observe(tokens / elapsed, backend=backend, model=model)
+        self.tokens.inc(tokens, backend=backend, model=model)
+
+    def summary_rows(self):
+        """Per backend/model: calls, latency quantiles, tokens/sec, parse yield and duplicate rate."""
+        rows = {}
+        for (backend, model, outcome), n in self.requests.samples():
+            row = rows.setdefault((backend, model), {"backend": backend, "model": model,
+                                                     "ok": 0, "failed": 0, "cached": 0})
+            row[outcome] = n
+        duplicates = {key[0]: n for key, n in self.duplicates.samples()}
+        out = []
+        for (backend, model), row in sorted(rows.items()):
+            labels = {"backend": backend, "model": model}
+            requested = self.requested.value(**labels)
+            parsed = self.parsed.value(**labels)
+            tokens = self.tokens.value(**labels)
+            call_time = dict(self.latency.samples()).get((backend, model), {}).get("sum", 0.0)
+            for q in (0.5, 0.95, 0.99):
+                value = self.latency.quantile(q, **labels)
+                row[f"p{round(q * 100)}"] = None if value is None else round(value, 2)
+            row["tokens_per_sec"] = round(tokens / call_time, 1) if call_time else None
+            row["parse_yield"] = round(parsed / requested, 3) if requested else None
+            row["duplicate_rate"] = round(duplicates.get(model, 0) / parsed, 3) if parsed else None
+            out.append(row)
+        return out
+
+    def to_json(self):
+        return dict(super().to_json(), summary=self.summary_rows())
+
+    def report(self):
+        """One line per backend/model."""
+        lines = []
+        for row in self.summary_rows():
+            tokens = row["tokens_per_sec"]
+            quantiles = " / ".join("-" if row[k] is None else f"{row[k]:.1f}s" for k in ("p50", "p95", "p99"))
+            lines.append(f"   {row['backend']}/{row['model']}: {row['ok']} ok, {row['failed']} failed, "
+                         f"{row['cached']} cached | p50/p95/p99 {quantiles} | "
+                         f"{'-' if tokens is None else f'{tokens:.0f}'} tok/s | "
+                         f"yield {row['parse_yield'] or 0:.0%} | dup {row['duplicate_rate'] or 0:.0%}")
+        return "\n".join(lines)
@@ -0,0 +1,263 @@
+"""
+Asyncio Ollama client
+=====================
+One pooled aiohttp session shared by every request, with keep-alive
+connections and a semaphore bounding how many requests are in flight.
+A single process can keep hundreds of requests open against one or more
+Ollama servers without one thread per request. Several servers are used
+round-robin, or through an EndpointPool (qgen.endpoints: least-loaded
+routing, ejection of failing servers, failed calls re-sent elsewhere).
+
+Requires: pip install aiohttp
+"""
+
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+
+from qgen.trace import add_wait, set_error
+
+DEFAULT_HOST = "http://localhost:11434"
+
+
+class AsyncOllamaClient:
+    """Pooled async client for one or more Ollama servers.
+
+    Use as an async context manager:
+
+        async with AsyncOllamaClient(["http://localhost:11434"], max_in_flight=64) as client:
+            text = await client.generate("llama3:latest", prompt)
+    """
+
+    def __init__(self, hosts=None, max_in_flight=64, timeout=120, keepalive=60, controller=None, pool=None):
+        if isinstance(hosts, str):
+            hosts = [hosts]
+        self.hosts = [h.rstrip("/") for h in (hosts or [DEFAULT_HOST])]
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.keepalive = keepalive
+        self.controller = controller  # AIMDController fed with each response's latency / failure
+        self.pool = pool  # EndpointPool picking the server for each request (None = round-robin over hosts)
+        self._host_cycle = itertools.cycle(self.hosts)
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self._session = None
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.max_in_flight,
+            keepalive_timeout=self.keepalive,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._session.close()
+        self._session = None
+
+    def _observe(self, start, error):
+        if self.controller is not None:
+            self.controller.observe(time.time() - start, error)
+
+    def next_host(self):
+        """Round-robin over the configured servers."""
+        return next(self._host_cycle)
+
+    async def generate_raw(self, model, prompt, options=None, host=None, info=None, **extra):
+        """POST /api/generate and return the decoded JSON body (or None on failure).
+
+        The body carries "response" plus Ollama's timing/token fields
+        (eval_count, eval_duration, ...). Extra keyword arguments are merged
+        into the request payload. info (qgen.trace.call_info) gets the wait
+        for an in-flight slot and, on failure, the error class.
+        """
+        if self.pool is not None and host is None:
+            return await self.pool.call_async(
+                lambda url: self.generate_raw(model, prompt, options, host=url, info=info, **extra), info)
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        url = f"{host or self.next_host()}/api/generate"
+
+        queued = time.time()
+        async with self._semaphore:
+            self.in_flight += 1
+            self.requests += 1
+            start = time.time()
+            add_wait(info, start - queued)
+            try:
+                async with self._session.post(url, json=payload) as resp:
+                    if resp.status != 200:
+                        self.errors += 1
+                        self._observe(start, resp.status >= 500)
+                        set_error(info, f"HTTP {resp.status}")
+                        return None
+                    body = await resp.json(content_type=None)
+                    self._observe(start, False)
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.errors += 1
+                self._observe(start, True)
+                set_error(info, e)
+                return None
+            except ValueError:
+                self.errors += 1
+                set_error(info, "bad_json")
+                return None
+            finally:
+                self.in_flight -= 1
+
+    async def generate(self, model, prompt, options=None, host=None, **extra):
+        """Like generate_raw() but returns only the response text (or None)."""
+        body = await self.generate_raw(model, prompt, options, host=host, **extra)
+        if body is None:
+            return None
+        return body.get("response", "")
+
+    async def generate_stream(self, model, prompt, on_chunk, options=None, host=None, info=None, **extra):
+        """Stream /api/generate, feeding each text fragment to on_chunk(text).
+
+        on_chunk returns True to cancel; the connection is then dropped so
+        Ollama stops decoding. Returns the last NDJSON status object (with
+        "cancelled" set when stopped early) or None on failure. Through a
+        pool, a failed stream is re-sent elsewhere only if nothing of it had
+        arrived yet.
+        """
+        if self.pool is not None and host is None:
+            received = False
+
+            def tracked(text):
+                nonlocal received
+                received = True
+                return on_chunk(text)
+
+            return await self.pool.call_async(
+                lambda url: self.generate_stream(model, prompt, tracked, options, host=url, info=info, **extra),
+                info, retry=lambda: not received)
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        payload.update(extra)
+        url = f"{host or self.next_host()}/api/generate"
+
+        queued = time.time()
+        async with self._semaphore:
+            self.in_flight += 1
+            self.requests += 1
+            start = time.time()
+            add_wait(info, start - queued)
+            first = True
+            try:
+                async with self._session.post(url, json=payload) as resp:
+                    if resp.status != 200:
+                        self.errors += 1
+                        self._observe(start, resp.status >= 500)
+                        set_error(info, f"HTTP {resp.status}")
+                        return None
+                    last = {}
+                    async for line in resp.content:
+                        line = line.strip()
+                        if not line:
+                            continue
+                        if first:
+                            # Time to first token: queueing + load, independent of how early we cancel
+                            self._observe(start, False)
+                            first = False
+                        last = json.loads(line)
+                        if on_chunk(last.get("response", "")):
+                            last["cancelled"] = True
+                            resp.close()
+                            break
+                        if last.get("done"):
+                            break
+                    return last
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                self.errors += 1
+                if first:
+                    self._observe(start, True)
+                set_error(info, e)
+                return None
+            except ValueError:
+                self.errors += 1
+                set_error(info, "bad_json")
+                return None
+            finally:
+                self.in_flight -= 1
+
+    async def tags(self, host=None):
+        """Return the model names installed on a server, or None if unreachable."""
+        url = f"{host or self.hosts[0]}/api/tags"
+        try:
+            async with self._session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                if resp.status != 200:
+                    return None
+                body = await resp.json(content_type=None)
+                return [m["name"] for m in body.get("models", [])]
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+
+
+async def run_tasks(tasks, worker, on_result, should_stop, concurrency):
+    """Asyncio replacement for the ThreadPoolExecutor submit loop.
+
+    Keeps up to `concurrency` worker(task) coroutines running (an int, or a
+    callable re-read after every result, e.g. an AIMD controller's limit), hands each
+    finished result to on_result(task, result, elapsed) on the event loop
+    (so accepting questions needs no lock), and stops submitting once
+    should_stop() is true. Outstanding requests are cancelled on exit.
+    """
+    task_iter = iter(tasks)
+    pending = {}
+    limit = concurrency if callable(concurrency) else (lambda: concurrency)
+
+    async def timed(task):
+        start = time.time()
+        result = await worker(task)
+        return result, time.time() - start
+
+    def submit():
+        if should_stop():
+            return False
+        try:
+            task = next(task_iter)
+        except StopIteration:
+            return False
+        pending[asyncio.ensure_future(timed(task))] = task
+        return True
+
+    def fill():
+        while len(pending) < limit():
+            if not submit():
+                break
+
+    fill()
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in done:
+                if should_stop():
+                    break
+                task = pending.pop(fut)
+                try:
+                    result, elapsed = fut.result()
+                except Exception:
+                    result, elapsed = None, 0.0
+                on_result(task, result, elapsed)
+                fill()
+            if should_stop():
+                break
+    finally:
+        for fut in pending:
+            fut.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
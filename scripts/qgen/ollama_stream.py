@@ -0,0 +1,75 @@
+"""
+Streaming /api/generate (blocking)
+==================================
+requests-based counterpart of AsyncOllamaClient.generate_stream() for
+the threaded engine. Ollama answers "stream": true with one JSON object
+per line; each carries a "response" fragment and the last one has
+"done": true plus eval_count / eval_duration. pooled_stream_generate()
+sends it to the best server of an EndpointPool (qgen.endpoints) instead.
+"""
+
+import json
+import time
+
+import requests
+
+from qgen.trace import set_error
+
+
+def stream_generate(url, payload, on_chunk, timeout=120, controller=None, info=None):
+    """POST a streaming generate request and feed each fragment to on_chunk.
+
+    on_chunk(text) returns True to stop early; the connection is then
+    closed so the server stops decoding. Returns the final status dict
+    (with "cancelled" set when stopped early) or None on HTTP failure.
+    An AIMDController, if given, is fed the time to first token; info
+    (qgen.trace.call_info) gets the error class of a failed call.
+    """
+    payload = dict(payload, stream=True)
+    start = time.time()
+    try:
+        response = requests.post(url, json=payload, stream=True, timeout=timeout)
+    except requests.RequestException as e:
+        if controller is not None:
+            controller.observe(time.time() - start, True)
+        set_error(info, e)
+        return None
+    first = True
+    try:
+        if response.status_code != 200:
+            if controller is not None:
+                controller.observe(time.time() - start, response.status_code >= 500)
+            set_error(info, f"HTTP {response.status_code}")
+            return None
+        last = {}
+        for line in response.iter_lines():
+            if not line:
+                continue
+            if first and controller is not None:
+                controller.observe(time.time() - start, False)
+            first = False
+            last = json.loads(line)
+            if on_chunk(last.get("response", "")):
+                last["cancelled"] = True
+                break
+            if last.get("done"):
+                break
+        return last
+    except (requests.RequestException, ValueError) as e:
+        set_error(info, e)
+        return None
+    finally:
+        response.close()
+
+
+def pooled_stream_generate(pool, payload, on_chunk, timeout=120, controller=None, info=None):
+    """stream_generate() on the pool's best server; re-sent to another only if nothing had arrived yet."""
+    received = False
+
+    def tracked(text):
+        nonlocal received
+        received = True
+        return on_chunk(text)
+
+    return pool.call(lambda host: stream_generate(f"{host}/api/generate", payload, tracked, timeout, controller, info),
+                     info, retry=lambda: not received)
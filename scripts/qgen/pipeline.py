@@ -0,0 +1,151 @@
+"""
+Shared batch pipeline
+=====================
+Everything between "send a prompt" and "keep a question" that doesn't
+depend on the backend, so the Ollama, Groq, vLLM and fake paths run the
+same steps and are measured the same way:
+
+- batch_prompt():      the batch prompt (free-text JSON or schema mode)
+- parse_completion():  raw text -> question objects + whether the answer
+                       was cut off at the token limit
+- question_record():   a parsed object as a bank record (a compact
+                       qgen.records.Question, JSON-shaped on write)
+- BackendStats:        per backend/model calls, questions/min,
+                       tokens/question and parse yield (and, given a
+                       RunMetrics, the live metrics of qgen/metrics.py)
+
+    completion = backend.complete(model, batch_prompt(*cell, count), options)
+    parsed, truncated = parse_completion(completion, scan_mcqs)
+    run_stats.record(completion, backend.name, model, count, len(parsed), len(accepted))
+"""
+
+import threading
+import time
+
+from qgen.records import MISSING, Question, now_stamp
+
+
+def batch_prompt(subject, topic, subtopic, difficulty, count, structured=False):
+    """Prompt asking for `count` questions of one cell."""
+    if structured:
+        # The schema fixes the format; the prompt only has to say what to write
+        return f"""Generate exactly {count} unique MCQ questions for OSSC RI/AI exam.
+
+Subject: {subject}
+Topic: {topic}
+Subtopic: {subtopic}
+Difficulty: {difficulty}
+
+Respond in JSON: {{"questions": [...]}}, each with question, options A-D, correctAnswer and explanation.
+
+Requirements:
+- Each question must be unique
+- Suitable for Indian govt competitive exam
+- Include solution steps for math questions"""
+    return f"""Generate exactly {count} unique MCQ questions for OSSC RI/AI exam.
+
+Subject: {subject}
+Topic: {topic}
+Subtopic: {subtopic}
+Difficulty: {difficulty}
+
+Return a JSON array with {count} questions in this format:
+[
+  {{"question": "Q1 text", "options": {{"A": "opt1", "B": "opt2", "C": "opt3", "D": "opt4"}}, "correctAnswer": "A", "explanation": "Why A is correct"}},
+  {{"question": "Q2 text", "options": {{"A": "opt1", "B": "opt2", "C": "opt3", "D": "opt4"}}, "correctAnswer": "B", "explanation": "Why B is correct"}},
+  ...
+]
+
+Requirements:
+- Each question must be unique
+- Suitable for Indian govt competitive exam
+- Include solution steps for math questions
+- Return ONLY the JSON array, no other text"""
+
+
+def parse_completion(completion, parse):
+    """(question objects, truncated) from a completion; `parse` is scan_mcqs or parse_structured.
+
+    The backend's finish_reason says whether the token limit cut the answer
+    off; without one, the text ending mid-object does.
+    """
+    parsed, cut_off = parse(completion.get("text", ""))
+    reason = completion.get("finish_reason")
+    return parsed, (reason == "length" if reason else cut_off)
+
+
+def question_record(q, cell, question_id, model=None):
+    """Bank record for a validated question of cell (subject, topic, subtopic, difficulty)."""
+    return Question(question_id, cell, q["question"], q["options"], q["correctAnswer"],
+                    q.get("explanation", ""), MISSING if model is None else model, now_stamp())
+
+
+class BackendStats:
+    """Per (backend, model) throughput and yield, comparable across backends.
+
+    - questions/min: accepted questions per minute since the first call
+    - tokens/question: completion tokens paid per accepted question
+    - parse yield: schema-valid questions parsed / questions asked for
+
+    With a qgen.metrics.RunMetrics, every call is also fed to its latency /
+    tokens/sec histograms and yield counters as it is recorded.
+    """
+
+    def __init__(self, metrics=None):
+        self.metrics = metrics
+        self.rows = {}
+        self.start = None
+        self._lock = threading.Lock()
+
+    def record(self, completion, backend, model, requested, parsed=0, accepted=0, cached=False):
+        """One call: completion None if it failed; parsed = valid objects, accepted = kept after dedup.
+
+        cached: the completion came from the response cache (no latency / tokens paid this run).
+        """
+        if self.metrics is not None:
+            self.metrics.observe_call(completion, backend, model, requested, parsed, accepted, cached)
+        with self._lock:
+            if self.start is None:
+                self.start = time.time()
+            row = self.rows.setdefault((backend, model), {
+                "calls": 0, "failed": 0, "requested": 0, "parsed": 0, "accepted": 0,
+                "completion_tokens": 0, "call_time": 0.0,
+            })
+            row["calls"] += 1
+            row["requested"] += requested
+            if completion is None:
+                row["failed"] += 1
+                return
+            row["parsed"] += parsed
+            row["accepted"] += accepted
+            row["completion_tokens"] += completion.get("completion_tokens") or 0
+            row["call_time"] += completion.get("elapsed") or 0.0
+
+    def to_json(self, elapsed=None):
+        """Rows with the derived rates; elapsed defaults to the time since the first call."""
+        with self._lock:
+            if elapsed is None:
+                elapsed = time.time() - self.start if self.start else 0.0
+            out = []
+            for (backend, model), row in sorted(self.rows.items()):
+                accepted = row["accepted"]
+                out.append(dict(
+                    row,
+                    backend=backend,
+                    model=model,
+                    questions_per_min=round(accepted / elapsed * 60, 1) if elapsed else 0.0,
+                    tokens_per_question=round(row["completion_tokens"] / accepted, 1) if accepted else None,
+                    parse_yield=round(row["parsed"] / row["requested"], 3) if row["requested"] else None,
+                ))
+            return out
+
+    def report(self, elapsed=None):
+        """One line per backend/model."""
+        lines = []
+        for row in self.to_json(elapsed):
+            tokens = row["tokens_per_question"]
+            lines.append(f"   {row['backend']}/{row['model']}: {row['calls']} calls ({row['failed']} failed) | "
+                         f"{row['accepted']} q | {row['questions_per_min']:.0f} q/min | "
+                         f"{'-' if tokens is None else f'{tokens:.0f}'} tokens/q | "
+                         f"parse yield {row['parse_yield'] or 0:.0%}")
+        return "\n".join(lines)
@@ -0,0 +1,240 @@
+"""
+Deficit-driven quota planner
+============================
+Turns the syllabus weights into a quota per cell (subject x topic x
+subtopic x difficulty), subtracts what the bank already holds, and hands
+out only the calls needed to close the gaps:
+
+- next task = the cell with the largest unmet share of its quota, after
+  counting the questions its in-flight calls are expected to deliver; a
+  call only asks for as many questions as the gap needs
+- expected yield per call is learned per cell (failures, duplicates and
+  short batches lower it, so the planner issues more calls there)
+- a cell that keeps yielding nothing is given up after max_attempts, so
+  one bad topic can't burn the whole run
+- extra calls are issued against expected losses, so a cell can get back
+  more than it needs: callers keep at most deficit(cell) of a batch and
+  pass the rest as dropped
+- report(): planned vs. delivered per topic, plus every cell still short;
+  to_json() has the full per-cell table
+
+The planner is the task iterator of the submit loops: next(planner)
+returns a task or raises StopIteration while in-flight calls already
+cover every deficit. A later failure reopens the cell and the next
+next() call returns work again, so it is a re-entrant iterator rather
+than a generator.
+
+    planner = QuotaPlanner(allocate(topics, 1500), make_task, per_call=5)
+    planner.add_existing(load_cell_counts(QUESTIONS_DIR / "index.json"))
+    task = next(planner)  # make_task(cell, count) built it
+    ...
+    planner.record(cell, delivered=4, requested=5)  # dropped=1 if a 5th didn't fit the quota
+"""
+
+import json
+import math
+import random
+import threading
+from collections import Counter
+from pathlib import Path
+
+DIFFICULTIES = ["easy", "medium", "hard"]
+
+
+def cell_of_question(q):
+    return (q.get("subject"), q.get("topic"), q.get("subtopic"), q.get("difficulty"))
+
+
+def count_cells(questions):
+    """Counter of questions per (subject, topic, subtopic, difficulty)."""
+    return Counter(cell_of_question(q) for q in questions)
+
+
+def cells_to_json(counts):
+    return [{"subject": c[0], "topic": c[1], "subtopic": c[2], "difficulty": c[3], "count": n}
+            for c, n in sorted(counts.items(), key=lambda kv: tuple(str(x) for x in kv[0]))]
+
+
+def cells_from_json(rows):
+    return Counter({(r["subject"], r["topic"], r["subtopic"], r["difficulty"]): r["count"] for r in rows})
+
+
+def load_cell_counts(index_path, bank_path=None, total=None):
+    """Per-cell counts from index.json's "cells" (written at every checkpoint).
+
+    Falls back to reading the bank itself for indexes written before the
+    planner existed, or when the cells don't add up to `total` (a crash
+    between writing the bank and its index).
+    """
+    index_path = Path(index_path)
+    if index_path.exists():
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+            if "cells" in index:
+                counts = cells_from_json(index["cells"])
+                if total is None or sum(counts.values()) == total:
+                    return counts
+        except ValueError:
+            pass
+    if bank_path and Path(bank_path).exists():
+        try:
+            with open(bank_path, "r", encoding="utf-8") as f:
+                return count_cells(json.load(f))
+        except ValueError:
+            pass
+    return Counter()
+
+
+def allocate(topics, target, unit=1):
+    """Split `target` over cells by topic weight.
+
+    topics: iterable of (subject, topic, subtopics, difficulties, weight).
+    Each topic gets its share in whole units (largest remainder rounding,
+    so topics of equal weight differ by at most one unit), dealt out over
+    its cells round-robin: across subtopics first, each with a rotating
+    difficulty. With unit > 1 the units are batches of `unit` questions,
+    so a batched generator never spends a call on a 1-2 question remainder
+    (the total may then exceed target by less than one unit).
+    Returns {cell: quota}.
+    """
+    topics = [t for t in topics if t[2]]
+    units = math.ceil(target / unit)
+    total_weight = sum(t[4] for t in topics) or 1
+    shares = [units * t[4] / total_weight for t in topics]
+    counts = [int(share) for share in shares]
+    short = units - sum(counts)
+    for i in sorted(range(len(topics)), key=lambda i: shares[i] - counts[i], reverse=True)[:max(short, 0)]:
+        counts[i] += 1
+    quotas = {}
+    for (subject, topic, subtopics, difficulties, _), n in zip(topics, counts):
+        difficulties = difficulties or DIFFICULTIES
+        cells = [(subject, topic, subtopics[j], difficulties[(r + j) % len(difficulties)])
+                 for r in range(len(difficulties)) for j in range(len(subtopics))]
+        for cell in cells:
+            quotas.setdefault(cell, 0)
+        for k in range(n):
+            quotas[cells[k % len(cells)]] += unit
+    return quotas
+
+
+class QuotaPlanner:
+    """Issues calls for the cells furthest below quota; re-plans on every result."""
+
+    def __init__(self, quotas, make_task, per_call=1, max_attempts=None):
+        self.quotas = dict(quotas)
+        self.make_task = make_task  # (cell, count) -> task tuple for the submit loop
+        self.per_call = per_call  # most questions one call may ask for (int, or cell -> int)
+        self.existing = Counter()
+        self.delivered = Counter()
+        self.calls = Counter()
+        self.failures = Counter()
+        self.in_flight = Counter()  # questions requested by calls not back yet
+        self._rate = {}  # cell -> learned accepted/requested ratio
+        self._max_attempts = max_attempts
+        self._lock = threading.Lock()
+
+    def add_existing(self, counts):
+        """Count questions already in the bank (cells outside the plan are ignored)."""
+        with self._lock:
+            for cell, n in counts.items():
+                if cell in self.quotas:
+                    self.existing[cell] += n
+
+    def max_attempts(self, cell):
+        if self._max_attempts is not None:
+            return self._max_attempts
+        return 3 * math.ceil(self.quotas[cell] / self.call_size(cell)) + 3
+
+    def call_size(self, cell):
+        return self.per_call(cell) if callable(self.per_call) else self.per_call
+
+    def deficit(self, cell):
+        """Questions still missing in `cell`, ignoring in-flight calls."""
+        return max(0, self.quotas[cell] - self.existing[cell] - self.delivered[cell])
+
+    def _open_deficit(self, cell):
+        """Deficit not yet covered by in-flight calls (0 once the cell is given up)."""
+        if self.calls[cell] >= self.max_attempts(cell):
+            return 0.0
+        return self.deficit(cell) - self.in_flight[cell] * self._rate.get(cell, 1.0)
+
+    def remaining(self):
+        """Questions still needed across all cells."""
+        with self._lock:
+            return sum(self.deficit(c) for c in self.quotas)
+
+    def done(self):
+        """Every cell has reached its quota (in-flight extras can be dropped)."""
+        return self.remaining() == 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        with self._lock:
+            best, best_score = [], 0.0
+            for cell, quota in self.quotas.items():
+                gap = self._open_deficit(cell)
+                if gap <= 0:
+                    continue
+                score = gap / max(quota, 1)
+                if score > best_score + 1e-9:
+                    best, best_score = [cell], score
+                elif abs(score - best_score) <= 1e-9:
+                    best.append(cell)
+            if not best:
+                raise StopIteration
+            cell = random.choice(best)
+            # Ask for what the gap needs at the learned yield, capped at per_call
+            rate = self._rate.get(cell, 1.0)
+            count = max(1, min(self.call_size(cell), math.ceil(self._open_deficit(cell) / rate)))
+            self.in_flight[cell] += count
+            self.calls[cell] += 1
+        return self.make_task(cell, count)
+
+    def record(self, cell, delivered, requested=None, dropped=0):
+        """One call for `cell` came back with `delivered` accepted questions (0 = failed).
+
+        dropped: accepted questions the caller didn't keep because the cell
+        was already at quota; they count towards the learned yield only.
+        """
+        requested = requested or self.call_size(cell)
+        with self._lock:
+            if cell not in self.quotas:
+                return
+            self.in_flight[cell] = max(0, self.in_flight[cell] - requested)
+            self.delivered[cell] += delivered
+            if not delivered and not dropped:
+                self.failures[cell] += 1
+            old = self._rate.get(cell, 1.0)
+            self._rate[cell] = max(0.1, old + ((delivered + dropped) / requested - old) * 0.3)
+
+    def to_json(self):
+        rows = []
+        for cell, quota in sorted(self.quotas.items()):
+            rows.append({
+                "subject": cell[0], "topic": cell[1], "subtopic": cell[2], "difficulty": cell[3],
+                "planned": quota, "existing": self.existing[cell], "delivered": self.delivered[cell],
+                "calls": self.calls[cell], "failedCalls": self.failures[cell], "short": self.deficit(cell),
+            })
+        return rows
+
+    def report(self, max_cells=15):
+        """Planned vs. delivered per topic, then the cells still below quota."""
+        by_topic = {}
+        for row in self.to_json():
+            t = by_topic.setdefault((row["subject"], row["topic"]), Counter())
+            for k in ("planned", "existing", "delivered", "calls", "failedCalls", "short"):
+                t[k] += row[k]
+        lines = [f"   {'topic':<34} {'planned':>7} {'had':>5} {'new':>5} {'calls':>5} {'failed':>6} {'short':>5}"]
+        for (subject, topic), t in by_topic.items():
+            lines.append(f"   {topic[:34]:<34} {t['planned']:>7} {t['existing']:>5} {t['delivered']:>5} "
+                         f"{t['calls']:>5} {t['failedCalls']:>6} {t['short']:>5}")
+        short = [r for r in self.to_json() if r["short"]]
+        if short:
+            lines.append(f"   {len(short)} cells still below quota:")
+            for r in sorted(short, key=lambda r: -r["short"])[:max_cells]:
+                lines.append(f"     {r['topic']} / {r['subtopic']} / {r['difficulty']}: "
+                             f"{r['existing'] + r['delivered']}/{r['planned']} ({r['calls']} calls)")
+        return "\n".join(lines)
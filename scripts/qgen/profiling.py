@@ -0,0 +1,242 @@
+"""
+Stage profiler
+==============
+Where does a slow run's time go - the network, parsing, the dedup index,
+rewriting the JSON files? StageProfiler answers per pipeline stage:
+
+    with profiler.stage("parse"):
+        parsed, truncated = parse_completion(completion, scan_mcqs)
+
+- timers:   calls, total and self time (minus the stages nested inside,
+            e.g. a streamed request's parse/dedup), mean and max, per
+            stage; the current stage is a ContextVar, so nesting is right
+            on worker threads and across awaits on the event loop alike
+- sample:   a sampling profiler thread (sys._current_frames every
+            SAMPLE_INTERVAL) writing collapsed stacks, one "a;b;c count"
+            line per stack, for flamegraph.pl / speedscope; top functions
+            by samples in the report
+- memory:   tracemalloc from start() to stop(): peak traced memory and the
+            allocation sites that grew most between the two snapshots;
+            tracing every allocation slows the run several times over, so
+            take timings from a run without it
+
+Off by default: stage() then hands back one shared no-op context manager,
+so an instrumented pipeline pays a method call per stage and nothing else.
+
+    profiler = StageProfiler()
+    profiler.start(sample=True, memory=True)   # --profile, --profile-sample, --profile-memory
+    ...
+    profiler.stop()
+    print(profiler.report())
+    profiler.save(QUESTIONS_DIR / "profile.json", QUESTIONS_DIR / "profile.folded")
+"""
+
+import contextlib
+import contextvars
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from qgen.journal import atomic_write_json
+
+SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+MAX_DEPTH = 48  # frames kept per sampled stack
+TOP = 10  # rows in the sampled-function and allocation tables
+
+_NULL = contextlib.nullcontext()
+_current = contextvars.ContextVar("qgen_stage", default=None)
+
+
+class _Frame:
+    __slots__ = ("name", "start", "child")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = time.perf_counter()
+        self.child = 0.0
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "frame", "token")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.frame = _Frame(self.name)
+        self.token = _current.set(self.frame)
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.frame.start
+        _current.reset(self.token)
+        parent = _current.get()
+        if parent is not None:
+            parent.child += elapsed
+        self.profiler._add(self.name, elapsed, elapsed - self.frame.child)
+        return False
+
+
+class StageProfiler:
+    """Per-stage timers, plus an optional stack sampler and tracemalloc snapshots."""
+
+    def __init__(self):
+        self.enabled = False
+        self.stages = {}  # name -> [calls, total, self, max]
+        self.elapsed = 0.0
+        self.samples = Counter()  # collapsed stack -> samples
+        self.memory = None
+        self._lock = threading.Lock()
+        self._started = None
+        self._sampler = None
+        self._stop = threading.Event()
+        self._snapshot = None
+
+    def stage(self, name):
+        """Context manager timing one stage (a no-op while disabled)."""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name)
+
+    def iterate(self, name, iterable):
+        """`iterable` with each next() timed as stage `name` (the iterable itself while disabled)."""
+        if not self.enabled:
+            return iterable
+        return self._timed_iter(name, iter(iterable))
+
+    def _timed_iter(self, name, it):
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    def _add(self, name, elapsed, own):
+        with self._lock:
+            row = self.stages.get(name)
+            if row is None:
+                row = self.stages[name] = [0, 0.0, 0.0, 0.0]
+            row[0] += 1
+            row[1] += elapsed
+            row[2] += own
+            if elapsed > row[3]:
+                row[3] = elapsed
+
+    # ---------- run control ----------
+
+    def start(self, sample=False, memory=False, interval=SAMPLE_INTERVAL):
+        self.enabled = True
+        self.stages.clear()
+        self.samples.clear()
+        self.memory = None
+        self._started = time.perf_counter()
+        if memory:
+            tracemalloc.start()
+            self._snapshot = tracemalloc.take_snapshot()
+        if sample:
+            self._stop = threading.Event()
+            self._sampler = threading.Thread(target=self._sample_loop, args=(interval,), name="qgen-profiler",
+                                             daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self.elapsed = time.perf_counter() - self._started
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+            self._sampler = None
+        if self._snapshot is not None:
+            _, peak = tracemalloc.get_traced_memory()
+            end = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            growth = end.compare_to(self._snapshot, "lineno")
+            self.memory = {
+                "peak_mb": round(peak / 1e6, 1),
+                "top": [{"site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                         "size_diff_kb": round(stat.size_diff / 1e3, 1), "count_diff": stat.count_diff}
+                        for stat in growth[:TOP]],
+            }
+            self._snapshot = None
+
+    def _sample_loop(self, interval):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None and len(stack) < MAX_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    # ---------- output ----------
+
+    def to_json(self):
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda kv: -kv[1][2])
+        own_total = sum(row[2] for _, row in stages) or 1.0
+        out = {
+            "elapsed": round(self.elapsed, 3),
+            "stages": [{"stage": name, "calls": calls, "total_s": round(total, 4), "self_s": round(own, 4),
+                        "mean_ms": round(total / calls * 1e3, 3), "max_ms": round(peak * 1e3, 3),
+                        "self_pct": round(100 * own / own_total, 1)}
+                       for name, (calls, total, own, peak) in stages],
+        }
+        if self.samples:
+            out["sampled_functions"] = [{"function": f, "samples": n} for f, n in self.top_functions()]
+        if self.memory is not None:
+            out["memory"] = self.memory
+        return out
+
+    def top_functions(self, n=TOP):
+        """Functions by samples spent in them (the leaf of the stack), idle waits excluded."""
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            if not leaf.endswith((":wait", ":_wait_for_tstate_lock", ":select", ":get", ":sleep", ":acquire",
+                                 "thread.py:_worker")):
+                leaves[leaf] += count
+        return leaves.most_common(n)
+
+    def report(self):
+        data = self.to_json()
+        lines = [f"   {'stage':<24} {'calls':>8} {'total s':>9} {'self s':>9} {'mean ms':>9} {'max ms':>9} "
+                 f"{'self %':>7}"]
+        for row in data["stages"]:
+            lines.append(f"   {row['stage']:<24} {row['calls']:>8} {row['total_s']:>9.2f} {row['self_s']:>9.2f} "
+                         f"{row['mean_ms']:>9.2f} {row['max_ms']:>9.1f} {row['self_pct']:>6.1f}%")
+        lines.append(f"   (wall {data['elapsed']:.2f}s; stages on concurrent workers overlap, so totals can exceed it)")
+        if self.samples:
+            total = sum(self.samples.values())
+            lines.append(f"   Sampled ({total} samples), busiest functions:")
+            for function, count in self.top_functions():
+                lines.append(f"     {function:<50} {count:>6} ({100 * count / total:.1f}%)")
+        if self.memory is not None:
+            lines.append(f"   Memory: peak {self.memory['peak_mb']} MB traced; largest growth:")
+            for row in self.memory["top"][:5]:
+                lines.append(f"     {row['site']:<60} {row['size_diff_kb']:>+10.1f} KB")
+        return "\n".join(lines)
+
+    def save(self, path, folded_path=None):
+        """Write the breakdown as JSON (and the collapsed stacks, if sampled)."""
+        atomic_write_json(path, self.to_json())
+        if folded_path is not None and self.samples:
+            with open(folded_path, "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+
@@ -0,0 +1,141 @@
+"""
+Requests/min + tokens/min rate limiter
+======================================
+Replaces a fixed sleep between requests with two token buckets, so
+several requests can be in flight as long as the per-minute budgets
+allow it:
+
+- requests bucket: RPM slots, refilled continuously
+- tokens bucket:   TPM tokens; each request reserves an estimate up front
+                   and settles against usage.total_tokens when it returns
+- provider headers (x-ratelimit-remaining-*, x-ratelimit-reset-*) pull the
+  buckets down to what the server says is left
+- a 429 pauses every caller until retry-after (or the reset header) passes
+
+    limiter = RateLimiter(rpm=30, tpm=20000)
+    reserved = limiter.acquire()
+    resp = call_api()
+    limiter.settle(reserved, resp.usage.total_tokens, resp.headers)
+"""
+
+import re
+import threading
+import time
+
+_DURATION = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value):
+    """Seconds from "7.66s", "2m59.56s", "120ms" or a bare number; None if unparseable."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _UNITS[unit] for n, unit in parts)
+
+
+class TokenBucket:
+    """Continuously refilled bucket; the level may go negative (debt)."""
+
+    def __init__(self, capacity, period=60.0):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (amount is capped at capacity)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.rate)
+
+    def clamp(self, remaining):
+        """Never hold more than the server says is left."""
+        self.level = min(self.level, float(remaining))
+
+
+class RateLimiter:
+    """Thread-safe RPM + TPM limiter shared by all worker threads."""
+
+    def __init__(self, rpm, tpm, period=60.0, initial_estimate=1000, backoff=2.0):
+        self.requests = TokenBucket(rpm, period)
+        self.tokens = TokenBucket(tpm, period)
+        self.estimate = float(initial_estimate)  # tokens per request, running average of usage
+        self.backoff = backoff  # pause after a 429 that carries no retry hint
+        self.paused_until = 0.0
+        self._cond = threading.Condition()
+        self.stats = {"requests": 0, "tokens": 0, "rate_limited": 0, "waited": 0.0}
+
+    def acquire(self, tokens=None):
+        """Block until one request + `tokens` (default: running estimate) fit; returns the reservation."""
+        tokens = self.estimate if tokens is None else tokens
+        with self._cond:
+            start = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                wait = max(self.paused_until - now,
+                           self.requests.wait_time(1),
+                           self.tokens.wait_time(tokens))
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            self.stats["requests"] += 1
+            self.stats["waited"] += time.monotonic() - start
+        return tokens
+
+    def settle(self, reserved, used=None, headers=None):
+        """Replace a reservation with real usage and apply rate-limit headers."""
+        with self._cond:
+            if used is not None:
+                self.tokens.level += reserved - used
+                self.stats["tokens"] += used
+                self.estimate += (used - self.estimate) * 0.2
+            if headers is not None:
+                self._apply_headers(headers)
+            self._cond.notify_all()
+
+    def rate_limited(self, reserved=0, headers=None):
+        """A 429: hand back the token reservation and pause everyone until the server's reset."""
+        with self._cond:
+            self.stats["rate_limited"] += 1
+            self.tokens.level += reserved
+            delay = None
+            if headers is not None:
+                self._apply_headers(headers)
+                delay = parse_duration(headers.get("retry-after"))
+                if delay is None:
+                    resets = [parse_duration(headers.get(h))
+                              for h in ("x-ratelimit-reset-tokens", "x-ratelimit-reset-requests")]
+                    resets = [r for r in resets if r is not None]
+                    delay = min(resets) if resets else None
+            delay = self.backoff if delay is None else delay
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self._cond.notify_all()
+        return delay
+
+    def _apply_headers(self, headers):
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None:
+            self.requests.clamp(remaining)
+        remaining = headers.get("x-ratelimit-remaining-tokens")
+        if remaining is not None:
+            self.tokens.clamp(remaining)
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['requests']} requests, {s['tokens']} tokens, "
+                f"{s['rate_limited']} rate-limited, {s['waited']:.1f}s waiting for budget")
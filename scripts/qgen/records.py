@@ -0,0 +1,185 @@
+"""
+Compact question records
+========================
+A bank record held as the dict json.load returns costs ~1.7 KB (of which
+a few hundred bytes are the question's own text): eleven keys, a fresh
+copy of the subject / topic / subtopic / difficulty / model strings in
+every question and a 26-character ISO timestamp. At 100k questions that
+is ~170 MB of the generators' memory; as Question it is about half.
+
+Question keeps the same record in __slots__:
+
+- cell:     (subject, topic, subtopic, difficulty), one interned tuple
+            shared by every question of the cell
+- options:  the four A-D texts as a tuple
+- answer, model: interned strings
+- stamp:    generatedAt as integer microseconds (plus a flag for the
+            JavaScript "...Z" form); any other string is kept as is
+
+It reads like the dict it replaces (q["subject"], q.get("options"), it is
+a Mapping), so the pipeline doesn't care which one it holds, and it turns
+back into the bank's JSON shape - same keys, same order, same values -
+only when written:
+
+    q = question_record(parsed, cell, new_id(), model)     # a Question
+    json.dumps(q, default=as_json)
+    json.loads(text, object_hook=compact)                  # bank records -> Question
+
+compact() leaves anything that isn't a bank record in that exact shape
+(extra, missing or reordered keys) as a dict.
+"""
+
+import sys
+from collections.abc import Mapping
+from itertools import combinations
+from datetime import datetime, timedelta
+
+from qgen.schema import OPTION_KEYS
+
+FIELDS = ("id", "subject", "topic", "subtopic", "difficulty", "question", "options",
+          "correctAnswer", "explanation", "model", "generatedAt")
+OPTIONAL = FIELDS[8:]
+# Key orders compact() accepts: FIELDS minus any of the optional keys
+SHAPES = frozenset(tuple(k for k in FIELDS if k not in dropped)
+                   for n in range(len(OPTIONAL) + 1) for dropped in combinations(OPTIONAL, n))
+
+MISSING = object()  # optional key absent from the record
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_cells = {}
+
+
+def intern_cell(cell):
+    """The shared tuple for a (subject, topic, subtopic, difficulty) cell."""
+    shared = _cells.get(cell)
+    if shared is None:
+        shared = tuple(sys.intern(v) if isinstance(v, str) else v for v in cell)
+        shared = _cells.setdefault(shared, shared)
+    return shared
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def pack_time(text):
+    """generatedAt string -> (stamp, zulu); stamp stays the string if it wouldn't round-trip."""
+    if not isinstance(text, str):
+        return text, False
+    zulu = text.endswith("Z")
+    try:
+        when = datetime.fromisoformat(text[:-1] if zulu else text)
+    except ValueError:
+        return text, False
+    if when.tzinfo is not None:
+        return text, False
+    stamp = (when - _EPOCH) // _MICROSECOND
+    return (stamp, zulu) if unpack_time(stamp, zulu) == text else (text, False)
+
+
+def unpack_time(stamp, zulu=False):
+    if not isinstance(stamp, int) or isinstance(stamp, bool):
+        return stamp
+    when = _EPOCH + timedelta(microseconds=stamp)
+    return when.isoformat(timespec="milliseconds") + "Z" if zulu else when.isoformat()
+
+
+def now_stamp():
+    """datetime.now().isoformat(), as a stamp."""
+    return (datetime.now() - _EPOCH) // _MICROSECOND
+
+
+class Question(Mapping):
+    """One bank record in slots; a read-only Mapping with the record's JSON keys."""
+
+    __slots__ = ("id", "cell", "question", "options", "answer", "explanation", "model", "stamp", "zulu")
+
+    def __init__(self, id, cell, question, options, answer, explanation=MISSING, model=MISSING,
+                 stamp=MISSING, zulu=False):
+        self.id = id
+        self.cell = intern_cell(tuple(cell))
+        self.question = question
+        if type(options) is dict and tuple(options) == OPTION_KEYS:
+            options = tuple(options.values())
+        self.options = options
+        self.answer = _intern(answer)
+        self.explanation = explanation
+        self.model = _intern(model)
+        self.stamp = stamp
+        self.zulu = zulu
+
+    def _value(self, key):
+        if key == "id":
+            return self.id
+        if key == "subject":
+            return self.cell[0]
+        if key == "topic":
+            return self.cell[1]
+        if key == "subtopic":
+            return self.cell[2]
+        if key == "difficulty":
+            return self.cell[3]
+        if key == "question":
+            return self.question
+        if key == "options":
+            return dict(zip(OPTION_KEYS, self.options)) if type(self.options) is tuple else self.options
+        if key == "correctAnswer":
+            return self.answer
+        if key == "explanation":
+            return self.explanation
+        if key == "model":
+            return self.model
+        if key == "generatedAt":
+            return MISSING if self.stamp is MISSING else unpack_time(self.stamp, self.zulu)
+        return MISSING
+
+    def __getitem__(self, key):
+        value = self._value(key)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __iter__(self):
+        for key in FIELDS:
+            if self._value(key) is not MISSING:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Question({self.id!r}, {self.cell!r})"
+
+    def to_json(self):
+        """The record as the bank's JSON dict (keys in FIELDS order)."""
+        subject, topic, subtopic, difficulty = self.cell
+        record = {"id": self.id, "subject": subject, "topic": topic, "subtopic": subtopic,
+                  "difficulty": difficulty, "question": self.question, "options": self._value("options"),
+                  "correctAnswer": self.answer}
+        if self.explanation is not MISSING:
+            record["explanation"] = self.explanation
+        if self.model is not MISSING:
+            record["model"] = self.model
+        if self.stamp is not MISSING:
+            record["generatedAt"] = unpack_time(self.stamp, self.zulu)
+        return record
+
+
+def compact(record):
+    """A Question for a bank record in the canonical shape; anything else unchanged.
+
+    Usable as json.load(s)'s object_hook (inner dicts such as options pass through).
+    """
+    if "question" not in record or tuple(record) not in SHAPES:
+        return record
+    stamp, zulu = pack_time(record["generatedAt"]) if "generatedAt" in record else (MISSING, False)
+    return Question(record["id"], (record["subject"], record["topic"], record["subtopic"], record["difficulty"]),
+                    record["question"], record["options"], record["correctAnswer"],
+                    record.get("explanation", MISSING), record.get("model", MISSING), stamp, zulu)
+
+
+def as_json(obj):
+    """json.dump(s) default= hook: Question -> its JSON dict."""
+    if isinstance(obj, Question):
+        return obj.to_json()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
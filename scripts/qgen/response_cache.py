@@ -0,0 +1,153 @@
+"""
+Content-addressed raw-response cache (SQLite)
+=============================================
+Every raw backend answer is kept, keyed by a hash of (backend, model,
+prompt, sampling params, seed), with the timing/token fields the backend
+returned. Parser, validator and dedup changes can then be re-run over
+real model output without paying for new calls (replay mode), and a
+rerun after a crash reuses answers that were already paid for.
+
+Sampling at temperature 0.9 only makes "same request, same answer" true
+with a fixed seed, so each request carries one, and its answer is then a
+pure function of the key. The n-th request this run for the same
+(backend, model, prompt, params) replays the n-th answer stored for it;
+once those run out, a miss gets a seed never used before. Seeds start at
+a salt that is random per cache file, so a new cache doesn't repeat the
+answers of an old one.
+
+- responses: one row per answer (key, seedless base key, seed, body
+             JSON, elapsed seconds)
+- meta:      the seed salt
+
+    cache = ResponseCache(QUESTIONS_DIR / "responses.sqlite")
+    key, seed, body = cache.next("ollama", model, prompt, options)
+    if body is None:
+        body = call(dict(options, seed=seed))
+        cache.put(key, seed, "ollama", model, prompt, options, body, elapsed)
+"""
+
+import hashlib
+import json
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+CACHE_FILE = "responses.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    base TEXT,
+    seed INTEGER,
+    backend TEXT,
+    model TEXT,
+    body TEXT,
+    elapsed REAL,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS responses_base ON responses(base, seed);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def request_key(backend, model, prompt, params, seed=None):
+    """sha256 over the canonical JSON of everything that determines the answer."""
+    raw = json.dumps([backend, model, prompt, params or {}, seed], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Raw answers by request key; next() hands out the seed for each new request."""
+
+    def __init__(self, path, commit_every=20):
+        self.path = Path(path)
+        self.commit_every = commit_every
+        self.stats = Counter()  # hits, misses, stored
+        self._seen = Counter()  # requests per base key this run
+        self._fresh = {}  # base key -> next unused seed
+        self._conn = None
+        self._salt = None
+        self._uncommitted = 0
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        """Opened on first use."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            row = conn.execute("SELECT value FROM meta WHERE name = 'salt'").fetchone()
+            if row is None:
+                row = (str(random.randrange(1 << 30)),)
+                conn.execute("INSERT INTO meta (name, value) VALUES ('salt', ?)", row)
+                conn.commit()
+            self._salt = int(row[0])
+            self._conn = conn
+        return self._conn
+
+    def commit(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+            self._uncommitted = 0
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def __len__(self):
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def next(self, backend, model, prompt, params):
+        """(key, seed, body or None) for the next request of this kind.
+
+        The n-th call this run returns the n-th stored answer (by seed);
+        past the stored answers it returns a new key and an unused seed
+        for the backend call, with body None.
+        """
+        base = request_key(backend, model, prompt, params)
+        with self._lock:
+            conn = self.conn
+            n = self._seen[base]
+            self._seen[base] += 1
+            row = conn.execute("SELECT key, seed, body FROM responses WHERE base = ? ORDER BY seed LIMIT 1 OFFSET ?",
+                               (base, n)).fetchone()
+            if row:
+                self.stats["hits"] += 1
+                return row[0], row[1], json.loads(row[2])
+            self.stats["misses"] += 1
+            if base not in self._fresh:
+                last = conn.execute("SELECT MAX(seed) FROM responses WHERE base = ?", (base,)).fetchone()[0]
+                self._fresh[base] = self._salt if last is None else last + 1
+            seed = self._fresh[base]
+            self._fresh[base] += 1
+        return request_key(backend, model, prompt, params, seed), seed, None
+
+    def put(self, key, seed, backend, model, prompt, params, body, elapsed):
+        """Store the raw answer for a key/seed handed out by next()."""
+        base = request_key(backend, model, prompt, params)
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, base, seed, backend, model, body, elapsed, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, base, seed, backend, model, json.dumps(body, ensure_ascii=False), elapsed, time.time()),
+            )
+            self.stats["stored"] += 1
+            self._uncommitted += 1
+            if self._uncommitted >= self.commit_every:
+                self.commit()
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['hits']} hits, {s['misses']} misses, {s['stored']} stored "
+                f"({len(self)} answers in {self.path.name})")
@@ -0,0 +1,120 @@
+"""
+Model-affinity scheduling for Ollama
+====================================
+Assigning a model per task (random.choice / i % len(MODELS)) interleaves
+llama3 and mistral requests. On a box that can hold only one of them,
+Ollama then unloads and reloads weights over and over, and every reload
+costs seconds.
+
+ModelScheduler hands out models in runs instead: the next run_length
+requests all go to the current model, then it moves on to the next one.
+In-flight work is therefore almost always for a single model, and a long
+run pays one load per switch rather than one per request. The models
+still end up evenly mixed in the bank.
+
+It also keeps a per-model view of what happened: requests, failures,
+latency, how many responses paid a load (Ollama's load_duration) and
+which models /api/ps reports as resident.
+
+    scheduler = ModelScheduler(MODELS, run_length=200)
+    scheduler.warm_up(OLLAMA_HOST, keep_alive="30m")
+    task = scheduler.assign(task)            # task[0] is the model
+    scheduler.observe(model, elapsed, body)  # body = /api/generate JSON
+    print(scheduler.view(OLLAMA_HOST))
+"""
+
+import threading
+
+import requests
+
+
+def warm_up(host, model, keep_alive="30m", timeout=300):
+    """Load `model` and keep it resident (an empty prompt only loads it). Returns seconds taken or None."""
+    try:
+        r = requests.post(f"{host}/api/generate", json={"model": model, "keep_alive": keep_alive},
+                          timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return r.json().get("load_duration", 0) / 1e9
+    except (requests.RequestException, ValueError):
+        return None
+
+
+def resident_models(host, timeout=5):
+    """Names of the models currently loaded (GET /api/ps), or None if unavailable."""
+    try:
+        r = requests.get(f"{host}/api/ps", timeout=timeout)
+        if r.status_code != 200:
+            return None
+        return [m.get("name") or m.get("model") for m in r.json().get("models", [])]
+    except (requests.RequestException, ValueError):
+        return None
+
+
+class ModelScheduler:
+    """Hands out models in runs of run_length requests and tracks per-model latency."""
+
+    def __init__(self, models, run_length=200, load_threshold=0.5):
+        self.models = list(models)
+        self.run_length = max(1, run_length)
+        self.load_threshold = load_threshold  # load_duration (s) above this counts as a (re)load
+        self.switches = 0
+        self._index = 0
+        self._issued = 0
+        self._lock = threading.Lock()
+        self.per_model = {m: {"requests": 0, "failures": 0, "latency": None, "loads": 0, "load_time": 0.0}
+                          for m in self.models}
+
+    @property
+    def current(self):
+        return self.models[self._index]
+
+    def next_model(self):
+        with self._lock:
+            if self._issued >= self.run_length:
+                self._index = (self._index + 1) % len(self.models)
+                self._issued = 0
+                self.switches += 1
+            self._issued += 1
+            return self.models[self._index]
+
+    def assign(self, task):
+        """Return `task` with its model (first element) replaced by the scheduled one."""
+        return (self.next_model(),) + tuple(task[1:])
+
+    def warm_up(self, host, keep_alive="30m"):
+        """Load the model the first run will use before any work is sent."""
+        model = self.current
+        took = warm_up(host, model, keep_alive)
+        if took is None:
+            print(f"⚠️ Could not warm up {model}")
+        else:
+            print(f"🔥 Warmed up {model} ({took:.1f}s load, keep_alive={keep_alive})")
+        return took
+
+    def observe(self, model, elapsed, body=None):
+        """Record one finished request; body is the /api/generate JSON (None on failure)."""
+        with self._lock:
+            s = self.per_model.setdefault(model, {"requests": 0, "failures": 0, "latency": None,
+                                                  "loads": 0, "load_time": 0.0})
+            s["requests"] += 1
+            if body is None:
+                s["failures"] += 1
+                return
+            s["latency"] = elapsed if s["latency"] is None else s["latency"] * 0.9 + elapsed * 0.1
+            load = (body.get("load_duration") or 0) / 1e9
+            if load >= self.load_threshold:
+                s["loads"] += 1
+                s["load_time"] += load
+
+    def view(self, host=None):
+        """Per-model table: resident?, requests, failures, avg latency, loads."""
+        resident = resident_models(host) if host else None
+        lines = [f"   {'model':<20} {'resident':>8} {'requests':>8} {'failed':>6} {'latency':>8} {'loads':>5} {'load s':>7}"]
+        for model, s in self.per_model.items():
+            flag = "?" if resident is None else ("yes" if model in resident else "no")
+            latency = f"{s['latency']:.2f}s" if s["latency"] is not None else "-"
+            lines.append(f"   {model:<20} {flag:>8} {s['requests']:>8} {s['failures']:>6} "
+                         f"{latency:>8} {s['loads']:>5} {s['load_time']:>7.1f}")
+        lines.append(f"   run length {self.run_length}, {self.switches} model switches")
+        return "\n".join(lines)
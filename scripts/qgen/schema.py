@@ -0,0 +1,90 @@
+"""
+Schema-constrained MCQ output
+=============================
+With the free-text prompts the model is only asked nicely to "return
+ONLY a valid JSON array"; trailing commas, single quotes, options as a
+list or an answer like "Option B" still come back and the call counts
+as failed. Both backends can constrain the output instead:
+
+- Ollama: "format": <JSON schema> on /api/generate (grammar-constrained
+  decoding, Ollama 0.5+), so every token fits MCQ_SCHEMA
+- Groq: response_format={"type": "json_object"} (the API rejects output
+  that isn't one JSON object; the schema itself goes in the prompt)
+
+A batch is one object, {"questions": [...]}, because JSON mode needs an
+object at the top level. parse_structured() is then a single json.loads;
+it only falls back to the scanner when the output was cut off at
+num_predict / max_tokens.
+
+    payload["format"] = batch_schema(5)
+    questions, cut_off = parse_structured(body["response"])
+"""
+
+import json
+
+from qgen.json_stream import scan_mcqs
+
+OPTION_KEYS = ("A", "B", "C", "D")
+
+MCQ_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "question": {"type": "string"},
+        "options": {
+            "type": "object",
+            "properties": {k: {"type": "string"} for k in OPTION_KEYS},
+            "required": list(OPTION_KEYS),
+            "additionalProperties": False,
+        },
+        "correctAnswer": {"type": "string", "enum": list(OPTION_KEYS)},
+        "explanation": {"type": "string"},
+    },
+    "required": ["question", "options", "correctAnswer", "explanation"],
+    "additionalProperties": False,
+}
+
+
+def batch_schema(count):
+    """Schema for one call asking for `count` questions."""
+    return {
+        "type": "object",
+        "properties": {
+            "questions": {"type": "array", "items": MCQ_SCHEMA, "minItems": count, "maxItems": count},
+        },
+        "required": ["questions"],
+    }
+
+
+def conforms(q):
+    """True if `q` has the shape MCQ_SCHEMA describes (what the app can render).
+
+    Checked for free-text output as well, so both modes accept the same questions.
+    """
+    if not isinstance(q, dict) or not isinstance(q.get("question"), str) or not q["question"].strip():
+        return False
+    options = q.get("options")
+    if not isinstance(options, dict) or sorted(options) != list(OPTION_KEYS):
+        return False
+    if not all(isinstance(v, str) and v.strip() for v in options.values()):
+        return False
+    return q.get("correctAnswer") in OPTION_KEYS
+
+
+def parse_structured(text):
+    """Questions from schema-constrained output; returns (questions, cut_off).
+
+    Accepts {"questions": [...]}, a bare array or a single question object.
+    Output that isn't valid JSON was cut off mid-object (constrained
+    decoding can't produce anything else), so the scanner salvages it.
+    """
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return scan_mcqs(text)
+    if isinstance(value, dict) and isinstance(value.get("questions"), list):
+        value = value["questions"]
+    if isinstance(value, dict):
+        value = [value]
+    if not isinstance(value, list):
+        return [], False
+    return [q for q in value if isinstance(q, dict)], False
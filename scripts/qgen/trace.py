@@ -0,0 +1,150 @@
+"""
+Per-call trace log
+==================
+One JSON line per backend call (and per cached answer reused), so a run
+can be taken apart afterwards with scripts/analyze_traces.py: which
+topics parse worst, how latency grows with output length, where a model
+spends its time.
+
+    {"run": "20260416T101500", "ts": 1776334500.12, "backend": "ollama",
+     "model": "llama3:latest", "endpoint": null, "subject": "...", "topic": "...", "subtopic": "...",
+     "difficulty": "medium", "prompt_hash": "3f2a9c1e0b7d", "queue_wait": 0.41,
+     "latency": 7.9, "prompt_tokens": 212, "completion_tokens": 905, "eval_s": 7.1,
+     "load_s": 0.0, "finish_reason": "stop", "requested": 5, "parsed": 5,
+     "accepted": 4, "duplicates": 1, "cached": false, "stream": false, "error": null}
+
+- call_info(prompt, queued):  the per-call dict handed to the backend (info=),
+                              which adds the time spent waiting for a slot or
+                              the rate limiter ("queue_wait") and, on failure,
+                              the error class ("error"); an EndpointPool adds
+                              the server that answered ("endpoint")
+- trace_record(...):          that dict plus what the completion says (tokens,
+                              Ollama eval_duration / Groq usage timings)
+- CallTracer(path):           appends records to a JSONL file; buffered, one
+                              lock, flushed every FLUSH_EVERY lines and on close
+                              (a trace is diagnostics, not data: no fsync)
+- iter_traces(path):          read them back, skipping a torn last line
+
+Prompt text isn't stored, only a hash: two calls with the same hash sent
+the same prompt.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+FLUSH_EVERY = 256  # lines buffered before the trace file is flushed
+
+
+def prompt_hash(prompt):
+    return hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+
+
+def call_info(prompt, queued=None):
+    """Per-call dict for backend.complete(info=...); queued = when the task was handed out."""
+    start = time.time()
+    return {"prompt_hash": prompt_hash(prompt), "queue_wait": start - queued if queued else 0.0}
+
+
+def add_wait(info, seconds):
+    """Backends: time spent before the request could be sent (semaphore, rate limiter)."""
+    if info is not None and seconds > 0:
+        info["queue_wait"] = info.get("queue_wait", 0.0) + seconds
+
+
+def set_error(info, error):
+    """Backends: why the call failed - an exception class name, "HTTP 503", "rate_limited", ..."""
+    if info is not None:
+        info["error"] = error if isinstance(error, str) else type(error).__name__
+
+
+def _seconds(ns):
+    return round(ns / 1e9, 4) if ns else None
+
+
+def trace_record(info, completion, backend, model, cell, requested, parsed=0, accepted=0, duplicates=0,
+                 cached=False, stream=False):
+    """One trace line: the call's info dict plus the completion's tokens and timings."""
+    subject, topic, subtopic, difficulty = cell
+    record = {
+        "ts": round(time.time(), 3),
+        "backend": backend,
+        "model": model,
+        "endpoint": info.get("endpoint"),
+        "subject": subject,
+        "topic": topic,
+        "subtopic": subtopic,
+        "difficulty": difficulty,
+        "prompt_hash": info.get("prompt_hash"),
+        "queue_wait": round(info.get("queue_wait", 0.0), 4),
+        "latency": None,
+        "prompt_tokens": None,
+        "completion_tokens": None,
+        "eval_s": None,
+        "load_s": None,
+        "finish_reason": None,
+        "requested": requested,
+        "parsed": parsed,
+        "accepted": accepted,
+        "duplicates": duplicates,
+        "cached": cached,
+        "stream": stream,
+        "error": info.get("error"),
+    }
+    if completion is None:
+        record["error"] = record["error"] or "no_response"
+    else:
+        elapsed = completion.get("elapsed")
+        record.update(
+            latency=None if elapsed is None else round(elapsed, 4),
+            prompt_tokens=completion.get("prompt_tokens"),
+            completion_tokens=completion.get("completion_tokens"),
+            eval_s=_seconds(completion.get("eval_duration")),
+            load_s=_seconds(completion.get("load_duration")),
+            finish_reason=completion.get("finish_reason"),
+        )
+    return record
+
+
+class CallTracer:
+    """Thread-safe JSONL appender for trace records; every record gets this run's id."""
+
+    def __init__(self, path, run=None, flush_every=FLUSH_EVERY):
+        self.path = Path(path)
+        self.run = run or datetime.now().strftime("%Y%m%dT%H%M%S")
+        self.flush_every = flush_every
+        self.count = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def record(self, record):
+        line = json.dumps(dict(run=self.run, **record), ensure_ascii=False) + "\n"
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self.count += 1
+            if self.count % self.flush_every == 0:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def iter_traces(path):
+    """Trace records of a JSONL file (a line torn by a crash is skipped)."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
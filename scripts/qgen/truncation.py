@@ -0,0 +1,119 @@
+"""
+Truncated-batch salvage and feedback
+====================================
+A batch that hits num_predict / max_tokens mid-array used to yield
+nothing: the regex parsers never found the closing "]". extract_mcqs()
+now keeps every question object that closed before the cutoff, and this
+tracker records, per topic:
+
+- calls, truncated calls (done_reason / finish_reason "length"; the
+  text ending inside an object only when the backend gives no reason)
+  and the questions salvaged from them;
+  a salvaged call is one the old parsers would have thrown away
+- tokens per question, estimated from truncated calls (limit /
+  questions that fit) and from complete ones (tokens used / questions)
+
+and feeds it back into the next calls for that topic once it keeps
+truncating (min_truncations):
+
+- limit(topic): raise num_predict / max_tokens to fit a whole batch,
+  up to max_limit
+- batch_size(topic): if even max_limit can't fit the batch, ask for as
+  many questions as it can
+
+    truncation = TruncationTracker(batch_size=5, limit=2048, max_limit=4096)
+    options = dict(OLLAMA_OPTIONS, num_predict=truncation.limit(topic))
+    ...
+    truncation.record(topic, done_reason == "length" if done_reason else cut_off, len(parsed), limit)
+    print(truncation.summary())
+"""
+
+import math
+import threading
+
+
+class TruncationTracker:
+    """Per-topic truncation rate, salvage counts and the batch size / limit they call for."""
+
+    def __init__(self, batch_size, limit, max_limit, headroom=1.2, min_truncations=2, alpha=0.3):
+        self.default_batch = batch_size
+        self.default_limit = limit
+        self.max_limit = max_limit
+        self.headroom = headroom  # extra tokens per batch on top of the estimate
+        self.min_truncations = min_truncations  # one runaway answer isn't a pattern
+        self.alpha = alpha
+        self.topics = {}
+        self._lock = threading.Lock()
+
+    def _state(self, topic):
+        state = self.topics.get(topic)
+        if state is None:
+            state = self.topics[topic] = {
+                "calls": 0, "truncated": 0, "salvagedCalls": 0, "salvaged": 0,
+                "rate": 0.0, "tokensPerQuestion": None,
+            }
+        return state
+
+    def record(self, topic, truncated, questions, limit=None, tokens=None):
+        """One finished call: was it cut off, how many complete questions it
+        held, the limit it ran with and (if known) the tokens it used."""
+        with self._lock:
+            state = self._state(topic)
+            state["calls"] += 1
+            state["rate"] += ((1.0 if truncated else 0.0) - state["rate"]) * self.alpha
+            sample = None
+            if truncated:
+                state["truncated"] += 1
+                if questions:
+                    state["salvagedCalls"] += 1
+                    state["salvaged"] += questions
+                # The cutoff landed somewhere inside question n+1
+                sample = (limit or self.default_limit) / (questions + 0.5)
+            elif tokens and questions:
+                sample = tokens / questions
+            if sample is not None:
+                old = state["tokensPerQuestion"]
+                state["tokensPerQuestion"] = sample if old is None else old + (sample - old) * self.alpha
+
+    def _adjusting(self, state):
+        return (state is not None and state["truncated"] >= self.min_truncations
+                and state["tokensPerQuestion"] is not None)
+
+    def limit(self, topic):
+        """num_predict / max_tokens for the next call on `topic`."""
+        state = self.topics.get(topic)
+        if not self._adjusting(state):
+            return self.default_limit
+        need = math.ceil(state["tokensPerQuestion"] * self.default_batch * self.headroom)
+        return min(self.max_limit, max(self.default_limit, need))
+
+    def batch_size(self, topic):
+        """Questions to ask for in the next call on `topic`."""
+        state = self.topics.get(topic)
+        if not self._adjusting(state):
+            return self.default_batch
+        fit = int(self.max_limit / (state["tokensPerQuestion"] * self.headroom))
+        return max(1, min(self.default_batch, fit))
+
+    @property
+    def totals(self):
+        keys = ("calls", "truncated", "salvagedCalls", "salvaged")
+        return {k: sum(s[k] for s in self.topics.values()) for k in keys}
+
+    def summary(self):
+        t = self.totals
+        adjusted = sum(1 for s in self.topics.values() if self._adjusting(s))
+        return (f"{t['truncated']}/{t['calls']} calls truncated, {t['salvagedCalls']} salvaged "
+                f"({t['salvaged']} questions kept), {adjusted} topics adjusted")
+
+    def report(self, max_topics=10):
+        """Topics that truncate, worst first, with the batch size / limit now used."""
+        rows = sorted(((topic, s) for topic, s in self.topics.items() if s["truncated"]),
+                      key=lambda kv: -kv[1]["truncated"] / kv[1]["calls"])
+        lines = []
+        for topic, s in rows[:max_topics]:
+            name = topic[-1] if isinstance(topic, tuple) else topic
+            lines.append(f"   {str(name)[:30]:<30} {s['truncated']:>3}/{s['calls']:<4} truncated, "
+                         f"{s['salvaged']:>3} salvaged -> batch {self.batch_size(topic)}, "
+                         f"limit {self.limit(topic)}")
+        return "\n".join(lines)
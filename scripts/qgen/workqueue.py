@@ -0,0 +1,434 @@
+"""
+Shared work queue (SQLite, optionally served over HTTP)
+=======================================================
+Spreads one run over several machines without hand-merging ossc_*.json
+files afterwards. A coordinator owns the quota plan, the fingerprint
+index and the bank files; workers lease batches from this queue,
+generate them against their own Ollama, and send the questions back,
+so every question is deduped and journaled in one place.
+
+- tasks:    one row per batch (the generator's task tuple as JSON),
+            queued -> leased (by one worker, until lease_until) -> done.
+            Workers renew their leases while a batch is running; a lease
+            that isn't renewed (the worker died or hung) runs out and the
+            next lease() hands the batch to another worker (attempts
+            counts the hand-outs)
+- results:  the questions a worker generated for a task (bank JSON
+            shape) until the coordinator take()s them; only the first
+            result per task counts, so a worker presumed dead that comes
+            back can't deliver a batch twice
+- workers:  one row per worker: its ID slot (qgen.ids.set_worker; taken
+            over once it hasn't been seen for SLOT_HOLD), when it was
+            last seen, batches and questions sent
+- meta:     state: running while a coordinator hands out work, finished
+            once its plan is met (workers then exit)
+
+Every method is one short transaction (BEGIN IMMEDIATE when it writes)
+in WAL mode, and the polls check with a plain read first, so idle
+workers don't queue up for the write lock. WAL needs shared memory, so
+processes on the coordinator's machine open the file directly, and
+workers on other machines go through QueueServer, which the coordinator
+runs (--queue-port): plain JSON over HTTP, no authentication, so keep
+it on a trusted network. connect() picks the right one for a worker.
+
+    work = WorkQueue("queue.sqlite")                    # coordinator
+    work.start()
+    server = QueueServer(work, port=8765)               # for remote workers
+    ids = work.put(tasks)
+    for task_id, worker, questions, elapsed in work.take():
+        ...
+    work.finish()
+    server.close()
+
+    work = connect("http://coordinator:8765")           # worker (or a file path)
+    set_worker(work.register(name))
+    leased = work.lease(name, 4, ttl=60)                # or FINISHED / EVICTED / UNREACHABLE: stop
+    for task_id, task in leased:
+        ...
+    work.renew(name, running_ids, ttl=60)
+    work.complete(task_id, name, questions, elapsed)
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import requests
+
+from qgen.ids import QUEUE_SLOTS
+from qgen.records import as_json, compact
+
+QUEUE_FILE = "queue.sqlite"
+LEASE_TTL = 60.0  # seconds a lease lasts without renewal
+SLOT_HOLD = 600.0  # a worker not heard from for this long (it calls every lease_ttl / 4) loses its ID slot
+GIVE_UP = 60.0  # seconds a remote worker keeps trying an unreachable coordinator before it exits
+
+# Why lease() tells a worker to stop
+FINISHED = "finished"  # the coordinator's plan is met
+EVICTED = "evicted"  # the worker's ID slot went to another worker (it wasn't heard from for SLOT_HOLD)
+UNREACHABLE = "unreachable"  # RemoteQueue: no answer from the coordinator for give_up seconds
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT,
+    state TEXT,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_state ON tasks(state, lease_until);
+CREATE TABLE IF NOT EXISTS results (
+    task_id INTEGER PRIMARY KEY,
+    worker TEXT,
+    questions TEXT,
+    elapsed REAL
+);
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    slot INTEGER,
+    seen REAL,
+    batches INTEGER DEFAULT 0,
+    questions INTEGER DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+_LEASABLE = "state = 'queued' OR (state = 'leased' AND lease_until < ?)"
+
+
+class WorkQueue:
+    """Lease-based batch queue in one SQLite file, shared by a coordinator and its workers."""
+
+    def __init__(self, path, timeout=30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.RLock()
+
+    @property
+    def conn(self):
+        """Opened on first use (autocommit; writes open their own transaction)."""
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @contextlib.contextmanager
+    def _write(self):
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _state(self, conn):
+        row = conn.execute("SELECT value FROM meta WHERE name = 'state'").fetchone()
+        return row[0] if row else None
+
+    # ---------- coordinator ----------
+
+    def start(self):
+        """New run: drop the previous run's tasks and let workers lease.
+
+        Results no coordinator took yet (it stopped while workers were
+        still sending) are kept for the next take().
+        """
+        with self._write() as conn:
+            conn.execute("DELETE FROM tasks")
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('state', 'running')")
+
+    def put(self, tasks):
+        """Queue task tuples; returns their ids in the same order."""
+        with self._write() as conn:
+            return [conn.execute("INSERT INTO tasks (task, state) VALUES (?, 'queued')",
+                                 (json.dumps(task, ensure_ascii=False),)).lastrowid
+                    for task in tasks]
+
+    def queued(self):
+        """Tasks waiting for a worker (expired leases included)."""
+        with self._lock:
+            return self.conn.execute(f"SELECT COUNT(*) FROM tasks WHERE {_LEASABLE}", (time.time(),)).fetchone()[0]
+
+    def take(self):
+        """Results sent back since the last take(): [(task id, worker, questions, elapsed)], removed from the queue."""
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM results LIMIT 1").fetchone() is None:
+                return []
+            with self._write() as conn:
+                rows = conn.execute("SELECT task_id, worker, questions, elapsed FROM results ORDER BY task_id").fetchall()
+                conn.execute("DELETE FROM results")
+        return [(task_id, worker, json.loads(questions, object_hook=compact), elapsed)
+                for task_id, worker, questions, elapsed in rows]
+
+    def finish(self):
+        """Plan met: cancel what is still queued or leased and tell the workers to exit."""
+        with self._write() as conn:
+            conn.execute("UPDATE tasks SET state = 'cancelled' WHERE state != 'done'")
+            conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('state', 'finished')")
+
+    # ---------- worker ----------
+
+    def register(self, worker):
+        """Join as `worker`; returns its ID slot (from qgen.ids.QUEUE_SLOTS).
+
+        A slot whose worker hasn't been heard from for SLOT_HOLD seconds is
+        taken over (that worker, if it comes back, is told to stop). Raises
+        RuntimeError if every slot is held by a live worker.
+        """
+        now = time.time()
+        with self._write() as conn:
+            row = conn.execute("SELECT slot FROM workers WHERE name = ?", (worker,)).fetchone()
+            if row is not None and row[0] is not None:
+                conn.execute("UPDATE workers SET seen = ? WHERE name = ?", (now, worker))
+                return row[0]
+            held = {slot for slot, in conn.execute("SELECT slot FROM workers WHERE slot IS NOT NULL AND seen > ?",
+                                                   (now - SLOT_HOLD,))}
+            slot = next((s for s in QUEUE_SLOTS if s not in held), None)
+            if slot is None:
+                raise RuntimeError(f"all {len(QUEUE_SLOTS)} worker ID slots are held by workers seen in the "
+                                   f"last {SLOT_HOLD:.0f}s")
+            conn.execute("UPDATE workers SET slot = NULL WHERE slot = ?", (slot,))
+            conn.execute("INSERT INTO workers (name, slot, seen) VALUES (?, ?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET slot = excluded.slot, seen = excluded.seen",
+                         (worker, slot, now))
+            return slot
+
+    def _slot(self, conn, worker):
+        row = conn.execute("SELECT slot FROM workers WHERE name = ?", (worker,)).fetchone()
+        return row[0] if row else None
+
+    def lease(self, worker, n=1, ttl=LEASE_TTL):
+        """Up to n tasks for `worker`, oldest first (expired leases included): [(task id, task tuple)].
+
+        Returns FINISHED instead once the coordinator has finished the run,
+        or EVICTED if `worker` has lost its ID slot to another worker.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self.conn
+            if self._state(conn) == "finished":
+                return FINISHED
+            if self._slot(conn, worker) is None:
+                return EVICTED
+            if n <= 0 or conn.execute(f"SELECT 1 FROM tasks WHERE {_LEASABLE} LIMIT 1", (now,)).fetchone() is None:
+                return []
+            with self._write() as conn:
+                rows = conn.execute(f"SELECT id, task FROM tasks WHERE {_LEASABLE} ORDER BY id LIMIT ?",
+                                    (now, n)).fetchall()
+                conn.executemany("UPDATE tasks SET state = 'leased', worker = ?, lease_until = ?, "
+                                 "attempts = attempts + 1 WHERE id = ?",
+                                 [(worker, now + ttl, task_id) for task_id, _ in rows])
+                conn.execute("UPDATE workers SET seen = ? WHERE name = ?", (now, worker))
+        return [(task_id, tuple(json.loads(task))) for task_id, task in rows]
+
+    def renew(self, worker, task_ids, ttl=LEASE_TTL):
+        """Extend `worker`'s leases on task_ids (its heartbeat while they run)."""
+        now = time.time()
+        with self._write() as conn:
+            conn.executemany("UPDATE tasks SET lease_until = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                             [(now + ttl, task_id, worker) for task_id in task_ids])
+            conn.execute("UPDATE workers SET seen = ? WHERE name = ?", (now, worker))
+
+    def complete(self, task_id, worker, questions, elapsed):
+        """Send back a task's questions ([] = the batch failed).
+
+        False if it was already done or cancelled, or if `worker` lost its ID
+        slot (its IDs may clash with the new holder's; the lease runs out and
+        another worker redoes the batch).
+        """
+        payload = json.dumps(questions, ensure_ascii=False, default=as_json)
+        with self._write() as conn:
+            row = conn.execute("SELECT state FROM tasks WHERE id = ?", (task_id,)).fetchone()
+            if row is None or row[0] not in ("queued", "leased") or self._slot(conn, worker) is None:
+                return False
+            conn.execute("UPDATE tasks SET state = 'done', worker = ? WHERE id = ?", (worker, task_id))
+            conn.execute("INSERT OR REPLACE INTO results (task_id, worker, questions, elapsed) VALUES (?, ?, ?, ?)",
+                         (task_id, worker, payload, elapsed))
+            conn.execute("UPDATE workers SET seen = ?, batches = batches + 1, questions = questions + ? "
+                         "WHERE name = ?", (time.time(), len(questions), worker))
+        return True
+
+    # ---------- reporting ----------
+
+    def by_worker(self):
+        """[(worker, batches done this run)], busiest first."""
+        with self._lock:
+            return self.conn.execute("SELECT worker, COUNT(*) FROM tasks WHERE state = 'done' "
+                                     "GROUP BY worker ORDER BY COUNT(*) DESC").fetchall()
+
+    def summary(self):
+        with self._lock:
+            done, reassigned = self.conn.execute(
+                "SELECT SUM(state = 'done'), SUM(MAX(attempts - 1, 0)) FROM tasks").fetchone()
+        return (f"{done or 0} batches done by {len(self.by_worker())} workers, "
+                f"{reassigned or 0} expired leases handed to another worker")
+
+    def report(self):
+        """Per-worker share of the batches, then the summary."""
+        rows = self.by_worker()
+        total = sum(n for _, n in rows) or 1
+        lines = [f"   {worker:<32} {n:>6} batches ({n / total:.0%})" for worker, n in rows]
+        lines.append(f"   {self.summary()}")
+        return "\n".join(lines)
+
+
+# ---------- over HTTP ----------
+
+class QueueServer:
+    """Serves a WorkQueue's worker half (register, lease, renew, complete) to workers on other machines."""
+
+    METHODS = ("register", "lease", "renew", "complete")
+
+    def __init__(self, work, port=0, host="0.0.0.0"):
+        self.work = work
+        self.seen = {}  # worker -> monotonic time of its last call
+        self.told = set()  # workers that were told the run is finished
+        self._server = ThreadingHTTPServer((host, port), _handler(self))
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="qgen-queue-http", daemon=True)
+        self._thread.start()
+
+    def call(self, method, args):
+        result = getattr(self.work, method)(**args)
+        self.seen[args["worker"]] = time.monotonic()
+        if method == "lease" and isinstance(result, str):
+            self.told.add(args["worker"])
+        return result
+
+    def close(self, grace=5.0):
+        """Stop serving once the workers heard from in the last `grace` seconds know the run is finished.
+
+        Waits at most `grace` seconds; a worker still busy after that (or
+        dead) finds the coordinator gone and exits after GIVE_UP.
+        """
+        deadline = time.monotonic() + grace
+        while time.monotonic() < deadline and any(
+                worker not in self.told and time.monotonic() - seen < grace for worker, seen in list(self.seen.items())):
+            time.sleep(0.05)
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _handler(server):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive: a worker makes a call per lease and per batch
+        disable_nagle_algorithm = True  # else each small response waits out the client's delayed ACK
+
+        def do_POST(self):
+            method = self.path.strip("/")
+            if method not in QueueServer.METHODS:
+                self.send_error(404)
+                return
+            try:
+                args = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                data = json.dumps({"result": server.call(method, args)}).encode("utf-8")
+            except RuntimeError as e:
+                self.send_error(409, str(e))  # register: no ID slot free
+                return
+            except (ValueError, TypeError, KeyError, sqlite3.Error) as e:
+                self.send_error(400 if not isinstance(e, sqlite3.Error) else 500, str(e))
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass  # one line per lease would drown the progress line
+
+    return Handler
+
+
+class RemoteQueue:
+    """The worker half of a WorkQueue, served by the coordinator's QueueServer at `url`.
+
+    A failed lease() is an empty one until the coordinator has been
+    unreachable for give_up seconds (it finished and exited, or died),
+    then UNREACHABLE. A failed complete() is retried a few
+    times; if it still fails the lease runs out and the batch is redone.
+    """
+
+    def __init__(self, url, timeout=30.0, give_up=GIVE_UP, retries=3):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.give_up = give_up
+        self.retries = retries
+        self.session = requests.Session()
+        self._down_since = None
+
+    def _call(self, method, **args):
+        r = self.session.post(f"{self.url}/{method}", data=json.dumps(args, ensure_ascii=False, default=as_json),
+                              headers={"Content-Type": "application/json"}, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()["result"]
+
+    def register(self, worker):
+        """Join as `worker`, waiting up to give_up seconds for the coordinator to come up."""
+        deadline = time.monotonic() + self.give_up
+        while True:
+            try:
+                return self._call("register", worker=worker)
+            except requests.ConnectionError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(1)
+            except requests.HTTPError as e:
+                if e.response.status_code == 409:
+                    raise RuntimeError(e.response.reason) from None
+                raise
+
+    def lease(self, worker, n=1, ttl=LEASE_TTL):
+        try:
+            rows = self._call("lease", worker=worker, n=n, ttl=ttl)
+        except requests.RequestException:
+            now = time.monotonic()
+            self._down_since = self._down_since or now
+            return UNREACHABLE if now - self._down_since > self.give_up else []
+        self._down_since = None
+        return rows if isinstance(rows, str) else [(task_id, tuple(task)) for task_id, task in rows]
+
+    def renew(self, worker, task_ids, ttl=LEASE_TTL):
+        try:
+            self._call("renew", worker=worker, task_ids=list(task_ids), ttl=ttl)
+        except requests.RequestException:
+            pass  # the next renewal covers it, or the lease runs out
+
+    def complete(self, task_id, worker, questions, elapsed):
+        for attempt in range(self.retries):
+            try:
+                return self._call("complete", task_id=task_id, worker=worker, questions=questions, elapsed=elapsed)
+            except requests.RequestException:
+                time.sleep(1 + attempt)
+        return False
+
+    def close(self):
+        self.session.close()
+
+
+def connect(target):
+    """The queue a worker uses: RemoteQueue for an http(s):// URL, else the WorkQueue file at that path."""
+    if str(target).startswith(("http://", "https://")):
+        return RemoteQueue(target)
+    return WorkQueue(target)
@@ -0,0 +1,147 @@
+"""
+Background persistence thread
+=============================
+Journal appends (fsync) and checkpoints (rewriting all_questions.json, the
+subject files and index.json) used to run on the submit loop while it held
+the generator's global lock, so every worker that finished a call during
+a multi-file dump stalled at its dedup check until the dump was done.
+
+BackgroundWriter moves all of that to one thread fed by a bounded queue:
+
+- append(questions):   journal a batch; returns as soon as it is queued
+- checkpoint(*args):   run the generator's compaction after every append
+                       queued before it (FIFO), so the journal it truncates
+                       holds exactly what the snapshot now contains
+- busy():              a checkpoint is still queued or running; callers
+                       skip theirs and let the next one cover both, so a
+                       writer slower than the checkpoint interval doesn't
+                       pile up full-bank rewrites
+- flush() / close():   wait for the queue to drain (close also stops the
+                       thread); an error on the writer thread is re-raised
+                       here, and on the next append/checkpoint
+
+Callers only wait when max_pending jobs are already queued (the disk is
+that far behind), which also bounds how many accepted questions a crash
+can lose before they reach the journal. background=False runs every job
+inline in the caller, i.e. the old behaviour, for comparison. With a
+profiler (qgen.profiling) the jobs are timed as the persist.journal and
+persist.checkpoint stages.
+
+    writer = BackgroundWriter(journal, write_checkpoint)
+    writer.append(questions)
+    writer.checkpoint(new, pending, counts, index)
+    writer.close()
+"""
+
+import queue
+import threading
+import time
+
+from qgen.profiling import StageProfiler
+
+MAX_PENDING = 64  # queued jobs before append()/checkpoint() block
+
+
+class BackgroundWriter:
+    """Runs journal appends and checkpoints in order on one persistence thread."""
+
+    def __init__(self, journal, checkpoint, max_pending=MAX_PENDING, background=True, profiler=None):
+        self.journal = journal
+        self._checkpoint = checkpoint
+        self.background = background
+        self.profiler = profiler or StageProfiler()  # disabled unless the caller's is running
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.error = None
+        self.written = 0  # questions journaled
+        self.checkpoints = 0
+        self.write_time = 0.0  # seconds spent writing
+        self.waited = 0.0  # seconds callers spent waiting for queue room (or writing, inline)
+        self._queued_checkpoints = 0
+        self._count_lock = threading.Lock()
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._loop, name="qgen-writer", daemon=True)
+            self._thread.start()
+
+    # ---------- producer side ----------
+
+    def append(self, questions):
+        if questions:
+            self._submit(self._append, list(questions))
+
+    def checkpoint(self, *args):
+        with self._count_lock:
+            self._queued_checkpoints += 1
+        self._submit(self._run_checkpoint, *args)
+
+    def busy(self):
+        """True while an earlier checkpoint hasn't finished."""
+        return self._queued_checkpoints > 0
+
+    def flush(self):
+        """Block until everything queued so far is on disk."""
+        if self._thread is not None:
+            self.queue.join()
+        self._raise()
+
+    def close(self):
+        """Drain the queue and stop the thread."""
+        if self._thread is not None:
+            self.queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise()
+
+    def summary(self):
+        mode = "writer thread" if self.background else "inline"
+        return (f"{self.written} journaled, {self.checkpoints} checkpoints, {self.write_time:.2f}s writing ({mode}), "
+                f"callers waited {self.waited:.2f}s")
+
+    # ---------- internals ----------
+
+    def _raise(self):
+        if self.error is not None:
+            raise RuntimeError(f"background writer failed: {self.error!r}") from self.error
+
+    def _submit(self, job, *args):
+        self._raise()
+        start = time.perf_counter()
+        if self._thread is None:
+            self._timed(job, args)
+        else:
+            self.queue.put((job, args))
+        self.waited += time.perf_counter() - start
+
+    def _timed(self, job, args):
+        start = time.perf_counter()
+        try:
+            job(*args)
+        finally:
+            self.write_time += time.perf_counter() - start
+
+    def _append(self, questions):
+        with self.profiler.stage("persist.journal"):
+            self.journal.append_many(questions)
+        self.written += len(questions)
+
+    def _run_checkpoint(self, *args):
+        try:
+            with self.profiler.stage("persist.checkpoint"):
+                self._checkpoint(*args)
+            self.checkpoints += 1
+        finally:
+            with self._count_lock:
+                self._queued_checkpoints -= 1
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                if self.error is None:  # after a failure, drain without writing
+                    self._timed(*item)
+            except BaseException as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
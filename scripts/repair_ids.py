@@ -0,0 +1,188 @@
+"""
+Question ID integrity repair
+============================
+Older generators built IDs as q_{ms}_{random 4 digits}, so two questions
+of one batch could share an ID, and the app's questionIndex Map (keyed by
+id) silently kept only one of them.
+
+This finds every ID that names more than one distinct question across
+the question files in src/data/questions (merged_questions.json first,
+then all_questions.json, firestore_data.json, the per-subject files,
+...) and gives every question after the first its own ID - the same new
+ID in every file that holds it, and in topic_mapping.json's questionIds.
+New IDs keep the old millisecond (so sort order holds) with worker 99
+and a sequence number (see qgen/ids.py), which no legacy ID can equal.
+
+The same question repeated under one ID is left alone (that is
+dedup_questions.py's job). Without --write nothing is changed.
+
+Usage:
+    python scripts/repair_ids.py
+    python scripts/repair_ids.py --write
+"""
+
+import argparse
+import json
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from qgen.ids import claim_worker, new_id
+from qgen.journal import atomic_write_json
+
+QUESTIONS_DIR = Path(__file__).parent.parent / "src" / "data" / "questions"
+CANONICAL = "merged_questions.json"  # what the app loads; its question keeps a contested ID
+TOPIC_MAPPING = "topic_mapping.json"
+REPAIR_WORKER = 99
+LEGACY_ID = re.compile(r"^q_(\d{13})_\d+$")
+
+
+def content_key(q):
+    """What makes two records the same question, whatever file they are in."""
+    return q.get("question", "").strip(), json.dumps(q.get("options"), sort_keys=True, ensure_ascii=False)
+
+
+def question_lists(data):
+    """The question lists inside a loaded file ([] if it holds none)."""
+    if isinstance(data, dict) and isinstance(data.get("questions"), list):
+        data = data["questions"]  # firestore_data.json
+    if isinstance(data, list) and data and all(isinstance(q, dict) and "id" in q for q in data):
+        return [data]
+    return []
+
+
+def load_files(folder):
+    """{path: data} for every JSON file holding questions, CANONICAL first."""
+    paths = sorted(folder.glob("*.json"), key=lambda p: (p.name != CANONICAL, p.name))
+    files = {}
+    for path in paths:
+        if path.name == TOPIC_MAPPING:
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if question_lists(data):
+            files[path] = data
+    return files
+
+
+def plan_renames(files):
+    """{(old id, content key): new id} for every question that shares its ID with another."""
+    owners = defaultdict(list)  # id -> distinct content keys, first seen first
+    for data in files.values():
+        for questions in question_lists(data):
+            for q in questions:
+                key = content_key(q)
+                if key not in owners[q["id"]]:
+                    owners[q["id"]].append(key)
+
+    taken = set(owners)
+    sequence = Counter()  # per millisecond
+    renames = {}
+    for old, keys in owners.items():
+        for key in keys[1:]:
+            match = LEGACY_ID.match(old)
+            if match is None:
+                renames[(old, key)] = new_id()
+                continue
+            ms = match.group(1)
+            while True:
+                candidate = f"q_{ms}_{REPAIR_WORKER:02d}{sequence[ms]:04d}"
+                sequence[ms] += 1
+                if candidate not in taken:
+                    break
+            taken.add(candidate)
+            renames[(old, key)] = candidate
+    return renames
+
+
+def apply_renames(files, renames):
+    """Rewrite IDs in place; returns {path: questions renamed}."""
+    changed = Counter()
+    for path, data in files.items():
+        for questions in question_lists(data):
+            for q in questions:
+                new = renames.get((q["id"], content_key(q)))
+                if new is not None:
+                    q["id"] = new
+                    changed[path] += 1
+    return changed
+
+
+def repair_topic_mapping(mapping, canonical, renames):
+    """Re-point questionIds at the renamed questions; returns (changed, unresolved).
+
+    topic_mapping.json is built from merged_questions.json in file order,
+    so the k-th occurrence of an ID under a subject/topic is the k-th
+    question with that ID, subject and topic there.
+    """
+    contested = {old for old, _ in renames}
+    pending = defaultdict(list)  # (subject, topic, old id) -> content keys in file order
+    for q in canonical:
+        if q["id"] in contested:
+            pending[(q.get("subject"), q.get("topic"), q["id"])].append(content_key(q))
+
+    changed = unresolved = 0
+    for subject, topics in mapping.items():
+        for topic, entry in topics.items():
+            ids = entry.get("questionIds", [])
+            for i, old in enumerate(ids):
+                if old not in contested:
+                    continue
+                keys = pending.get((subject, topic, old))
+                if not keys:
+                    unresolved += 1
+                    continue
+                new = renames.get((old, keys.pop(0)))
+                if new is not None:
+                    ids[i] = new
+                    changed += 1
+    return changed, unresolved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and rewrite question IDs shared by different questions")
+    parser.add_argument("--dir", type=Path, default=QUESTIONS_DIR, help="question data folder")
+    parser.add_argument("--write", action="store_true", help="rewrite the files (default: report only)")
+    args = parser.parse_args()
+
+    claim_worker(args.dir)  # new IDs can't clash with a generator writing here meanwhile
+    files = load_files(args.dir)
+    print(f"📂 {len(files)} question files in {args.dir}")
+    for path, data in files.items():
+        questions = [q for qs in question_lists(data) for q in qs]
+        ids = Counter(q["id"] for q in questions)
+        repeated = sum(1 for n in ids.values() if n > 1)
+        print(f"   {path.name:<45} {len(questions):>6} questions | {repeated:>4} repeated IDs")
+
+    renames = plan_renames(files)
+    print(f"\n🔍 {len({old for old, _ in renames})} IDs shared by different questions -> {len(renames)} new IDs")
+    for (old, key), new in list(renames.items())[:20]:
+        print(f"   {old} -> {new}  {key[0][:60]}")
+
+    # topic_mapping.json first: it is matched against the canonical file's old IDs
+    changed = Counter()
+    mapping_path = args.dir / TOPIC_MAPPING
+    mapping = None
+    if mapping_path.exists() and args.dir / CANONICAL in files:
+        with open(mapping_path, "r", encoding="utf-8") as f:
+            mapping = json.load(f)
+        canonical = question_lists(files[args.dir / CANONICAL])[0]
+        changed[mapping_path], unresolved = repair_topic_mapping(mapping, canonical, renames)
+        if unresolved:
+            print(f"⚠️  {unresolved} topic_mapping entries could not be matched to a question")
+    changed.update(apply_renames(files, renames))
+
+    for path, n in changed.items():
+        if n:
+            print(f"   ✏️  {path.name}: {n} IDs rewritten")
+    if not args.write:
+        print("\n(dry run - pass --write to rewrite the files)")
+        return
+    for path, n in changed.items():
+        if n:
+            atomic_write_json(path, mapping if path == mapping_path else files[path])
+    print(f"\n💾 Rewrote {sum(1 for n in changed.values() if n)} files")
+
+
+if __name__ == "__main__":
+    main()